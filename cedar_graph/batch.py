@@ -0,0 +1,686 @@
+"""Batch product generation: render plot type × system × area × lead time from a manifest.
+
+Operational products are a matrix: every plot type for every system,
+forecast hour and regional area. Driving ``quick_plot`` from shell loops
+starts one Python process per image, and each process imports the
+plotting stack and reads the same GRIB files again. ``cedar-graph batch``
+expands a manifest into jobs, groups them by
+``(system, start_time, forecast_time)`` and renders each group in one
+worker of a process pool: the group shares one data source and one
+:class:`~cedar_graph.data.FieldCache`, so file paths, GRIB indexes and
+decoded fields are reused by every plot and area of that lead time.
+Jobs of a plot type with the same params are loaded once and drawn for
+each of their areas (``cedar_graph.render.render_areas``).
+
+With ``--pipeline`` (:func:`run_pipeline`) this process loads the next
+plots while the workers draw the loaded ones, and PNGs are encoded and
+written in background threads (``cedar_graph.pipeline``).
+
+With ``--trace-dir`` each worker task writes a Chrome trace and a stage
+summary of its plots (``cedar_graph.tracing``).
+
+Manifest (YAML):
+
+.. code-block:: yaml
+
+    output_dir: /data/products
+    # optional, relative to output_dir; fields: plot_type, plot_name, system_name,
+    # start_time, forecast_hour, area_name
+    output: "{system_name}/{start_time:%Y%m%d%H}/{plot_name}/{plot_name}_{area_name}_{forecast_hour:03d}.png"
+    data_source:              # keyword arguments of LocalDataSource
+      data_class: od
+    composite: false          # draw static chrome once per product and area in each worker
+    systems: [CMA-GFS, CMA-MESO]
+    start_times: ["2024070100"]
+    forecast_hours: {start: 0, stop: 72, step: 3}   # or a list: [24, 48]
+    areas:
+      - name: China           # no range: full domain
+      - cn_areas              # all areas of CN_AREAS
+      - name: Beijing
+        range: [115, 118, 39, 42]
+        params: {wind_level: 850}
+    products:
+      - plot_type: cn.t2m
+      - plot_type: cn.rain_24h
+        params: {interval: 24h}
+      - plot_type: cn.kidx_wind
+        areas: [NorthEast, NorthChina]   # only these areas (names of the areas above or CN_AREAS)
+
+Area params (the wind level of plateau areas) override product params.
+"""
+
+import functools
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+import yaml
+
+from cedarkit.plots.types import AreaRange
+
+from cedar_graph.data import FieldCache
+from cedar_graph.logger import get_logger
+from cedar_graph.render import CN_AREAS, PlotArea, render_areas
+from cedar_graph.tracing import plot_span, trace
+
+
+logger = get_logger(__name__)
+
+#: default output path, relative to ``output_dir``.
+DEFAULT_OUTPUT = "{system_name}/{start_time:%Y%m%d%H}/{plot_name}/{plot_name}_{area_name}_{forecast_hour:03d}.png"
+
+
+class ManifestError(ValueError):
+    """Invalid batch manifest."""
+    def __init__(self, path: Union[str, Path], message: str):
+        self.path = path
+        super().__init__(f"{path}: {message}")
+
+
+@dataclass
+class BatchProduct:
+    """
+    A plot type of the manifest.
+
+    Attributes
+    ----------
+    plot_type : str
+    params : dict
+    areas : list[str] or None
+        names of the areas to render, all manifest areas if None.
+    """
+    plot_type: str
+    params: Dict[str, Any] = field(default_factory=dict)
+    areas: Optional[List[str]] = None
+
+
+@dataclass
+class BatchManifest:
+    """
+    Parsed batch manifest, see the module docstring.
+
+    Attributes
+    ----------
+    products : list[BatchProduct]
+    systems : list[str]
+    start_times : list[pd.Timestamp]
+    forecast_times : list[pd.Timedelta]
+    areas : list[PlotArea]
+    output_dir : Path
+    output : str
+        output path template, relative to ``output_dir``.
+    data_source_config : dict
+    composite : bool
+        save images with the chrome cache of the worker (``cedar_graph.composite``).
+    """
+    products: List[BatchProduct]
+    systems: List[str]
+    start_times: List[pd.Timestamp]
+    forecast_times: List[pd.Timedelta]
+    areas: List[PlotArea]
+    output_dir: Path
+    output: str = DEFAULT_OUTPUT
+    data_source_config: Dict[str, Any] = field(default_factory=dict)
+    composite: bool = False
+
+
+@dataclass
+class BatchJob:
+    """
+    One image of a batch.
+
+    Attributes
+    ----------
+    plot_type : str
+    system_name : str
+    start_time : pd.Timestamp
+    forecast_time : pd.Timedelta
+    area : PlotArea
+    params : dict
+        product params updated with area params.
+    output_path : Path
+    """
+    plot_type: str
+    system_name: str
+    start_time: pd.Timestamp
+    forecast_time: pd.Timedelta
+    area: PlotArea
+    params: Dict[str, Any]
+    output_path: Path
+
+    def group_key(self) -> Tuple[str, pd.Timestamp, pd.Timedelta]:
+        """Jobs with the same key are rendered by one worker."""
+        return self.system_name, self.start_time, self.forecast_time
+
+    def plot_settings(self) -> Dict[str, Any]:
+        """Plot settings of ``create_panel``."""
+        plot_settings = dict(
+            system_name=self.system_name,
+            start_time=self.start_time,
+            forecast_time=str(self.forecast_time),
+            area_name=self.area.name,
+            **self.params,
+        )
+        if self.area.area is not None:
+            plot_settings["area_range"] = self.area.area
+        return plot_settings
+
+
+@dataclass
+class JobResult:
+    """
+    Result of a batch job.
+
+    Attributes
+    ----------
+    job : BatchJob
+    error : str or None
+        error of a failed job.
+    elapsed : float
+        seconds.
+    """
+    job: BatchJob
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _parse_forecast_times(path, value) -> List[pd.Timedelta]:
+    if isinstance(value, dict):
+        unknown = set(value) - {"start", "stop", "step"}
+        if unknown or "stop" not in value:
+            raise ManifestError(path, f"forecast_hours range needs start/stop/step, got: {sorted(value)}")
+        start, stop, step = int(value.get("start", 0)), int(value["stop"]), int(value.get("step", 1))
+        if step <= 0:
+            raise ManifestError(path, f"forecast_hours step must be positive, got: {step}")
+        hours = list(range(start, stop + 1, step))
+    elif isinstance(value, list):
+        hours = [int(hour) for hour in value]
+    else:
+        hours = [int(value)]
+    return [pd.Timedelta(hours=hour) for hour in hours]
+
+
+def _parse_areas(path, value) -> List[PlotArea]:
+    known = {area.name: area for area in CN_AREAS}
+    areas = []
+    for entry in value:
+        if entry == "cn_areas":
+            areas.extend(CN_AREAS)
+        elif isinstance(entry, str):
+            if entry not in known:
+                raise ManifestError(path, f"unknown area {entry!r}, known areas: {sorted(known)}")
+            areas.append(known[entry])
+        elif isinstance(entry, dict) and "name" in entry:
+            area_range = entry.get("range")
+            areas.append(PlotArea(
+                name=entry["name"],
+                area=AreaRange.from_tuple(tuple(area_range)) if area_range is not None else None,
+                params=dict(entry.get("params") or {}),
+            ))
+        else:
+            raise ManifestError(path, f"invalid area entry: {entry!r}")
+    return areas
+
+
+def parse_manifest(content: Dict[str, Any], path: Union[str, Path] = "<manifest>") -> BatchManifest:
+    """
+    Create a manifest from decoded YAML.
+
+    Raises
+    ------
+    ManifestError
+    """
+    if not isinstance(content, dict):
+        raise ManifestError(path, "manifest must be a YAML mapping")
+    for key in ("products", "systems", "start_times", "forecast_hours", "output_dir"):
+        if key not in content:
+            raise ManifestError(path, f"missing key {key!r}")
+
+    products = []
+    for entry in content["products"]:
+        if isinstance(entry, str):
+            entry = dict(plot_type=entry)
+        if not isinstance(entry, dict) or "plot_type" not in entry:
+            raise ManifestError(path, f"invalid product entry: {entry!r}")
+        products.append(BatchProduct(
+            plot_type=entry["plot_type"],
+            params=dict(entry.get("params") or {}),
+            areas=entry.get("areas"),
+        ))
+
+    start_times = content["start_times"]
+    if not isinstance(start_times, list):
+        start_times = [start_times]
+
+    areas = _parse_areas(path, content.get("areas") or [dict(name="China")])
+    area_names = {area.name for area in areas} | {area.name for area in CN_AREAS}
+    for product in products:
+        unknown = sorted(set(product.areas or []) - area_names)
+        if unknown:
+            raise ManifestError(path, f"product {product.plot_type!r} uses unknown areas: {unknown}")
+
+    systems = content["systems"]
+    return BatchManifest(
+        products=products,
+        systems=systems if isinstance(systems, list) else [systems],
+        start_times=[_parse_start_time(start_time) for start_time in start_times],
+        forecast_times=_parse_forecast_times(path, content["forecast_hours"]),
+        areas=areas,
+        output_dir=Path(content["output_dir"]),
+        output=content.get("output", DEFAULT_OUTPUT),
+        data_source_config=dict(content.get("data_source") or {}),
+        composite=bool(content.get("composite", False)),
+    )
+
+
+def _parse_start_time(value) -> pd.Timestamp:
+    value = str(value)
+    if len(value) == 10 and value.isdigit():
+        return pd.to_datetime(value, format="%Y%m%d%H")
+    return pd.Timestamp(value)
+
+
+def load_manifest(path: Union[str, Path]) -> BatchManifest:
+    """
+    Load a batch manifest YAML file.
+
+    Raises
+    ------
+    ManifestError
+    """
+    path = Path(path)
+    try:
+        content = yaml.safe_load(path.read_text(encoding="utf-8"))
+    except (OSError, yaml.YAMLError) as e:
+        raise ManifestError(path, f"cannot load manifest: {e}") from e
+    return parse_manifest(content, path=path)
+
+
+def expand_jobs(manifest: BatchManifest) -> List[BatchJob]:
+    """
+    All jobs of a manifest: product × system × start time × forecast time × area.
+
+    Returns
+    -------
+    list[BatchJob]
+    """
+    known_areas = {area.name: area for area in CN_AREAS}
+    known_areas.update({area.name: area for area in manifest.areas})
+    jobs = []
+    for product in manifest.products:
+        if product.areas is None:
+            areas = manifest.areas
+        else:
+            areas = [known_areas[name] for name in product.areas]
+        for system_name in manifest.systems:
+            for start_time in manifest.start_times:
+                for forecast_time in manifest.forecast_times:
+                    for area in areas:
+                        output_path = manifest.output_dir / manifest.output.format(
+                            plot_type=product.plot_type,
+                            plot_name=product.plot_type.replace(".", "_"),
+                            system_name=system_name,
+                            start_time=start_time,
+                            forecast_hour=int(forecast_time / pd.Timedelta(hours=1)),
+                            area_name=area.name,
+                        )
+                        jobs.append(BatchJob(
+                            plot_type=product.plot_type,
+                            system_name=system_name,
+                            start_time=start_time,
+                            forecast_time=forecast_time,
+                            area=area,
+                            params={**product.params, **area.params},
+                            output_path=output_path,
+                        ))
+    return jobs
+
+
+def group_jobs(jobs: List[BatchJob]) -> Dict[Tuple[str, pd.Timestamp, pd.Timedelta], List[BatchJob]]:
+    """Jobs by ``(system, start_time, forecast_time)``, in order of first job."""
+    groups: Dict[Tuple[str, pd.Timestamp, pd.Timedelta], List[BatchJob]] = dict()
+    for job in jobs:
+        groups.setdefault(job.group_key(), []).append(job)
+    return groups
+
+
+def load_groups(jobs: List[BatchJob]) -> List[List[BatchJob]]:
+    """
+    Jobs loading the same data: same system, plot type and values of the params used by ``load_data``,
+    in order of first job. The jobs of a group differ in their areas.
+    """
+    from cedar_graph.quickplot import load_params, resolve_plot
+
+    plot_params: Dict[str, Optional[set]] = dict()
+    plots: Dict[Tuple[str, pd.Timestamp, pd.Timedelta, str, str], List[BatchJob]] = dict()
+    for job in jobs:
+        if job.plot_type not in plot_params:
+            try:
+                plot_params[job.plot_type] = load_params(resolve_plot(job.plot_type))
+            except Exception:
+                # reported when the plot is loaded
+                plot_params[job.plot_type] = None
+        names = plot_params[job.plot_type]
+        params = {k: v for k, v in job.params.items() if names is None or k in names}
+        key = (*job.group_key(), job.plot_type, repr(sorted(params.items())))
+        plots.setdefault(key, []).append(job)
+    return list(plots.values())
+
+
+def load_span(job: BatchJob):
+    """Plot span of ``cedar_graph.tracing`` around loading the data of ``job``."""
+    return plot_span(
+        job.plot_type, stage="load", system_name=job.system_name, start_time=job.start_time, forecast_time=job.forecast_time,
+    )
+
+
+def trace_name(job: BatchJob) -> str:
+    """File name (without suffix) of the trace of the group of ``job``."""
+    forecast_hour = int(job.forecast_time / pd.Timedelta(hours=1))
+    return f"{job.system_name}_{job.start_time:%Y%m%d%H}_{forecast_hour:03d}"
+
+
+def run_group(
+        jobs: List[BatchJob],
+        data_source_config: Optional[Dict[str, Any]] = None,
+        field_cache_bytes: int = 2 * 1024 ** 3,
+        composite: bool = False,
+        trace_dir: Optional[Union[str, Path]] = None,
+) -> List[JobResult]:
+    """
+    Render jobs of one ``(system, start_time, forecast_time)`` with one data source and field cache.
+
+    Jobs of the same plot type and params load their data once and draw each area from it.
+    A failed job does not stop the others.
+
+    Parameters
+    ----------
+    jobs
+    data_source_config
+        keyword arguments of ``LocalDataSource``.
+    field_cache_bytes
+        budget of the field cache shared by the jobs.
+    composite
+        save images with the process-wide ``ChromeCache``, keyed by system, plot type, params and area.
+    trace_dir
+        write the Chrome trace and stage summary of the group (``cedar_graph.tracing``) to
+        ``<trace_dir>/<system>_<YYYYMMDDHH>_<FFF>.json`` and ``.txt``.
+
+    Returns
+    -------
+    list[JobResult]
+        in order of ``jobs``.
+    """
+    if trace_dir is None:
+        return _run_group(jobs, data_source_config, field_cache_bytes, composite)
+    name = trace_name(jobs[0])
+    with trace(Path(trace_dir, f"{name}.json"), summary_path=Path(trace_dir, f"{name}.txt")):
+        return _run_group(jobs, data_source_config, field_cache_bytes, composite)
+
+
+def _run_group(
+        jobs: List[BatchJob],
+        data_source_config: Optional[Dict[str, Any]],
+        field_cache_bytes: int,
+        composite: bool,
+) -> List[JobResult]:
+    from cedar_graph.composite import get_chrome_cache
+    from cedar_graph.quickplot import create_data_source, load_plot
+
+    data_sources = dict()
+    field_cache = FieldCache(max_bytes=field_cache_bytes)
+
+    results: Dict[int, JobResult] = dict()
+    for plot_jobs in load_groups(jobs):
+        first_job = plot_jobs[0]
+        start = time.perf_counter()
+        try:
+            data_source = data_sources.get(first_job.system_name)
+            if data_source is None:
+                data_source = create_data_source(first_job.system_name, dict(data_source_config or {}))
+                data_sources[first_job.system_name] = data_source
+            with load_span(first_job):
+                plot_module, plot_metadata, plot_data = load_plot(
+                    plot_type=first_job.plot_type,
+                    plot_settings=first_job.plot_settings(),
+                    data_source_config=dict(data_source_config or {}),
+                    field_cache=field_cache,
+                    data_source=data_source,
+                )
+        except Exception as e:
+            for job in plot_jobs:
+                results[id(job)] = JobResult(job=job, error=repr(e), elapsed=time.perf_counter() - start)
+            continue
+
+        for job in plot_jobs:
+            def save(area: PlotArea, panel, job=job):
+                job.output_path.parent.mkdir(parents=True, exist_ok=True)
+                if composite:
+                    key = (job.system_name, job.plot_type, repr(sorted(job.params.items())), area.name, area.area)
+                    get_chrome_cache().save(panel, job.output_path, key=key)
+                else:
+                    panel.save(job.output_path)
+
+            try:
+                # plot() crops its plot data in place, render_areas draws each area from a copy
+                render_areas(plot_module, plot_data, plot_metadata, [job.area], output=save, plot_type=job.plot_type)
+            except Exception as e:
+                results[id(job)] = JobResult(job=job, error=repr(e), elapsed=time.perf_counter() - start)
+            else:
+                results[id(job)] = JobResult(job=job, elapsed=time.perf_counter() - start)
+            start = time.perf_counter()
+    return [results[id(job)] for job in jobs]
+
+
+def run_pipeline(
+        manifest: BatchManifest,
+        executor: Optional[Executor] = None,
+        loader_threads: int = 2,
+        writer_threads: int = 2,
+        memory_budget: int = 2 * 1024 ** 3,
+        field_cache_bytes: int = 2 * 1024 ** 3,
+        trace_dir: Optional[Union[str, Path]] = None,
+) -> List[JobResult]:
+    """
+    Render all jobs of a manifest with a :class:`~cedar_graph.pipeline.PlotPipeline`: this process
+    loads the next plots while ``executor`` draws the loaded ones and PNGs are written in the background.
+
+    Jobs of the same lead time, plot type and params load their data once (:func:`load_groups`).
+    All loads share one field cache and one data source per system.
+
+    Parameters
+    ----------
+    manifest
+    executor
+        render worker processes, draw in this process if None.
+    loader_threads
+    writer_threads
+    memory_budget
+        bytes of loaded plot data and images waiting to be written.
+    field_cache_bytes
+        budget of the field cache shared by the loads.
+    trace_dir
+        write the Chrome trace and stage summary (``cedar_graph.tracing``) to
+        ``<trace_dir>/pipeline.json`` and ``.txt``, with the spans of the render worker processes.
+
+    Returns
+    -------
+    list[JobResult]
+        in order of :func:`expand_jobs`.
+    """
+    if trace_dir is not None:
+        with trace(Path(trace_dir, "pipeline.json"), summary_path=Path(trace_dir, "pipeline.txt")):
+            return run_pipeline(
+                manifest, executor, loader_threads, writer_threads, memory_budget, field_cache_bytes,
+            )
+
+    from cedar_graph.pipeline import PipelineJob, PlotPipeline
+    from cedar_graph.quickplot import create_data_source, load_plot
+
+    jobs = expand_jobs(manifest)
+    field_cache = FieldCache(max_bytes=field_cache_bytes)
+    data_sources = dict()
+    data_source_lock = threading.Lock()
+
+    def load(job: BatchJob):
+        with data_source_lock:
+            data_source = data_sources.get(job.system_name)
+            if data_source is None:
+                data_source = create_data_source(job.system_name, dict(manifest.data_source_config))
+                data_sources[job.system_name] = data_source
+        with load_span(job):
+            return load_plot(
+                plot_type=job.plot_type,
+                plot_settings=job.plot_settings(),
+                data_source_config=dict(manifest.data_source_config),
+                field_cache=field_cache,
+                data_source=data_source,
+            )
+
+    pipeline_jobs = []
+    for group in group_jobs(jobs).values():
+        for plot_jobs in load_groups(group):
+            first_job = plot_jobs[0]
+            pipeline_jobs.append(PipelineJob(
+                plot_type=first_job.plot_type,
+                load=functools.partial(load, first_job),
+                outputs=[(job.area, job.output_path) for job in plot_jobs],
+                chrome_key=(
+                    (first_job.system_name, first_job.plot_type, repr(sorted(first_job.params.items())))
+                    if manifest.composite else None
+                ),
+            ))
+    logger.info(f"batch: {len(jobs)} jobs in {len(pipeline_jobs)} loads, pipelined")
+
+    pipeline = PlotPipeline(
+        loader_threads=loader_threads,
+        writer_threads=writer_threads,
+        max_bytes=memory_budget,
+        executor=executor,
+    )
+    jobs_by_path = {job.output_path: job for job in jobs}
+    results: Dict[Path, JobResult] = dict()
+    for result in pipeline.run(pipeline_jobs):
+        results[result.path] = JobResult(job=jobs_by_path[result.path], error=result.error, elapsed=result.elapsed)
+        if not result.ok:
+            logger.warning(f"batch: {result.path} failed: {result.error}")
+    return [results[job.output_path] for job in jobs]
+
+
+def create_process_pool(
+        max_workers: Optional[int] = None,
+        map_cache_dir: Optional[Union[str, Path]] = None,
+        recipe_cache_dir: Optional[Union[str, Path]] = None,
+) -> Executor:
+    """
+    Process pool of workers forked from a fork server with the plotting modules preloaded.
+
+    Parameters
+    ----------
+    max_workers
+    map_cache_dir
+        base-map geometry cache directory of the workers, see ``cedar_graph.server.warm_up``.
+    recipe_cache_dir
+        compiled recipe cache directory of the workers, see ``cedar_graph.server.warm_up``.
+    """
+    from cedar_graph.server import DEFAULT_WORKER_PRELOAD, warm_up
+
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(DEFAULT_WORKER_PRELOAD)
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=context,
+        initializer=warm_up,
+        initargs=(None, True, map_cache_dir, recipe_cache_dir),
+    )
+
+
+def run_batch(
+        manifest: BatchManifest,
+        max_workers: Optional[int] = None,
+        executor_factory: Optional[Callable[[], Executor]] = None,
+        map_cache_dir: Optional[Union[str, Path]] = None,
+        recipe_cache_dir: Optional[Union[str, Path]] = None,
+        pipeline: bool = False,
+        memory_budget: int = 2 * 1024 ** 3,
+        trace_dir: Optional[Union[str, Path]] = None,
+) -> List[JobResult]:
+    """
+    Render all jobs of a manifest, one ``(system, start_time, forecast_time)`` group per worker task,
+    or with :func:`run_pipeline` if ``pipeline`` is set.
+
+    Parameters
+    ----------
+    manifest
+    max_workers
+        worker processes, cpu count if None.
+    executor_factory
+        creates the worker pool, :func:`create_process_pool` if None.
+    map_cache_dir
+        base-map geometry cache directory of the process pool.
+    recipe_cache_dir
+        compiled recipe cache directory of this process and the process pool,
+        see ``cedar_graph.recipes.engine.get_recipe_engine``.
+    pipeline
+        load in this process, draw in the worker processes and write PNGs in background threads.
+    memory_budget
+        bytes of loaded plot data and images waiting to be written, with ``pipeline``.
+    trace_dir
+        write a Chrome trace and stage summary per group, see :func:`run_group` and :func:`run_pipeline`.
+
+    Returns
+    -------
+    list[JobResult]
+        in order of :func:`expand_jobs`.
+    """
+    from cedar_graph.recipes.engine import get_recipe_engine
+
+    def create_executor() -> Executor:
+        if executor_factory is not None:
+            return executor_factory()
+        return create_process_pool(max_workers, map_cache_dir=map_cache_dir, recipe_cache_dir=recipe_cache_dir)
+
+    if recipe_cache_dir is not None:
+        # plots are resolved (and loaded with ``pipeline``) in this process too
+        get_recipe_engine(cache_dir=recipe_cache_dir)
+
+    if pipeline:
+        executor = create_executor()
+        with executor:
+            return run_pipeline(manifest, executor=executor, memory_budget=memory_budget, trace_dir=trace_dir)
+
+    jobs = expand_jobs(manifest)
+    groups = group_jobs(jobs)
+    logger.info(f"batch: {len(jobs)} jobs in {len(groups)} groups")
+
+    executor = create_executor()
+    # results of process workers hold copies of the jobs, matched by output path
+    results: Dict[Path, JobResult] = dict()
+    with executor:
+        futures = {
+            executor.submit(
+                run_group, group, manifest.data_source_config, composite=manifest.composite, trace_dir=trace_dir,
+            ): group
+            for group in groups.values()
+        }
+        for future in as_completed(futures):
+            group = futures[future]
+            try:
+                group_results = future.result()
+            except Exception as e:
+                # the worker died, e.g. killed for memory
+                group_results = [JobResult(job=job, error=repr(e)) for job in group]
+            for result in group_results:
+                results[result.job.output_path] = result
+                if not result.ok:
+                    logger.warning(f"batch: {result.job.output_path} failed: {result.error}")
+    return [results[job.output_path] for job in jobs]
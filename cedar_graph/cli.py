@@ -0,0 +1,145 @@
+"""Command line interface: ``cedar-graph <command>``.
+
+Commands
+--------
+serve
+    run the warm render daemon (``cedar_graph.server``).
+batch
+    render all products of a manifest (``cedar_graph.batch``).
+"""
+
+import argparse
+from typing import List, Optional
+
+from cedar_graph.server import DEFAULT_PORT
+
+
+def _add_data_source_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--data-class", default="od", help="data class passed to reki data finder (default: od)")
+    parser.add_argument("--storage-base", default=None, help="storage base path passed to reki data finder")
+
+
+def _add_map_cache_argument(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--map-cache", default=None,
+        help="directory of base-map geometries shared by workers (default: cache in memory of each worker)",
+    )
+
+
+def _add_recipe_cache_argument(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--recipe-cache", default=None,
+        help="directory of compiled recipes shared by workers (default: compile in memory of each worker)",
+    )
+
+
+def _data_source_config(args: argparse.Namespace) -> dict:
+    return dict(data_class=args.data_class, storage_base=args.storage_base)
+
+
+def _serve(args: argparse.Namespace) -> int:
+    from cedar_graph.server import PlotService, serve
+
+    service = PlotService(
+        data_source_config=_data_source_config(args),
+        max_workers=args.workers,
+        recycle_after=args.recycle_after if args.recycle_after > 0 else None,
+        timeout=args.timeout,
+        style_snapshot=args.style_snapshot,
+        precompile=not args.no_precompile,
+        map_cache_dir=args.map_cache,
+        recipe_cache_dir=args.recipe_cache,
+    )
+    serve(service, socket_path=args.socket, host=args.host, port=args.port)
+    return 0
+
+
+def _batch(args: argparse.Namespace) -> int:
+    from cedar_graph.batch import expand_jobs, group_jobs, load_manifest, run_batch
+
+    manifest = load_manifest(args.manifest)
+    if args.dry_run:
+        jobs = expand_jobs(manifest)
+        for (system_name, start_time, forecast_time), group in group_jobs(jobs).items():
+            print(f"{system_name} {start_time:%Y%m%d%H} {forecast_time}: {len(group)} jobs")
+            for job in group:
+                print(f"  {job.plot_type} {job.area.name} -> {job.output_path}")
+        return 0
+
+    results = run_batch(
+        manifest,
+        max_workers=args.workers,
+        map_cache_dir=args.map_cache,
+        recipe_cache_dir=args.recipe_cache,
+        pipeline=args.pipeline,
+        memory_budget=int(args.memory_budget * 1024 ** 3),
+        trace_dir=args.trace_dir,
+    )
+    failed = [result for result in results if not result.ok]
+    print(f"{len(results) - len(failed)} of {len(results)} plots rendered")
+    for result in failed:
+        print(f"failed: {result.job.output_path}: {result.error}")
+    return 1 if failed else 0
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cedar-graph", description="Plot tool for CEMC.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="run the warm render daemon",
+        description="Render plot requests received over a Unix socket or localhost HTTP in warm worker processes.",
+    )
+    address_group = serve_parser.add_mutually_exclusive_group()
+    address_group.add_argument("--socket", default=None, help="Unix socket path")
+    address_group.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"HTTP port (default: {DEFAULT_PORT})")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="HTTP host (default: 127.0.0.1)")
+    serve_parser.add_argument("--workers", type=int, default=None, help="worker processes (default: min(4, cpu count))")
+    serve_parser.add_argument(
+        "--recycle-after", type=int, default=100,
+        help="replace worker processes after this many requests, 0 to never replace (default: 100)",
+    )
+    serve_parser.add_argument("--timeout", type=float, default=None, help="seconds to wait for one render")
+    serve_parser.add_argument("--style-snapshot", default=None, help="style registry snapshot loaded by workers")
+    serve_parser.add_argument("--no-precompile", action="store_true", help="do not compile all recipes in workers")
+    _add_map_cache_argument(serve_parser)
+    _add_recipe_cache_argument(serve_parser)
+    _add_data_source_arguments(serve_parser)
+    serve_parser.set_defaults(func=_serve)
+
+    batch_parser = subparsers.add_parser(
+        "batch",
+        help="render all products of a manifest",
+        description="Render plot type x system x area x lead time from a YAML manifest with a process pool.",
+    )
+    batch_parser.add_argument("manifest", help="manifest YAML file")
+    batch_parser.add_argument("--workers", type=int, default=None, help="worker processes (default: cpu count)")
+    batch_parser.add_argument("--dry-run", action="store_true", help="list jobs grouped by worker task, render nothing")
+    batch_parser.add_argument(
+        "--pipeline", action="store_true",
+        help="load data in this process while workers draw, write PNGs in background threads",
+    )
+    batch_parser.add_argument(
+        "--memory-budget", type=float, default=2.0,
+        help="GiB of loaded plot data and images waiting to be written with --pipeline (default: 2)",
+    )
+    batch_parser.add_argument(
+        "--trace-dir", default=None,
+        help="write a Chrome trace (JSON) and stage summary per worker task (one for --pipeline) to this directory",
+    )
+    _add_map_cache_argument(batch_parser)
+    _add_recipe_cache_argument(batch_parser)
+    batch_parser.set_defaults(func=_batch)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = create_parser()
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,408 @@
+"""
+Composite forecast-hour frames onto cached rasters of their static chrome.
+
+Every frame of a 0-240h series of one product has the same base map,
+gridlines, axes frame, colorbar and map info: only the data layers
+(contourf, contour lines, barbs) and the title text change.
+:class:`ChromeCache` renders a ``Panel`` built as usual (``Panel``,
+``panel.plot``, ``domain.set_title``, ``domain.add_colorbar``) but draws
+the static chrome once per key, e.g. (product, area):
+
+* artists of the figure are listed in paint order and split into runs
+  of static chrome and dynamic artists (:func:`is_dynamic_artist`:
+  contour sets, barbs, meshes, images and texts of map axes);
+* for the first frame of a key, one draw snapshots the Agg buffer at each
+  run boundary and keeps the rasters of the static runs, cropped to
+  their non-transparent pixels;
+* for every frame, the background raster is copied into the Agg buffer
+  with NumPy, static chrome artists are skipped and the cached rasters of
+  later static runs are blended in at their place in the paint order,
+  between the dynamic artists drawn as usual.
+
+Static runs above the data (map borders over filled contours, the South
+China Sea inset over the main map) keep their place, so frames match the
+full render. All frames of a key are cropped to the ``bbox_inches="tight"``
+box of the first frame.
+
+Examples
+--------
+>>> chrome_cache = ChromeCache()
+>>> for forecast_hour in range(0, 241, 3):
+...     panel = plot(plot_data=..., plot_metadata=...)
+...     chrome_cache.save(panel, f"pte_wind_{forecast_hour:03d}.png", key=("cn.pte_wind", "China"))
+"""
+import io
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Hashable, List, Optional, Tuple, Union
+
+import numpy as np
+import matplotlib
+from matplotlib.artist import Artist
+from matplotlib.axes import Axes
+from matplotlib.collections import PathCollection, PolyCollection, QuadMesh
+from matplotlib.contour import ContourSet
+from matplotlib.image import AxesImage
+from matplotlib.text import Text
+from matplotlib.transforms import Bbox
+
+from cedar_graph.tracing import traced
+
+
+#: artist types drawn for every frame, other artists of map axes are static chrome.
+DATA_ARTIST_TYPES = (ContourSet, PolyCollection, QuadMesh, AxesImage, PathCollection)
+
+
+def is_dynamic_artist(artist: Artist) -> bool:
+    """
+    Whether an artist of a map axes (or of the figure) is drawn for every frame.
+
+    Data layers (contour sets, barbs and quivers, meshes, images, scatter points)
+    and texts (titles, contour labels) are dynamic. Empty texts are dynamic too:
+    a title slot may be empty in one frame and set in the next, and an empty slot
+    between titles keeps them in one run. Invisible artists are not classified,
+    :func:`paint_order` leaves them out.
+
+    Parameters
+    ----------
+    artist
+
+    Returns
+    -------
+    bool
+    """
+    return isinstance(artist, (Text, *DATA_ARTIST_TYPES))
+
+
+@dataclass
+class ChromeRun:
+    """
+    Consecutive artists in paint order that are all static or all dynamic.
+
+    Attributes
+    ----------
+    dynamic : bool
+    artists : list[Artist]
+    """
+    dynamic: bool
+    artists: List[Artist]
+
+    def signature(self) -> Tuple:
+        if self.dynamic:
+            return (True,)
+        return (False, *(type(artist).__name__ for artist in self.artists))
+
+
+@dataclass
+class ChromeRaster:
+    """
+    Raster of a static run, cropped to its non-transparent pixels.
+
+    Attributes
+    ----------
+    row : int
+        top row in the output image.
+    column : int
+        left column in the output image.
+    image : np.ndarray
+        uint8 RGBA, rows from top to bottom.
+    """
+    row: int
+    column: int
+    image: np.ndarray
+
+
+@dataclass
+class ChromeEntry:
+    """
+    Cached chrome of one key.
+
+    Attributes
+    ----------
+    bbox : Bbox
+        output box in inches.
+    shape : tuple
+        (height, width) of the output image.
+    signature : tuple
+        structure of the runs, a frame with other runs renders the chrome again.
+    rasters : list
+        ``ChromeRaster`` of each static run (None if empty), None for dynamic runs.
+    """
+    bbox: Bbox
+    shape: Tuple[int, int]
+    signature: Tuple
+    rasters: List[Optional[ChromeRaster]]
+
+
+@dataclass
+class ChromeCacheStats:
+    """
+    Counters of a ``ChromeCache``.
+
+    Attributes
+    ----------
+    hits
+        frames composited onto cached chrome.
+    misses
+        frames whose chrome was rendered.
+    """
+    hits: int = 0
+    misses: int = 0
+
+
+def paint_order(fig: matplotlib.figure.Figure, map_axes: List[Axes]) -> List[Artist]:
+    """
+    Artists of a figure in the order they are drawn, down to the children of map axes.
+
+    Other axes (colorbars) are single items. Invisible artists are left out.
+
+    Parameters
+    ----------
+    fig
+    map_axes
+        axes whose children are listed.
+
+    Returns
+    -------
+    list[Artist]
+    """
+    artists = [fig.patch]
+    children = [child for child in fig.get_children() if child is not fig.patch]
+    for child in sorted(children, key=lambda artist: artist.get_zorder()):
+        _add_paint_order(child, map_axes, artists)
+    return [artist for artist in artists if artist.get_visible()]
+
+
+def _add_paint_order(artist: Artist, map_axes: List[Axes], artists: List[Artist]):
+    if not isinstance(artist, Axes) or not any(artist is ax for ax in map_axes):
+        artists.append(artist)
+        return
+    artists.append(artist.patch)
+    children = [child for child in artist.get_children() if child is not artist.patch]
+    for child in sorted(children, key=lambda child: child.get_zorder()):
+        _add_paint_order(child, map_axes, artists)
+
+
+def chrome_runs(
+        fig: matplotlib.figure.Figure,
+        map_axes: List[Axes],
+        dynamic: Callable[[Artist], bool] = is_dynamic_artist,
+) -> List[ChromeRun]:
+    """
+    Split the paint order of a figure into runs of static and dynamic artists.
+
+    Parameters
+    ----------
+    fig
+    map_axes
+    dynamic
+        whether an artist of a map axes or of the figure is dynamic. Other axes are static.
+
+    Returns
+    -------
+    list[ChromeRun]
+        the first run is static, it holds the figure background.
+    """
+    runs: List[ChromeRun] = []
+    for artist in paint_order(fig, map_axes):
+        is_dynamic = not isinstance(artist, Axes) and artist is not fig.patch and dynamic(artist)
+        if runs and runs[-1].dynamic == is_dynamic:
+            runs[-1].artists.append(artist)
+        else:
+            runs.append(ChromeRun(dynamic=is_dynamic, artists=[artist]))
+    return runs
+
+
+def _panel_axes(panel) -> List[Axes]:
+    return [layer.ax for chart in panel.charts for layer in chart.layers]
+
+
+def _crop(image: np.ndarray) -> Optional[ChromeRaster]:
+    rows = np.flatnonzero(image[..., 3].any(axis=1))
+    if len(rows) == 0:
+        return None
+    columns = np.flatnonzero(image[..., 3].any(axis=0))
+    return ChromeRaster(
+        row=int(rows[0]),
+        column=int(columns[0]),
+        image=np.ascontiguousarray(image[rows[0]:rows[-1] + 1, columns[0]:columns[-1] + 1]),
+    )
+
+
+class _DrawHooks:
+    """Replace the draw method of artists for one draw, restored on exit."""
+    def __init__(self):
+        self._saved: List[Tuple[Artist, Any]] = []
+
+    def replace(self, artist: Artist, draw: Callable):
+        self._saved.append((artist, artist.__dict__.get("draw")))
+        artist.draw = draw
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        for artist, draw in reversed(self._saved):
+            if draw is None:
+                del artist.draw
+            else:
+                artist.draw = draw
+        self._saved.clear()
+
+
+def _skip(renderer, *args, **kwargs):
+    pass
+
+
+class ChromeCache:
+    """
+    Cached chrome rasters of panels, keyed e.g. by (product, area), LRU with at most ``max_entries`` keys.
+
+    The Agg backend is required. Keys are chosen by the caller: panels saved with the same
+    key must have the same chrome. A frame whose static artists differ in number or type
+    from the cached ones (see ``ChromeRun.signature``) renders the chrome again.
+    """
+    def __init__(
+            self,
+            max_entries: int = 16,
+            dynamic: Callable[[Artist], bool] = is_dynamic_artist,
+    ):
+        """
+        Parameters
+        ----------
+        max_entries
+            cached keys, a full-size chrome raster takes about 4 bytes per output pixel.
+        dynamic
+            see :func:`chrome_runs`.
+        """
+        self.max_entries = max_entries
+        self.dynamic = dynamic
+        self._entries: "OrderedDict[Hashable, ChromeEntry]" = OrderedDict()
+        self._stats = ChromeCacheStats()
+        self._lock = threading.Lock()
+
+    @traced("save", "output")
+    def save(self, panel, path: Union[str, Path, io.IOBase], key: Hashable, **kwargs):
+        """
+        Save a panel like ``panel.save(path)``, drawing its static chrome from the cache.
+
+        Parameters
+        ----------
+        panel
+            ``cedarkit.plots.chart.Panel``.
+        path
+            output file, PNG.
+        key
+            chrome key.
+        **kwargs
+            passed to ``Figure.savefig``, except ``bbox_inches``.
+        """
+        fig = panel.fig
+        runs = chrome_runs(fig, _panel_axes(panel), dynamic=self.dynamic)
+        signature = tuple(run.signature() for run in runs)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.signature == signature:
+                self._entries.move_to_end(key)
+                self._stats.hits += 1
+            else:
+                entry = None
+                self._stats.misses += 1
+
+        if entry is None:
+            entry = self._render_chrome(fig, runs, signature, **kwargs)
+            with self._lock:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        self._composite(fig, runs, entry, path, **kwargs)
+
+    def stats(self) -> ChromeCacheStats:
+        with self._lock:
+            return ChromeCacheStats(hits=self._stats.hits, misses=self._stats.misses)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _render_chrome(self, fig, runs: List[ChromeRun], signature: Tuple, **kwargs) -> ChromeEntry:
+        """Draw the full figure once, snapshotting the buffer at each run boundary."""
+        fig.draw_without_rendering()
+        bbox = fig.get_tightbbox(fig.canvas.get_renderer()).padded(matplotlib.rcParams["savefig.pad_inches"])
+
+        snapshots: List[np.ndarray] = []
+
+        def boundary(draw):
+            def draw_run(renderer, *args, **kwargs):
+                snapshots.append(np.array(renderer.buffer_rgba()))
+                renderer.clear()
+                return draw(renderer, *args, **kwargs)
+            return draw_run
+
+        buffer = io.BytesIO()
+        with _DrawHooks() as hooks:
+            for run in runs[1:]:
+                first = run.artists[0]
+                hooks.replace(first, boundary(first.draw))
+            fig.savefig(buffer, format="rgba", bbox_inches=bbox, **kwargs)
+        shape = snapshots[0].shape[:2] if snapshots else None
+        if shape is None:
+            width, height = (bbox.size * fig.dpi).astype(int)
+            shape = (height, width)
+        snapshots.append(np.frombuffer(buffer.getvalue(), dtype=np.uint8).reshape(*shape, 4))
+
+        rasters = [None if run.dynamic else _crop(snapshot) for run, snapshot in zip(runs, snapshots)]
+        return ChromeEntry(bbox=bbox, shape=shape, signature=signature, rasters=rasters)
+
+    def _composite(self, fig, runs: List[ChromeRun], entry: ChromeEntry, path, **kwargs):
+        """Draw dynamic artists between the cached rasters of static runs."""
+        height = entry.shape[0]
+
+        def blend(raster: ChromeRaster, first: bool):
+            def draw_raster(renderer, *args, **kwargs):
+                if first:
+                    # background: copied into the cleared buffer
+                    buffer = np.asarray(renderer.buffer_rgba())
+                    image = raster.image
+                    buffer[raster.row:raster.row + image.shape[0], raster.column:raster.column + image.shape[1]] = image
+                    return
+                gc = renderer.new_gc()
+                try:
+                    bottom = height - raster.row - raster.image.shape[0]
+                    renderer.draw_image(gc, raster.column, bottom, raster.image[::-1])
+                finally:
+                    gc.restore()
+            return draw_raster
+
+        with _DrawHooks() as hooks:
+            for index, (run, raster) in enumerate(zip(runs, entry.rasters)):
+                if run.dynamic:
+                    continue
+                for artist in run.artists:
+                    hooks.replace(artist, _skip)
+                if raster is not None:
+                    hooks.replace(run.artists[0], blend(raster, first=index == 0))
+            fig.savefig(path, bbox_inches=entry.bbox, **kwargs)
+
+
+_chrome_cache: Optional[ChromeCache] = None
+_chrome_cache_lock = threading.Lock()
+
+
+def get_chrome_cache() -> ChromeCache:
+    """Process-wide ``ChromeCache``."""
+    global _chrome_cache
+    with _chrome_cache_lock:
+        if _chrome_cache is None:
+            _chrome_cache = ChromeCache()
+        return _chrome_cache
+
@@ -1,3 +1,5 @@
 from .field_info import FieldInfo
-from .source import DataSource, LocalDataSource
+from .source import DataSource, LocalDataSource, FilePathCache
 from .loader import DataLoader
+from .cache import FieldCache, FieldCacheStats
+from .accumulation import AccumulationCache
@@ -0,0 +1,188 @@
+"""
+Cache of accumulated fields across the lead times of a forecast series.
+
+``time_diff`` turns accumulated fields (total precipitation ``apcp``,
+snowfall ``asnow``) into interval amounts by loading the field at
+``forecast_time`` and at ``forecast_time - interval``. Rendering 0-240h
+at 3-hour steps therefore reads every accumulation file twice: once as
+the current lead time, once as the previous lead time of a later plot.
+
+An :class:`AccumulationCache` keeps accumulated fields per
+``(system, start_time, forecast_time)``, independent of the interval, so
+the 1/3/6/12/24h variants of a plot all reuse the same loads. Pass it to
+``DataLoader(accumulation_cache=...)``. In sequential mode
+(:meth:`AccumulationCache.walk`) lead times are visited in order and
+only the accumulations still reachable by ``time_diff`` (within
+``window`` before the current lead time) are kept in memory.
+"""
+import threading
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import xarray as xr
+
+from cedarkit.plots.types import AreaRange
+
+from .field_info import FieldInfo, apcp_info, asnow_info
+
+
+#: accumulated fields cached by default
+ACCUMULATED_FIELD_INFOS = (apcp_info, asnow_info)
+
+#: (system name, start time, forecast time)
+StepKey = Tuple[Optional[str], pd.Timestamp, pd.Timedelta]
+
+
+class AccumulationCache:
+    """
+    Accumulated fields of forecast series, grouped by lead time.
+
+    Cached fields are shared by all callers and must not be modified in place.
+
+    Attributes
+    ----------
+    field_infos : tuple[FieldInfo, ...]
+        accumulated fields to cache, matched by GRIB selection (``field_info.name`` is ignored).
+    window : pd.Timedelta or None
+        largest ``time_diff`` interval of the series. In sequential mode lead times older
+        than ``forecast_time - window`` are dropped. Nothing is dropped if None.
+    hits : int
+    misses : int
+    """
+    def __init__(
+            self,
+            field_infos: Iterable[FieldInfo] = ACCUMULATED_FIELD_INFOS,
+            window: Optional[pd.Timedelta] = None,
+    ):
+        self.field_infos = tuple(field_infos)
+        self.window = pd.Timedelta(window) if window is not None else None
+        self.hits = 0
+        self.misses = 0
+        self._selections = {self._selection(field_info) for field_info in self.field_infos}
+        self._steps: Dict[StepKey, Dict[Hashable, Optional[xr.DataArray]]] = dict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _selection(field_info: FieldInfo) -> Hashable:
+        return field_info.parameter, field_info.level_type, field_info.level, field_info.additional_keys
+
+    @staticmethod
+    def step_key(
+            system_name: Optional[str],
+            start_time: pd.Timestamp,
+            forecast_time: pd.Timedelta,
+    ) -> StepKey:
+        """Cache key of one lead time of a series."""
+        return system_name, pd.Timestamp(start_time), pd.Timedelta(forecast_time)
+
+    def is_accumulated(self, field_info: FieldInfo) -> bool:
+        """Whether ``field_info`` selects one of the cached accumulated fields."""
+        return self._selection(field_info) in self._selections
+
+    def get(
+            self,
+            field_info: FieldInfo,
+            system_name: Optional[str],
+            start_time: pd.Timestamp,
+            forecast_time: pd.Timedelta,
+            area: Optional[AreaRange] = None,
+            area_padding: int = 1,
+    ) -> Tuple[bool, Optional[xr.DataArray]]:
+        """
+        Look up an accumulated field.
+
+        Returns
+        -------
+        tuple[bool, xr.DataArray or None]
+            whether the load is cached (a missing field is cached as None), and the field.
+        """
+        step_key = self.step_key(system_name, start_time, forecast_time)
+        field_key = self._field_key(field_info, area, area_padding)
+        with self._lock:
+            step = self._steps.get(step_key)
+            if step is not None and field_key in step:
+                self.hits += 1
+                return True, step[field_key]
+            self.misses += 1
+            return False, None
+
+    def put(
+            self,
+            field_info: FieldInfo,
+            system_name: Optional[str],
+            start_time: pd.Timestamp,
+            forecast_time: pd.Timedelta,
+            field: Optional[xr.DataArray],
+            area: Optional[AreaRange] = None,
+            area_padding: int = 1,
+    ):
+        """Add an accumulated field (or None for a field not found)."""
+        step_key = self.step_key(system_name, start_time, forecast_time)
+        field_key = self._field_key(field_info, area, area_padding)
+        with self._lock:
+            self._steps.setdefault(step_key, dict())[field_key] = field
+
+    def advance(self, forecast_time: pd.Timedelta):
+        """
+        Drop lead times no ``time_diff`` at ``forecast_time`` or later can reach.
+
+        Lead times before ``forecast_time - window`` are dropped, for all series.
+        Nothing is dropped if ``window`` is None.
+
+        Parameters
+        ----------
+        forecast_time
+            current lead time.
+        """
+        if self.window is None:
+            return
+        oldest = pd.Timedelta(forecast_time) - self.window
+        with self._lock:
+            for step_key in [key for key in self._steps if key[2] < oldest]:
+                del self._steps[step_key]
+
+    def walk(self, forecast_times: Iterable[pd.Timedelta]) -> Iterator[pd.Timedelta]:
+        """
+        Sequential mode: yield lead times in ascending order, dropping accumulations no longer needed.
+
+        The accumulation loaded at one lead time stays in memory until no later
+        ``time_diff`` (up to ``window``) can use it.
+
+        Parameters
+        ----------
+        forecast_times
+
+        Yields
+        ------
+        pd.Timedelta
+
+        Examples
+        --------
+        >>> cache = AccumulationCache(window=pd.Timedelta(hours=24))
+        >>> data_loader = DataLoader(data_source, accumulation_cache=cache)
+        >>> for forecast_time in cache.walk(pd.timedelta_range("3h", "240h", freq="3h")):
+        ...     plot_data = rain_24h.load_data(data_loader, start_time, forecast_time)
+        """
+        for forecast_time in sorted(pd.Timedelta(t) for t in forecast_times):
+            self.advance(forecast_time)
+            yield forecast_time
+
+    def steps(self) -> List[StepKey]:
+        """Cached lead times as (system name, start time, forecast time)."""
+        with self._lock:
+            return sorted(self._steps, key=lambda key: (str(key[0]), key[1], key[2]))
+
+    def clear(self):
+        """Drop all cached fields. Counters are kept."""
+        with self._lock:
+            self._steps.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(step) for step in self._steps.values())
+
+    def _field_key(self, field_info: FieldInfo, area: Optional[AreaRange], area_padding: int) -> Hashable:
+        return (
+            self._selection(field_info),
+            (area.to_tuple(), area_padding) if area is not None else None,
+        )
@@ -0,0 +1,178 @@
+"""
+In-process cache of loaded fields.
+
+A :class:`FieldCache` keeps decoded fields in memory, keyed by the field
+selection, start time, forecast time and system, and evicts the least
+recently used fields once the total ``nbytes`` of cached fields exceeds
+a byte budget. Pass one cache to every ``DataLoader`` of a batch so
+fields shared by several plots (e.g. 850hPa wind) are decoded once.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable, Optional, Tuple
+
+import pandas as pd
+import xarray as xr
+
+from cedarkit.plots.types import AreaRange
+
+from .field_info import FieldInfo
+
+
+@dataclass
+class FieldCacheStats:
+    """
+    Counters of a ``FieldCache``.
+
+    Attributes
+    ----------
+    hits
+        number of lookups served from the cache.
+    misses
+        number of lookups not found in the cache.
+    evictions
+        number of fields dropped to stay within the byte budget.
+    count
+        number of cached fields.
+    current_bytes
+        total ``nbytes`` of cached fields.
+    max_bytes
+        byte budget.
+    """
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    count: int = 0
+    current_bytes: int = 0
+    max_bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+
+def field_cache_key(
+        field_info: FieldInfo,
+        start_time: pd.Timestamp,
+        forecast_time: pd.Timedelta,
+        system_name: Optional[str] = None,
+        area: Optional[AreaRange] = None,
+        area_padding: int = 1,
+) -> Tuple[Hashable, ...]:
+    """
+    Hashable cache key of one field load.
+
+    ``FieldInfo`` is hashable and takes part in the key itself.
+
+    Parameters
+    ----------
+    field_info
+    start_time
+    forecast_time
+    system_name
+    area
+        area of interest, fields cropped to different areas are cached separately.
+    area_padding
+
+    Returns
+    -------
+    tuple
+    """
+    return (
+        field_info,
+        pd.Timestamp(start_time),
+        pd.Timedelta(forecast_time),
+        system_name,
+        (area.to_tuple(), area_padding) if area is not None else None,
+    )
+
+
+class FieldCache:
+    """
+    Memory-bounded LRU cache of fields.
+
+    Cached fields are shared by all callers and must not be modified in place.
+
+    Attributes
+    ----------
+    max_bytes : int
+        byte budget. Least recently used fields are evicted when the total
+        ``nbytes`` of cached fields exceeds it. A field larger than the budget
+        is never cached.
+    """
+    def __init__(self, max_bytes: int = 2 * 1024 ** 3):
+        self.max_bytes = max_bytes
+        self._fields: "OrderedDict[Hashable, xr.DataArray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = FieldCacheStats(max_bytes=max_bytes)
+
+    def get(self, key: Hashable) -> Optional[xr.DataArray]:
+        """
+        Return the cached field of ``key`` and mark it as recently used.
+
+        Parameters
+        ----------
+        key
+
+        Returns
+        -------
+        xr.DataArray or None
+            field if cached, None if not.
+        """
+        with self._lock:
+            field = self._fields.get(key)
+            if field is None:
+                self._stats.misses += 1
+                return None
+            self._fields.move_to_end(key)
+            self._stats.hits += 1
+            return field
+
+    def put(self, key: Hashable, field: Optional[xr.DataArray]):
+        """
+        Add a field, evicting least recently used fields to stay within the budget.
+
+        ``None`` (field not found) is not cached.
+
+        Parameters
+        ----------
+        key
+        field
+        """
+        if field is None:
+            return
+        nbytes = field.nbytes
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._fields.pop(key, None)
+            if previous is not None:
+                self._stats.current_bytes -= previous.nbytes
+            self._fields[key] = field
+            self._stats.current_bytes += nbytes
+            while self._stats.current_bytes > self.max_bytes:
+                _, evicted = self._fields.popitem(last=False)
+                self._stats.current_bytes -= evicted.nbytes
+                self._stats.evictions += 1
+            self._stats.count = len(self._fields)
+
+    def clear(self):
+        """Drop all cached fields. Counters are kept."""
+        with self._lock:
+            self._fields.clear()
+            self._stats.current_bytes = 0
+            self._stats.count = 0
+
+    @property
+    def stats(self) -> FieldCacheStats:
+        """A snapshot of the cache counters."""
+        with self._lock:
+            return FieldCacheStats(**vars(self._stats))
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._fields
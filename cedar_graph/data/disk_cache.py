@@ -0,0 +1,440 @@
+"""
+On-disk cache of decoded fields shared across processes.
+
+A :class:`DiskFieldCache` stores each decoded field as a raw ``.npy``
+array with its coordinates (``.npz``) and metadata (``.json``) in a local
+directory. Entries are keyed by the identity of the source GRIB file
+(path, size and modification time) plus the field selection, so a
+rewritten file never serves stale data. Cached arrays are opened with
+``np.load(mmap_mode="r")``: worker processes rendering different
+products from the same forecast hour share page cache instead of each
+decoding the same GRIB messages.
+
+:class:`DiskCachedDataSource` plugs the cache in front of a
+``LocalDataSource``.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional, Set, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not on POSIX, writers are not serialized.
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from cedarkit.plots.types import AreaRange
+
+from cedar_graph.logger import get_logger
+
+from .field_info import FieldInfo
+from .grib_index import field_selection_key
+from .operator import crop_field
+from .source import DataSource
+
+
+logger = get_logger(__name__)
+
+#: cache entry format version, part of the entry key.
+DISK_CACHE_VERSION = 1
+
+#: puts between scans of the cache directory for entries added by other processes.
+DISK_CACHE_SCAN_INTERVAL = 100
+
+# fields not cached, logged once per process
+_uncacheable: Set[Tuple[Optional[str], str]] = set()
+
+
+class DiskFieldCache:
+    """
+    Size-capped LRU cache of decoded fields in a local directory.
+
+    Each entry consists of ``<key>.npy`` (values), ``<key>.npz``
+    (coordinates) and ``<key>.json`` (name, dims and attributes). The JSON
+    file is written last and marks a complete entry, its modification time
+    is the last access time used for LRU eviction.
+
+    Writers hold an exclusive ``flock`` on ``<cache_dir>/.lock`` while
+    adding an entry and evicting old ones. Readers take no lock: entry
+    files are created with atomic renames, and an entry removed under a
+    reader is treated as a miss. Arrays already memory-mapped stay valid
+    after their files are removed.
+
+    Fields returned by :meth:`get` are backed by read-only memory maps and
+    must not be modified in place. Fields are only cached if a hit equals
+    the field: attributes must survive a JSON round trip, and values and
+    coordinates must not have an object dtype. Other fields are loaded
+    from the source each time, a warning is logged once per field name.
+
+    Each cache object tracks the size of the directory in memory, from a
+    scan at its first put plus the entries it adds. The directory is
+    scanned again to evict entries when the tracked size exceeds
+    ``max_bytes``, and every ``DISK_CACHE_SCAN_INTERVAL`` puts to count
+    entries added by other processes.
+
+    Attributes
+    ----------
+    cache_dir : Path
+    max_bytes : int
+        size cap of all entries. Least recently used entries are removed
+        when it is exceeded.
+    """
+    def __init__(self, cache_dir: Union[str, Path], max_bytes: int = 20 * 1024 ** 3):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        # tracked size of the directory, None until scanned
+        self._total_bytes: Optional[int] = None
+        self._puts_since_scan = 0
+
+    @staticmethod
+    def make_key(file_path: Union[str, Path], field_info: FieldInfo) -> str:
+        """
+        Entry key of a field selection in a GRIB file.
+
+        Parameters
+        ----------
+        file_path
+        field_info
+
+        Returns
+        -------
+        str
+            hex digest of file path, size, modification time and field selection.
+        """
+        file_path = os.path.abspath(str(file_path))
+        stat = os.stat(file_path)
+        content = json.dumps([
+            DISK_CACHE_VERSION,
+            file_path,
+            stat.st_size,
+            stat.st_mtime_ns,
+            field_selection_key(field_info),
+        ])
+        return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[xr.DataArray]:
+        """
+        Return the cached field of ``key`` with memory-mapped values.
+
+        Parameters
+        ----------
+        key
+
+        Returns
+        -------
+        xr.DataArray or None
+            field if cached, None if not.
+        """
+        meta_path = self._entry_path(key, ".json")
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            values = np.load(self._entry_path(key, ".npy"), mmap_mode="r")
+            with np.load(self._entry_path(key, ".npz")) as coord_values:
+                coords = {
+                    name: xr.Variable(coord["dims"], coord_values[name], attrs=coord["attrs"])
+                    for name, coord in meta["coords"].items()
+                }
+            os.utime(meta_path)
+        except (OSError, ValueError, KeyError):
+            return None
+        return xr.DataArray(
+            values,
+            dims=meta["dims"],
+            coords=coords,
+            name=meta["name"],
+            attrs=meta["attrs"],
+        )
+
+    def put(self, key: str, field: Optional[xr.DataArray]):
+        """
+        Add a field and evict least recently used entries to stay within ``max_bytes``.
+
+        ``None`` is not cached, nor is a field larger than ``max_bytes`` or a field
+        that cannot be stored exactly (see the class docstring).
+        Errors writing the cache are ignored.
+
+        Parameters
+        ----------
+        key
+        field
+        """
+        if field is None or field.nbytes > self.max_bytes:
+            return
+        meta = dict(
+            name=field.name,
+            dims=list(field.dims),
+            attrs=field.attrs,
+            coords={
+                name: dict(dims=list(coord.dims), attrs=coord.attrs)
+                for name, coord in field.coords.items()
+            },
+        )
+        content = _dump_meta(field, meta)
+        if content is None:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with self._lock():
+                entry_dir = self._entry_path(key, "").parent
+                entry_dir.mkdir(exist_ok=True)
+                self._write_atomic(
+                    self._entry_path(key, ".npy"),
+                    lambda f: np.save(f, np.ascontiguousarray(field.values), allow_pickle=False),
+                )
+                self._write_atomic(
+                    self._entry_path(key, ".npz"),
+                    lambda f: np.savez(f, **{name: coord.values for name, coord in field.coords.items()}),
+                )
+                self._write_atomic(self._entry_path(key, ".json"), lambda f: f.write(content))
+                self._added(key)
+        except OSError:
+            # cache is an optimization only, a full or read-only disk must not break loading.
+            pass
+
+    def entries(self) -> List[Tuple[str, float, int]]:
+        """
+        Return (key, last access time, size in bytes) of all complete entries.
+
+        Returns
+        -------
+        list[tuple[str, float, int]]
+        """
+        result = []
+        for meta_path in self.cache_dir.glob("*/*.json"):
+            key = meta_path.stem
+            try:
+                access_time = meta_path.stat().st_mtime
+                size = sum(self._entry_path(key, suffix).stat().st_size for suffix in (".npy", ".npz", ".json"))
+            except OSError:
+                continue
+            result.append((key, access_time, size))
+        return result
+
+    def total_bytes(self) -> int:
+        """Total size of all complete entries."""
+        return sum(size for _, _, size in self.entries())
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock():
+            for key, _, _ in self.entries():
+                self._remove(key)
+
+    def _added(self, key: str):
+        """Track the size of a new entry and evict if needed, lock held by caller."""
+        self._puts_since_scan += 1
+        if self._total_bytes is None or self._puts_since_scan >= DISK_CACHE_SCAN_INTERVAL:
+            self._evict()
+            return
+        self._total_bytes += sum(
+            self._entry_path(key, suffix).stat().st_size for suffix in (".npy", ".npz", ".json")
+        )
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        """Remove least recently used entries until the cache is within ``max_bytes``, lock held by caller."""
+        entries = sorted(self.entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        for key, _, size in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(key)
+            total -= size
+        self._total_bytes = total
+        self._puts_since_scan = 0
+
+    def _remove(self, key: str):
+        # metadata first, so readers never see an entry without values.
+        for suffix in (".json", ".npy", ".npz"):
+            try:
+                os.remove(self._entry_path(key, suffix))
+            except OSError:
+                pass
+
+    def _entry_path(self, key: str, suffix: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}{suffix}"
+
+    def _write_atomic(self, path: Path, write):
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    @contextmanager
+    def _lock(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.cache_dir / ".lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _dump_meta(field: xr.DataArray, meta: dict) -> Optional[bytes]:
+    """JSON of entry metadata, None if the field cannot be cached exactly."""
+    reason = None
+    if field.dtype.hasobject:
+        reason = "object values"
+    else:
+        object_coords = [name for name, coord in field.coords.items() if coord.dtype.hasobject]
+        if object_coords:
+            reason = f"object coordinates {object_coords}"
+    if reason is None:
+        try:
+            content = json.dumps(meta)
+            if json.loads(content) != meta:
+                # e.g. tuples or non-string keys
+                reason = "attributes changed by JSON"
+        except (TypeError, ValueError):
+            reason = "attributes not JSON serializable"
+    if reason is not None:
+        if (field.name, reason) not in _uncacheable:
+            _uncacheable.add((field.name, reason))
+            logger.warning(f"disk cache: field {field.name} not cached, {reason}")
+        return None
+    return content.encode("utf-8")
+
+
+class DiskCachedDataSource(DataSource):
+    """
+    Data source wrapper serving decoded fields from a ``DiskFieldCache``.
+
+    The wrapped source must resolve local files with ``get_file_path(start_time, forecast_time)``,
+    such as ``LocalDataSource``. Fields not in the cache are loaded by the wrapped
+    source and added to the cache.
+
+    Full-domain fields are cached. With an area of interest, the window is
+    cropped from the memory-mapped values, so only its pages are read.
+
+    Attributes
+    ----------
+    data_source : DataSource
+        wrapped data source.
+    cache : DiskFieldCache
+
+    Examples
+    --------
+    >>> data_source = DiskCachedDataSource(
+    ...     LocalDataSource(system_name="CMA-MESO"),
+    ...     cache_dir="/tmp/cedar-graph-fields",
+    ... )
+    """
+    def __init__(
+            self,
+            data_source: DataSource,
+            cache_dir: Optional[Union[str, Path]] = None,
+            max_bytes: int = 20 * 1024 ** 3,
+            cache: Optional[DiskFieldCache] = None,
+    ):
+        super().__init__()
+        if cache is None:
+            if cache_dir is None:
+                raise ValueError("cache_dir or cache must be set")
+            cache = DiskFieldCache(cache_dir, max_bytes=max_bytes)
+        self.data_source = data_source
+        self.cache = cache
+
+    @property
+    def system_name(self) -> Optional[str]:
+        return getattr(self.data_source, "system_name", None)
+
+    def retrieve(
+            self,
+            field_info: FieldInfo,
+            start_time: pd.Timestamp,
+            forecast_time: pd.Timedelta,
+            area: Optional[AreaRange] = None,
+            area_padding: int = 1,
+    ) -> Optional[xr.DataArray]:
+        """
+        Load field from the disk cache, or from the wrapped source if not cached.
+
+        Parameters
+        ----------
+        field_info
+        start_time
+        forecast_time
+        area
+        area_padding
+
+        Returns
+        -------
+        xr.DataArray or None
+            field if found, None if not.
+        """
+        return self.retrieve_many(
+            [field_info],
+            start_time=start_time,
+            forecast_time=forecast_time,
+            area=area,
+            area_padding=area_padding,
+        )[0]
+
+    def retrieve_many(
+            self,
+            field_infos: List[FieldInfo],
+            start_time: pd.Timestamp,
+            forecast_time: pd.Timedelta,
+            area: Optional[AreaRange] = None,
+            area_padding: int = 1,
+    ) -> List[Optional[xr.DataArray]]:
+        """
+        Load several fields, fields not in the disk cache are loaded together by the wrapped source.
+
+        Parameters
+        ----------
+        field_infos
+        start_time
+        forecast_time
+        area
+        area_padding
+
+        Returns
+        -------
+        List[Optional[xr.DataArray]]
+            fields in the order of ``field_infos``, None for fields not found.
+        """
+        file_path = self.data_source.get_file_path(start_time=start_time, forecast_time=forecast_time)
+        if file_path is None:
+            return [None] * len(field_infos)
+        try:
+            keys = [self.cache.make_key(file_path, field_info) for field_info in field_infos]
+        except OSError:
+            return [None] * len(field_infos)
+
+        fields = [self.cache.get(key) for key in keys]
+        missing = [i for i, field in enumerate(fields) if field is None]
+        if len(missing) > 0:
+            missing_fields = self.data_source.retrieve_many(
+                field_infos=[field_infos[i] for i in missing],
+                start_time=start_time,
+                forecast_time=forecast_time,
+            )
+            for i, field in zip(missing, missing_fields):
+                fields[i] = field
+                self.cache.put(keys[i], field)
+        if area is not None:
+            fields = [
+                crop_field(field, area, padding=area_padding) if field is not None else None
+                for field in fields
+            ]
+        return fields
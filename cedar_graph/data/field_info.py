@@ -1,12 +1,54 @@
-from dataclasses import dataclass
-from typing import Union, Optional, Dict
+from dataclasses import dataclass, replace
+from typing import Union, Optional, Dict, Any
 
 
-@dataclass
+class FrozenDict(dict):
+    """
+    Read-only dict with a hash, used for dict-valued items of ``Parameter`` and ``FieldInfo``.
+
+    It is still a ``dict``, so reki functions accept it unchanged.
+    """
+    def __hash__(self):
+        return hash(frozenset(self.items()))
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError(f"{type(self).__name__} is read-only")
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    __ior__ = _readonly
+    clear = _readonly
+    pop = _readonly
+    popitem = _readonly
+    setdefault = _readonly
+    update = _readonly
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+def _freeze(value: Any) -> Any:
+    """Convert dicts (also nested) to ``FrozenDict`` and lists to tuples."""
+    if isinstance(value, dict):
+        return FrozenDict({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+@dataclass(frozen=True)
 class Parameter:
     """
     Parameter information, mainly field name, to be used in reki functions.
 
+    Parameter is immutable and hashable, ``eccodes_keys`` is stored as a ``FrozenDict``.
+
     Attributes
     ----------
     eccodes_short_name
@@ -23,6 +65,9 @@ class Parameter:
     wgrib2_name: Optional[str] = None
     cemc_name: Optional[str] = None
 
+    def __post_init__(self):
+        object.__setattr__(self, "eccodes_keys", _freeze(self.eccodes_keys))
+
     def get_parameter(self) -> Optional[Union[str, Dict[str, int]]]:
         """
         Return proper item for ``parameter`` param in reki's load_* functions.
@@ -41,11 +86,16 @@ class Parameter:
             return self.cemc_name
         return None
 
-@dataclass
+
+@dataclass(frozen=True)
 class FieldInfo:
     """
     Field information, used in reki functions.
 
+    FieldInfo is immutable and hashable, so it can be used directly as a key of
+    caches and indexes. Dict-valued items are stored as ``FrozenDict``.
+    Use ``with_level()`` to get a field info at another level.
+
     Attributes
     ----------
     name
@@ -56,7 +106,18 @@ class FieldInfo:
         field level type, for `level_type` option.
     level
         field level value, for `level` option.
+    additional_keys
+        other GRIB keys used to filter messages.
+
+    Examples
+    --------
+    850hPa u component of wind:
 
+    >>> u_info.with_level("pl", 850)
+
+    0-6km vertical wind shear:
+
+    >>> vwsh_info.with_level("heightAboveGroundLayer", {"first_level": 6000, "second_level": 0})
     """
     name: str
     parameter: Parameter
@@ -64,6 +125,41 @@ class FieldInfo:
     level: Optional[Union[int, float, Dict[str, int]]] = None
     additional_keys: Optional[Dict[str, Union[str, int, float]]] = None
 
+    def __post_init__(self):
+        object.__setattr__(self, "level_type", _freeze(self.level_type))
+        object.__setattr__(self, "level", _freeze(self.level))
+        object.__setattr__(self, "additional_keys", _freeze(self.additional_keys))
+
+    def with_level(
+            self,
+            level_type: Optional[Union[str, Dict[str, int]]],
+            level: Optional[Union[int, float, Dict[str, int]]],
+            **keys: Union[str, int, float],
+    ) -> "FieldInfo":
+        """
+        Return a copy with another level type and level value.
+
+        Parameters
+        ----------
+        level_type
+        level
+        keys
+            additional GRIB keys, merged into ``additional_keys``.
+
+        Returns
+        -------
+        FieldInfo
+        """
+        additional_keys = self.additional_keys
+        if len(keys) > 0:
+            additional_keys = {**(additional_keys or {}), **keys}
+        return replace(
+            self,
+            level_type=level_type,
+            level=level,
+            additional_keys=additional_keys,
+        )
+
 
 # 2米温度
 t_2m_info = FieldInfo(
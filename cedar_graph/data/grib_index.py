@@ -0,0 +1,364 @@
+"""
+GRIB message index: map field selections to message byte offsets.
+
+``reki.from_source("file", path).sel(...).first()`` scans the GRIB file
+from the beginning for every field, decoding each message on its way.
+A :class:`GribMessageIndex` remembers where the message of a field
+selection (parameter, level type, level and additional keys) starts, so
+later loads of the same selection seek straight to the message and
+decode only that one.
+
+Offsets are resolved on first touch with a headers-only pass (message
+data sections are skipped), kept in a process-wide table shared by all
+data sources, and optionally written to a JSON sidecar file so that
+other processes start warm. An index is tied to the file identity
+(size and modification time) and is rebuilt when the file changes.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import eccodes
+import xarray as xr
+
+from reki.readers.grib.common import convert_parameter
+from reki.readers.grib.eccodes import create_data_array_from_message
+from reki.readers.grib.eccodes.util import check_message_with_level_fix
+from reki.readers.grib.eccodes._level import _fix_level
+
+from cedar_graph.tracing import span
+
+from .field_info import FieldInfo
+
+
+#: sidecar file format version, bumped on incompatible changes.
+INDEX_VERSION = 1
+
+
+def field_selection_key(field_info: FieldInfo) -> str:
+    """
+    Canonical string form of the message selection in ``field_info``.
+
+    Only the GRIB selection (parameter, level type, level and additional
+    keys) takes part, ``field_info.name`` does not.
+
+    Parameters
+    ----------
+    field_info
+
+    Returns
+    -------
+    str
+    """
+    return json.dumps(
+        [
+            field_info.parameter.get_parameter(),
+            field_info.level_type,
+            field_info.level,
+            field_info.additional_keys or {},
+        ],
+        sort_keys=True,
+        default=str,
+    )
+
+
+def is_indexable(field_info: FieldInfo) -> bool:
+    """
+    Whether ``field_info`` selects exactly one message.
+
+    Multi-level selections (a list of levels or ``"all"``) are merged
+    from several messages by reki and are not indexed.
+    """
+    level = field_info.level
+    return not isinstance(level, (list, tuple)) and level != "all"
+
+
+def _file_identity(file_path: str) -> Tuple[int, int]:
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class GribMessageIndex:
+    """
+    Byte-offset index of the messages in one GRIB file.
+
+    Attributes
+    ----------
+    file_path : str
+        absolute path of the GRIB file.
+    index_dir : Path or None
+        directory of the sidecar file. No sidecar is read or written if None.
+    file_identity : tuple[int, int]
+        file size and modification time (ns) when the index was created.
+    offsets : dict[str, int or None]
+        selection key -> message offset, None for selections not in the file.
+    """
+    def __init__(self, file_path: Union[str, Path], index_dir: Optional[Union[str, Path]] = None):
+        self.file_path = os.path.abspath(str(file_path))
+        self.index_dir = Path(index_dir) if index_dir is not None else None
+        self.file_identity = _file_identity(self.file_path)
+        self.offsets: Dict[str, Optional[int]] = dict()
+        self._lock = threading.Lock()
+        if self.index_dir is not None:
+            self.offsets.update(self._read_sidecar())
+
+    @property
+    def sidecar_path(self) -> Optional[Path]:
+        """Sidecar file path, named by the GRIB file name and a hash of its full path."""
+        if self.index_dir is None:
+            return None
+        path_hash = hashlib.sha1(self.file_path.encode("utf-8")).hexdigest()[:12]
+        return self.index_dir / f"{Path(self.file_path).name}.{path_hash}.idx.json"
+
+    def is_stale(self) -> bool:
+        """Whether the file has changed (or disappeared) since the index was created."""
+        try:
+            return _file_identity(self.file_path) != self.file_identity
+        except OSError:
+            return True
+
+    def lookup(self, field_info: FieldInfo) -> Optional[int]:
+        """
+        Return the offset of the first message matching ``field_info``.
+
+        Unknown selections are resolved with a headers-only scan and
+        remembered, including selections with no matching message.
+
+        Parameters
+        ----------
+        field_info
+
+        Returns
+        -------
+        int or None
+            message offset if found, None if not.
+        """
+        return self.lookup_many([field_info])[0]
+
+    def lookup_many(self, field_infos: List[FieldInfo]) -> List[Optional[int]]:
+        """
+        Return message offsets of several field selections.
+
+        All unknown selections are resolved together in one headers-only scan.
+
+        Parameters
+        ----------
+        field_infos
+
+        Returns
+        -------
+        list[int or None]
+            message offsets in the order of ``field_infos``, None for fields not found.
+        """
+        keys = [field_selection_key(field_info) for field_info in field_infos]
+        with self._lock:
+            pending = {
+                key: field_info for key, field_info in zip(keys, field_infos)
+                if key not in self.offsets
+            }
+
+        if len(pending) > 0:
+            found = self._scan(pending)
+            with self._lock:
+                self.offsets.update(found)
+            self._write_sidecar()
+
+        with self._lock:
+            return [self.offsets[key] for key in keys]
+
+    def load_field(self, field_info: FieldInfo) -> Optional[xr.DataArray]:
+        """
+        Load the field selected by ``field_info``, decoding only its message.
+
+        Parameters
+        ----------
+        field_info
+
+        Returns
+        -------
+        xr.DataArray or None
+            field if found, None if not.
+        """
+        return self.load_fields([field_info])[0]
+
+    def load_fields(self, field_infos: List[FieldInfo]) -> List[Optional[xr.DataArray]]:
+        """
+        Load several fields in one pass over the file.
+
+        Offsets are resolved with :meth:`lookup_many`, then messages are
+        decoded in file order through a single file handle.
+
+        Parameters
+        ----------
+        field_infos
+
+        Returns
+        -------
+        list[xr.DataArray or None]
+            fields in the order of ``field_infos``, None for fields not found.
+        """
+        offsets = self.lookup_many(field_infos)
+        fields: List[Optional[xr.DataArray]] = [None] * len(field_infos)
+        order = sorted(
+            (i for i, offset in enumerate(offsets) if offset is not None),
+            key=lambda i: offsets[i],
+        )
+        if len(order) == 0:
+            return fields
+        with open(self.file_path, "rb") as f:
+            for i in order:
+                fields[i] = _decode_message(f, offsets[i], field_infos[i])
+        return fields
+
+    def _scan(self, pending: Dict[str, FieldInfo]) -> Dict[str, Optional[int]]:
+        """Find the first matching message of every pending selection, stop when all are found."""
+        conditions = {
+            key: (
+                convert_parameter(field_info.parameter.get_parameter()),
+                field_info.level_type,
+                field_info.level,
+                field_info.additional_keys or dict(),
+            )
+            for key, field_info in pending.items()
+        }
+        found: Dict[str, Optional[int]] = {key: None for key in pending}
+        with span("grib_index_scan", "data", fields=len(pending)), open(self.file_path, "rb") as f:
+            while len(conditions) > 0:
+                offset = f.tell()
+                message = eccodes.codes_grib_new_from_file(f, headers_only=True)
+                if message is None:
+                    break
+                try:
+                    for key, (parameter, level_type, level, additional_keys) in list(conditions.items()):
+                        if check_message_with_level_fix(message, parameter, level_type, level, **additional_keys):
+                            found[key] = offset
+                            del conditions[key]
+                finally:
+                    eccodes.codes_release(message)
+        return found
+
+    def _read_sidecar(self) -> Dict[str, Optional[int]]:
+        sidecar_path = self.sidecar_path
+        try:
+            with open(sidecar_path, "r", encoding="utf-8") as f:
+                content = json.load(f)
+        except (OSError, ValueError):
+            return dict()
+        if (
+            content.get("version") != INDEX_VERSION
+            or content.get("path") != self.file_path
+            or tuple(content.get("identity", ())) != self.file_identity
+        ):
+            return dict()
+        return content.get("offsets", dict())
+
+    def _write_sidecar(self):
+        """Merge offsets with the current sidecar content and replace it atomically."""
+        if self.index_dir is None:
+            return
+        with self._lock:
+            offsets = {**self._read_sidecar(), **self.offsets}
+            content = dict(
+                version=INDEX_VERSION,
+                path=self.file_path,
+                identity=list(self.file_identity),
+                offsets=offsets,
+            )
+            try:
+                self.index_dir.mkdir(parents=True, exist_ok=True)
+                fd, temp_path = tempfile.mkstemp(dir=self.index_dir, prefix=".", suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(content, f)
+                os.replace(temp_path, self.sidecar_path)
+            except OSError:
+                # sidecar is an optimization only, a read-only index dir must not break loading.
+                pass
+
+
+def decode_message_at(
+        file_path: Union[str, Path],
+        offset: int,
+        field_info: FieldInfo,
+) -> Optional[xr.DataArray]:
+    """
+    Decode the message starting at ``offset`` into a field.
+
+    The result is the same as loading ``field_info`` with reki's
+    ``load_field_from_file``: field name and level dimension name are
+    derived from ``field_info`` in the same way.
+
+    Parameters
+    ----------
+    file_path
+    offset
+        message offset in bytes.
+    field_info
+
+    Returns
+    -------
+    xr.DataArray or None
+    """
+    with open(file_path, "rb") as f:
+        return _decode_message(f, offset, field_info)
+
+
+def _decode_message(f, offset: int, field_info: FieldInfo) -> Optional[xr.DataArray]:
+    parameter = field_info.parameter.get_parameter()
+    field_name = parameter if isinstance(parameter, str) else None
+    _, level_dim = _fix_level(field_info.level_type, None)
+    with span("decode", "data", field=field_info.name):
+        f.seek(offset)
+        message = eccodes.codes_grib_new_from_file(f)
+        if message is None:
+            return None
+        try:
+            return create_data_array_from_message(
+                message,
+                level_dim_name=level_dim,
+                field_name=field_name,
+            )
+        finally:
+            eccodes.codes_release(message)
+
+
+_message_indexes: Dict[str, GribMessageIndex] = dict()
+_message_indexes_lock = threading.Lock()
+
+
+def get_message_index(
+        file_path: Union[str, Path],
+        index_dir: Optional[Union[str, Path]] = None,
+) -> GribMessageIndex:
+    """
+    Return the process-wide message index of ``file_path``.
+
+    The index is created on first use and recreated when the file has
+    changed since.
+
+    Parameters
+    ----------
+    file_path
+    index_dir
+        sidecar directory used when the index is created.
+
+    Returns
+    -------
+    GribMessageIndex
+    """
+    path = os.path.abspath(str(file_path))
+    with _message_indexes_lock:
+        index = _message_indexes.get(path)
+        if index is None or index.is_stale():
+            index = GribMessageIndex(path, index_dir=index_dir)
+            _message_indexes[path] = index
+        return index
+
+
+def clear_message_indexes():
+    """Drop all in-memory message indexes. Sidecar files are kept."""
+    with _message_indexes_lock:
+        _message_indexes.clear()
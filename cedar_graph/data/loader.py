@@ -1,11 +1,20 @@
-from typing import Optional
+import copy
+from typing import TYPE_CHECKING, Optional, List, Tuple, Dict
 
 import pandas as pd
 import xarray as xr
 
+from cedarkit.plots.types import AreaRange
+
+from cedar_graph.tracing import span
+
+from .cache import FieldCache, field_cache_key
 from .field_info import FieldInfo
 from .source import DataSource
 
+if TYPE_CHECKING:
+    from .accumulation import AccumulationCache
+
 
 class DataLoader:
     """
@@ -15,15 +24,56 @@ class DataLoader:
     ----------
     data_source : DataSource
         some data source which is used to load the field.
+    cache : FieldCache or None
+        optional in-process field cache, shared by all loaders it is passed to.
+        Fields are keyed by field info, start time, forecast time,
+        ``data_source.system_name`` (if the source has one) and area of interest.
+    area : AreaRange or None
+        default area of interest. If set, data sources return only the field
+        inside the area, padded by ``area_padding`` grid steps.
+    area_padding : int
+        default number of grid steps added on each side of the area.
+    accumulation_cache : AccumulationCache or None
+        optional cache of accumulated fields (such as ``apcp``) across lead times,
+        used before ``cache`` for the fields it holds.
     """
-    def __init__(self, data_source: DataSource):
+    def __init__(
+            self,
+            data_source: DataSource,
+            cache: Optional[FieldCache] = None,
+            area: Optional[AreaRange] = None,
+            area_padding: int = 1,
+            accumulation_cache: Optional["AccumulationCache"] = None,
+    ):
         self.data_source = data_source
+        self.cache = cache
+        self.area = area
+        self.area_padding = area_padding
+        self.accumulation_cache = accumulation_cache
+
+    def with_area_padding(self, area_padding: int) -> "DataLoader":
+        """
+        A copy of this loader (same class, source and caches), padding the area by ``area_padding`` grid steps.
+
+        Parameters
+        ----------
+        area_padding
+
+        Returns
+        -------
+        DataLoader
+        """
+        data_loader = copy.copy(self)
+        data_loader.area_padding = area_padding
+        return data_loader
 
     def load(
             self,
             field_info: FieldInfo,
             start_time: pd.Timestamp,
             forecast_time: pd.Timedelta,
+            area: Optional[AreaRange] = None,
+            area_padding: Optional[int] = None,
     ) -> Optional[xr.DataArray]:
         """
         Load field from some ``DataSource``.
@@ -34,14 +84,295 @@ class DataLoader:
             field info, including parameter, level type and level value.
         start_time
         forecast_time
+        area
+            area of interest, ``self.area`` if not set.
+        area_padding
+            grid steps added on each side of the area, ``self.area_padding`` if not set.
 
         Returns
         -------
         xr.DataArray or None
         """
-        field = self.data_source.retrieve(
+        area_kwargs = self._area_kwargs(area, area_padding)
+        if self._is_accumulated(field_info):
+            found, field = self.accumulation_cache.get(
+                field_info, self._system_name, start_time, forecast_time, **area_kwargs,
+            )
+            if found:
+                return field
+
+        field = None
+        if self.cache is not None:
+            key = self._cache_key(field_info, start_time, forecast_time, **area_kwargs)
+            field = self.cache.get(key)
+
+        if field is None:
+            with span("retrieve", "data", field=field_info.name):
+                field = self.data_source.retrieve(
+                    field_info=field_info,
+                    start_time=start_time,
+                    forecast_time=forecast_time,
+                    **area_kwargs,
+                )
+            if self.cache is not None:
+                self.cache.put(key, field)
+
+        if self._is_accumulated(field_info):
+            self.accumulation_cache.put(
+                field_info, self._system_name, start_time, forecast_time, field, **area_kwargs,
+            )
+        return field
+
+    def load_many(
+            self,
+            field_infos: List[FieldInfo],
+            start_time: pd.Timestamp,
+            forecast_time: pd.Timedelta,
+            area: Optional[AreaRange] = None,
+            area_padding: Optional[int] = None,
+    ) -> List[Optional[xr.DataArray]]:
+        """
+        Load several fields of the same start time and forecast time from some ``DataSource``.
+
+        Data sources such as ``LocalDataSource`` resolve the file once
+        and load all fields in one pass.
+
+        Parameters
+        ----------
+        field_infos
+        start_time
+        forecast_time
+        area
+            area of interest, ``self.area`` if not set.
+        area_padding
+            grid steps added on each side of the area, ``self.area_padding`` if not set.
+
+        Returns
+        -------
+        List[Optional[xr.DataArray]]
+            fields in the order of ``field_infos``, None for fields not found.
+        """
+        area_kwargs = self._area_kwargs(area, area_padding)
+        if self.accumulation_cache is not None:
+            fields: List[Optional[xr.DataArray]] = [None] * len(field_infos)
+            missing = []
+            for i, field_info in enumerate(field_infos):
+                found = False
+                if self._is_accumulated(field_info):
+                    found, fields[i] = self.accumulation_cache.get(
+                        field_info, self._system_name, start_time, forecast_time, **area_kwargs,
+                    )
+                if not found:
+                    missing.append(i)
+            if len(missing) > 0:
+                missing_fields = self._load_many(
+                    [field_infos[i] for i in missing], start_time, forecast_time, area_kwargs,
+                )
+                for i, field in zip(missing, missing_fields):
+                    fields[i] = field
+                    if self._is_accumulated(field_infos[i]):
+                        self.accumulation_cache.put(
+                            field_infos[i], self._system_name, start_time, forecast_time, field, **area_kwargs,
+                        )
+            return fields
+        return self._load_many(field_infos, start_time, forecast_time, area_kwargs)
+
+    def _load_many(
+            self,
+            field_infos: List[FieldInfo],
+            start_time: pd.Timestamp,
+            forecast_time: pd.Timedelta,
+            area_kwargs: Dict,
+    ) -> List[Optional[xr.DataArray]]:
+        """Load several fields through ``cache``."""
+        if self.cache is None:
+            with span("retrieve_many", "data", fields=len(field_infos)):
+                return self.data_source.retrieve_many(
+                    field_infos=field_infos,
+                    start_time=start_time,
+                    forecast_time=forecast_time,
+                    **area_kwargs,
+                )
+
+        keys = [
+            self._cache_key(field_info, start_time, forecast_time, **area_kwargs)
+            for field_info in field_infos
+        ]
+        fields = [self.cache.get(key) for key in keys]
+        missing = [i for i, field in enumerate(fields) if field is None]
+        if len(missing) > 0:
+            with span("retrieve_many", "data", fields=len(missing)):
+                missing_fields = self.data_source.retrieve_many(
+                    field_infos=[field_infos[i] for i in missing],
+                    start_time=start_time,
+                    forecast_time=forecast_time,
+                    **area_kwargs,
+                )
+            for i, field in zip(missing, missing_fields):
+                fields[i] = field
+                self.cache.put(keys[i], field)
+        return fields
+
+    @property
+    def _system_name(self) -> Optional[str]:
+        return getattr(self.data_source, "system_name", None)
+
+    def _is_accumulated(self, field_info: FieldInfo) -> bool:
+        return self.accumulation_cache is not None and self.accumulation_cache.is_accumulated(field_info)
+
+    def _area_kwargs(self, area: Optional[AreaRange], area_padding: Optional[int]) -> Dict:
+        """Area keyword arguments for the data source, empty without area so any source works."""
+        if area is None:
+            area = self.area
+        if area is None:
+            return dict()
+        if area_padding is None:
+            area_padding = self.area_padding
+        return dict(area=area, area_padding=area_padding)
+
+    def _cache_key(
+            self,
+            field_info: FieldInfo,
+            start_time: pd.Timestamp,
+            forecast_time: pd.Timedelta,
+            area: Optional[AreaRange] = None,
+            area_padding: int = 1,
+    ):
+        return field_cache_key(
+            field_info=field_info,
+            start_time=start_time,
+            forecast_time=forecast_time,
+            system_name=self._system_name,
+            area=area,
+            area_padding=area_padding,
+        )
+
+
+class PrefetchedDataLoader(DataLoader):
+    """
+    Serve already loaded fields, fall back to another loader for others.
+
+    Used to batch the loads of a plot: fields are loaded with
+    ``load_many()`` up front, and ``load_data`` functions still call ``load()``.
+
+    Attributes
+    ----------
+    data_loader : DataLoader
+        loader used for fields not prefetched.
+    start_time : pd.Timestamp
+    forecast_time : pd.Timedelta
+        time of prefetched fields.
+    fields : list[tuple[FieldInfo, xr.DataArray or None]]
+        prefetched fields, loaded with the default area of ``data_loader``.
+        Loads with an explicit area are passed to ``data_loader``.
+    fields_area_padding : int
+        padding of the area the prefetched fields were loaded with. Loaders with a
+        wider padding (see :meth:`with_area_padding`) load the fields again.
+    """
+    def __init__(
+            self,
+            data_loader: DataLoader,
+            start_time: pd.Timestamp,
+            forecast_time: pd.Timedelta,
+            fields: List[Tuple[FieldInfo, Optional[xr.DataArray]]],
+    ):
+        super().__init__(
+            data_source=data_loader.data_source,
+            cache=None,
+            area=data_loader.area,
+            area_padding=data_loader.area_padding,
+        )
+        self.data_loader = data_loader
+        self.start_time = start_time
+        self.forecast_time = forecast_time
+        self.fields = fields
+        self.fields_area_padding = data_loader.area_padding
+        self._field_map = {field_info: field for field_info, field in fields}
+
+    def with_area_padding(self, area_padding: int) -> "PrefetchedDataLoader":
+        """
+        A copy serving the same prefetched fields, with ``data_loader`` padding the area by ``area_padding``.
+
+        Prefetched fields are still served if they were loaded with at least ``area_padding``,
+        otherwise ``data_loader`` loads them again with the wider window.
+
+        Parameters
+        ----------
+        area_padding
+
+        Returns
+        -------
+        PrefetchedDataLoader
+        """
+        data_loader = super().with_area_padding(area_padding)
+        data_loader.data_loader = self.data_loader.with_area_padding(area_padding)
+        return data_loader
+
+    def load(
+            self,
+            field_info: FieldInfo,
+            start_time: pd.Timestamp,
+            forecast_time: pd.Timedelta,
+            area: Optional[AreaRange] = None,
+            area_padding: Optional[int] = None,
+    ) -> Optional[xr.DataArray]:
+        found, field = self._find(field_info, start_time, forecast_time, area)
+        if found:
+            return field
+        return self.data_loader.load(
             field_info=field_info,
             start_time=start_time,
             forecast_time=forecast_time,
+            area=area,
+            area_padding=area_padding,
+        )
+
+    def load_many(
+            self,
+            field_infos: List[FieldInfo],
+            start_time: pd.Timestamp,
+            forecast_time: pd.Timedelta,
+            area: Optional[AreaRange] = None,
+            area_padding: Optional[int] = None,
+    ) -> List[Optional[xr.DataArray]]:
+        fields = []
+        missing = []
+        for i, field_info in enumerate(field_infos):
+            found, field = self._find(field_info, start_time, forecast_time, area)
+            if not found:
+                missing.append(i)
+            fields.append(field)
+        if len(missing) > 0:
+            missing_fields = self.data_loader.load_many(
+                field_infos=[field_infos[i] for i in missing],
+                start_time=start_time,
+                forecast_time=forecast_time,
+                area=area,
+                area_padding=area_padding,
+            )
+            for i, field in zip(missing, missing_fields):
+                fields[i] = field
+        return fields
+
+    def _find(
+            self,
+            field_info: FieldInfo,
+            start_time: pd.Timestamp,
+            forecast_time: pd.Timedelta,
+            area: Optional[AreaRange] = None,
+    ) -> Tuple[bool, Optional[xr.DataArray]]:
+        if (
+                self._serves_prefetched(start_time, area)
+                and forecast_time == self.forecast_time
+                and field_info in self._field_map
+        ):
+            return True, self._field_map[field_info]
+        return False, None
+
+    def _serves_prefetched(self, start_time: pd.Timestamp, area: Optional[AreaRange]) -> bool:
+        """Whether prefetched fields can answer a load: default area, same start time and enough padding."""
+        return (
+            area is None
+            and start_time == self.start_time
+            and (self.area is None or self.area_padding <= self.fields_area_padding)
         )
-        return field
@@ -1,14 +1,47 @@
-from dataclasses import fields
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, fields
+from typing import Collection, Hashable, Optional, Tuple, Union
 
+import numpy as np
 import xarray as xr
 
+from cedarkit.plots.chart.panel import Schema
+from cedarkit.plots.domains.layout import LayoutConfig
+from cedarkit.plots.style import BarbStyle
 from cedarkit.plots.types import AreaRange
 from reki.operator import extract_region, sample_nearest
 
 from cedar_graph.metadata import BasePlotMetadata
+from cedar_graph.tracing import traced
 
 
-def prepare_data(plot_data, plot_metadata: BasePlotMetadata, total_area: AreaRange):
+#: scalar coordinates added by ``crop_field``: first latitude and longitude of the source grid.
+GRID_ORIGIN_COORDS = ("grid_origin_latitude", "grid_origin_longitude")
+
+#: fraction of a grid step by which points may lie outside a padded area and still be kept,
+#: so boundary points are kept whatever the rounding of their coordinates.
+AREA_STEP_TOLERANCE = 1e-3
+
+#: ``sample_step`` value choosing the step from the size of the map in output pixels, see ``auto_sample_step``.
+AUTO_SAMPLE_STEP = "auto"
+
+#: output pixels between sampled grid points of scalar fields (fills, contour lines) with ``sample_step="auto"``.
+FILL_PIXELS_PER_POINT = 4
+
+#: spacing of sampled wind barbs with ``sample_step="auto"``, in barb lengths.
+BARB_SPACING = 1.2
+
+
+@traced("prepare_data", "data")
+def prepare_data(
+        plot_data,
+        plot_metadata: BasePlotMetadata,
+        total_area: AreaRange,
+        domain=None,
+        barb_fields: Collection[str] = (),
+        barb_length: Optional[float] = None,
+):
     """
     Process all fields in plot_data according setting in plot_metadata.
     Use generated fields replace those in plot_data.
@@ -18,6 +51,13 @@ def prepare_data(plot_data, plot_metadata: BasePlotMetadata, total_area: AreaRan
     * extract_area: use ``total_area``
     * sample_nearest: use ``plot_metadata.sample_step``
 
+    Grid indices of both operators are computed once per grid (see ``GridIndexCache``)
+    and applied to every field by plain indexing.
+
+    With ``sample_step="auto"`` the step is worked out from the map size in output pixels
+    (see ``auto_sample_step``): fields in ``barb_fields`` are thinned to the barb spacing,
+    other fields to a few pixels per grid point.
+
     Parameters
     ----------
     plot_data
@@ -26,35 +66,191 @@ def prepare_data(plot_data, plot_metadata: BasePlotMetadata, total_area: AreaRan
         some PlotMetadata object for each plot.
     total_area
         used when auto_extract_area is set.
+    domain
+        map template of the plot, needed when ``sample_step`` is ``"auto"``.
+    barb_fields
+        names of fields drawn as wind barbs.
+    barb_length
+        barb length in points, ``BarbStyle`` default if None.
 
     Returns
     -------
     PlotData
     """
     auto_extract_area = plot_metadata.auto_extract_area
-    auto_sample_nearest = plot_metadata.auto_sample_nearest
 
     field_names = set([
         f.name for f in fields(plot_data)
         if f.type == xr.DataArray and f.name.index("field_") != -1
     ])
 
-    if auto_sample_nearest:
-        sample_step = plot_metadata.sample_step
-        for field_name in field_names:
-            field = getattr(plot_data, field_name)
-            plot_field = sample_nearest(field, longitude_step=sample_step, latitude_step=sample_step)
-            setattr(plot_data, field_name, plot_field)
-
-    if auto_extract_area:
-        for field_name in field_names:
-            field = getattr(plot_data, field_name)
-            plot_field = extract_area(field, area=total_area)
-            setattr(plot_data, field_name, plot_field)
+    sample_step = resolve_sample_step(plot_metadata, domain=domain, kind="fill")
+    barb_sample_step = resolve_sample_step(plot_metadata, domain=domain, kind="barb", barb_length=barb_length)
+    area = total_area if auto_extract_area else None
+    for field_name in field_names:
+        field = getattr(plot_data, field_name)
+        plot_field = select_plot_grid(
+            field,
+            sample_step=barb_sample_step if field_name in barb_fields else sample_step,
+            area=area,
+        )
+        setattr(plot_data, field_name, plot_field)
 
     return plot_data
 
 
+def resolve_sample_step(
+        plot_metadata,
+        domain=None,
+        kind: str = "fill",
+        barb_length: Optional[float] = None,
+) -> Optional[float]:
+    """
+    Return the ``sample_nearest`` step of a plot, None if ``auto_sample_nearest`` is not set.
+
+    Parameters
+    ----------
+    plot_metadata
+        some PlotMetadata object with ``auto_sample_nearest`` and ``sample_step``.
+    domain
+        map template with ``area`` and ``layout_config``, needed when ``sample_step`` is ``"auto"``.
+    kind
+        "fill" for scalar fields, "barb" for wind barbs. Only used with ``"auto"``.
+    barb_length
+
+    Returns
+    -------
+    float or None
+    """
+    if not getattr(plot_metadata, "auto_sample_nearest", False):
+        return None
+    sample_step = plot_metadata.sample_step
+    if sample_step != AUTO_SAMPLE_STEP:
+        return sample_step
+    if domain is None:
+        raise ValueError("sample_step 'auto' needs the map domain of the plot")
+    return auto_sample_step(
+        domain.area,
+        kind=kind,
+        layout=getattr(domain, "layout_config", None),
+        barb_length=barb_length,
+    )
+
+
+def auto_sample_step(
+        area: AreaRange,
+        kind: str = "fill",
+        layout: Optional[LayoutConfig] = None,
+        schema: Optional[Schema] = None,
+        barb_length: Optional[float] = None,
+) -> float:
+    """
+    Sample step matching the output resolution of a map showing ``area``.
+
+    Scalar fields keep one grid point per ``FILL_PIXELS_PER_POINT`` output pixels
+    along the finer map axis, finer grids only add contouring and rendering time.
+    Wind barbs are spaced ``BARB_SPACING`` barb lengths apart along the coarser axis,
+    so barbs do not overlap whatever the model resolution.
+
+    Parameters
+    ----------
+    area
+        main map area (``domain.area``).
+    kind
+        "fill" or "barb".
+    layout
+        map axes layout, ``LayoutConfig()`` if None.
+    schema
+        figure size and DPI, ``Schema()`` (the ``Panel`` default) if None.
+    barb_length
+        barb length in points, ``BarbStyle`` default if None.
+
+    Returns
+    -------
+    float
+        step in degrees.
+    """
+    longitude_degrees, latitude_degrees = map_degrees_per_pixel(area, layout=layout, schema=schema)
+    if kind == "fill":
+        return min(longitude_degrees, latitude_degrees) * FILL_PIXELS_PER_POINT
+    if kind == "barb":
+        schema = schema if schema is not None else Schema()
+        if barb_length is None:
+            barb_length = BarbStyle.length
+        barb_pixels = barb_length / 72 * schema.dpi
+        return max(longitude_degrees, latitude_degrees) * barb_pixels * BARB_SPACING
+    raise ValueError(f"unknown sample kind: {kind}")
+
+
+def map_degrees_per_pixel(
+        area: AreaRange,
+        layout: Optional[LayoutConfig] = None,
+        schema: Optional[Schema] = None,
+) -> Tuple[float, float]:
+    """
+    Degrees per output pixel of the map axes along longitude and latitude.
+
+    The map axes take ``layout.width`` x ``layout.height`` of the figure,
+    shrunk to ``layout.aspect`` if set, as ``MapTemplate`` lays them out.
+
+    Parameters
+    ----------
+    area
+    layout
+    schema
+
+    Returns
+    -------
+    tuple[float, float]
+        (longitude degrees, latitude degrees) per pixel.
+    """
+    layout = layout if layout is not None else LayoutConfig()
+    schema = schema if schema is not None else Schema()
+    figure_width, figure_height = (size * schema.dpi for size in schema.figsize)
+    width = layout.width * figure_width
+    height = layout.height * figure_height
+    if layout.aspect is not None:
+        width = min(width, height * layout.aspect)
+        height = width / layout.aspect
+    return (
+        (area.end_longitude - area.start_longitude) / width,
+        (area.end_latitude - area.start_latitude) / height,
+    )
+
+
+def select_plot_grid(
+        field: xr.DataArray,
+        sample_step: Optional[float] = None,
+        area: Optional[AreaRange] = None,
+) -> xr.DataArray:
+    """
+    Sample field with ``sample_nearest`` and then extract area with ``extract_area``,
+    using grid indices cached in the process-wide ``GridIndexCache``.
+
+    For fields cropped by ``crop_field``, sampling is anchored at the first point of the
+    source grid, so the selected points are the same as for the full-domain field.
+
+    Parameters
+    ----------
+    field
+    sample_step
+        target grid step of ``sample_nearest``, no sampling if None.
+    area
+        area of ``extract_area``, no extraction if None.
+
+    Returns
+    -------
+    xr.DataArray
+    """
+    if sample_step is None and area is None:
+        return field
+    grid_index = _grid_index_cache.get(field, sample_step=sample_step, area=area)
+    plot_field = grid_index.apply(field)
+    if GRID_ORIGIN_COORDS[0] in plot_field.coords:
+        plot_field = plot_field.drop_vars(list(GRID_ORIGIN_COORDS), errors="ignore")
+    return plot_field
+
+
 def extract_area(field: xr.DataArray, area: AreaRange) -> xr.DataArray:
     """
     extract field with area range, padded by one grid step on each side.
@@ -62,6 +258,8 @@ def extract_area(field: xr.DataArray, area: AreaRange) -> xr.DataArray:
     The padding keeps contour lines complete at the area boundary.
     Region extraction itself is delegated to
     ``reki.operator.extract_region``.
+    Fields already inside the padded area (e.g. cropped when loaded, see ``crop_field``)
+    are returned unchanged.
 
     Parameters
     ----------
@@ -72,12 +270,325 @@ def extract_area(field: xr.DataArray, area: AreaRange) -> xr.DataArray:
     -------
     xr.DataArray
     """
+    return select_plot_grid(field, area=area)
+
+
+def _extract_area(field: xr.DataArray, area: AreaRange) -> xr.DataArray:
+    if is_within_area(field, area, padding=1):
+        return field
+    return _extract_padded_region(field, area, padding=1)
+
+
+@dataclass(frozen=True)
+class GridSignature:
+    """
+    Identity of a regular lat/lon grid: shape, first and last coordinates and steps.
+
+    Fields with the same signature share grid indices.
+    """
+    shape: Tuple[int, int]
+    first_latitude: float
+    last_latitude: float
+    first_longitude: float
+    last_longitude: float
+    latitude_step: float
+    longitude_step: float
+
+    @classmethod
+    def from_field(cls, field: xr.DataArray) -> "GridSignature":
+        latitude = field.latitude.values
+        longitude = field.longitude.values
+        lat_step, lon_step = grid_steps(field)
+        return cls(
+            shape=(len(latitude), len(longitude)),
+            first_latitude=float(latitude[0]),
+            last_latitude=float(latitude[-1]),
+            first_longitude=float(longitude[0]),
+            last_longitude=float(longitude[-1]),
+            latitude_step=float(lat_step),
+            longitude_step=float(lon_step),
+        )
+
+
+@dataclass(frozen=True, eq=False)
+class GridIndex:
+    """
+    Latitude and longitude indices selecting the plot grid from a source grid.
+
+    Indices are slices (with stride) when the selection is regular, integer arrays otherwise.
+    """
+    latitude: Union[slice, np.ndarray]
+    longitude: Union[slice, np.ndarray]
+
+    def apply(self, field: xr.DataArray) -> xr.DataArray:
+        if _is_full(self.latitude) and _is_full(self.longitude):
+            return field
+        return field.isel(latitude=self.latitude, longitude=self.longitude)
+
+
+def _is_full(index: Union[slice, np.ndarray]) -> bool:
+    return isinstance(index, slice) and index == slice(None)
+
+
+def _to_slice(index: np.ndarray, size: int) -> Union[slice, np.ndarray]:
+    """Convert indices with a constant positive stride to a slice."""
+    if len(index) == size:
+        return slice(None)
+    if len(index) == 0:
+        return slice(0, 0)
+    if len(index) == 1:
+        return slice(int(index[0]), int(index[0]) + 1)
+    strides = np.diff(index)
+    if strides[0] > 0 and np.all(strides == strides[0]):
+        return slice(int(index[0]), int(index[-1]) + 1, int(strides[0]))
+    return index
+
+
+class GridIndexCache:
+    """
+    Cache of grid indices of ``sample_nearest`` + ``extract_area``, keyed by grid signature.
+
+    All fields of a plot, and usually all plots of a system, share one grid, so
+    coordinates are searched once and later fields are selected by plain indexing.
+    Indices are found by running the reki operators on a zero-memory placeholder of the grid,
+    so results are the same as applying the operators to the field.
+
+    Attributes
+    ----------
+    max_entries : int
+        least recently used entries are dropped above this count.
+    """
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._indexes: "OrderedDict[Hashable, GridIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+            self,
+            field: xr.DataArray,
+            sample_step: Optional[float] = None,
+            area: Optional[AreaRange] = None,
+    ) -> GridIndex:
+        """
+        Return grid indices of field's grid for ``sample_step`` and ``area``, computing them if not cached.
+
+        Parameters
+        ----------
+        field
+        sample_step
+        area
+
+        Returns
+        -------
+        GridIndex
+        """
+        anchor = _sample_anchor(field, sample_step) if sample_step is not None else (0, 0)
+        key = (
+            GridSignature.from_field(field),
+            sample_step,
+            anchor,
+            area.to_tuple() if area is not None else None,
+        )
+        with self._lock:
+            grid_index = self._indexes.get(key)
+            if grid_index is not None:
+                self._indexes.move_to_end(key)
+                return grid_index
+
+        grid_index = self._compute(field, sample_step=sample_step, area=area, anchor=anchor)
+        with self._lock:
+            self._indexes[key] = grid_index
+            while len(self._indexes) > self.max_entries:
+                self._indexes.popitem(last=False)
+        return grid_index
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+    def __len__(self) -> int:
+        return len(self._indexes)
+
+    @staticmethod
+    def _compute(
+            field: xr.DataArray,
+            sample_step: Optional[float],
+            area: Optional[AreaRange],
+            anchor: Tuple[int, int] = (0, 0),
+    ) -> GridIndex:
+        latitude = field.latitude.values
+        longitude = field.longitude.values
+        placeholder = xr.DataArray(
+            np.broadcast_to(np.int8(0), (len(latitude), len(longitude))),
+            dims=["latitude", "longitude"],
+            coords=dict(
+                latitude=latitude,
+                longitude=longitude,
+                latitude_index=("latitude", np.arange(len(latitude))),
+                longitude_index=("longitude", np.arange(len(longitude))),
+            ),
+        )
+        if sample_step is not None and anchor == (0, 0):
+            placeholder = sample_nearest(placeholder, longitude_step=sample_step, latitude_step=sample_step)
+        elif sample_step is not None:
+            lat_ratio, lon_ratio = _sample_ratios(field, sample_step)
+            placeholder = placeholder.isel(
+                latitude=slice(anchor[0], None, lat_ratio),
+                longitude=slice(anchor[1], None, lon_ratio),
+            )
+        if area is not None:
+            placeholder = _extract_area(placeholder, area)
+        return GridIndex(
+            latitude=_to_slice(placeholder.latitude_index.values, len(latitude)),
+            longitude=_to_slice(placeholder.longitude_index.values, len(longitude)),
+        )
+
+
+def _sample_ratios(field: xr.DataArray, sample_step: float) -> Tuple[int, int]:
+    """Strides of ``reki.operator.sample_nearest``."""
+    lat_step, lon_step = grid_steps(field)
+    lat_ratio = max(1, int(np.round(sample_step / lat_step)))
+    lon_ratio = max(1, int(np.round(sample_step / lon_step)))
+    return lat_ratio, lon_ratio
+
+
+def _sample_anchor(field: xr.DataArray, sample_step: float) -> Tuple[int, int]:
+    """
+    First sampled (latitude, longitude) index of a cropped field, so that sampling
+    selects the same points as on the source grid. (0, 0) for fields not cropped.
+    """
+    if GRID_ORIGIN_COORDS[0] not in field.coords:
+        return 0, 0
+    lat_ratio, lon_ratio = _sample_ratios(field, sample_step)
+    latitude = field.latitude.values
+    longitude = field.longitude.values
+    lat_offset = int(np.round(
+        (latitude[0] - float(field.coords[GRID_ORIGIN_COORDS[0]])) / (latitude[1] - latitude[0])
+    ))
+    lon_offset = int(np.round(
+        (longitude[0] - float(field.coords[GRID_ORIGIN_COORDS[1]])) / (longitude[1] - longitude[0])
+    ))
+    return (-lat_offset) % lat_ratio, (-lon_offset) % lon_ratio
+
+
+#: process-wide grid index cache, kept across plots and forecast hours.
+_grid_index_cache = GridIndexCache()
+
+
+def get_grid_index_cache() -> GridIndexCache:
+    """Return the process-wide grid index cache."""
+    return _grid_index_cache
+
+
+def grid_steps(field: xr.DataArray) -> Tuple[float, float]:
+    """
+    Return (latitude step, longitude step) of a regular lat/lon field.
+
+    Parameters
+    ----------
+    field
+
+    Returns
+    -------
+    tuple[float, float]
+    """
     lat_step = abs(field.latitude.values[1] - field.latitude.values[0])
     lon_step = abs(field.longitude.values[1] - field.longitude.values[0])
+    return lat_step, lon_step
+
+
+def crop_field(field: xr.DataArray, area: AreaRange, padding: int = 1, copy: bool = True) -> xr.DataArray:
+    """
+    Crop field to area range, padded by ``padding`` grid steps on each side.
+
+    Used by data sources to return only the area of interest. With ``copy``,
+    the result owns its values so the full-domain field can be released.
+
+    The first latitude and longitude of the source grid are kept as scalar coordinates
+    (``GRID_ORIGIN_COORDS``), so ``select_plot_grid`` samples the same points as on the
+    full-domain field.
+
+    Parameters
+    ----------
+    field
+    area
+    padding
+        number of grid steps added on each side.
+    copy
+        copy values of the cropped field.
+
+    Returns
+    -------
+    xr.DataArray
+    """
+    cropped = _extract_padded_region(field, area, padding=padding)
+    if GRID_ORIGIN_COORDS[0] not in cropped.coords:
+        cropped = cropped.assign_coords({
+            GRID_ORIGIN_COORDS[0]: float(field.latitude.values[0]),
+            GRID_ORIGIN_COORDS[1]: float(field.longitude.values[0]),
+        })
+    if copy:
+        cropped = cropped.copy()
+    return cropped
+
+
+def _extract_padded_region(field: xr.DataArray, area: AreaRange, padding: int) -> xr.DataArray:
+    lat_step, lon_step = grid_steps(field)
+    lat_pad = lat_step * (padding + AREA_STEP_TOLERANCE)
+    lon_pad = lon_step * (padding + AREA_STEP_TOLERANCE)
     return extract_region(
         field,
-        start_longitude=area.start_longitude - lon_step,
-        end_longitude=area.end_longitude + lon_step,
-        start_latitude=area.start_latitude - lat_step,
-        end_latitude=area.end_latitude + lat_step,
+        start_longitude=area.start_longitude - lon_pad,
+        end_longitude=area.end_longitude + lon_pad,
+        start_latitude=area.start_latitude - lat_pad,
+        end_latitude=area.end_latitude + lat_pad,
+    )
+
+
+def expand_area(area: AreaRange, margin: float) -> AreaRange:
+    """
+    Return area range expanded by ``margin`` degrees on each side.
+
+    Parameters
+    ----------
+    area
+    margin
+
+    Returns
+    -------
+    AreaRange
+    """
+    return AreaRange(
+        start_longitude=area.start_longitude - margin,
+        end_longitude=area.end_longitude + margin,
+        start_latitude=area.start_latitude - margin,
+        end_latitude=area.end_latitude + margin,
+    )
+
+
+def is_within_area(field: xr.DataArray, area: AreaRange, padding: int = 1) -> bool:
+    """
+    Whether all grid points of field lie inside the area range padded by ``padding`` grid steps.
+
+    Parameters
+    ----------
+    field
+    area
+    padding
+
+    Returns
+    -------
+    bool
+    """
+    lat_step, lon_step = grid_steps(field)
+    # same tolerance as ``_extract_padded_region``, a point one more step away must not pass.
+    lat_pad = lat_step * (padding + AREA_STEP_TOLERANCE)
+    lon_pad = lon_step * (padding + AREA_STEP_TOLERANCE)
+    latitude = field.latitude.values
+    longitude = field.longitude.values
+    return bool(
+        area.start_latitude - lat_pad <= np.min(latitude)
+        and np.max(latitude) <= area.end_latitude + lat_pad
+        and area.start_longitude - lon_pad <= np.min(longitude)
+        and np.max(longitude) <= area.end_longitude + lon_pad
     )
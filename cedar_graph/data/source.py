@@ -1,5 +1,7 @@
+import threading
+import time
 from pathlib import Path
-from typing import Union, Optional, Callable
+from typing import Union, Optional, Callable, List, Dict, Hashable, Tuple
 from abc import ABC, abstractmethod
 
 import xarray as xr
@@ -7,8 +9,13 @@ import pandas as pd
 
 import reki
 from reki.sources.local import LocalSource
+from cedarkit.plots.types import AreaRange
+
+from cedar_graph.tracing import span
 
 from .field_info import FieldInfo
+from .operator import crop_field
+from .grib_index import get_message_index, is_indexable
 
 
 class DataSource(ABC):
@@ -24,6 +31,8 @@ class DataSource(ABC):
             field_info: FieldInfo,
             start_time: pd.Timestamp,
             forecast_time: pd.Timedelta,
+            area: Optional[AreaRange] = None,
+            area_padding: int = 1,
     ) -> Optional[xr.DataArray]:
         """
         Retrieve field from data source.
@@ -33,6 +42,11 @@ class DataSource(ABC):
         field_info
         start_time
         forecast_time
+        area
+            area of interest. If set, only the field inside the area
+            (padded by ``area_padding`` grid steps) is returned.
+        area_padding
+            number of grid steps added on each side of ``area``.
 
         Returns
         -------
@@ -40,8 +54,52 @@ class DataSource(ABC):
         """
         ...
 
+    def retrieve_many(
+            self,
+            field_infos: List[FieldInfo],
+            start_time: pd.Timestamp,
+            forecast_time: pd.Timedelta,
+            area: Optional[AreaRange] = None,
+            area_padding: int = 1,
+    ) -> List[Optional[xr.DataArray]]:
+        """
+        Retrieve several fields of the same start time and forecast time.
+
+        Default implementation calls ``retrieve()`` for each field.
+        Data sources able to load fields together should override it.
+
+        Parameters
+        ----------
+        field_infos
+        start_time
+        forecast_time
+        area
+            area of interest, see ``retrieve()``.
+        area_padding
+
+        Returns
+        -------
+        List[Optional[xr.DataArray]]
+            fields in the order of ``field_infos``, None for fields not found.
+        """
+        area_kwargs = dict(area=area, area_padding=area_padding) if area is not None else dict()
+        return [
+            self.retrieve(
+                field_info=field_info,
+                start_time=start_time,
+                forecast_time=forecast_time,
+                **area_kwargs,
+            )
+            for field_info in field_infos
+        ]
+
 
-def get_field_from_file(field_info: FieldInfo, file_path: Union[str, Path]) -> Optional[xr.DataArray]:
+def get_field_from_file(
+        field_info: FieldInfo,
+        file_path: Union[str, Path],
+        use_index: bool = True,
+        index_dir: Optional[Union[str, Path]] = None,
+) -> Optional[xr.DataArray]:
     """
     Load field from local file according to field info.
 
@@ -51,23 +109,73 @@ def get_field_from_file(field_info: FieldInfo, file_path: Union[str, Path]) -> O
         Field info.
     file_path
         local file path.
+    use_index
+        use the process-wide GRIB message index (see ``cedar_graph.data.grib_index``),
+        so that repeated loads from the same file seek straight to the message
+        instead of scanning the whole file again.
+    index_dir
+        directory of message index sidecar files, only used when ``use_index`` is set.
 
     Returns
     -------
     xr.DataArray
     """
+    if use_index and is_indexable(field_info):
+        message_index = get_message_index(file_path, index_dir=index_dir)
+        return message_index.load_field(field_info)
+
     additional_keys = field_info.additional_keys
     if additional_keys is None:
         additional_keys = dict()
-    grib_field = reki.from_source("file", file_path).sel(
-        parameter=field_info.parameter.get_parameter(),
-        level_type=field_info.level_type,
-        level=field_info.level,
-        **additional_keys,
-    ).first()
-    if grib_field is None:
-        return None
-    return grib_field.to_xarray()
+    with span("decode", "data", field=field_info.name):
+        grib_field = reki.from_source("file", file_path).sel(
+            parameter=field_info.parameter.get_parameter(),
+            level_type=field_info.level_type,
+            level=field_info.level,
+            **additional_keys,
+        ).first()
+        if grib_field is None:
+            return None
+        return grib_field.to_xarray()
+
+
+def get_fields_from_file(
+        field_infos: List[FieldInfo],
+        file_path: Union[str, Path],
+        use_index: bool = True,
+        index_dir: Optional[Union[str, Path]] = None,
+) -> List[Optional[xr.DataArray]]:
+    """
+    Load several fields from one local file.
+
+    With ``use_index``, all indexed fields are located in one pass over the file
+    and decoded in file order. Other fields are loaded one by one.
+
+    Parameters
+    ----------
+    field_infos
+    file_path
+        local file path.
+    use_index
+        use the process-wide GRIB message index.
+    index_dir
+        directory of message index sidecar files.
+
+    Returns
+    -------
+    List[Optional[xr.DataArray]]
+        fields in the order of ``field_infos``, None for fields not found.
+    """
+    fields: List[Optional[xr.DataArray]] = [None] * len(field_infos)
+    indexed = [i for i, field_info in enumerate(field_infos) if use_index and is_indexable(field_info)]
+    if len(indexed) > 0:
+        message_index = get_message_index(file_path, index_dir=index_dir)
+        indexed_fields = message_index.load_fields([field_infos[i] for i in indexed])
+        for i, field in zip(indexed, indexed_fields):
+            fields[i] = field
+    for i in sorted(set(range(len(field_infos))) - set(indexed)):
+        fields[i] = get_field_from_file(field_info=field_infos[i], file_path=file_path, use_index=False)
+    return fields
 
 
 data_mapper = {
@@ -109,6 +217,96 @@ def get_file_path(system_name: str, start_time, forecast_time, **kwargs) -> Unio
     return source.resolve_path()
 
 
+class FilePathCache:
+    """
+    Memoized file path resolution.
+
+    Resolving a path with ``LocalSource`` parses the system config and probes
+    the file system, which is slow on shared storage. Found paths are kept
+    until invalidated, missing paths (None) expire after ``negative_ttl``
+    seconds so forecast hours arriving later are found.
+
+    Attributes
+    ----------
+    negative_ttl : float
+        seconds to keep a missing path.
+    """
+    def __init__(self, negative_ttl: float = 60.0):
+        self.negative_ttl = negative_ttl
+        self._paths: Dict[Hashable, Tuple[Optional[Union[str, Path]], Optional[float]]] = dict()
+        self._lock = threading.Lock()
+
+    def get_or_resolve(
+            self,
+            key: Tuple[Hashable, ...],
+            resolve: Callable[[], Optional[Union[str, Path]]],
+    ) -> Optional[Union[str, Path]]:
+        """
+        Return the cached path of ``key``, calling ``resolve()`` when not cached or expired.
+
+        Parameters
+        ----------
+        key
+            tuple starting with (system_name, data_class, storage_base, start_time, forecast_time).
+        resolve
+            function returning the file path, or None if not found.
+
+        Returns
+        -------
+        Path or None
+        """
+        with self._lock:
+            entry = self._paths.get(key)
+        if entry is not None:
+            file_path, expire_time = entry
+            if expire_time is None or time.monotonic() < expire_time:
+                return file_path
+
+        file_path = resolve()
+        expire_time = None if file_path is not None else time.monotonic() + self.negative_ttl
+        with self._lock:
+            self._paths[key] = (file_path, expire_time)
+        return file_path
+
+    def invalidate(
+            self,
+            system_name: Optional[str] = None,
+            start_time: Optional[pd.Timestamp] = None,
+            forecast_time: Optional[pd.Timedelta] = None,
+    ):
+        """
+        Drop cached paths matching all given conditions, or all paths if none is given.
+
+        Parameters
+        ----------
+        system_name
+        start_time
+        forecast_time
+        """
+        start_time = pd.Timestamp(start_time) if start_time is not None else None
+        forecast_time = pd.Timedelta(forecast_time) if forecast_time is not None else None
+        with self._lock:
+            for key in list(self._paths):
+                if (
+                        (system_name is None or key[0] == system_name)
+                        and (start_time is None or key[3] == start_time)
+                        and (forecast_time is None or key[4] == forecast_time)
+                ):
+                    del self._paths[key]
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+
+#: process-wide path cache shared by ``LocalDataSource`` objects.
+_file_path_cache = FilePathCache()
+
+
+def get_file_path_cache() -> FilePathCache:
+    """Return the process-wide file path cache."""
+    return _file_path_cache
+
+
 class LocalDataSource(DataSource):
     """
     Data source for local files in CMA HPC system 1.
@@ -117,6 +315,14 @@ class LocalDataSource(DataSource):
     -----
     use embedded config files in reki by default.
     For other data source, please set ``file_path_func`` when object created.
+
+    Fields are loaded through the GRIB message index by default,
+    set ``use_message_index=False`` to scan the file for every field.
+    Set ``index_dir`` to keep index sidecar files between processes.
+
+    Resolved file paths are memoized in the process-wide ``FilePathCache``
+    (or ``path_cache`` if set), set ``cache_paths=False`` to resolve paths for every load.
+    Call ``invalidate()`` when new forecast hours arrive.
     """
     def __init__(
             self,
@@ -125,12 +331,20 @@ class LocalDataSource(DataSource):
             storage_base: Optional[str] = None,
             file_path_func: Optional[Callable] = None,
             data_source_kwargs: Optional[dict] = None,
+            use_message_index: bool = True,
+            index_dir: Optional[Union[str, Path]] = None,
+            cache_paths: bool = True,
+            path_cache: Optional[FilePathCache] = None,
     ):
         super().__init__()
         self.system_name = system_name
         self.data_class = data_class
         self.storage_base = storage_base
         self.data_source_kwargs = data_source_kwargs or {}
+        self.use_message_index = use_message_index
+        self.index_dir = index_dir
+        self.cache_paths = cache_paths
+        self.path_cache = path_cache if path_cache is not None else _file_path_cache
         if file_path_func is None:
             self.find_path_func = get_file_path
         else:
@@ -141,29 +355,140 @@ class LocalDataSource(DataSource):
             field_info: FieldInfo,
             start_time: pd.Timestamp,
             forecast_time: pd.Timedelta,
+            area: Optional[AreaRange] = None,
+            area_padding: int = 1,
     ) -> Optional[xr.DataArray]:
         """
         Find the local file path using ``find_path_func()``,
         and load the field using  ``get_field_from_file()``
 
+        With ``area``, the decoded message is cropped right away and
+        only the window is kept.
+
         Parameters
         ----------
         field_info
         start_time
         forecast_time
+        area
+        area_padding
 
         Returns
         -------
         xr.DataArray or None
             field if found, None if not.
         """
-        file_path = self.find_path_func(
+        file_path = self.get_file_path(start_time=start_time, forecast_time=forecast_time)
+        if file_path is None:
+            return None
+        field = get_field_from_file(
+            field_info=field_info,
+            file_path=file_path,
+            use_index=self.use_message_index,
+            index_dir=self.index_dir,
+        )
+        if field is not None and area is not None:
+            field = crop_field(field, area, padding=area_padding)
+        return field
+
+    def retrieve_many(
+            self,
+            field_infos: List[FieldInfo],
+            start_time: pd.Timestamp,
+            forecast_time: pd.Timedelta,
+            area: Optional[AreaRange] = None,
+            area_padding: int = 1,
+    ) -> List[Optional[xr.DataArray]]:
+        """
+        Find the local file path once and load all fields using ``get_fields_from_file()``.
+
+        Parameters
+        ----------
+        field_infos
+        start_time
+        forecast_time
+        area
+        area_padding
+
+        Returns
+        -------
+        List[Optional[xr.DataArray]]
+            fields in the order of ``field_infos``, None for fields not found.
+        """
+        file_path = self.get_file_path(start_time=start_time, forecast_time=forecast_time)
+        if file_path is None:
+            return [None] * len(field_infos)
+        fields = get_fields_from_file(
+            field_infos=field_infos,
+            file_path=file_path,
+            use_index=self.use_message_index,
+            index_dir=self.index_dir,
+        )
+        if area is not None:
+            fields = [
+                crop_field(field, area, padding=area_padding) if field is not None else None
+                for field in fields
+            ]
+        return fields
+
+    def get_file_path(
+            self,
+            start_time: pd.Timestamp,
+            forecast_time: pd.Timedelta,
+    ) -> Optional[Union[str, Path]]:
+        """
+        Find the local file path using ``find_path_func()``, memoized in ``path_cache``.
+
+        Parameters
+        ----------
+        start_time
+        forecast_time
+
+        Returns
+        -------
+        Path or None
+            file path if found, None if not.
+        """
+        def resolve():
+            with span("resolve_path", "data"):
+                return self.find_path_func(
+                    system_name=self.system_name,
+                    start_time=start_time,
+                    forecast_time=forecast_time,
+                    data_class=self.data_class,
+                    storage_base=self.storage_base,
+                    **self.data_source_kwargs,
+                )
+
+        if not self.cache_paths:
+            return resolve()
+
+        key = (
+            self.system_name,
+            self.data_class,
+            self.storage_base,
+            pd.Timestamp(start_time),
+            pd.Timedelta(forecast_time),
+            self.find_path_func,
+            tuple(sorted((k, str(v)) for k, v in self.data_source_kwargs.items())),
+        )
+        return self.path_cache.get_or_resolve(key, resolve)
+
+    def invalidate(
+            self,
+            start_time: Optional[pd.Timestamp] = None,
+            forecast_time: Optional[pd.Timedelta] = None,
+    ):
+        """
+        Drop memoized file paths of this system, optionally only of the given times.
+
+        Parameters
+        ----------
+        start_time
+        forecast_time
+        """
+        self.path_cache.invalidate(
             system_name=self.system_name,
             start_time=start_time,
             forecast_time=forecast_time,
-            data_class=self.data_class,
-            storage_base=self.storage_base,
-            **self.data_source_kwargs,
         )
-        field = get_field_from_file(field_info=field_info, file_path=file_path)
-        return field
@@ -0,0 +1,463 @@
+"""
+Cache of base-map feature geometries per map extent.
+
+Every ``EastAsiaMapTemplate`` or ``CnAreaMapTemplate`` panel asks its map
+loader for the coastline, border, province and river features again:
+shapefiles are read, every geometry of the country is converted to a
+Matplotlib path and drawn, even far outside a regional map.
+
+This module is a cedarkit map loader package wrapping the configured one.
+:func:`install_map_cache` makes it the default map loader package
+(``cedarkit.plots.map.set_default_map_loader_package``). Features of the
+wrapped loader are then served as :class:`CachedFeature`, whose
+geometries are clipped to the map extent (plus a margin), simplified
+below the pixel size and kept per (feature, extent) in memory and,
+optionally, as WKB in a cache directory shared by worker processes. The
+extent is the one of the template's area in the feature CRS, so entries
+are per (template, area). Cached geometries are long-lived objects, which
+lets cartopy's own path cache (keyed by geometry and target projection)
+project each of them once per process.
+
+Disk entries are keyed by the map loader (class, package version and
+settings), the feature and the extent. Clear the cache directory when
+shapefiles are replaced without a new package version.
+
+Examples
+--------
+>>> install_map_cache("/tmp/cedar-graph-maps")
+>>> panel = Panel(domain=CnAreaMapTemplate(area=area_range))   # features come from the cache
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from dataclasses import dataclass
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import shapely
+
+import cartopy.feature as cfeature
+from cedarkit.plots import map as cedarkit_map
+from cedarkit.plots.map import MapLoader, MapType
+
+
+#: cache entry format version, part of the entry key.
+MAP_CACHE_VERSION = 1
+
+#: name of this map loader package.
+CACHED_MAP_LOADER_PACKAGE = __name__
+
+Extent = Tuple[float, float, float, float]
+
+
+@dataclass
+class MapCacheStats:
+    """
+    Counters of a ``MapGeometryCache``.
+
+    Attributes
+    ----------
+    memory_hits
+        geometry lookups served from memory.
+    disk_hits
+        geometry lookups read from the cache directory.
+    misses
+        geometry lookups clipped from the source feature.
+    """
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+
+
+def _package_version(module_name: str) -> str:
+    try:
+        return version(module_name.split(".")[0])
+    except PackageNotFoundError:
+        return ""
+
+
+def _digest(*items: Any) -> str:
+    return hashlib.sha1(json.dumps([MAP_CACHE_VERSION, *items]).encode("utf-8")).hexdigest()
+
+
+def _extent_key(extent: Extent) -> Extent:
+    return tuple(round(float(value), 6) for value in extent)
+
+
+def clip_geometries(
+        geometries: Sequence[Any],
+        extent: Extent,
+        margin: float = 0.02,
+        simplify: Optional[float] = 1e-4,
+) -> List[Any]:
+    """
+    Clip geometries to a map extent and simplify them.
+
+    Parameters
+    ----------
+    geometries
+        shapely geometries.
+    extent
+        ``(x0, x1, y0, y1)`` in the CRS of the geometries.
+    margin
+        the clip box is larger than ``extent`` by this fraction of its size on each side,
+        so edges created by clipping polygons lie outside the map.
+    simplify
+        simplify tolerance as a fraction of the larger extent size, no simplification if None or 0.
+
+    Returns
+    -------
+    list
+        non-empty clipped geometries.
+    """
+    x0, x1, y0, y1 = extent
+    dx = (x1 - x0) * margin
+    dy = (y1 - y0) * margin
+    geometries = np.asarray(list(geometries), dtype=object)
+    if len(geometries) == 0:
+        return []
+    clipped = shapely.clip_by_rect(geometries, x0 - dx, y0 - dy, x1 + dx, y1 + dy)
+    if simplify:
+        tolerance = max(x1 - x0, y1 - y0) * simplify
+        clipped = shapely.simplify(clipped, tolerance, preserve_topology=True)
+    return [geometry for geometry in clipped if not geometry.is_empty]
+
+
+class CachedFeature(cfeature.Feature):
+    """
+    Map feature serving clipped geometries of a source feature from a ``MapGeometryCache``.
+
+    The source feature is created on first use only, a warm cache never reads the map files.
+    """
+    def __init__(self, cache: "MapGeometryCache", key: str, index: int, crs, kwargs: Dict, source):
+        super().__init__(crs, **kwargs)
+        self.key = key
+        self.index = index
+        self._cache = cache
+        self._source = source
+
+    def source_feature(self) -> cfeature.Feature:
+        return self._source()[self.index]
+
+    def geometries(self):
+        return self.source_feature().geometries()
+
+    def intersecting_geometries(self, extent: Optional[Extent]):
+        if extent is None:
+            return self.geometries()
+        return iter(self._cache.get_geometries(self, extent))
+
+
+class MapGeometryCache:
+    """
+    In-memory cache of map features and of their clipped geometries per extent, optionally backed by a directory.
+
+    Disk entries are pickle files written with atomic renames. Processes
+    writing the same entry write the same content, so no lock is taken.
+    Errors writing the cache directory are ignored.
+
+    Attributes
+    ----------
+    cache_dir : Path or None
+    margin : float
+    simplify : float or None
+        see :func:`clip_geometries`.
+    """
+    def __init__(
+            self,
+            cache_dir: Optional[Union[str, Path]] = None,
+            margin: float = 0.02,
+            simplify: Optional[float] = 1e-4,
+    ):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.margin = margin
+        self.simplify = simplify
+        self._features: Dict[str, List[CachedFeature]] = dict()
+        self._sources: Dict[str, List[cfeature.Feature]] = dict()
+        self._geometries: Dict[Tuple[str, int, Extent], List[Any]] = dict()
+        self._stats = MapCacheStats()
+        self._lock = threading.RLock()
+
+    def get_features(self, key: str, load) -> List[CachedFeature]:
+        """
+        Cached features of one map loader call.
+
+        Parameters
+        ----------
+        key
+            key of the loader call, see ``CachedMapLoader.feature_key``.
+        load
+            ``load() -> list[Feature]``, the loader call, used on a miss or when geometries are clipped.
+
+        Returns
+        -------
+        list[CachedFeature]
+        """
+        with self._lock:
+            features = self._features.get(key)
+            if features is not None:
+                return features
+
+            def source() -> List[cfeature.Feature]:
+                with self._lock:
+                    if key not in self._sources:
+                        self._sources[key] = list(load())
+                    return self._sources[key]
+
+            descriptions = self._read(key)
+            if descriptions is None:
+                descriptions = [(feature.crs, feature.kwargs) for feature in source()]
+                self._write(key, descriptions)
+            features = [
+                CachedFeature(self, key, index, crs, kwargs, source)
+                for index, (crs, kwargs) in enumerate(descriptions)
+            ]
+            self._features[key] = features
+            return features
+
+    def get_geometries(self, feature: CachedFeature, extent: Extent) -> List[Any]:
+        """
+        Geometries of ``feature`` clipped to ``extent`` and simplified.
+
+        Parameters
+        ----------
+        feature
+        extent
+            ``(x0, x1, y0, y1)`` in the feature CRS.
+
+        Returns
+        -------
+        list
+            shapely geometries.
+        """
+        extent = _extent_key(extent)
+        memory_key = (feature.key, feature.index, extent)
+        with self._lock:
+            geometries = self._geometries.get(memory_key)
+            if geometries is not None:
+                self._stats.memory_hits += 1
+                return geometries
+
+            disk_key = _digest(feature.key, feature.index, extent, self.margin, self.simplify)
+            content = self._read(disk_key)
+            if content is not None:
+                geometries = list(shapely.from_wkb(content))
+                self._stats.disk_hits += 1
+            else:
+                source = feature.source_feature()
+                geometries = clip_geometries(
+                    list(source.intersecting_geometries(self._clip_extent(extent))),
+                    extent,
+                    margin=self.margin,
+                    simplify=self.simplify,
+                )
+                self._write(disk_key, [shapely.to_wkb(geometry) for geometry in geometries])
+                self._stats.misses += 1
+            self._geometries[memory_key] = geometries
+            return geometries
+
+    def stats(self) -> MapCacheStats:
+        with self._lock:
+            return MapCacheStats(**vars(self._stats))
+
+    def clear(self):
+        """Remove cached geometries in memory and in the cache directory."""
+        with self._lock:
+            self._features.clear()
+            self._sources.clear()
+            self._geometries.clear()
+            if self.cache_dir is not None:
+                for path in self.cache_dir.glob("*/*.pickle"):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+    def _clip_extent(self, extent: Extent) -> Extent:
+        x0, x1, y0, y1 = extent
+        dx = (x1 - x0) * self.margin
+        dy = (y1 - y0) * self.margin
+        return x0 - dx, x1 + dx, y0 - dy, y1 + dy
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.pickle"
+
+    def _read(self, key: str) -> Optional[Any]:
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._entry_path(key), "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _write(self, key: str, content: Any):
+        if self.cache_dir is None:
+            return
+        path = self._entry_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump(content, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temp_path, path)
+            except BaseException:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+                raise
+        except OSError:
+            # cache is an optimization only, a full or read-only disk must not break plotting.
+            pass
+
+
+_map_cache: Optional[MapGeometryCache] = None
+_base_package: Optional[str] = None
+
+
+def _wrapped_package() -> str:
+    if _base_package is not None:
+        return _base_package
+    if cedarkit_map.DEFAULT_MAP_LOADER_PACKAGE != CACHED_MAP_LOADER_PACKAGE:
+        return cedarkit_map.DEFAULT_MAP_LOADER_PACKAGE
+    return "cedarkit.plots.map.default"
+
+
+class CachedMapLoader(MapLoader):
+    """
+    Map loader serving the features of the wrapped map loader package from the installed ``MapGeometryCache``.
+
+    Other attributes (such as ``update_style`` of the CEMC loader) are those of the wrapped loader.
+    """
+    def __init__(self, map_type: MapType = MapType.Portrait, **kwargs):
+        super().__init__(map_type=map_type, **kwargs)
+        self.base_loader: MapLoader = cedarkit_map.get_map_loader_class(_wrapped_package())(map_type=map_type, **kwargs)
+
+    def __getattr__(self, name: str):
+        if name == "base_loader":
+            raise AttributeError(name)
+        return getattr(self.base_loader, name)
+
+    def feature_key(self, name: str, kwargs: Dict) -> str:
+        """
+        Key of a feature call: loader class, package version and settings, feature name and arguments.
+
+        Parameters
+        ----------
+        name
+        kwargs
+
+        Returns
+        -------
+        str
+        """
+        loader_class = type(self.base_loader)
+        return _digest(
+            f"{loader_class.__module__}.{loader_class.__qualname__}",
+            _package_version(loader_class.__module__),
+            repr(sorted(vars(self.base_loader).items(), key=lambda item: item[0])),
+            name,
+            repr(sorted(kwargs.items(), key=lambda item: item[0])),
+        )
+
+    def get_feature(self, name: str, **kwargs) -> List[cfeature.Feature]:
+        cache = _map_cache
+        if cache is None:
+            return self.base_loader.get_feature(name, **kwargs)
+        return cache.get_features(
+            self.feature_key(name, kwargs),
+            lambda: self.base_loader.get_feature(name, **kwargs),
+        )
+
+    def coastline(self, scale: Optional[str] = None, style: Optional[Dict] = None) -> List[cfeature.Feature]:
+        return self.get_feature("coastline", scale=scale, style=style)
+
+    def land(self, scale: Optional[str] = None, style: Optional[Dict] = None) -> List[cfeature.Feature]:
+        return self.get_feature("land", scale=scale, style=style)
+
+    def rivers(self, scale: Optional[str] = None, style: Optional[Dict] = None) -> List[cfeature.Feature]:
+        return self.get_feature("rivers", scale=scale, style=style)
+
+    def lakes(self, scale: Optional[str] = None, style: Optional[Dict] = None) -> List[cfeature.Feature]:
+        return self.get_feature("lakes", scale=scale, style=style)
+
+    def china_coastline(self) -> List[cfeature.Feature]:
+        return self.get_feature("china_coastline")
+
+    def china_borders(self) -> List[cfeature.Feature]:
+        return self.get_feature("china_borders")
+
+    def china_provinces(self) -> List[cfeature.Feature]:
+        return self.get_feature("china_provinces")
+
+    def china_rivers(self) -> List[cfeature.Feature]:
+        return self.get_feature("china_rivers")
+
+    def china_nine_lines(self) -> List[cfeature.Feature]:
+        return self.get_feature("china_nine_lines")
+
+    def global_borders(self) -> List[cfeature.Feature]:
+        return self.get_feature("global_borders")
+
+
+map_class = CachedMapLoader
+
+
+def get_china_map() -> List[cfeature.Feature]:
+    return cedarkit_map.get_china_map(_wrapped_package())
+
+
+def get_china_nine_map() -> List[cfeature.Feature]:
+    return cedarkit_map.get_china_nine_map(_wrapped_package())
+
+
+def install_map_cache(
+        cache_dir: Optional[Union[str, Path]] = None,
+        margin: float = 0.02,
+        simplify: Optional[float] = 1e-4,
+) -> MapGeometryCache:
+    """
+    Serve map features of the default map loader package from a new ``MapGeometryCache``.
+
+    The current default map loader package (e.g. the CEMC maps) is wrapped.
+    Installing again replaces the cache and keeps the wrapped package.
+
+    Parameters
+    ----------
+    cache_dir
+        directory of disk entries shared by processes, memory only if None.
+    margin
+    simplify
+        see :func:`clip_geometries`.
+
+    Returns
+    -------
+    MapGeometryCache
+    """
+    global _map_cache, _base_package
+    if cedarkit_map.DEFAULT_MAP_LOADER_PACKAGE != CACHED_MAP_LOADER_PACKAGE:
+        _base_package = cedarkit_map.DEFAULT_MAP_LOADER_PACKAGE
+    _map_cache = MapGeometryCache(cache_dir=cache_dir, margin=margin, simplify=simplify)
+    cedarkit_map.set_default_map_loader_package(CACHED_MAP_LOADER_PACKAGE)
+    return _map_cache
+
+
+def uninstall_map_cache():
+    """Restore the wrapped map loader package as default map loader package."""
+    global _map_cache, _base_package
+    if _base_package is not None:
+        cedarkit_map.set_default_map_loader_package(_base_package)
+    _map_cache = None
+    _base_package = None
+
+
+def get_map_cache() -> Optional[MapGeometryCache]:
+    """The installed ``MapGeometryCache``, None if not installed."""
+    return _map_cache
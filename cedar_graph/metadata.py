@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Union
 
 
 @dataclass
@@ -10,9 +11,11 @@ class BasePlotMetadata:
         Flag for auto extract area. If True, data will be extract according to map range before drawing.
     auto_sample_nearest : bool
         Flag for auto sample data. If True, data will be regrid to a smaller grid nearest to ``sample_step``.
-    sample_step : float
+    sample_step : float or str
         A target grid resolution to use when ``auto_sample_nearest`` is set.
+        ``"auto"`` works it out from the map size in output pixels, separately for
+        scalar fields and wind barbs (see ``cedar_graph.data.operator.auto_sample_step``).
     """
     auto_extract_area: bool = True
     auto_sample_nearest: bool = True
-    sample_step: float = 0.09
+    sample_step: Union[float, str] = 0.09
@@ -0,0 +1,655 @@
+"""Pipelined plot execution: load, draw and write plots of a batch concurrently.
+
+``show_plot`` and :func:`cedar_graph.batch.run_group` run each plot as
+load → prepare → plot → save in turn, so the CPU idles during GRIB reads
+and the disk idles during matplotlib drawing. :class:`PlotPipeline`
+overlaps the three stages:
+
+* loader threads run ``load_data`` of the next plots (GRIB reads and
+  decoding release the GIL) and put the plot data into a
+  :class:`MemoryBoundedQueue`;
+* the render stage draws each queued plot for its areas, in worker
+  processes of an ``Executor`` (one task per plot, :func:`render_images`)
+  or in the calling thread, and rasterizes each figure to an RGBA buffer
+  (:func:`rasterize`);
+* writer threads encode the buffers to PNG and write them (:func:`write_png`),
+  the images are the same as ``panel.save(path)``.
+
+When tracing is enabled, tasks in worker processes run with
+:func:`cedar_graph.tracing.call_traced` and their spans are merged into the
+tracer of the calling process.
+
+Loader threads wait while plot data in the queue or being drawn and
+images waiting to be written exceed ``max_bytes``. The queue always takes
+one item, so loading runs at most one plot per loader thread beyond the
+budget.
+
+Plot data sent to worker processes is rebuilt there with the
+``PlotData`` / ``PlotMetadata`` classes of the plot module resolved from
+the plot type, recipe plot data classes cannot be pickled.
+
+Examples
+--------
+>>> def load(plot_type, plot_settings):
+...     return lambda: load_plot(plot_type, plot_settings, data_source_config={})
+>>> jobs = [
+...     PipelineJob(
+...         plot_type="cn.t2m",
+...         load=load("cn.t2m", dict(system_name="CMA-GFS", start_time="2024070100", forecast_time=f"{hour}h")),
+...         outputs=[(PlotArea("China"), Path(f"t2m_{hour:03d}.png"))],
+...     )
+...     for hour in range(0, 73, 3)
+... ]
+>>> with create_process_pool(max_workers=4) as executor:
+...     results = PlotPipeline(executor=executor).run(jobs)
+"""
+
+import dataclasses
+import functools
+import io
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import xarray as xr
+
+from cedar_graph.logger import get_logger
+from cedar_graph.render import PlotArea, area_metadata, copy_plot_data, plot_name
+from cedar_graph.tracing import call_traced, get_tracer, plot_span, traced
+
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class PipelineJob:
+    """
+    A plot loaded once and drawn for one or more areas.
+
+    Attributes
+    ----------
+    plot_type : str
+        plot type of ``quick_plot``, resolved again by render worker processes.
+    load : callable
+        ``load() -> (plot_module, plot_metadata, plot_data)``, run in a loader thread,
+        e.g. with ``cedar_graph.quickplot.load_plot``.
+    outputs : list[tuple[PlotArea, Path]]
+        area and output path of each image.
+    chrome_key : hashable or None
+        save the images with the ``ChromeCache`` of the render process, keyed by
+        ``(chrome_key, area)`` (``cedar_graph.composite``), in the render process.
+    """
+    plot_type: str
+    load: Callable[[], Tuple[Any, Any, Any]]
+    outputs: List[Tuple[PlotArea, Path]]
+    chrome_key: Optional[Hashable] = None
+
+
+@dataclass
+class PipelineResult:
+    """
+    Result of one image of a :class:`PipelineJob`.
+
+    Attributes
+    ----------
+    job : PipelineJob
+    area : PlotArea
+    path : Path
+    error : str or None
+        error of a failed load, render or write.
+    elapsed : float
+        seconds of the render and write of the image, plus the load of the job for its first image.
+    """
+    job: PipelineJob
+    area: PlotArea
+    path: Path
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class PipelineStats:
+    """
+    Stage times of a :meth:`PlotPipeline.run`, stages overlap so their sum exceeds ``wall_seconds``.
+
+    Attributes
+    ----------
+    load_seconds : float
+    render_seconds : float
+    write_seconds : float
+    wall_seconds : float
+    peak_bytes : int
+        largest queued plot data and pending images, see :class:`MemoryBoundedQueue`.
+    """
+    load_seconds: float = 0.0
+    render_seconds: float = 0.0
+    write_seconds: float = 0.0
+    wall_seconds: float = 0.0
+    peak_bytes: int = 0
+
+
+@dataclass
+class RenderedImage:
+    """
+    A figure rasterized by :func:`rasterize`, to be encoded by :func:`write_png`.
+
+    Attributes
+    ----------
+    rgba : np.ndarray
+        (height, width, 4) uint8 pixels, top row first.
+    dpi : float
+    render_seconds : float
+    """
+    rgba: np.ndarray
+    dpi: float
+    render_seconds: float = 0.0
+
+    @property
+    def nbytes(self) -> int:
+        return self.rgba.nbytes
+
+
+class MemoryBoundedQueue:
+    """
+    FIFO queue bounded by the bytes of its items instead of their number.
+
+    Bytes of an item are counted from :meth:`put` until :meth:`release`, so items taken
+    by :meth:`get` and still in use keep their share of the budget.
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: deque = deque()
+        self._bytes = 0
+        self._peak_bytes = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def put(self, item: Any, nbytes: int) -> bool:
+        """
+        Add an item, waiting while it does not fit into the budget.
+
+        An item always fits if no bytes are counted, so items larger than the budget pass one by one.
+
+        Returns
+        -------
+        bool
+            False if the queue was closed, the item is not added.
+        """
+        with self._condition:
+            while not self._closed and self._bytes > 0 and self._bytes + nbytes > self.max_bytes:
+                self._condition.wait()
+            if self._closed:
+                return False
+            self._items.append(item)
+            self._add(nbytes)
+            self._condition.notify_all()
+            return True
+
+    def get(self) -> Optional[Any]:
+        """Next item, waiting for one. None once the queue is closed and empty."""
+        with self._condition:
+            while not self._items and not self._closed:
+                self._condition.wait()
+            return self._items.popleft() if self._items else None
+
+    def charge(self, nbytes: int):
+        """Count bytes without an item and without waiting, e.g. for results of taken items."""
+        with self._condition:
+            self._add(nbytes)
+
+    def release(self, nbytes: int):
+        """Stop counting bytes of an item taken by :meth:`get` or of :meth:`charge`."""
+        with self._condition:
+            self._bytes -= nbytes
+            self._condition.notify_all()
+
+    def close(self):
+        """Stop adding items, :meth:`get` returns the remaining items then None."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    @property
+    def current_bytes(self) -> int:
+        return self._bytes
+
+    @property
+    def peak_bytes(self) -> int:
+        return self._peak_bytes
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _add(self, nbytes: int):
+        self._bytes += nbytes
+        self._peak_bytes = max(self._peak_bytes, self._bytes)
+
+
+def plot_data_nbytes(plot_data: Any) -> int:
+    """
+    Bytes of the arrays of plot data: ``DataArray`` / ``ndarray`` values of a dataclass,
+    dict, list or tuple, nested. Arrays sharing memory are counted for each.
+    """
+    if isinstance(plot_data, (xr.DataArray, xr.Dataset, np.ndarray)):
+        return int(plot_data.nbytes)
+    if dataclasses.is_dataclass(plot_data) and not isinstance(plot_data, type):
+        return sum(plot_data_nbytes(getattr(plot_data, f.name)) for f in dataclasses.fields(plot_data))
+    if isinstance(plot_data, dict):
+        return sum(plot_data_nbytes(value) for value in plot_data.values())
+    if isinstance(plot_data, (list, tuple)):
+        return sum(plot_data_nbytes(value) for value in plot_data)
+    return 0
+
+
+@traced("rasterize", "output")
+def rasterize(fig, **kwargs) -> RenderedImage:
+    """
+    Draw a figure into an RGBA buffer, as ``panel.save`` (``bbox_inches="tight"``) would draw it.
+
+    Parameters
+    ----------
+    fig
+        figure on the Agg canvas.
+    **kwargs
+        passed to ``Figure.savefig``, except ``bbox_inches`` and ``format``.
+    """
+    import matplotlib
+
+    start = time.perf_counter()
+    fig.draw_without_rendering()
+    bbox = fig.get_tightbbox(fig.canvas.get_renderer()).padded(matplotlib.rcParams["savefig.pad_inches"])
+    dpi = kwargs.pop("dpi", fig.dpi)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="rgba", bbox_inches=bbox, dpi=dpi, **kwargs)
+    width, height = (bbox.size * dpi).astype(int)
+    rgba = np.frombuffer(buffer.getbuffer(), dtype=np.uint8).reshape(height, width, 4)
+    return RenderedImage(rgba=rgba, dpi=dpi, render_seconds=time.perf_counter() - start)
+
+
+@traced("write_png", "output")
+def write_png(image: RenderedImage, path: Union[str, Path]) -> Path:
+    """Encode an image to PNG and write it, with the metadata of ``Figure.savefig``."""
+    import matplotlib.image
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    matplotlib.image.imsave(path, image.rgba, format="png", dpi=image.dpi)
+    return path
+
+
+@dataclass
+class _Packed:
+    """Dataclass object sent to a worker process by class name and field values."""
+    class_name: str
+    values: Dict[str, Any] = field(default_factory=dict)
+
+
+def _pack(obj: Any) -> Any:
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return _Packed(class_name=type(obj).__name__, values=dict(obj.__dict__))
+    return obj
+
+
+def _unpack(obj: Any, plot_module) -> Any:
+    if not isinstance(obj, _Packed):
+        return obj
+    cls = getattr(plot_module, obj.class_name)
+    unpacked = cls.__new__(cls)
+    unpacked.__dict__.update(obj.values)
+    return unpacked
+
+
+def render_image(
+        plot: Any,
+        plot_data: Any,
+        plot_metadata: Any,
+        area: PlotArea,
+        path: Optional[Path] = None,
+        chrome_key: Optional[Hashable] = None,
+        plot_type: Optional[str] = None,
+) -> Optional[RenderedImage]:
+    """
+    Draw a plot for one area and rasterize it.
+
+    Parameters
+    ----------
+    plot
+        plot module, or plot type resolved with ``cedar_graph.quickplot.resolve_plot``
+        (plot data and metadata packed by the pipeline are rebuilt with its classes).
+    plot_data
+        drawn from a shallow copy, see ``cedar_graph.render.copy_plot_data``.
+    plot_metadata
+        metadata of the full-domain plot, see ``cedar_graph.render.area_metadata``.
+    area
+    path
+        output path, only used with ``chrome_key``.
+    chrome_key
+        save the image to ``path`` with the process-wide ``ChromeCache`` instead of returning it.
+    plot_type
+        name of the plot span of ``cedar_graph.tracing``: ``plot`` if it is a plot type,
+        else ``cedar_graph.render.plot_name`` of the plot module if None.
+
+    Returns
+    -------
+    RenderedImage or None
+        None if saved with ``chrome_key``.
+    """
+    import matplotlib.pyplot as plt
+
+    if isinstance(plot, str):
+        from cedar_graph.quickplot import resolve_plot
+        plot_type = plot
+        plot = resolve_plot(plot)
+    plot_data = _unpack(plot_data, plot)
+    plot_metadata = _unpack(plot_metadata, plot)
+
+    start = time.perf_counter()
+    with plot_span(
+            plot_type if plot_type is not None else plot_name(plot),
+            stage="render",
+            area=area.name,
+            forecast_time=getattr(plot_metadata, "forecast_time", None),
+    ):
+        panel = plot.plot(plot_data=copy_plot_data(plot_data), plot_metadata=area_metadata(plot_metadata, area))
+        try:
+            if chrome_key is None:
+                image = rasterize(panel.fig)
+                image.render_seconds = time.perf_counter() - start
+                return image
+            from cedar_graph.composite import get_chrome_cache
+            path.parent.mkdir(parents=True, exist_ok=True)
+            get_chrome_cache().save(panel, path, key=(chrome_key, area.name, area.area))
+            return None
+        finally:
+            plt.close(panel.fig)
+
+
+def render_images(
+        plot: Any,
+        plot_data: Any,
+        plot_metadata: Any,
+        outputs: List[Tuple[PlotArea, Path]],
+        chrome_key: Optional[Hashable] = None,
+        plot_type: Optional[str] = None,
+) -> List[Tuple[Optional[RenderedImage], Optional[str], float]]:
+    """
+    Draw a plot for each of its outputs with :func:`render_image`, as one task of a worker process.
+
+    The plot data is sent to the worker once for all areas of the plot.
+
+    Parameters
+    ----------
+    plot
+        plot type or plot module, see :func:`render_image`.
+    plot_data
+    plot_metadata
+    outputs
+        area and output path of each image.
+    chrome_key
+    plot_type
+        see :func:`render_image`.
+
+    Returns
+    -------
+    list[tuple[RenderedImage or None, str or None, float]]
+        image, error of a failed render and render seconds, in order of ``outputs``.
+    """
+    if isinstance(plot, str):
+        from cedar_graph.quickplot import resolve_plot
+        plot_type = plot
+        plot = resolve_plot(plot)
+    plot_data = _unpack(plot_data, plot)
+    plot_metadata = _unpack(plot_metadata, plot)
+
+    results = []
+    for area, path in outputs:
+        start = time.perf_counter()
+        try:
+            image = render_image(
+                plot, plot_data, plot_metadata, area, path=path, chrome_key=chrome_key, plot_type=plot_type,
+            )
+        except Exception as e:
+            results.append((None, repr(e), time.perf_counter() - start))
+        else:
+            results.append((image, None, time.perf_counter() - start))
+    return results
+
+
+@dataclass
+class _Loaded:
+    index: int
+    job: PipelineJob
+    plot_module: Any
+    plot_metadata: Any
+    plot_data: Any
+    nbytes: int
+    load_seconds: float
+    remaining: int
+
+
+class PlotPipeline:
+    """
+    Load, draw and write the plots of a batch in overlapping stages, see the module docstring.
+
+    Attributes
+    ----------
+    loader_threads : int
+    writer_threads : int
+    max_bytes : int
+        budget of loaded plot data and images waiting to be written.
+    executor : Executor or None
+        render worker processes, e.g. ``cedar_graph.batch.create_process_pool``.
+        Plots are drawn in the thread calling :meth:`run` if None. Not shut down by the pipeline.
+    max_pending_renders : int
+        render tasks (one per plot, for all its areas) submitted to ``executor`` and not finished yet,
+        twice the cpu count by default.
+    """
+    def __init__(
+            self,
+            loader_threads: int = 2,
+            writer_threads: int = 2,
+            max_bytes: int = 2 * 1024 ** 3,
+            executor: Optional[Executor] = None,
+            max_pending_renders: Optional[int] = None,
+    ):
+        self.loader_threads = loader_threads
+        self.writer_threads = writer_threads
+        self.max_bytes = max_bytes
+        self.executor = executor
+        if max_pending_renders is None:
+            max_pending_renders = 2 * (os.cpu_count() or 1)
+        self.max_pending_renders = max_pending_renders
+        self._stats = PipelineStats()
+        self._lock = threading.Lock()
+
+    def stats(self) -> PipelineStats:
+        """Stage times of the last :meth:`run`."""
+        with self._lock:
+            return dataclasses.replace(self._stats)
+
+    def run(self, jobs: Iterable[PipelineJob]) -> List[PipelineResult]:
+        """
+        Load, draw and write all images of ``jobs``. A failed image does not stop the others.
+
+        Returns
+        -------
+        list[PipelineResult]
+            in order of ``jobs`` and their outputs.
+        """
+        start = time.perf_counter()
+        tracer = get_tracer()
+        self._stats = PipelineStats()
+        queue = MemoryBoundedQueue(self.max_bytes)
+        results: Dict[Tuple[int, int], PipelineResult] = dict()
+        job_iter = iter(enumerate(jobs))
+        job_lock = threading.Lock()
+        running_loaders = [self.loader_threads]
+
+        def record(index: int, output_index: int, result: PipelineResult):
+            with self._lock:
+                results[(index, output_index)] = result
+
+        def load_jobs():
+            try:
+                while True:
+                    with job_lock:
+                        index, job = next(job_iter, (None, None))
+                    if job is None:
+                        return
+                    load_start = time.perf_counter()
+                    try:
+                        plot_module, plot_metadata, plot_data = job.load()
+                    except Exception as e:
+                        elapsed = time.perf_counter() - load_start
+                        for output_index, (area, path) in enumerate(job.outputs):
+                            record(index, output_index, PipelineResult(job, area, path, error=repr(e), elapsed=elapsed))
+                        continue
+                    load_seconds = time.perf_counter() - load_start
+                    with self._lock:
+                        self._stats.load_seconds += load_seconds
+                    nbytes = plot_data_nbytes(plot_data)
+                    loaded = _Loaded(
+                        index, job, plot_module, plot_metadata, plot_data, nbytes, load_seconds, len(job.outputs),
+                    )
+                    if not queue.put(loaded, nbytes):
+                        return
+            finally:
+                with job_lock:
+                    running_loaders[0] -= 1
+                    if running_loaders[0] == 0:
+                        queue.close()
+
+        writer = ThreadPoolExecutor(max_workers=self.writer_threads, thread_name_prefix="cedar-graph-writer")
+        loader = ThreadPoolExecutor(max_workers=self.loader_threads, thread_name_prefix="cedar-graph-loader")
+        # renders submitted to the executor whose results are not handled yet
+        pending_renders = [0]
+        render_condition = threading.Condition()
+
+        def write(image: RenderedImage, loaded: _Loaded, output_index: int, elapsed: float):
+            area, path = loaded.job.outputs[output_index]
+            write_start = time.perf_counter()
+            error = None
+            try:
+                write_png(image, path)
+            except Exception as e:
+                error = repr(e)
+            finally:
+                queue.release(image.nbytes)
+            write_seconds = time.perf_counter() - write_start
+            with self._lock:
+                self._stats.write_seconds += write_seconds
+            record(loaded.index, output_index, PipelineResult(
+                loaded.job, area, path, error=error, elapsed=elapsed + write_seconds,
+            ))
+
+        def rendered(
+                loaded: _Loaded,
+                output_index: int,
+                image: Optional[RenderedImage],
+                error: Optional[str],
+                render_seconds: float,
+        ):
+            area, path = loaded.job.outputs[output_index]
+            elapsed = loaded.load_seconds if output_index == 0 else 0.0
+            if image is not None:
+                render_seconds = image.render_seconds
+            with self._lock:
+                self._stats.render_seconds += render_seconds
+                loaded.remaining -= 1
+                last = loaded.remaining == 0
+            if last:
+                queue.release(loaded.nbytes)
+            if image is None:
+                # failed, or saved by the chrome cache
+                record(loaded.index, output_index, PipelineResult(
+                    loaded.job, area, path, error=error, elapsed=elapsed + render_seconds,
+                ))
+                return
+            queue.charge(image.nbytes)
+            writer.submit(write, image, loaded, output_index, elapsed + render_seconds)
+
+        def rendered_in_worker(future: Future, loaded: _Loaded, render_start: float):
+            try:
+                try:
+                    outputs = future.result()
+                    if tracer is not None:
+                        outputs, events = outputs
+                        tracer.merge(events)
+                except Exception as e:
+                    # e.g. a broken process pool: every output of the plot failed
+                    seconds = time.perf_counter() - render_start
+                    outputs = [(None, repr(e), seconds)] * len(loaded.job.outputs)
+                for output_index, (image, error, render_seconds) in enumerate(outputs):
+                    rendered(loaded, output_index, image, error, render_seconds)
+            finally:
+                with render_condition:
+                    pending_renders[0] -= 1
+                    render_condition.notify_all()
+
+        try:
+            for _ in range(self.loader_threads):
+                loader.submit(load_jobs)
+            while True:
+                loaded = queue.get()
+                if loaded is None:
+                    break
+                if self.executor is None:
+                    # each image goes to the writers as soon as it is drawn
+                    for output_index, output in enumerate(loaded.job.outputs):
+                        [(image, error, render_seconds)] = render_images(
+                            loaded.plot_module, loaded.plot_data, loaded.plot_metadata, [output],
+                            chrome_key=loaded.job.chrome_key, plot_type=loaded.job.plot_type,
+                        )
+                        rendered(loaded, output_index, image, error, render_seconds)
+                    continue
+
+                # one task per plot: the plot data is pickled once for all its areas
+                render_start = time.perf_counter()
+                with render_condition:
+                    while pending_renders[0] >= self.max_pending_renders:
+                        render_condition.wait()
+                    pending_renders[0] += 1
+                task = functools.partial(
+                    render_images, loaded.job.plot_type, _pack(loaded.plot_data), _pack(loaded.plot_metadata),
+                    loaded.job.outputs, chrome_key=loaded.job.chrome_key,
+                )
+                try:
+                    if tracer is None:
+                        future = self.executor.submit(task)
+                    else:
+                        # spans of the worker process come back with the images
+                        future = self.executor.submit(call_traced, task)
+                except Exception as e:
+                    # e.g. a broken process pool
+                    future = Future()
+                    future.set_exception(e)
+                future.add_done_callback(functools.partial(
+                    rendered_in_worker, loaded=loaded, render_start=render_start,
+                ))
+            with render_condition:
+                while pending_renders[0] > 0:
+                    render_condition.wait()
+        finally:
+            queue.close()
+            loader.shutdown(wait=True)
+            writer.shutdown(wait=True)
+
+        with self._lock:
+            self._stats.wall_seconds = time.perf_counter() - start
+            self._stats.peak_bytes = queue.peak_bytes
+            stats = dataclasses.replace(self._stats)
+        logger.info(
+            f"pipeline: {len(results)} images in {stats.wall_seconds:.1f}s, load {stats.load_seconds:.1f}s, "
+            f"render {stats.render_seconds:.1f}s, write {stats.write_seconds:.1f}s, peak {stats.peak_bytes} bytes"
+        )
+        return [results[key] for key in sorted(results)]
@@ -1,23 +1,20 @@
 from dataclasses import dataclass
-from copy import deepcopy
 from typing import Optional
 
 import pandas as pd
 import xarray as xr
 
-from cedarkit.plots.style import get_default_registry
 from cedarkit.plots.chart import Panel
 from cedarkit.plots.domains import CnAreaMapTemplate, EastAsiaMapTemplate
 from cedarkit.plots.types import AreaRange
 
-from cedarkit.comp.smooth import smth9
-from cedarkit.comp.util import apply_to_xarray_values
-
 from cedar_graph.metadata import BasePlotMetadata
 from cedar_graph.data import DataLoader
 from cedar_graph.data.field_info import div_info, u_info, v_info
 from cedar_graph.data.operator import prepare_data
+from cedar_graph.data.smooth import smooth_field
 from cedar_graph.logger import get_logger
+from cedar_graph.styles.registry import get_style_registry
 
 
 plot_logger = get_logger(__name__)
@@ -51,38 +48,20 @@ def load_data(
         wind_level: float,
 ) -> PlotData:
     # data loader -> data field
-    plot_logger.debug(f"loading wind {wind_level}hPa...")
+    u_level_info = u_info.with_level("pl", wind_level)
+    v_level_info = v_info.with_level("pl", wind_level)
+    div_level_info = div_info.with_level("pl", div_level)
 
-    u_level_info = deepcopy(u_info)
-    u_level_info.level_type = "pl"
-    u_level_info.level = wind_level
-    field_u = data_loader.load(
-        field_info=u_level_info,
-        start_time=start_time,
-        forecast_time=forecast_time,
-    )
-    v_level_info = deepcopy(v_info)
-    v_level_info.level_type = "pl"
-    v_level_info.level = wind_level
-    field_v = data_loader.load(
-        field_info=v_level_info,
-        start_time=start_time,
-        forecast_time=forecast_time,
-    )
-    plot_logger.debug(f"loading div {div_level}hPa...")
-    div_level_info = deepcopy(div_info)
-    div_level_info.level_type = "pl"
-    div_level_info.level = div_level
-    field_div = data_loader.load(
-        field_info=div_level_info,
+    plot_logger.debug(f"loading wind {wind_level}hPa and div {div_level}hPa...")
+    field_u, field_v, field_div = data_loader.load_many(
+        field_infos=[u_level_info, v_level_info, div_level_info],
         start_time=start_time,
         forecast_time=forecast_time,
     )
     # data field -> plot data
     plot_logger.debug("calculating...")
     field_div = field_div * 1.0e5
-    field_div = apply_to_xarray_values(field_div, lambda x: smth9(x, 0.5, -0.25, False))
-    field_div = apply_to_xarray_values(field_div, lambda x: smth9(x, 0.5, -0.25, False))
+    field_div = smooth_field(field_div, 0.5, -0.25, False, repeat=2)
 
     plot_logger.debug("loading done")
 
@@ -104,7 +83,7 @@ def plot(plot_data: PlotData, plot_metadata: PlotMetadata) -> Panel:
     div_level = plot_metadata.div_level
 
     # style
-    style_registry = get_default_registry()
+    style_registry = get_style_registry()
     div_style = style_registry.get_style("div", "cn_fill")
     div_line_style = style_registry.get_style("div", "cn_line")
     barb_style = style_registry.get_style("wind")
@@ -120,7 +99,10 @@ def plot(plot_data: PlotData, plot_metadata: PlotMetadata) -> Panel:
     # prepare data
     plot_logger.debug("preparing data...")
     total_area = domain.total_area()
-    plot_data = prepare_data(plot_data=plot_data, plot_metadata=plot_metadata, total_area=total_area)
+    plot_data = prepare_data(
+        plot_data=plot_data, plot_metadata=plot_metadata, total_area=total_area, domain=domain,
+        barb_fields=("field_u", "field_v"), barb_length=barb_style.length,
+    )
 
     plot_field_div = plot_data.field_div
     plot_field_u = plot_data.field_u
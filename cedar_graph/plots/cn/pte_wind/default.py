@@ -1,11 +1,9 @@
 from dataclasses import dataclass
-from copy import deepcopy
 
 import pandas as pd
 import xarray as xr
 
 from cedar_graph.data.operator import prepare_data
-from cedarkit.plots.style import get_default_registry
 from cedarkit.plots.chart import Panel
 from cedarkit.plots.domains import CnAreaMapTemplate, EastAsiaMapTemplate
 from cedarkit.plots.types import AreaRange
@@ -14,6 +12,7 @@ from cedar_graph.metadata import BasePlotMetadata
 from cedar_graph.data import DataLoader
 from cedar_graph.data.field_info import u_info, v_info, pte_info
 from cedar_graph.logger import get_logger
+from cedar_graph.styles.registry import get_style_registry
 
 
 plot_logger = get_logger(__name__)
@@ -49,39 +48,14 @@ def load_data(
     first_pte_level = pte_levels[0]
     second_pte_level = pte_levels[1]
 
-    plot_logger.debug(f"loading pte {first_pte_level}hPa...")
-    first_pte_info = deepcopy(pte_info)
-    first_pte_info.level_type = "pl"
-    first_pte_info.level = first_pte_level
-    field_first_pte = data_loader.load(
-        field_info=first_pte_info,
-        start_time=start_time,
-        forecast_time=forecast_time,
-    )
-    plot_logger.debug(f"loading pte {second_pte_level}hPa...")
-    second_pte_info = deepcopy(pte_info)
-    second_pte_info.level_type = "pl"
-    second_pte_info.level = second_pte_level
-    field_second_pte = data_loader.load(
-        field_info=second_pte_info,
-        start_time=start_time,
-        forecast_time=forecast_time,
-    )
-    plot_logger.debug(f"loading u {wind_level}hPa...")
-    u_level_info = deepcopy(u_info)
-    u_level_info.level_type = "pl"
-    u_level_info.level = wind_level
-    field_u = data_loader.load(
-        field_info=u_level_info,
-        start_time=start_time,
-        forecast_time=forecast_time,
-    )
-    plot_logger.debug(f"loading u {wind_level}hPa...")
-    v_level_info = deepcopy(v_info)
-    v_level_info.level_type = "pl"
-    v_level_info.level = wind_level
-    field_v = data_loader.load(
-        field_info=v_level_info,
+    first_pte_info = pte_info.with_level("pl", first_pte_level)
+    second_pte_info = pte_info.with_level("pl", second_pte_level)
+    u_level_info = u_info.with_level("pl", wind_level)
+    v_level_info = v_info.with_level("pl", wind_level)
+
+    plot_logger.debug(f"loading pte {first_pte_level}hPa, {second_pte_level}hPa and wind {wind_level}hPa...")
+    field_first_pte, field_second_pte, field_u, field_v = data_loader.load_many(
+        field_infos=[first_pte_info, second_pte_info, u_level_info, v_level_info],
         start_time=start_time,
         forecast_time=forecast_time,
     )
@@ -107,7 +81,7 @@ def plot(plot_data: PlotData, plot_metadata: PlotMetadata) -> Panel:
     pte_levels = plot_data.pte_levels
 
     # style
-    style_registry = get_default_registry()
+    style_registry = get_style_registry()
     pte_diff_style = style_registry.get_style("pte_diff", "cn_fill")
     pte_diff_line_style = style_registry.get_style("pte_diff", "cn_line")
     barb_style = style_registry.get_style("wind")
@@ -123,7 +97,10 @@ def plot(plot_data: PlotData, plot_metadata: PlotMetadata) -> Panel:
     # prepare data
     plot_logger.debug("preparing data...")
     total_area = domain.total_area()
-    plot_data : PlotData = prepare_data(plot_data=plot_data, plot_metadata=plot_metadata, total_area=total_area)
+    plot_data : PlotData = prepare_data(
+        plot_data=plot_data, plot_metadata=plot_metadata, total_area=total_area, domain=domain,
+        barb_fields=("field_u", "field_v"), barb_length=barb_style.length,
+    )
 
     plot_field_pte = plot_data.field_pte
     plot_field_u = plot_data.field_u
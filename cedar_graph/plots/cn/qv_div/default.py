@@ -1,23 +1,20 @@
 from dataclasses import dataclass
 from typing import Optional
-from copy import deepcopy
 
 import pandas as pd
 import xarray as xr
 
-from cedarkit.plots.style import get_default_registry
 from cedarkit.plots.chart import Panel
 from cedarkit.plots.domains import CnAreaMapTemplate, EastAsiaMapTemplate
 from cedarkit.plots.types import AreaRange
 
-from cedarkit.comp.smooth import smth9
-from cedarkit.comp.util import apply_to_xarray_values
-
 from cedar_graph.metadata import BasePlotMetadata
 from cedar_graph.data import DataLoader
 from cedar_graph.data.field_info import qv_div_info
 from cedar_graph.data.operator import prepare_data
+from cedar_graph.data.smooth import smooth_field
 from cedar_graph.logger import get_logger
+from cedar_graph.styles.registry import get_style_registry
 
 
 plot_logger = get_logger(__name__)
@@ -46,9 +43,7 @@ def load_data(
         level: float,
 ) -> PlotData:
     plot_logger.debug(f"loading qv_div {level}hPa...")
-    qv_div_level_info = deepcopy(qv_div_info)
-    qv_div_level_info.level_type = "pl"
-    qv_div_level_info.level = level
+    qv_div_level_info = qv_div_info.with_level("pl", level)
     field_qv_div = data_loader.load(
         field_info=qv_div_level_info,
         start_time=start_time,
@@ -56,8 +51,7 @@ def load_data(
     )
     plot_logger.debug("calculating...")
     field_qv_div = field_qv_div * 10000000.0
-    field_qv_div = apply_to_xarray_values(field_qv_div, lambda x: smth9(x, 0.5, -0.25, False))
-    field_qv_div = apply_to_xarray_values(field_qv_div, lambda x: smth9(x, 0.5, -0.25, False))
+    field_qv_div = smooth_field(field_qv_div, 0.5, -0.25, False, repeat=2)
 
     plot_logger.debug("loading done")
 
@@ -76,7 +70,7 @@ def plot(plot_data: PlotData, plot_metadata: PlotMetadata) -> Panel:
     level = plot_metadata.level
 
     # style
-    style_registry = get_default_registry()
+    style_registry = get_style_registry()
     qv_div_style = style_registry.get_style("qdiv", "cn_fill")
     qv_div_line_style = style_registry.get_style("qdiv", "cn_line")
 
@@ -90,7 +84,9 @@ def plot(plot_data: PlotData, plot_metadata: PlotMetadata) -> Panel:
 
     # prepare data
     total_area = domain.total_area()
-    plot_data : PlotData = prepare_data(plot_data=plot_data, plot_metadata=plot_metadata, total_area=total_area)
+    plot_data : PlotData = prepare_data(
+        plot_data=plot_data, plot_metadata=plot_metadata, total_area=total_area, domain=domain,
+    )
 
     plot_field_qv_div = plot_data.field_qv_div
 
@@ -1,26 +1,23 @@
 from dataclasses import dataclass
 from typing import Literal, Optional
-from copy import deepcopy
 
 import numpy as np
 import pandas as pd
 import xarray as xr
 import matplotlib.colors as mcolors
 
-from cedarkit.plots.style import get_default_registry
 from cedarkit.plots.chart import Panel
 from cedarkit.plots.domains import CnAreaMapTemplate, EastAsiaMapTemplate
 from cedarkit.plots.calculate import calculate_levels_automatic
 from cedarkit.plots.types import AreaRange
 
-from cedarkit.comp.smooth import smth9
-from cedarkit.comp.util import apply_to_xarray_values
-
 from cedar_graph.metadata import BasePlotMetadata
 from cedar_graph.data import DataLoader
 from cedar_graph.data.field_info import vwsh_info
 from cedar_graph.data.operator import prepare_data
+from cedar_graph.data.smooth import smooth_field
 from cedar_graph.logger import get_logger
+from cedar_graph.styles.registry import get_style_registry
 
 
 plot_logger = get_logger(__name__)
@@ -52,21 +49,20 @@ def load_data(
         second_level: float = 0,
 ) -> PlotData:
     plot_logger.debug(f"loading vwsh {first_level}-{second_level}m...")
-    level_vwsh_info = deepcopy(vwsh_info)
-    level_vwsh_info.level_type = "heightAboveGroundLayer"
-    level_vwsh_info.level = {
-        "first_level": first_level,
-        "second_level": second_level,
-    }
+    level_vwsh_info = vwsh_info.with_level(
+        "heightAboveGroundLayer",
+        {
+            "first_level": first_level,
+            "second_level": second_level,
+        },
+    )
     vwsh_field = data_loader.load(
         field_info=level_vwsh_info,
         start_time=start_time,
         forecast_time=forecast_time,
     )
     plot_logger.debug("calculating...")
-    vwsh_field = apply_to_xarray_values(vwsh_field, lambda x: smth9(x, 0.5, -0.25, False))
-    vwsh_field = apply_to_xarray_values(vwsh_field, lambda x: smth9(x, 0.5, -0.25, False))
-    vwsh_field = apply_to_xarray_values(vwsh_field, lambda x: smth9(x, 0.5, -0.25, False))
+    vwsh_field = smooth_field(vwsh_field, 0.5, -0.25, False, repeat=3)
 
     plot_logger.debug("loading done")
 
@@ -89,7 +85,7 @@ def plot(plot_data: PlotData, plot_metadata: PlotMetadata) -> Panel:
     second_level = plot_metadata.second_level
 
     # style: levels 由数据范围按 NCL nice-values 算法运行时计算，色标取自样式库
-    style_registry = get_default_registry()
+    style_registry = get_style_registry()
     vwsh_style = style_registry.get_style("shr", "cn_fill")
     vwsh_line_style = style_registry.get_style("shr", "cn_line")
 
@@ -120,7 +116,9 @@ def plot(plot_data: PlotData, plot_metadata: PlotMetadata) -> Panel:
     # prepare data
     plot_logger.debug("preparing data...")
     total_area = domain.total_area()
-    plot_data : PlotData = prepare_data(plot_data=plot_data, plot_metadata=plot_metadata, total_area=total_area)
+    plot_data : PlotData = prepare_data(
+        plot_data=plot_data, plot_metadata=plot_metadata, total_area=total_area, domain=domain,
+    )
 
     plot_field_vwsh = plot_data.field_vwsh
 
@@ -1,22 +1,19 @@
 from dataclasses import dataclass
-from copy import deepcopy
 
 import pandas as pd
 import xarray as xr
 
-from cedarkit.plots.style import get_default_registry
 from cedarkit.plots.chart import Panel
 from cedarkit.plots.domains import CnAreaMapTemplate, EastAsiaMapTemplate
 from cedarkit.plots.types import AreaRange
 
-from cedarkit.comp.smooth import smth9
-from cedarkit.comp.util import apply_to_xarray_values
-
 from cedar_graph.metadata import BasePlotMetadata
 from cedar_graph.data import DataLoader
 from cedar_graph.data.field_info import t_info, dew_t_info
 from cedar_graph.data.operator import prepare_data
+from cedar_graph.data.smooth import smooth_field
 from cedar_graph.logger import get_logger
+from cedar_graph.styles.registry import get_style_registry
 
 
 plot_logger = get_logger(__name__)
@@ -45,32 +42,21 @@ def load_data(
         forecast_time: pd.Timedelta,
         level: float,
 ) -> PlotData:
-    plot_logger.debug(f"loading t {level}hPa...")
-    t_level_info = deepcopy(t_info)
-    t_level_info.level_type = "pl"
-    t_level_info.level = level
-    field_t = data_loader.load(
-        field_info=t_level_info,
-        start_time=start_time,
-        forecast_time=forecast_time,
-    )
-    plot_logger.debug(f"loading dpt {level}hPa...")
-    dew_t_level_info = deepcopy(dew_t_info)
-    dew_t_level_info.level_type = "pl"
-    dew_t_level_info.level = level
-    field_dew_t = data_loader.load(
-        field_info=dew_t_level_info,
+    t_level_info = t_info.with_level("pl", level)
+    dew_t_level_info = dew_t_info.with_level("pl", level)
+
+    plot_logger.debug(f"loading t and dpt {level}hPa...")
+    field_t, field_dew_t = data_loader.load_many(
+        field_infos=[t_level_info, dew_t_level_info],
         start_time=start_time,
         forecast_time=forecast_time,
     )
     plot_logger.debug("calculating...")
     field_t_dew_t_diff = field_t - field_dew_t
-    field_t_dew_t_diff = apply_to_xarray_values(field_t_dew_t_diff, lambda x: smth9(x, 0.5, 0.25, True))
-    field_t_dew_t_diff = apply_to_xarray_values(field_t_dew_t_diff, lambda x: smth9(x, 0.5, 0.25, True))
+    field_t_dew_t_diff = smooth_field(field_t_dew_t_diff, 0.5, 0.25, True, repeat=2)
 
     field_t = field_t - 273.15
-    field_t = apply_to_xarray_values(field_t, lambda x: smth9(x, 0.5, 0.25, True))
-    field_t = apply_to_xarray_values(field_t, lambda x: smth9(x, 0.5, 0.25, True))
+    field_t = smooth_field(field_t, 0.5, 0.25, True, repeat=2)
 
     plot_logger.debug("loading done")
 
@@ -90,7 +76,7 @@ def plot(plot_data: PlotData, plot_metadata: PlotMetadata):
     level = plot_metadata.level
 
     # style
-    style_registry = get_default_registry()
+    style_registry = get_style_registry()
     t_dew_t_diff_style = style_registry.get_style("t_dew_t", "cn_fill")
     t_dew_t_diff_line_style = style_registry.get_style("t_dew_t", "cn_line")
     t_line_style = style_registry.get_style("t_dew_t", "cn_t")
@@ -106,7 +92,9 @@ def plot(plot_data: PlotData, plot_metadata: PlotMetadata):
     # prepare data
     plot_logger.debug("preparing data...")
     total_area = domain.total_area()
-    plot_data : PlotData = prepare_data(plot_data=plot_data, plot_metadata=plot_metadata, total_area=total_area)
+    plot_data : PlotData = prepare_data(
+        plot_data=plot_data, plot_metadata=plot_metadata, total_area=total_area, domain=domain,
+    )
 
     plot_field_t_dew_t_diff = plot_data.field_t_dew_t_diff
     plot_field_t = plot_data.field_t
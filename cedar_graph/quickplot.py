@@ -1,9 +1,15 @@
 import inspect
-from typing import Any, Callable, Optional
+from typing import Any, Callable, Optional, Tuple
 
 import pandas as pd
 
-from cedar_graph.data import LocalDataSource, DataSource, DataLoader
+from cedarkit.plots.domains.layout import LayoutConfig
+from cedarkit.plots.types import AreaRange
+
+from cedar_graph.data import LocalDataSource, DataSource, DataLoader, FieldCache, AccumulationCache
+from cedar_graph.data.operator import AUTO_SAMPLE_STEP, auto_sample_step, expand_area
+from cedar_graph.data.smooth import smoothing_halo
+from cedar_graph.tracing import plot_span
 from cedarkit.plots.engine.loader import (
     Metadata,
     convert_metadata,
@@ -16,6 +22,9 @@ from cedarkit.plots.engine.loader import (
 __all__ = [
     "quick_plot",
     "show_plot",
+    "create_panel",
+    "load_plot",
+    "resolve_plot",
     "load",
     "create_data_source",
     "Metadata",
@@ -31,6 +40,11 @@ BASE_MODULE_NAME = "cedar_graph.plots"
 #: recipe package searched before plot modules, e.g. "cn.t2m".
 BASE_RECIPE_NAME = "cedar_graph.recipes"
 
+#: grid steps kept around the area when ``area_pushdown`` is set:
+#: ``smoothing_halo(3)``, enough for the most smth9 passes applied by a
+#: cedar-graph plot module. Recipes raise it for their own transforms.
+DEFAULT_AREA_PADDING = smoothing_halo(3)
+
 
 def quick_plot(
         plot_type: str,
@@ -87,15 +101,123 @@ def quick_plot(
     )
 
 
-def show_plot(plot_type: str, plot_settings: dict, data_source_config: dict):
-    from cedar_graph.recipes.engine import get_recipe_engine
+def show_plot(
+        plot_type: str,
+        plot_settings: dict,
+        data_source_config: dict,
+        field_cache: Optional[FieldCache] = None,
+        area_pushdown: bool = False,
+        area_padding: int = DEFAULT_AREA_PADDING,
+        accumulation_cache: Optional[AccumulationCache] = None,
+):
+    """
+    Load data and draw the plot, then display it.
 
-    plot_module = get_plot_definition(
+    Parameters
+    ----------
+    plot_type
+    plot_settings
+        settings used to create metadata, such as ``system_name``, ``start_time``, ``area_range``.
+    data_source_config
+        keyword arguments of ``LocalDataSource``.
+    field_cache
+        in-process field cache shared across plots.
+    area_pushdown
+        for area plots (``area_range`` set), load only the fields inside the area
+        instead of the full domain, so smoothing in ``load_data`` runs on the window only.
+        The area is expanded by ``sample_step`` and padded by ``area_padding`` grid steps,
+        so values inside the plotted area are the same as with full-domain fields.
+    area_padding
+        halo in grid steps, see ``cedar_graph.data.smooth.smoothing_halo``.
+    accumulation_cache
+        accumulated fields shared across lead times, so ``time_diff`` plots of a
+        forecast series read each accumulation once (``cedar_graph.data.accumulation``).
+    """
+    panel = create_panel(
         plot_type=plot_type,
-        base_module_name=BASE_MODULE_NAME,
-        recipe_base_module=BASE_RECIPE_NAME,
-        engine=get_recipe_engine(),
+        plot_settings=plot_settings,
+        data_source_config=data_source_config,
+        field_cache=field_cache,
+        area_pushdown=area_pushdown,
+        area_padding=area_padding,
+        accumulation_cache=accumulation_cache,
     )
+
+    # plot -> output
+    panel.show()
+
+
+def create_panel(
+        plot_type: str,
+        plot_settings: dict,
+        data_source_config: dict,
+        field_cache: Optional[FieldCache] = None,
+        area_pushdown: bool = False,
+        area_padding: int = DEFAULT_AREA_PADDING,
+        accumulation_cache: Optional[AccumulationCache] = None,
+        data_source: Optional[DataSource] = None,
+):
+    """
+    Load data and draw the plot, see :func:`show_plot`.
+
+    Parameters
+    ----------
+    plot_type
+    plot_settings
+    data_source_config
+    field_cache
+    area_pushdown
+    area_padding
+    accumulation_cache
+    data_source
+        data source used instead of a ``LocalDataSource`` created from ``data_source_config``.
+
+    Returns
+    -------
+    Panel
+        the drawn panel, to be shown or saved.
+    """
+    span_args = {key: plot_settings[key] for key in ("system_name", "start_time", "forecast_time") if key in plot_settings}
+    with plot_span(plot_type, **span_args):
+        plot_module, plot_metadata, plot_data = load_plot(
+            plot_type=plot_type,
+            plot_settings=plot_settings,
+            data_source_config=data_source_config,
+            field_cache=field_cache,
+            area_pushdown=area_pushdown,
+            area_padding=area_padding,
+            accumulation_cache=accumulation_cache,
+            data_source=data_source,
+        )
+
+        # field -> plot
+        panel = plot_module.plot(
+            plot_data=plot_data,
+            plot_metadata=plot_metadata,
+        )
+    return panel
+
+
+def load_plot(
+        plot_type: str,
+        plot_settings: dict,
+        data_source_config: dict,
+        field_cache: Optional[FieldCache] = None,
+        area_pushdown: bool = False,
+        area_padding: int = DEFAULT_AREA_PADDING,
+        accumulation_cache: Optional[AccumulationCache] = None,
+        data_source: Optional[DataSource] = None,
+) -> Tuple[Any, Any, Any]:
+    """
+    Load the data of a plot without drawing it, see :func:`create_panel`.
+
+    Returns
+    -------
+    tuple
+        plot module (``plot(plot_data, plot_metadata)``), ``PlotMetadata`` object and plot data,
+        e.g. for ``cedar_graph.render.render_areas``.
+    """
+    plot_module = resolve_plot(plot_type)
     metadata_class = Metadata
     metadata = create_metadata(
         metadata_class=metadata_class,
@@ -103,33 +225,85 @@ def show_plot(plot_type: str, plot_settings: dict, data_source_config: dict):
         processor_map=item_processor_map
     )
 
-    data_source = create_data_source(
-        system_name=metadata.system_name,
-        data_source_config=data_source_config,
-    )
+    if data_source is None:
+        data_source = create_data_source(
+            system_name=metadata.system_name,
+            data_source_config=data_source_config,
+        )
+
+    area = None
+    if area_pushdown and getattr(metadata, "area_range", None) is not None:
+        sample_step = getattr(metadata, "sample_step", getattr(plot_module.PlotMetadata, "sample_step", 0))
+        if sample_step == AUTO_SAMPLE_STEP:
+            # barbs have the largest step, area plots use the CnArea layout
+            sample_step = auto_sample_step(metadata.area_range, kind="barb", layout=LayoutConfig.cn_area())
+        area = expand_area(metadata.area_range, sample_step)
 
     # data source -> data field
     plot_data = load(
         metadata=metadata,
         load_data_func=plot_module.load_data,
         data_source=data_source,
+        field_cache=field_cache,
+        area=area,
+        area_padding=area_padding,
+        accumulation_cache=accumulation_cache,
     )
 
-    # field -> plot
-    plot_func = plot_module.plot
-    plot_metadata = plot_module.PlotMetadata
+    plot_metadata = plot_module.PlotMetadata()
     convert_metadata(from_metadata=metadata, to_metadata=plot_metadata)
-    panel = plot_func(
-        plot_data=plot_data,
-        plot_metadata=plot_metadata,
+    return plot_module, plot_metadata, plot_data
+
+
+def resolve_plot(plot_type: str):
+    """
+    Plot definition of a plot type: a recipe plot module if a recipe exists, else a Python plot module.
+
+    Returns
+    -------
+    RecipePlotModule or module
+        with ``load_data``, ``plot`` and ``PlotMetadata``.
+    """
+    from cedar_graph.recipes.engine import get_recipe_engine
+
+    return get_plot_definition(
+        plot_type=plot_type,
+        base_module_name=BASE_MODULE_NAME,
+        recipe_base_module=BASE_RECIPE_NAME,
+        engine=get_recipe_engine(),
     )
 
-    # plot -> output
-    panel.show()
+
+def load_params(plot_module) -> Optional[set]:
+    """
+    Names of the plot settings used to load data of a plot definition (recipe params or
+    ``load_data`` arguments), None if unknown.
+    """
+    recipe = getattr(plot_module, "recipe", None)
+    if recipe is not None:
+        return set(recipe.params)
+    parameters = inspect.signature(plot_module.load_data).parameters
+    if any(parameter.kind == inspect.Parameter.VAR_KEYWORD for parameter in parameters.values()):
+        return None
+    return set(parameters) - {"data_loader", "start_time", "forecast_time"}
 
 
-def load(metadata, load_data_func: Callable, data_source: DataSource):
-    data_loader = DataLoader(data_source=data_source)
+def load(
+        metadata,
+        load_data_func: Callable,
+        data_source: DataSource,
+        field_cache: Optional[FieldCache] = None,
+        area: Optional[AreaRange] = None,
+        area_padding: int = 1,
+        accumulation_cache: Optional[AccumulationCache] = None,
+):
+    data_loader = DataLoader(
+        data_source=data_source,
+        cache=field_cache,
+        area=area,
+        area_padding=area_padding,
+        accumulation_cache=accumulation_cache,
+    )
 
     load_data_params = inspect.signature(load_data_func).parameters
     load_data_kwargs = {
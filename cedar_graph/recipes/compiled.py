@@ -0,0 +1,232 @@
+"""Cache of compiled recipes: parsed, checked and adapted to plot modules once per process.
+
+``get_plot_definition`` calls ``engine.load_recipe(path)`` and
+``engine.build_module(recipe)`` for every plot: the YAML file is parsed,
+validated, cross-checked against the op/field/style registries, and a
+new plot module with its generated dataclasses is built each time. A
+:class:`CompiledRecipeCache` keeps the checked ``Recipe`` and its module
+per recipe file, keyed by resolved path and modification time, so an
+edited recipe is picked up on the next call.
+
+With ``cache_dir`` set, checked recipes are also pickled to disk, so a
+new process (batch worker, daemon restart) skips YAML parsing and
+checking. Disk entries are keyed by path, modification time, the recipe
+schema version and a fingerprint of the engine registries.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from cedarkit.plots.engine.recipe import Recipe
+
+from cedar_graph.recipes import RECIPE_PATHS
+
+if TYPE_CHECKING:
+    from cedar_graph.recipes.engine import RecipePlotEngine, RecipePlotModule
+
+
+#: on-disk entry format version, part of the entry key.
+COMPILED_RECIPE_VERSION = 1
+
+#: (resolved path, modification time in ns)
+RecipeKey = Tuple[str, int]
+
+
+def recipe_key(path: Union[str, Path]) -> RecipeKey:
+    """
+    Cache key of a recipe file.
+
+    Parameters
+    ----------
+    path
+
+    Returns
+    -------
+    tuple[str, int]
+        resolved path and modification time (ns).
+    """
+    path = Path(path).resolve()
+    return str(path), path.stat().st_mtime_ns
+
+
+class CompiledRecipeCache:
+    """
+    Checked recipes and their plot modules, per recipe file.
+
+    Attributes
+    ----------
+    cache_dir : Path or None
+        directory of pickled recipes. Only the in-process cache is used if None.
+    """
+    def __init__(self, cache_dir: Optional[Union[str, Path]] = None):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self._recipes: Dict[str, Tuple[int, Recipe]] = dict()
+        self._modules: Dict[int, Tuple[Recipe, "RecipePlotModule"]] = dict()
+        self._lock = threading.Lock()
+
+    def get_recipe(
+            self,
+            path: Union[str, Path],
+            load: Callable[[Path], Recipe],
+            fingerprint: Optional[Callable[[], str]] = None,
+    ) -> Recipe:
+        """
+        Return the checked recipe of ``path``, loading it with ``load`` if the file is new or changed.
+
+        Parameters
+        ----------
+        path
+        load
+            ``load(path) -> Recipe``, parses and checks the recipe file.
+        fingerprint
+            ``fingerprint() -> str``, identity of the registries the recipe is checked against,
+            part of the disk entry key. Called only when the recipe is not cached in process.
+
+        Returns
+        -------
+        Recipe
+            the same object for the same file and modification time.
+        """
+        path_str, mtime_ns = recipe_key(path)
+        with self._lock:
+            entry = self._recipes.get(path_str)
+        if entry is not None and entry[0] == mtime_ns:
+            return entry[1]
+
+        fingerprint = fingerprint() if fingerprint is not None else ""
+        recipe = self._read_disk(path_str, mtime_ns, fingerprint)
+        if recipe is None:
+            recipe = load(Path(path_str))
+            self._write_disk(path_str, mtime_ns, fingerprint, recipe)
+        with self._lock:
+            if entry is not None:
+                self._modules.pop(id(entry[1]), None)
+            self._recipes[path_str] = (mtime_ns, recipe)
+        return recipe
+
+    def get_module(self, recipe: Recipe, build: Callable[[Recipe], "RecipePlotModule"]) -> "RecipePlotModule":
+        """
+        Return the plot module of a recipe returned by :meth:`get_recipe`, building it once.
+
+        Recipes not from this cache are built with ``build`` every time.
+
+        Parameters
+        ----------
+        recipe
+        build
+            ``build(recipe) -> RecipePlotModule``.
+
+        Returns
+        -------
+        RecipePlotModule
+        """
+        with self._lock:
+            cached = any(entry[1] is recipe for entry in self._recipes.values())
+            entry = self._modules.get(id(recipe))
+            if entry is not None and entry[0] is recipe:
+                return entry[1]
+        module = build(recipe)
+        if cached:
+            with self._lock:
+                self._modules[id(recipe)] = (recipe, module)
+        return module
+
+    def clear(self):
+        """Drop in-process entries. Disk entries are kept."""
+        with self._lock:
+            self._recipes.clear()
+            self._modules.clear()
+
+    def __len__(self) -> int:
+        return len(self._recipes)
+
+    def _disk_path(self, path_str: str, mtime_ns: int, fingerprint: str) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        content = json.dumps([COMPILED_RECIPE_VERSION, path_str, mtime_ns, fingerprint])
+        key = hashlib.sha1(content.encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{Path(path_str).stem}.{key}.pickle"
+
+    def _read_disk(self, path_str: str, mtime_ns: int, fingerprint: str) -> Optional[Recipe]:
+        disk_path = self._disk_path(path_str, mtime_ns, fingerprint)
+        if disk_path is None:
+            return None
+        try:
+            with open(disk_path, "rb") as f:
+                recipe = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+        return recipe if isinstance(recipe, Recipe) else None
+
+    def _write_disk(self, path_str: str, mtime_ns: int, fingerprint: str, recipe: Recipe):
+        disk_path = self._disk_path(path_str, mtime_ns, fingerprint)
+        if disk_path is None:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".", suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(recipe, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, disk_path)
+        except OSError:
+            # disk form is an optimization only, a read-only cache dir must not break loading.
+            pass
+
+
+def iter_recipe_files(paths: Optional[Iterable[Union[str, Path]]] = None) -> List[Path]:
+    """
+    Recipe files (``*.yaml``, ``*.yml``) under recipe directories.
+
+    Parameters
+    ----------
+    paths
+        recipe directories, ``RECIPE_PATHS`` if None.
+
+    Returns
+    -------
+    list[Path]
+    """
+    if paths is None:
+        paths = RECIPE_PATHS
+    files = []
+    for path in paths:
+        path = Path(path)
+        files.extend(sorted([*path.glob("**/*.yaml"), *path.glob("**/*.yml")]))
+    return files
+
+
+def precompile_all(
+        engine: Optional["RecipePlotEngine"] = None,
+        paths: Optional[Iterable[Union[str, Path]]] = None,
+) -> List[Path]:
+    """
+    Warm the compiled recipe cache of ``engine`` with every recipe in ``paths``.
+
+    Call it once when a batch process or worker starts, so the first plots do not pay
+    for parsing and checking recipes. With an on-disk cache, later processes start warm.
+
+    Parameters
+    ----------
+    engine
+        recipe engine, ``get_recipe_engine()`` if None.
+    paths
+        recipe directories, ``RECIPE_PATHS`` if None.
+
+    Returns
+    -------
+    list[Path]
+        compiled recipe files.
+    """
+    if engine is None:
+        from cedar_graph.recipes.engine import get_recipe_engine
+        engine = get_recipe_engine()
+    files = iter_recipe_files(paths)
+    for recipe_file in files:
+        engine.build_module(engine.load_recipe(recipe_file))
+    return files
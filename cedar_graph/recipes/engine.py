@@ -5,20 +5,55 @@ Wires the business pieces into the business-agnostic engine:
 * ``FIELD_INFOS`` — recipe ``data.*.field`` names (aligned with cemc
   element names) mapped to ``FieldInfo`` objects;
 * diagnostic compute ops registered on top of the engine built-ins
-  (``wind_speed``; ``prep_classify`` for the rain/snow split);
+  (``wind_speed``; ``prep_classify`` for the rain/snow split), and
+  ``smth9`` replaced by a fused version running all ``repeat`` passes
+  in one call;
 * the process-wide default style registry (cedar-graph styles are
-  injected via the ``cedarkit.plots.styles`` entry point).
+  injected via the ``cedarkit.plots.styles`` entry point);
+* :class:`RecipePlotEngine`, building recipe modules that load all raw
+  fields of a recipe in one batch (``DataLoader.load_many``) and run its
+  data entries as a dependency graph on a thread pool;
+* ``render`` on recipe layers (:class:`RenderLayerSpec`), drawing a fill
+  layer as a classified raster (:mod:`cedar_graph.styles.raster`).
 """
 
-from typing import Optional
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import fields, replace
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Optional, Tuple, Union
 
 import numpy as np
+import pandas as pd
 import xarray as xr
+import yaml
 
-from cedarkit.plots.engine import OpRegistry, PlotEngine
-from cedarkit.plots.style import get_default_registry
+from cedarkit.plots.engine import OpRegistry, PlotEngine, PlotModuleAdapter
+# private names of cedarkit-plots, see the version range in pyproject.toml and tests/mock/recipes/test_cedarkit_hooks.py
+from cedarkit.plots.engine.engine import _LEVEL_TYPE_ALIASES, OpContext, resolve_templates
+from cedarkit.plots.engine.recipe import LayerSpec, Recipe, RecipeError
+from cedarkit.plots.engine.recipe import load_recipe_file as _load_recipe_file
+from cedarkit.plots.style.schema import LEVEL_TYPE_CODE_TO_NAME
+from cedarkit.plots.types import AreaRange
+
+from cedar_graph.data.cache import FieldCache, field_cache_key
+from cedar_graph.data.loader import DataLoader, PrefetchedDataLoader
+from cedar_graph.data.operator import AUTO_SAMPLE_STEP, resolve_sample_step, select_plot_grid
+from cedar_graph.data.smooth import smooth_field, smoothing_halo
+from cedar_graph.recipes.compiled import CompiledRecipeCache
+from cedar_graph.recipes.memo import Step, apply_chain, canonical, chain_key
+from cedar_graph.recipes.scheduler import RecipeGraph
+from cedar_graph.styles.raster import Render, with_render
+from cedar_graph.styles.registry import get_style_registry
+from cedar_graph.tracing import span, traced
 
 from cedar_graph.data.field_info import (
+    FieldInfo,
     apcp_info,
     asnow_info,
     bli_info,
@@ -84,24 +119,635 @@ def _prep_classify(rain_total: xr.DataArray, snow_total: xr.DataArray, context):
     return field_rain, field_rain_snow, field_snow
 
 
-def create_op_registry() -> OpRegistry:
-    """Engine built-ins plus CEMC diagnostic ops."""
-    registry = OpRegistry.builtins()
+def _smth9(
+        field: xr.DataArray,
+        p: float,
+        q: float,
+        wrap: bool,
+        context,
+        repeat: int = 1,
+        dtype: Optional[str] = None,
+) -> xr.DataArray:
+    """NCL smth9 smoothing, all ``repeat`` passes fused (``cedar_graph.data.smooth``)."""
+    return smooth_field(field, p, q, wrap, repeat=repeat, dtype=dtype)
+
+
+class RecipeOpRegistry(OpRegistry):
+    """
+    ``OpRegistry`` whose transforms can handle ``repeat`` themselves.
+
+    A transform registered with ``fused_repeat=True`` is called once with
+    ``repeat=n`` instead of ``n`` times in a row.
+
+    Each op application is a ``transform:<op>`` or ``compute:<op>`` span of
+    ``cedar_graph.tracing``.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._fused_repeat = set()
+        self._context_keys = dict()
+
+    def register(
+            self,
+            name: str,
+            func,
+            kind: str = "transform",
+            fused_repeat: bool = False,
+            context_key=None,
+    ) -> None:
+        """
+        Register an op.
+
+        Parameters
+        ----------
+        name
+        func
+        kind
+            ``"transform"`` or ``"compute"``.
+        fused_repeat
+            transform handles ``repeat`` itself, see class docstring.
+        context_key
+            ``context_key(context) -> Hashable`` for ops whose result depends on the
+            ``OpContext`` besides forecast time (e.g. ``style_units`` on the layer style).
+            Part of the memo key of the op's results, see ``cedar_graph.recipes.memo``.
+        """
+        super().register(name, func, kind=kind)
+        if fused_repeat:
+            self._fused_repeat.add(name)
+        else:
+            self._fused_repeat.discard(name)
+        if context_key is not None:
+            self._context_keys[name] = context_key
+        else:
+            self._context_keys.pop(name, None)
+
+    def step_key(self, name: str, args, kwargs, context) -> Step:
+        """Memo key of one application of op ``name`` with resolved ``args`` and ``kwargs``."""
+        context_key = self._context_keys.get(name)
+        return (
+            name,
+            canonical(args),
+            canonical(kwargs),
+            context_key(context) if context_key is not None else None,
+        )
+
+    def apply_compute(self, name, fields, args, kwargs, context):
+        with span(f"compute:{name}", "recipe"):
+            return super().apply_compute(name, fields, args, kwargs, context)
+
+    def apply_transform(self, name, field, args, kwargs, repeat, context):
+        with span(f"transform:{name}", "recipe", repeat=repeat):
+            if name not in self._fused_repeat:
+                return super().apply_transform(name, field, args, kwargs, repeat, context)
+            kind = self.kind(name)
+            if kind != "transform":
+                raise RecipeError(
+                    "<recipe>",
+                    f"op {name!r} is a {kind} op and cannot be used in transforms",
+                )
+            return self.get(name)(field, *args, context=context, repeat=repeat, **kwargs)
+
+
+def _style_units_key(context):
+    """
+    Units conversion applied by ``style_units``, a function of the built-in conversion table.
+
+    Layers with different styles declaring the same units share the memoized result.
+    """
+    return context.style_transform()
+
+
+def create_op_registry() -> RecipeOpRegistry:
+    """Engine built-ins plus CEMC diagnostic ops, with fused smth9."""
+    registry = RecipeOpRegistry.builtins()
+    registry.register("style_units", registry.get("style_units"), context_key=_style_units_key)
+    registry.register("smth9", _smth9, fused_repeat=True)
     registry.register("wind_speed", _wind_speed, kind="compute")
     registry.register("prep_classify", _prep_classify, kind="compute")
     return registry
 
 
-_engine: Optional[PlotEngine] = None
+class RenderLayerSpec(LayerSpec):
+    """Recipe layer with ``render``: "contour" or "raster", the style's ``render`` if unset."""
+    render: Optional[Render] = None
+
+
+class RenderRecipe(Recipe):
+    """Recipe whose layers accept ``render``."""
+    layers: List[RenderLayerSpec]
+
+
+def load_recipe_file(path: Union[str, Path]) -> Recipe:
+    """
+    Load and validate a recipe YAML file with ``cedarkit.plots.engine.recipe.load_recipe_file``,
+    or as a :class:`RenderRecipe` if one of its layers sets ``render``.
+
+    Raises
+    ------
+    RecipeError
+    """
+    raw = _read_layer_render_recipe(path)
+    if raw is None:
+        # also reports unreadable files and YAML errors
+        return _load_recipe_file(path)
+    if raw.get("api_version") is not None:
+        raise RecipeError(path, "layer render is only supported in v1 recipes")
+    try:
+        return RenderRecipe.model_validate(raw)
+    except ValueError as e:
+        raise RecipeError(path, f"recipe validation failed: {e}") from e
+
+
+def uses_layer_render(path: Union[str, Path]) -> bool:
+    """Whether a layer of the recipe file sets ``render``."""
+    return _read_layer_render_recipe(path) is not None
+
+
+def _read_layer_render_recipe(path: Union[str, Path]) -> Optional[Dict[str, Any]]:
+    try:
+        raw = yaml.safe_load(Path(path).read_text(encoding="utf-8"))
+    except (OSError, yaml.YAMLError):
+        return None
+    if not isinstance(raw, dict) or not isinstance(raw.get("layers"), list):
+        return None
+    if not any(isinstance(layer, dict) and "render" in layer for layer in raw["layers"]):
+        return None
+    return raw
+
+
+class RecipePlotModule(PlotModuleAdapter):
+    """
+    Recipe plot module whose ``load_data`` prefetches every raw field of
+    the recipe with one ``data_loader.load_many()`` call, so a recipe
+    reading several fields from the same file opens and scans it once.
+    Loads at other forecast times (``time_diff``) go to the original loader.
+
+    Data entries are then run as a dependency graph
+    (:class:`~cedar_graph.recipes.scheduler.RecipeGraph`) on the engine's
+    thread pool: independent entries (loads and their transforms) run
+    concurrently, a compute entry starts as soon as its inputs are ready.
+    Results are the same as the sequential ``PlotModuleAdapter.load_data``.
+
+    If the loader crops fields to an area, its padding is raised to the
+    halo needed by the recipe's ``smth9`` transforms, so smoothing runs on
+    the cropped window with the same result inside the area.
+
+    With ``sample_step: auto``, fields of vector layers are thinned to the
+    barb spacing and other fields to the map's output resolution, see
+    :func:`~cedar_graph.data.operator.auto_sample_step`.
+    """
+
+    def __init__(self, engine: "RecipePlotEngine", recipe: Recipe):
+        self.graph = RecipeGraph(recipe)
+        super().__init__(engine, recipe)
+
+    def _build_load_data(self):
+        load_data = super()._build_load_data()
+        engine = self.engine
+        recipe = self.recipe
+
+        def scheduled_load_data(data_loader, start_time, forecast_time, **param_values):
+            metadata = self.resolve_metadata(start_time, forecast_time, **param_values)
+
+            halo = self.smoothing_halo()
+            if data_loader.area is not None and data_loader.area_padding < halo:
+                # smooth-after-crop: widen the loaded window so smoothed values inside the area are unchanged
+                data_loader = data_loader.with_area_padding(halo)
+
+            def raw_loader(data_key: str, at_forecast_time: pd.Timedelta) -> xr.DataArray:
+                field_info = engine._resolve_field_info(recipe.data[data_key], metadata)
+                return data_loader.load(
+                    field_info=field_info,
+                    start_time=start_time,
+                    forecast_time=at_forecast_time,
+                )
+
+            contexts = {
+                data_key: OpContext(
+                    recipe=recipe,
+                    data_key=data_key,
+                    metadata=metadata,
+                    style_registry=engine.style_registry,
+                    loader=raw_loader,
+                )
+                for data_key in recipe.data
+            }
+            memo = engine.transform_memo if isinstance(engine.op_registry, RecipeOpRegistry) else None
+            value_keys = self._value_keys(data_loader, contexts) if memo is not None else None
+
+            # prefetch raw fields, except fields whose final value is already memoized
+            field_infos = [
+                engine._resolve_field_info(spec, metadata)
+                for data_key, spec in recipe.data.items()
+                if spec.field is not None and (value_keys is None or value_keys[data_key] not in memo)
+            ]
+            fields = data_loader.load_many(
+                field_infos=field_infos,
+                start_time=start_time,
+                forecast_time=forecast_time,
+            )
+            data_loader = PrefetchedDataLoader(
+                data_loader=data_loader,
+                start_time=start_time,
+                forecast_time=forecast_time,
+                fields=list(zip(field_infos, fields)),
+            )
+
+            def run_node(data_key: str, data: Dict[str, xr.DataArray]) -> Dict[str, xr.DataArray]:
+                return self._run_data_entry(data_key, data, data_loader, contexts[data_key], memo, value_keys)
+
+            data = self.graph.run(run_node, engine.executor)
+            return self.PlotData(**{key: data.get(key) for key in self._plot_data_keys()})
+
+        scheduled_load_data.__signature__ = load_data.__signature__
+        return scheduled_load_data
+
+    def plot(self, plot_data, plot_metadata):
+        """Draw as ``PlotModuleAdapter.plot``, sampling fields per layer kind first with ``sample_step: auto``."""
+        if getattr(plot_metadata, "auto_sample_nearest", False) and plot_metadata.sample_step == AUTO_SAMPLE_STEP:
+            domain = self.engine.create_domain(self.recipe, plot_metadata)
+            barb_fields = self.barb_fields()
+            sample_steps = {
+                kind: resolve_sample_step(plot_metadata, domain=domain, kind=kind)
+                for kind in ("fill", "barb")
+            }
+            plot_data = replace(plot_data, **{
+                f.name: select_plot_grid(
+                    getattr(plot_data, f.name),
+                    sample_step=sample_steps["barb" if f.name in barb_fields else "fill"],
+                )
+                for f in fields(plot_data)
+                if isinstance(getattr(plot_data, f.name), xr.DataArray)
+            })
+            plot_metadata = replace(plot_metadata, auto_sample_nearest=False)
+        return super().plot(plot_data, plot_metadata)
+
+    def barb_fields(self) -> List[str]:
+        """Data entries drawn by vector (barb) layers."""
+        return [
+            name
+            for layer in self.recipe.layers if layer.vector is not None
+            for name in (layer.vector.u, layer.vector.v)
+        ]
 
+    def resolve_metadata(self, start_time, forecast_time, **param_values):
+        """
+        ``PlotMetadata`` with times and recipe params set, as ``load_data`` sees it.
 
-def get_recipe_engine() -> PlotEngine:
-    """Process-wide recipe engine, created lazily."""
+        Raises
+        ------
+        RecipeError
+            a required param is missing.
+        """
+        metadata = self.PlotMetadata(start_time=start_time, forecast_time=forecast_time)
+        for param_name, param in self.recipe.params.items():
+            value = param_values.get(param_name, getattr(metadata, param_name))
+            if value is None:
+                if param.required:
+                    raise RecipeError("<recipe>", f"required param {param_name!r} is missing")
+                continue
+            setattr(metadata, param_name, self._coerce_param(param, value))
+        return metadata
+
+    def field_requests(self, metadata) -> List[Tuple[FieldInfo, pd.Timedelta]]:
+        """
+        Raw field loads of ``load_data``: every field entry at the forecast time, plus the
+        field at ``forecast_time - interval`` for each ``time_diff`` transform.
+
+        Parameters
+        ----------
+        metadata
+            see :meth:`resolve_metadata`.
+
+        Returns
+        -------
+        list[tuple[FieldInfo, pd.Timedelta]]
+            (field info, forecast time) in recipe order.
+        """
+        requests = []
+        for spec in self.recipe.data.values():
+            if spec.field is None:
+                continue
+            field_info = self.engine._resolve_field_info(spec, metadata)
+            requests.append((field_info, metadata.forecast_time))
+            for transform in spec.transforms:
+                if transform.op != "time_diff":
+                    continue
+                if transform.args:
+                    interval = resolve_templates(transform.args[0], metadata)
+                else:
+                    interval = resolve_templates(transform.kwargs["interval"], metadata)
+                requests.append((field_info, metadata.forecast_time - pd.to_timedelta(interval)))
+        return requests
+
+    def _entry_chain(self, data_key, data_loader, context, value_keys):
+        """
+        Memo key of the value before transforms and ``(step, repeat, apply)`` of each transform.
+
+        The base key is None if ``value_keys`` is None (no memo).
+        """
+        engine = self.engine
+        metadata = context.metadata
+        spec = self.recipe.data[data_key]
+
+        base_key = None
+        if value_keys is not None:
+            if spec.compute is not None:
+                compute = spec.compute
+                base_key = (
+                    "compute",
+                    tuple(value_keys[input_key] for input_key in compute.inputs),
+                    engine.op_registry.step_key(
+                        compute.op,
+                        resolve_templates(compute.args, metadata),
+                        resolve_templates(compute.kwargs, metadata),
+                        context,
+                    ),
+                )
+            else:
+                base_key = (
+                    "field",
+                    field_cache_key(
+                        field_info=engine._resolve_field_info(spec, metadata),
+                        start_time=metadata.start_time,
+                        forecast_time=metadata.forecast_time,
+                        system_name=getattr(data_loader.data_source, "system_name", None),
+                        area=data_loader.area,
+                        area_padding=data_loader.area_padding,
+                    ),
+                )
+
+        transforms = []
+        for transform in spec.transforms:
+            args = resolve_templates(transform.args, metadata)
+            kwargs = resolve_templates(transform.kwargs, metadata)
+            step = engine.op_registry.step_key(transform.op, args, kwargs, context) if value_keys is not None else None
+
+            def apply(field, repeat, op=transform.op, args=args, kwargs=kwargs):
+                return engine.op_registry.apply_transform(op, field, args, kwargs, repeat, context)
+
+            transforms.append((step, transform.repeat, apply))
+        return base_key, transforms
+
+    def _value_keys(self, data_loader, contexts) -> Dict[str, Hashable]:
+        """Memo keys of all fields produced by the data entries, see ``cedar_graph.recipes.memo``."""
+        value_keys = dict()
+        for data_key in self.graph.order:
+            spec = self.recipe.data[data_key]
+            base_key, transforms = self._entry_chain(data_key, data_loader, contexts[data_key], value_keys)
+            if spec.compute is not None and spec.compute.outputs:
+                for i, output_key in enumerate(spec.compute.outputs):
+                    value_keys[output_key] = ((base_key, i),)
+            else:
+                value_keys[data_key] = chain_key(base_key, transforms)
+        return value_keys
+
+    def _run_data_entry(
+            self,
+            data_key,
+            data,
+            data_loader,
+            context,
+            memo: Optional[FieldCache] = None,
+            value_keys: Optional[Dict[str, Hashable]] = None,
+    ) -> Dict[str, xr.DataArray]:
+        """
+        Compute or load one data entry and apply its transforms, as ``PlotModuleAdapter.load_data`` does.
+
+        With a memo, values are looked up by their keys first and transform chains
+        continue from the longest memoized prefix.
+
+        Returns
+        -------
+        dict[str, xr.DataArray]
+            fields produced by the entry: the entry itself, or the ``outputs`` of a multi-output compute op.
+        """
+        engine = self.engine
+        recipe = self.recipe
+        metadata = context.metadata
+        spec = recipe.data[data_key]
+        base_key, transforms = self._entry_chain(data_key, data_loader, context, value_keys)
+
+        if spec.compute is not None:
+            compute = spec.compute
+
+            def produce():
+                inputs = [data[input_key] for input_key in compute.inputs]
+                args = resolve_templates(compute.args, metadata)
+                kwargs = resolve_templates(compute.kwargs, metadata)
+                return engine.op_registry.apply_compute(compute.op, inputs, args, kwargs, context)
+
+            if compute.outputs:
+                output_keys = [value_keys[output_key] for output_key in compute.outputs] if memo is not None else []
+                cached = [memo.get(key) for key in output_keys]
+                if memo is not None and all(field is not None for field in cached):
+                    return dict(zip(compute.outputs, cached))
+                result = produce()
+                if len(compute.outputs) == 1:
+                    result = (result,)
+                if len(result) != len(compute.outputs):
+                    raise RecipeError(
+                        "<recipe>",
+                        f"compute op {compute.op!r} returned {len(result)} fields, "
+                        f"expected {len(compute.outputs)}",
+                    )
+                for key, field in zip(output_keys, result):
+                    memo.put(key, field)
+                return dict(zip(compute.outputs, result))
+        else:
+            def produce():
+                return engine.load_field(recipe, data_key, data_loader, metadata)
+
+        field = apply_chain(memo, base_key, produce, transforms, cache_base=spec.compute is not None)
+        if field is None:
+            return {}
+        return {data_key: field}
+
+    def smoothing_halo(self) -> int:
+        """Area padding needed by the ``smth9`` transforms of the recipe, the largest over data entries."""
+        repeat = max(
+            (
+                sum(transform.repeat for transform in (spec.transforms or []) if transform.op == "smth9")
+                for spec in self.recipe.data.values()
+            ),
+            default=0,
+        )
+        return smoothing_halo(repeat)
+
+
+class RecipePlotEngine(PlotEngine):
+    """
+    ``PlotEngine`` building :class:`RecipePlotModule` modules.
+
+    Data entries of recipes run on a thread pool shared by all modules of
+    the engine, created on first use. Loads (GRIB decoding) and numpy
+    transforms release the GIL, so they overlap across threads.
+
+    Attributes
+    ----------
+    max_workers : int
+        thread pool size. 1 runs data entries one after another.
+    transform_memo : FieldCache or None
+        memo of derived values of the batch run by the current thread, see :meth:`memoize`.
+    recipe_cache : CompiledRecipeCache
+        checked recipes and their modules per recipe file, so ``get_plot_definition``
+        parses a recipe once per process (or once per cache directory).
+    """
+
+    def __init__(
+            self,
+            *args,
+            max_workers: Optional[int] = None,
+            recipe_cache: Optional[CompiledRecipeCache] = None,
+            **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.recipe_cache = recipe_cache if recipe_cache is not None else CompiledRecipeCache()
+        self.max_workers = max_workers if max_workers is not None else min(8, os.cpu_count() or 1)
+        self._transform_memo: ContextVar[Optional[FieldCache]] = ContextVar(
+            f"cedar_graph_transform_memo_{id(self)}", default=None,
+        )
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Thread pool running recipe data entries."""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="cedar-graph-recipe",
+                )
+            return self._executor
+
+    @property
+    def transform_memo(self) -> Optional[FieldCache]:
+        """Memo of the batch run by the current thread, None outside :meth:`memoize`."""
+        return self._transform_memo.get()
+
+    @contextmanager
+    def memoize(self, memo: Optional[FieldCache] = None):
+        """
+        Memoize derived values of all recipes loaded inside the block (a batch).
+
+        Values of recipe data entries (loads, compute results and each transform)
+        are kept by canonical key in ``memo``, see ``cedar_graph.recipes.memo``:
+        recipes sharing a derived value compute it once, and a transform chain
+        continues from the longest memoized prefix, e.g. ``smth9`` with ``repeat: 4``
+        from a memoized ``repeat: 2`` result. The memo is dropped at the end of the block.
+
+        The memo is set in the current context only: batches run by other threads
+        on the same engine (such as ``get_recipe_engine()``) keep their own memo.
+
+        Parameters
+        ----------
+        memo
+            memo to use, a new ``FieldCache`` if None.
+
+        Examples
+        --------
+        >>> with engine.memoize():
+        ...     for module, params in modules:
+        ...         plot_data = module.load_data(data_loader, start_time, forecast_time, **params)
+        """
+        memo = memo if memo is not None else FieldCache()
+        token = self._transform_memo.set(memo)
+        try:
+            yield memo
+        finally:
+            self._transform_memo.reset(token)
+
+    def shutdown(self):
+        """Shut down the thread pool, a new one is created when needed again."""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def load_recipe(self, path) -> Recipe:
+        """Load and check a recipe file, once per file modification (see :attr:`recipe_cache`)."""
+        return self.recipe_cache.get_recipe(path, self._load_recipe, fingerprint=self.registry_fingerprint)
+
+    def _load_recipe(self, path) -> Recipe:
+        if not uses_layer_render(path):
+            return super().load_recipe(path)
+        recipe = load_recipe_file(path)
+        self.check_recipe(recipe, path)
+        return recipe
+
+    def build_layer_style(self, layer, metadata, data: Optional[xr.DataArray] = None):
+        """Layer style as ``PlotEngine.build_layer_style``, drawn with the layer's ``render`` if set."""
+        style = super().build_layer_style(layer, metadata, data=data)
+        return with_render(style, getattr(layer, "render", None))
+
+    def build_module(self, recipe: Recipe) -> RecipePlotModule:
+        """Adapt a recipe to the plot module interface, once per recipe from :meth:`load_recipe`."""
+        return self.recipe_cache.get_module(recipe, lambda recipe: RecipePlotModule(self, recipe))
+
+    def registry_fingerprint(self) -> str:
+        """Hash of registered op, field and style names, which recipes are checked against."""
+        content = json.dumps([
+            self.op_registry.op_names,
+            sorted(self.field_registry),
+            sorted(self.style_registry.style_ids),
+        ])
+        return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+    @traced("prepare_data", "data")
+    def prepare_data(self, plot_data, metadata, total_area: AreaRange):
+        """
+        Sample and extract fields as ``PlotEngine.prepare_data``, with
+        ``cedar_graph.data.operator.select_plot_grid``: grid indices are cached per grid,
+        and fields already cropped to the area when loaded are not extracted again.
+        """
+        sample_step = metadata.sample_step if getattr(metadata, "auto_sample_nearest", False) else None
+        area = total_area if getattr(metadata, "auto_extract_area", False) else None
+        for f in fields(plot_data):
+            field = getattr(plot_data, f.name)
+            if isinstance(field, xr.DataArray):
+                setattr(plot_data, f.name, select_plot_grid(field, sample_step=sample_step, area=area))
+        return plot_data
+
+    def _resolve_field_info(self, spec, metadata) -> FieldInfo:
+        """Apply the level spec with ``FieldInfo.with_level``, registered field infos are immutable."""
+        field_info = self.field_registry[spec.field]
+        if spec.level is None:
+            return field_info
+        level_name = LEVEL_TYPE_CODE_TO_NAME.get(spec.level.first_level_type)
+        if level_name is None:
+            raise RecipeError(
+                "<recipe>",
+                f"unknown first_level_type code {spec.level.first_level_type}",
+            )
+        return field_info.with_level(
+            _LEVEL_TYPE_ALIASES.get(level_name, level_name),
+            resolve_templates(spec.level.first_level, metadata),
+        )
+
+
+_engine: Optional[RecipePlotEngine] = None
+
+
+def get_recipe_engine(cache_dir: Optional[Union[str, Path]] = None) -> RecipePlotEngine:
+    """
+    Process-wide recipe engine, created lazily.
+
+    Parameters
+    ----------
+    cache_dir
+        directory of compiled recipes shared by processes (``CompiledRecipeCache.cache_dir``),
+        set on the engine if given. Checked recipes are cached in memory only until it is set.
+    """
     global _engine
     if _engine is None:
-        _engine = PlotEngine(
-            style_registry=get_default_registry(),
+        _engine = RecipePlotEngine(
+            style_registry=get_style_registry(),
             op_registry=create_op_registry(),
             field_registry=FIELD_INFOS,
+            recipe_cache=CompiledRecipeCache(cache_dir),
         )
+    elif cache_dir is not None:
+        _engine.recipe_cache.cache_dir = Path(cache_dir)
     return _engine
@@ -0,0 +1,131 @@
+"""Memo of derived recipe values, shared by the recipes of a batch.
+
+Recipes repeat the same derived values: 500 hPa height goes through
+``style_units`` and ``smth9(0.5, 0.25)`` in both ``h_500_psl`` and
+``h_500_wind_850`` (4 and 2 passes), ``wind_speed`` is computed from
+identical u/v in several recipes. Every value of a recipe data entry
+gets a canonical, hashable key describing how it is produced:
+
+* a loaded field: ``("field", field_cache_key(...))``;
+* a compute result: ``("compute", op, input keys, args, kwargs, context key)``,
+  plus ``("output", i)`` for the i-th output of a multi-output op;
+* a transformed value: the key of its input followed by one step
+  ``(op, args, kwargs, context key)`` per pass, so ``repeat: 4`` is four
+  equal steps and the key of ``repeat: 2`` is a prefix of it.
+
+Values are kept in a :class:`~cedar_graph.data.FieldCache` for the
+duration of a batch (``RecipePlotEngine.memoize()``). A transform chain
+starts from the longest cached prefix of its key, so a chain with
+``repeat: 4`` continues from a cached ``repeat: 2`` result.
+"""
+
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+
+import pandas as pd
+import xarray as xr
+
+from cedar_graph.data import FieldCache
+
+
+#: one transform pass: (op, args, kwargs, context key)
+Step = Tuple[Hashable, ...]
+
+
+def canonical(value: Any) -> Hashable:
+    """
+    Hashable canonical form of resolved op args: lists become tuples, dicts sorted item tuples.
+
+    Parameters
+    ----------
+    value
+
+    Returns
+    -------
+    Hashable
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), canonical(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(canonical(v) for v in value)
+    if isinstance(value, pd.Timedelta):
+        return ("timedelta", value.value)
+    return value
+
+
+def apply_chain(
+        memo: Optional[FieldCache],
+        base_key: Hashable,
+        produce: Callable[[], Optional[xr.DataArray]],
+        transforms: List[Tuple[Step, int, Callable[[xr.DataArray, int], xr.DataArray]]],
+        cache_base: bool = False,
+) -> Optional[xr.DataArray]:
+    """
+    Produce a value and apply a transform chain, reusing the longest cached prefix of the chain.
+
+    Results are added to ``memo`` after each transform.
+
+    Parameters
+    ----------
+    memo
+        memo of the batch, the chain runs without caching if None.
+    base_key
+        key of the value returned by ``produce``.
+    produce
+        loads or computes the value before transforms.
+    transforms
+        ``(step, repeat, apply)`` per transform, ``apply(field, repeat)`` runs ``repeat`` passes.
+    cache_base
+        also cache the value returned by ``produce`` when there are transforms,
+        such as compute results other recipes may use untransformed.
+
+    Returns
+    -------
+    xr.DataArray or None
+        None if ``produce`` returns None.
+    """
+    if memo is None:
+        field = produce()
+        for _, repeat, apply in transforms:
+            if field is None:
+                break
+            field = apply(field, repeat)
+        return field
+
+    # chain keys are (base_key, *steps), one step per pass
+    steps: List[Step] = []
+    positions: List[Tuple[int, int]] = [(0, 0)]
+    for index, (step, repeat, _) in enumerate(transforms):
+        for count in range(1, repeat + 1):
+            steps.append(step)
+            positions.append((index, count))
+
+    # one hit or miss per value in the memo statistics, shorter prefixes are probed without counting
+    length = len(steps)
+    field = memo.get((base_key, *steps))
+    if field is None:
+        for length in range(len(steps) - 1, -1, -1):
+            key = (base_key, *steps[:length])
+            field = memo.get(key) if key in memo else None
+            if field is not None:
+                break
+    if field is None:
+        field = produce()
+        if field is None:
+            return None
+        if cache_base or len(steps) == 0:
+            memo.put((base_key,), field)
+
+    index, done = positions[length]
+    for index in range(index, len(transforms)):
+        step, repeat, apply = transforms[index]
+        if done < repeat:
+            field = apply(field, repeat - done)
+            length += repeat - done
+            memo.put((base_key, *steps[:length]), field)
+        done = 0
+    return field
+
+
+def chain_key(base_key: Hashable, transforms: List[Tuple[Step, int, Any]]) -> Tuple[Hashable, ...]:
+    """Key of the value after all ``transforms``, see :func:`apply_chain`."""
+    return (base_key, *(step for step, repeat, _ in transforms for _ in range(repeat)))
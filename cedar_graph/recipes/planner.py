@@ -0,0 +1,194 @@
+"""Suite-level load planner: load every raw field of a set of recipes once.
+
+Rendering all recipes of ``recipes/cn`` for one cycle and lead time reads
+the same fields many times: 850 hPa u/v appear in ``kidx_wind``,
+``cape_wind``, ``bli_wind``, ``cin_wind`` and ``h_500_wind_850``, 24h
+precipitation totals in ``rain_24h`` and ``prep_24h``. A
+:class:`SuiteLoadPlan` merges the raw field loads of all recipes
+(including the earlier forecast times read by ``time_diff``) into a
+deduplicated load set, loads it with one ``load_many()`` call per
+forecast time, and runs every recipe's ``load_data`` against the loaded
+fields, sharing derived values across recipes (``cedar_graph.recipes.memo``).
+
+Examples
+--------
+>>> plan = SuiteLoadPlan(
+...     [(kidx_wind, dict(wind_level=850)), (cape_wind, dict(wind_level=850)), (h_500_wind_850, {})],
+...     start_time=pd.Timestamp("2024-07-01 00:00"),
+...     forecast_time=pd.Timedelta(hours=24),
+... )
+>>> plot_data_list = plan.run(DataLoader(data_source))
+>>> plan.loads_saved
+4
+"""
+
+from contextlib import ExitStack
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+import xarray as xr
+
+from cedarkit.plots.types import AreaRange
+
+from cedar_graph.data.field_info import FieldInfo
+from cedar_graph.data.loader import DataLoader, PrefetchedDataLoader
+from cedar_graph.recipes.engine import RecipePlotModule
+
+
+class PlannedDataLoader(PrefetchedDataLoader):
+    """
+    Serve fields loaded by a :class:`SuiteLoadPlan`, at any of its forecast times.
+
+    Loads not in the plan (or with an explicit area) go to the wrapped loader.
+
+    Attributes
+    ----------
+    planned_fields : dict[tuple[FieldInfo, pd.Timedelta], xr.DataArray or None]
+        (field info, forecast time) -> loaded field.
+    """
+    def __init__(
+            self,
+            data_loader: DataLoader,
+            start_time: pd.Timestamp,
+            planned_fields: Dict[Tuple[FieldInfo, pd.Timedelta], Optional[xr.DataArray]],
+    ):
+        super().__init__(
+            data_loader=data_loader,
+            start_time=start_time,
+            forecast_time=None,
+            fields=[],
+        )
+        self.planned_fields = planned_fields
+
+    def _find(
+            self,
+            field_info: FieldInfo,
+            start_time: pd.Timestamp,
+            forecast_time: pd.Timedelta,
+            area: Optional[AreaRange] = None,
+    ) -> Tuple[bool, Optional[xr.DataArray]]:
+        key = (field_info, pd.Timedelta(forecast_time))
+        if self._serves_prefetched(start_time, area) and key in self.planned_fields:
+            return True, self.planned_fields[key]
+        return False, None
+
+
+class SuiteLoadPlan:
+    """
+    Deduplicated raw field loads of several recipes at one start time and forecast time.
+
+    Attributes
+    ----------
+    items : list[tuple[RecipePlotModule, dict]]
+        recipe plot modules and their param values.
+    start_time : pd.Timestamp
+    forecast_time : pd.Timedelta
+    requests : list[tuple[FieldInfo, pd.Timedelta]]
+        raw field loads of all recipes, with duplicates.
+    loads : list[tuple[FieldInfo, pd.Timedelta]]
+        deduplicated loads, in order of first request.
+    """
+    def __init__(
+            self,
+            items: Sequence[Tuple[RecipePlotModule, Dict[str, Any]]],
+            start_time: pd.Timestamp,
+            forecast_time: pd.Timedelta,
+    ):
+        self.items = [(module, dict(params or {})) for module, params in items]
+        self.start_time = pd.Timestamp(start_time)
+        self.forecast_time = pd.Timedelta(forecast_time)
+
+        self.requests: List[Tuple[FieldInfo, pd.Timedelta]] = []
+        for module, params in self.items:
+            metadata = module.resolve_metadata(self.start_time, self.forecast_time, **params)
+            self.requests.extend(
+                (field_info, pd.Timedelta(at_forecast_time))
+                for field_info, at_forecast_time in module.field_requests(metadata)
+            )
+        self.loads = list(dict.fromkeys(self.requests))
+
+    @property
+    def requested_count(self) -> int:
+        """Number of raw field loads if every recipe loaded its own fields."""
+        return len(self.requests)
+
+    @property
+    def load_count(self) -> int:
+        """Number of raw field loads of the plan."""
+        return len(self.loads)
+
+    @property
+    def loads_saved(self) -> int:
+        """Number of raw field loads saved by deduplication."""
+        return self.requested_count - self.load_count
+
+    def smoothing_halo(self) -> int:
+        """Area padding needed by the ``smth9`` transforms of all recipes."""
+        return max((module.smoothing_halo() for module, _ in self.items), default=0)
+
+    def load(self, data_loader: DataLoader) -> PlannedDataLoader:
+        """
+        Load every planned field once, with one ``load_many()`` call per forecast time.
+
+        If ``data_loader`` crops fields to an area, its padding is raised to the halo
+        of all recipes, so every recipe can use the same cropped fields.
+
+        Parameters
+        ----------
+        data_loader
+
+        Returns
+        -------
+        PlannedDataLoader
+            loader serving the planned fields, to be passed to each recipe's ``load_data``.
+        """
+        halo = self.smoothing_halo()
+        if data_loader.area is not None and data_loader.area_padding < halo:
+            data_loader = data_loader.with_area_padding(halo)
+
+        field_infos_by_time: Dict[pd.Timedelta, List[FieldInfo]] = dict()
+        for field_info, at_forecast_time in self.loads:
+            field_infos_by_time.setdefault(at_forecast_time, []).append(field_info)
+
+        planned_fields = dict()
+        for at_forecast_time, field_infos in field_infos_by_time.items():
+            fields = data_loader.load_many(
+                field_infos=field_infos,
+                start_time=self.start_time,
+                forecast_time=at_forecast_time,
+            )
+            for field_info, field in zip(field_infos, fields):
+                planned_fields[(field_info, at_forecast_time)] = field
+
+        return PlannedDataLoader(
+            data_loader=data_loader,
+            start_time=self.start_time,
+            planned_fields=planned_fields,
+        )
+
+    def run(self, data_loader: DataLoader, memoize: bool = True) -> List[Any]:
+        """
+        Load planned fields once and run ``load_data`` of every recipe on them.
+
+        Parameters
+        ----------
+        data_loader
+        memoize
+            share derived values (transform chains, compute results) across recipes,
+            see ``RecipePlotEngine.memoize``.
+
+        Returns
+        -------
+        list
+            ``PlotData`` of each item, in order of ``items``, ready for the plot stage.
+        """
+        planned_loader = self.load(data_loader)
+        with ExitStack() as stack:
+            if memoize:
+                engines = {id(module.engine): module.engine for module, _ in self.items}
+                for engine in engines.values():
+                    stack.enter_context(engine.memoize())
+            return [
+                module.load_data(planned_loader, self.start_time, self.forecast_time, **params)
+                for module, params in self.items
+            ]
@@ -0,0 +1,122 @@
+"""Dependency graph of recipe data entries, executed on a thread pool.
+
+Each entry of a recipe's ``data:`` section is a node: field entries
+(load + transforms) have no dependencies, compute entries depend on the
+entries producing their ``inputs`` (an input may be one of the
+``outputs`` of a multi-output compute entry). :class:`RecipeGraph` runs
+every node as soon as its inputs are ready, so independent loads and
+transforms overlap and a recipe takes about as long as its longest
+dependency chain.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from typing import Any, Callable, Dict, List, Set
+
+from cedarkit.plots.engine.recipe import Recipe, RecipeError
+
+from cedar_graph.tracing import propagate
+
+
+class RecipeGraph:
+    """
+    Dependency graph of the data entries of a recipe.
+
+    Attributes
+    ----------
+    dependencies : dict[str, set[str]]
+        data key -> data keys of the entries it depends on.
+    producers : dict[str, str]
+        field key (data key or compute output) -> data key of the entry producing it.
+    order : list[str]
+        data keys in dependency order, each entry after the entries it depends on.
+    """
+
+    def __init__(self, recipe: Recipe):
+        self.producers: Dict[str, str] = {}
+        for data_key, spec in recipe.data.items():
+            self.producers[data_key] = data_key
+            if spec.compute is not None:
+                for output_key in spec.compute.outputs or []:
+                    self.producers[output_key] = data_key
+
+        self.dependencies: Dict[str, Set[str]] = {}
+        self.order: List[str] = []
+        for data_key, spec in recipe.data.items():
+            dependencies = set()
+            if spec.compute is not None:
+                for input_key in spec.compute.inputs:
+                    if input_key not in self.producers:
+                        raise RecipeError(
+                            "<recipe>",
+                            f"data entry {data_key!r} uses unknown input {input_key!r}",
+                        )
+                    dependencies.add(self.producers[input_key])
+            self.dependencies[data_key] = dependencies
+        self._check_cycles()
+
+    def _check_cycles(self):
+        visiting: Set[str] = set()
+        done: Set[str] = set()
+
+        def visit(key: str):
+            if key in done:
+                return
+            if key in visiting:
+                raise RecipeError("<recipe>", f"data entry {key!r} depends on itself")
+            visiting.add(key)
+            for dependency in self.dependencies[key]:
+                visit(dependency)
+            visiting.discard(key)
+            done.add(key)
+            self.order.append(key)
+
+        for key in self.dependencies:
+            visit(key)
+
+    def run(
+            self,
+            run_node: Callable[[str, Dict[str, Any]], Dict[str, Any]],
+            executor: Executor,
+    ) -> Dict[str, Any]:
+        """
+        Run all nodes, each one as soon as the nodes it depends on are done.
+
+        Parameters
+        ----------
+        run_node
+            ``run_node(data_key, data) -> fields``, called in a pool thread. ``data`` holds
+            the fields produced so far (read only), the returned dict is merged into it.
+        executor
+            thread pool running the nodes.
+
+        Returns
+        -------
+        dict[str, Any]
+            all produced fields.
+
+        Raises
+        ------
+        Exception
+            the first error raised by a node. Nodes not started yet are skipped.
+        """
+        data: Dict[str, Any] = {}
+        done: Set[str] = set()
+        running: Dict[Future, str] = {}
+        pending: List[str] = list(self.dependencies)
+
+        try:
+            while pending or running:
+                ready = [key for key in pending if self.dependencies[key] <= done]
+                for key in ready:
+                    pending.remove(key)
+                    running[executor.submit(propagate(run_node), key, dict(data))] = key
+
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key = running.pop(future)
+                    data.update(future.result())
+                    done.add(key)
+        finally:
+            for future in running:
+                future.cancel()
+        return data
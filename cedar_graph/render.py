@@ -0,0 +1,304 @@
+"""Load once, render many areas.
+
+Regional products read the same national fields, smooth them the same way
+and differ only in the area ``plot()`` crops to (``prepare_data`` with the
+``total_area`` of the area domain). :func:`render_areas` takes the plot
+data loaded once for the full domain and draws every area from it, in
+turn or in forked processes that share the loaded fields copy-on-write.
+
+It works for any plot module with ``plot(plot_data, plot_metadata)`` and
+``PlotMetadata``: recipe plot modules and the Python modules in
+``cedar_graph.plots.cn``.
+
+:func:`render_series` draws the forecast hours of one product and area
+over its static chrome rendered once (``cedar_graph.composite``).
+
+Examples
+--------
+>>> plot_module, plot_metadata, plot_data = load_plot(
+...     "cn.div_wind", dict(system_name="CMA-GFS", start_time="2024070100", forecast_time="24h",
+...                         div_level=850, wind_level=850), data_source_config={})
+>>> paths = render_areas(plot_module, plot_data, plot_metadata, CN_AREAS,
+...                      output="/data/div_wind/{area_name}.png", processes=4)
+"""
+
+import copy
+import dataclasses
+import multiprocessing
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+from cedarkit.plots.types import AreaRange
+
+from cedar_graph.tracing import call_traced, get_tracer, plot_span
+
+
+@dataclass(frozen=True)
+class PlotArea:
+    """
+    A named plot area.
+
+    Attributes
+    ----------
+    name : str
+    area : AreaRange or None
+        None for the full domain of the system.
+    params : dict
+        plot settings of the area used when loading data, such as ``wind_level``.
+    """
+    name: str
+    area: Optional[AreaRange] = None
+    params: Dict[str, Any] = field(default_factory=dict, hash=False)
+
+
+#: CN regional areas, with the wind level used for each region.
+CN_AREAS = [
+    PlotArea(name="NorthEast", area=AreaRange.from_tuple((108, 137, 37, 55)), params=dict(wind_level=850)),
+    PlotArea(name="NorthChina", area=AreaRange.from_tuple((105, 125, 34, 45)), params=dict(wind_level=850)),
+    PlotArea(name="EastChina", area=AreaRange.from_tuple((105, 130, 28, 40)), params=dict(wind_level=850)),
+    PlotArea(name="SouthChina", area=AreaRange.from_tuple((103, 128, 15, 32)), params=dict(wind_level=850)),
+    PlotArea(name="East_NorthWest", area=AreaRange.from_tuple((85, 115, 30, 45)), params=dict(wind_level=700)),
+    PlotArea(name="East_SouthWest", area=AreaRange.from_tuple((95, 113, 20, 35)), params=dict(wind_level=700)),
+    PlotArea(name="XinJiang", area=AreaRange.from_tuple((70, 100, 33, 50)), params=dict(wind_level=700)),
+    PlotArea(name="XiZang", area=AreaRange.from_tuple((75, 105, 25, 40)), params=dict(wind_level=500)),
+    PlotArea(name="CentralChina", area=AreaRange.from_tuple((95, 120, 25, 40)), params=dict(wind_level=850)),
+]
+
+#: ``output(area, panel) -> result``, called with each drawn panel before it is closed.
+AreaOutput = Callable[[PlotArea, Any], Any]
+
+# plot module, plot data, metadata, areas and output of render_areas, inherited by forked processes
+_fork_state: Optional[tuple] = None
+
+
+def area_metadata(plot_metadata: Any, area: PlotArea) -> Any:
+    """
+    Copy of a ``PlotMetadata`` object for one area.
+
+    Parameters
+    ----------
+    plot_metadata
+        ``PlotMetadata`` dataclass object of the full-domain plot.
+    area
+
+    Returns
+    -------
+    PlotMetadata
+        with ``area_range`` and ``area_name`` of ``area`` (if the metadata has these fields).
+    """
+    names = {f.name for f in dataclasses.fields(plot_metadata)}
+    changes = dict()
+    if "area_range" in names:
+        changes["area_range"] = area.area
+    if "area_name" in names:
+        changes["area_name"] = area.name
+    return dataclasses.replace(plot_metadata, **changes)
+
+
+def copy_plot_data(plot_data: Any) -> Any:
+    """
+    Shallow copy of plot data drawn for one area.
+
+    ``plot()`` replaces the fields of its plot data with fields cropped to the area
+    (``prepare_data``), so every area is drawn from its own copy of the loaded data.
+    Fields are not copied.
+    """
+    return copy.copy(plot_data)
+
+
+def _as_plot_area(index: int, area: Union[PlotArea, AreaRange, None]) -> PlotArea:
+    if isinstance(area, PlotArea):
+        return area
+    return PlotArea(name=f"area{index}", area=area)
+
+
+def _save_output(template: str) -> AreaOutput:
+    def save(area: PlotArea, panel) -> Path:
+        path = Path(template.format(area_name=area.name))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        panel.save(path)
+        return path
+    return save
+
+
+def plot_name(plot_module: Any) -> str:
+    """
+    Name of a plot module in traces: plot type of Python plot modules (``cn.t_dew_t.default``),
+    recipe name of recipe plot modules.
+    """
+    from cedar_graph.quickplot import BASE_MODULE_NAME
+
+    recipe = getattr(plot_module, "recipe", None)
+    if recipe is not None:
+        return recipe.name
+    name = getattr(plot_module, "__name__", type(plot_module).__name__)
+    prefix = f"{BASE_MODULE_NAME}."
+    return name[len(prefix):] if name.startswith(prefix) else name
+
+
+def _render_area(
+        plot_module,
+        plot_data,
+        plot_metadata,
+        area: PlotArea,
+        output: Optional[AreaOutput],
+        plot_type: Optional[str] = None,
+):
+    import matplotlib.pyplot as plt
+
+    with plot_span(
+            plot_type if plot_type is not None else plot_name(plot_module),
+            stage="render",
+            area=area.name,
+            forecast_time=getattr(plot_metadata, "forecast_time", None),
+    ):
+        panel = plot_module.plot(plot_data=copy_plot_data(plot_data), plot_metadata=area_metadata(plot_metadata, area))
+        if output is None:
+            return panel
+        try:
+            return output(area, panel)
+        finally:
+            plt.close(panel.fig)
+
+
+def _render_forked(index: int):
+    plot_module, plot_data, plot_metadata, areas, output, plot_type, traced = _fork_state
+    if traced:
+        # spans of the forked process come back with the result
+        return call_traced(_render_area, plot_module, plot_data, plot_metadata, areas[index], output, plot_type)
+    return _render_area(plot_module, plot_data, plot_metadata, areas[index], output, plot_type)
+
+
+def render_areas(
+        plot_module: Any,
+        plot_data: Any,
+        plot_metadata: Any,
+        areas: Sequence[Union[PlotArea, AreaRange, None]],
+        output: Union[str, AreaOutput, None] = None,
+        processes: Optional[int] = None,
+        plot_type: Optional[str] = None,
+) -> List[Any]:
+    """
+    Draw a plot for each area from plot data loaded once.
+
+    ``plot_data`` is loaded (and smoothed) for the full domain, e.g. with
+    ``cedar_graph.quickplot.load_plot``. Area params (``PlotArea.params``) are not
+    applied: all areas share the loaded fields. Each area is drawn from a shallow copy
+    of ``plot_data`` (:func:`copy_plot_data`), ``plot_data`` itself is not cropped.
+
+    Parameters
+    ----------
+    plot_module
+        recipe plot module or Python plot module, with ``plot(plot_data, plot_metadata)``.
+    plot_data
+    plot_metadata
+        ``PlotMetadata`` object of the plot, ``area_range`` and ``area_name`` are replaced per area.
+    areas
+        ``PlotArea`` objects, or ``AreaRange`` (None for the full domain) named ``area0``, ``area1``, ...
+    output
+        what to do with each panel:
+
+        * None: return the panels (only without ``processes``);
+        * path template with ``{area_name}``: save each panel and return the paths;
+        * ``output(area, panel) -> result``: return its results. The panel is closed afterwards.
+    processes
+        draw areas in this many forked processes, which share ``plot_data`` copy-on-write.
+        Draw in turn in the current process if None or 1. Results must be picklable.
+        When tracing is enabled, spans of the forked processes are merged into the tracer.
+    plot_type
+        name of the plot spans of ``cedar_graph.tracing``, :func:`plot_name` of ``plot_module`` if None.
+
+    Returns
+    -------
+    list
+        one result per area, in order of ``areas``.
+    """
+    global _fork_state
+
+    plot_areas = [_as_plot_area(index, area) for index, area in enumerate(areas)]
+    if isinstance(output, (str, Path)):
+        output = _save_output(str(output))
+
+    if processes is None or processes <= 1 or len(plot_areas) <= 1:
+        return [
+            _render_area(plot_module, plot_data, plot_metadata, area, output, plot_type)
+            for area in plot_areas
+        ]
+
+    if output is None:
+        raise ValueError("render_areas with processes needs an output, panels cannot be returned from processes")
+    tracer = get_tracer()
+    _fork_state = (plot_module, plot_data, plot_metadata, plot_areas, output, plot_type, tracer is not None)
+    try:
+        context = multiprocessing.get_context("fork")
+        with context.Pool(processes=min(processes, len(plot_areas))) as pool:
+            results = pool.map(_render_forked, range(len(plot_areas)))
+    finally:
+        _fork_state = None
+    if tracer is None:
+        return results
+    for _, events in results:
+        tracer.merge(events)
+    return [result for result, _ in results]
+
+
+def render_series(
+        plot_module: Any,
+        frames: Iterable[Tuple[Any, Any]],
+        output: Union[str, Callable[[Any], Union[str, Path]]],
+        area: Union[PlotArea, AreaRange, None] = None,
+        chrome_cache=None,
+) -> List[Path]:
+    """
+    Draw the frames of a forecast-hour series of one product and area over its cached static chrome.
+
+    The base map, gridlines, frame and colorbar are drawn once, each frame draws its data
+    layers and title only, see ``cedar_graph.composite.ChromeCache``.
+
+    Parameters
+    ----------
+    plot_module
+        recipe plot module or Python plot module, with ``plot(plot_data, plot_metadata)``.
+    frames
+        ``(plot_data, plot_metadata)`` of each forecast hour, e.g. a generator loading them in turn.
+        ``area_range`` and ``area_name`` of the metadata are replaced by ``area``.
+    output
+        path template with ``{area_name}`` and ``{forecast_hour}``,
+        or ``output(plot_metadata) -> path``.
+    area
+        ``PlotArea``, or ``AreaRange`` (None for the full domain) named ``area0``.
+    chrome_cache
+        ``ChromeCache`` shared with other series, a new one if None.
+
+    Returns
+    -------
+    list[Path]
+        one path per frame.
+    """
+    import matplotlib.pyplot as plt
+    from cedar_graph.composite import ChromeCache
+
+    if chrome_cache is None:
+        chrome_cache = ChromeCache()
+    area = _as_plot_area(0, area)
+    key = (getattr(plot_module, "__name__", repr(plot_module)), area.name, area.area)
+
+    paths = []
+    for plot_data, plot_metadata in frames:
+        plot_metadata = area_metadata(plot_metadata, area)
+        if isinstance(output, (str, Path)):
+            forecast_hour = int(pd.to_timedelta(plot_metadata.forecast_time) / pd.Timedelta(hours=1))
+            path = Path(str(output).format(area_name=area.name, forecast_hour=forecast_hour))
+        else:
+            path = Path(output(plot_metadata))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        panel = plot_module.plot(plot_data=plot_data, plot_metadata=plot_metadata)
+        try:
+            chrome_cache.save(panel, path, key=key)
+        finally:
+            plt.close(panel.fig)
+        paths.append(path)
+    return paths
@@ -0,0 +1,570 @@
+"""Warm render daemon: render plots on request in pre-initialized worker processes.
+
+Every ``quick_plot`` run from a cron pipeline imports cartopy and
+matplotlib, loads the style registry and builds the recipe engine before
+it draws anything. ``cedar-graph serve`` pays that once: worker
+processes are forked from a warm fork server (``forkserver`` start method
+with the plotting modules preloaded), warm up the registries and recipes
+when they start, and then render plot requests received over a Unix
+socket or localhost HTTP.
+
+Protocol (HTTP/1.1 on both transports):
+
+* ``POST /plot`` with a JSON :class:`PlotRequest`. Returns the PNG bytes
+  (``image/png``), or ``{"path": ..., "elapsed": ...}`` if ``output_path``
+  is set. Invalid requests get 400, render errors 500 with ``{"error": ...}``.
+* ``GET /health`` returns worker pool statistics.
+
+Workers are recycled to contain matplotlib memory growth: after
+``recycle_after`` requests the pool is replaced by a new one, requests
+already running finish in the old workers. A pool broken by a crashed
+worker is replaced as well, the requests it was running fail with 500.
+
+Examples
+--------
+.. code-block:: bash
+
+    cedar-graph serve --socket /tmp/cedar-graph.sock --workers 4
+    curl --unix-socket /tmp/cedar-graph.sock http://localhost/plot -o t2m.png \\
+        -d '{"plot_type": "cn.t2m", "system_name": "CMA-GFS", "start_time": "2024070100", "forecast_time": "24h"}'
+"""
+
+import io
+import json
+import multiprocessing
+import os
+import socketserver
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field, fields
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from cedar_graph.logger import get_logger
+
+
+logger = get_logger(__name__)
+
+#: modules imported once by the fork server, inherited by every worker.
+DEFAULT_WORKER_PRELOAD = [
+    "matplotlib.pyplot",
+    "cartopy.crs",
+    "cedar_graph.quickplot",
+    "cedar_graph.recipes.engine",
+]
+
+#: default HTTP port on localhost.
+DEFAULT_PORT = 8765
+
+#: keys of ``PlotRequest.area``, the fields of ``AreaRange``.
+AREA_KEYS = ("start_longitude", "end_longitude", "start_latitude", "end_latitude")
+
+
+@dataclass
+class PlotRequest:
+    """
+    One plot to render.
+
+    Attributes
+    ----------
+    plot_type : str
+        plot type of ``quick_plot``, such as ``"cn.t2m"``.
+    system_name : str
+    start_time : str
+        such as ``"2024070100"``.
+    forecast_time : str
+        such as ``"24h"``.
+    area : dict or None
+        ``AreaRange`` fields (``start_longitude``, ``end_longitude``, ``start_latitude``, ``end_latitude``)
+        for area plots.
+    params : dict
+        other plot settings, such as ``interval``, ``wind_level``.
+    output_path : str or None
+        write the PNG to this path instead of returning its bytes.
+    dpi : float or None
+    """
+    plot_type: str
+    system_name: str
+    start_time: str
+    forecast_time: str
+    area: Optional[Dict[str, float]] = None
+    params: Dict[str, Any] = field(default_factory=dict)
+    output_path: Optional[str] = None
+    dpi: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, content: Any) -> "PlotRequest":
+        """
+        Create a request from decoded JSON.
+
+        Raises
+        ------
+        ValueError
+            if ``content`` is not an object, misses a required key, has an unknown key
+            or a value of the wrong type.
+        """
+        if not isinstance(content, dict):
+            raise ValueError("plot request must be a JSON object")
+        names = {f.name for f in fields(cls)}
+        unknown = sorted(set(content) - names)
+        if unknown:
+            raise ValueError(f"unknown plot request keys: {unknown}")
+        missing = [name for name in ("plot_type", "system_name", "start_time", "forecast_time") if name not in content]
+        if missing:
+            raise ValueError(f"missing plot request keys: {missing}")
+        for name in ("plot_type", "system_name", "start_time", "forecast_time"):
+            if not isinstance(content[name], str):
+                raise ValueError(f"{name} must be a string")
+        if not isinstance(content.get("params", {}), dict):
+            raise ValueError("params must be a JSON object")
+        area = content.get("area")
+        if area is not None:
+            if not isinstance(area, dict) or set(area) != set(AREA_KEYS):
+                raise ValueError(f"area must be a JSON object with keys {list(AREA_KEYS)}")
+            if not all(_is_number(value) for value in area.values()):
+                raise ValueError("area values must be numbers")
+        if content.get("output_path") is not None and not isinstance(content["output_path"], str):
+            raise ValueError("output_path must be a string")
+        if content.get("dpi") is not None and not _is_number(content["dpi"]):
+            raise ValueError("dpi must be a number")
+        return cls(**content)
+
+    def plot_settings(self) -> Dict[str, Any]:
+        """Plot settings of ``show_plot``."""
+        plot_settings = dict(
+            system_name=self.system_name,
+            start_time=self.start_time,
+            forecast_time=self.forecast_time,
+            **self.params,
+        )
+        if self.area is not None:
+            plot_settings["area_range"] = dict(self.area)
+        return plot_settings
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+@dataclass
+class PlotResult:
+    """
+    Rendered plot.
+
+    Attributes
+    ----------
+    content : bytes or None
+        PNG bytes, None if written to ``path``.
+    path : str or None
+    elapsed : float
+        render time in seconds, in the worker.
+    """
+    content: Optional[bytes] = None
+    path: Optional[str] = None
+    elapsed: float = 0.0
+
+
+def warm_up(
+        style_snapshot: Optional[Union[str, Path]] = None,
+        precompile: bool = True,
+        map_cache_dir: Optional[Union[str, Path]] = None,
+        recipe_cache_dir: Optional[Union[str, Path]] = None,
+):
+    """
+    Import plotting libraries, build the process-wide style registry and recipe engine and install the map cache.
+
+    Parameters
+    ----------
+    style_snapshot
+        style registry snapshot to load, see ``LazyStyleRegistry.load_snapshot``.
+    precompile
+        parse and check all recipes (``precompile_all``).
+    map_cache_dir
+        directory of base-map geometries shared by workers, see ``install_map_cache``.
+        Geometries are cached in memory of each worker if None.
+    recipe_cache_dir
+        directory of compiled recipes shared by workers, see ``get_recipe_engine``.
+        Recipes are compiled in memory of each worker if None.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401
+    import cartopy.crs  # noqa: F401
+
+    from cedar_graph.map_cache import install_map_cache
+    from cedar_graph.recipes.compiled import precompile_all
+    from cedar_graph.recipes.engine import get_recipe_engine
+    from cedar_graph.styles.registry import get_style_registry
+
+    install_map_cache(map_cache_dir)
+
+    registry = get_style_registry()
+    if style_snapshot is not None and not registry.load_snapshot(style_snapshot):
+        logger.warning(f"style snapshot not loaded: {style_snapshot}")
+    engine = get_recipe_engine(cache_dir=recipe_cache_dir)
+    if precompile:
+        precompile_all(engine)
+
+
+def render_request(request: PlotRequest, data_source_config: Optional[Dict[str, Any]] = None) -> PlotResult:
+    """
+    Render one request in the current process, see ``create_panel``.
+
+    Parameters
+    ----------
+    request
+    data_source_config
+        keyword arguments of ``LocalDataSource``.
+
+    Returns
+    -------
+    PlotResult
+    """
+    import matplotlib.pyplot as plt
+    from cedar_graph.quickplot import create_panel
+
+    start = time.perf_counter()
+    panel = create_panel(
+        plot_type=request.plot_type,
+        plot_settings=request.plot_settings(),
+        data_source_config=dict(data_source_config or {}),
+    )
+    save_kwargs = dict(dpi=request.dpi) if request.dpi is not None else dict()
+    try:
+        if request.output_path is not None:
+            Path(request.output_path).parent.mkdir(parents=True, exist_ok=True)
+            panel.save(request.output_path, **save_kwargs)
+            content = None
+        else:
+            buffer = io.BytesIO()
+            panel.save(buffer, format="png", **save_kwargs)
+            content = buffer.getvalue()
+    finally:
+        plt.close(panel.fig)
+    return PlotResult(content=content, path=request.output_path, elapsed=time.perf_counter() - start)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+class PlotService:
+    """
+    Render plot requests on a pool of warm worker processes.
+
+    Attributes
+    ----------
+    data_source_config : dict
+        keyword arguments of ``LocalDataSource``, for all requests.
+    max_workers : int
+    recycle_after : int or None
+        replace the worker pool after this many requests. Never replaced if None.
+    timeout : float or None
+        seconds to wait for a render. The render keeps running in its worker after a timeout.
+    completed : int
+    failed : int
+    recycled : int
+        number of replaced worker pools, after ``recycle_after`` requests or a worker crash.
+    """
+    def __init__(
+            self,
+            data_source_config: Optional[Dict[str, Any]] = None,
+            max_workers: Optional[int] = None,
+            recycle_after: Optional[int] = 100,
+            timeout: Optional[float] = None,
+            style_snapshot: Optional[Union[str, Path]] = None,
+            precompile: bool = True,
+            map_cache_dir: Optional[Union[str, Path]] = None,
+            recipe_cache_dir: Optional[Union[str, Path]] = None,
+            preload: Optional[List[str]] = None,
+            executor_factory: Optional[Callable[[], Executor]] = None,
+            render: Callable[[PlotRequest, Optional[Dict[str, Any]]], PlotResult] = render_request,
+    ):
+        """
+        Parameters
+        ----------
+        data_source_config
+        max_workers
+            worker processes, ``min(4, cpu count)`` if None.
+        recycle_after
+        timeout
+        style_snapshot
+            loaded by each worker, see :func:`warm_up`.
+        precompile
+            compile all recipes in each worker, see :func:`warm_up`.
+        map_cache_dir
+            base-map geometry cache directory of the workers, see :func:`warm_up`.
+        recipe_cache_dir
+            compiled recipe cache directory of the workers, see :func:`warm_up`.
+        preload
+            modules imported by the fork server, ``DEFAULT_WORKER_PRELOAD`` if None.
+        executor_factory
+            creates a worker pool, a process pool of warm workers if None.
+        render
+            ``render(request, data_source_config) -> PlotResult``, run in the workers.
+        """
+        self.data_source_config = dict(data_source_config or {})
+        self.max_workers = max_workers if max_workers is not None else min(4, os.cpu_count() or 1)
+        self.recycle_after = recycle_after
+        self.timeout = timeout
+        self.style_snapshot = style_snapshot
+        self.precompile = precompile
+        self.map_cache_dir = map_cache_dir
+        self.recipe_cache_dir = recipe_cache_dir
+        self.preload = list(preload) if preload is not None else list(DEFAULT_WORKER_PRELOAD)
+        self.executor_factory = executor_factory if executor_factory is not None else self._create_process_pool
+        self.render_func = render
+
+        self.completed = 0
+        self.failed = 0
+        self.recycled = 0
+        self._executor: Optional[Executor] = None
+        self._submitted = 0
+        self._lock = threading.Lock()
+
+    def _create_process_pool(self) -> Executor:
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(self.preload)
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=context,
+            initializer=warm_up,
+            initargs=(self.style_snapshot, self.precompile, self.map_cache_dir, self.recipe_cache_dir),
+        )
+
+    def start(self):
+        """Create the worker pool and wait until a worker is ready."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = self.executor_factory()
+            executor = self._executor
+        executor.submit(_ping).result()
+
+    def submit(self, request: PlotRequest) -> Future:
+        """
+        Submit a request to the worker pool, replacing the pool after ``recycle_after`` requests
+        or if it is broken.
+
+        Returns
+        -------
+        Future
+            resolves to a :class:`PlotResult`.
+        """
+        return self._submit(request)[1]
+
+    def _submit(self, request: PlotRequest) -> Tuple[Executor, Future]:
+        with self._lock:
+            if self._executor is None:
+                self._executor = self.executor_factory()
+            elif self.recycle_after is not None and self._submitted >= self.recycle_after:
+                # requests already submitted finish in the old workers
+                self._replace_executor()
+            self._submitted += 1
+            try:
+                return self._executor, self._executor.submit(self.render_func, request, self.data_source_config)
+            except BrokenProcessPool:
+                # a worker crashed since the last request
+                logger.warning("worker pool broken, replacing it")
+                self._replace_executor()
+                self._submitted += 1
+                return self._executor, self._executor.submit(self.render_func, request, self.data_source_config)
+
+    def _replace_executor(self):
+        # with self._lock
+        self._executor.shutdown(wait=False)
+        self._executor = self.executor_factory()
+        self._submitted = 0
+        self.recycled += 1
+
+    def render(self, request: PlotRequest) -> PlotResult:
+        """
+        Render a request and wait for the result.
+
+        Raises
+        ------
+        TimeoutError
+            if the render takes longer than ``timeout``.
+        BrokenProcessPool
+            if a worker crashed, the pool is replaced for the next requests.
+        Exception
+            the error raised by the render.
+        """
+        executor, future = self._submit(request)
+        try:
+            result = future.result(timeout=self.timeout)
+        except BrokenProcessPool:
+            with self._lock:
+                self.failed += 1
+                if self._executor is executor:
+                    logger.warning("worker pool broken, replacing it")
+                    self._replace_executor()
+            raise
+        except BaseException:
+            with self._lock:
+                self.failed += 1
+            raise
+        with self._lock:
+            self.completed += 1
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Worker pool statistics, returned by ``GET /health``."""
+        with self._lock:
+            return dict(
+                workers=self.max_workers,
+                recycle_after=self.recycle_after,
+                completed=self.completed,
+                failed=self.failed,
+                recycled=self.recycled,
+            )
+
+    def shutdown(self, wait: bool = True):
+        """Shut down the worker pool."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+class PlotRequestHandler(BaseHTTPRequestHandler):
+    """HTTP handler of the render daemon, for TCP and Unix socket servers."""
+    server_version = "cedar-graph"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/health":
+            self._send_json(HTTPStatus.NOT_FOUND, dict(error=f"unknown path: {self.path}"))
+            return
+        self._send_json(HTTPStatus.OK, dict(status="ok", **self.server.service.stats()))
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length < 0:
+                raise ValueError(length)
+        except ValueError:
+            # the body cannot be skipped, nor the next request found
+            self.close_connection = True
+            self._send_json(HTTPStatus.BAD_REQUEST, dict(error="invalid Content-Length"))
+            return
+        # read the body first, the connection is kept alive for the next request
+        body = self.rfile.read(length)
+        if self.path.rstrip("/") != "/plot":
+            self._send_json(HTTPStatus.NOT_FOUND, dict(error=f"unknown path: {self.path}"))
+            return
+        try:
+            request = PlotRequest.from_dict(json.loads(body))
+        except ValueError as e:
+            self._send_json(HTTPStatus.BAD_REQUEST, dict(error=str(e)))
+            return
+
+        try:
+            result = self.server.service.render(request)
+        except Exception as e:
+            logger.warning(f"render failed: {request.plot_type}: {e!r}")
+            self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, dict(error=repr(e)))
+            return
+
+        if result.content is None:
+            self._send_json(HTTPStatus.OK, dict(path=result.path, elapsed=result.elapsed))
+            return
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(result.content)))
+        self.send_header("X-Render-Time", f"{result.elapsed:.3f}")
+        self.end_headers()
+        self.wfile.write(result.content)
+
+    def _send_json(self, status: HTTPStatus, content: Dict[str, Any]):
+        body = json.dumps(content).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self) -> str:
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format: str, *args):
+        logger.info(f"{self.address_string()} {format % args}")
+
+
+class PlotHTTPServer(ThreadingHTTPServer):
+    """Render daemon on a TCP address, localhost by default."""
+    def __init__(self, service: PlotService, host: str = "127.0.0.1", port: int = DEFAULT_PORT):
+        self.service = service
+        super().__init__((host, port), PlotRequestHandler)
+
+
+class PlotUnixServer(socketserver.ThreadingUnixStreamServer):
+    """Render daemon on a Unix socket. A stale socket file is replaced."""
+    daemon_threads = True
+
+    def __init__(self, service: PlotService, socket_path: Union[str, Path]):
+        self.service = service
+        self.socket_path = Path(socket_path)
+        if self.socket_path.is_socket():
+            self.socket_path.unlink()
+        super().__init__(str(self.socket_path), PlotRequestHandler)
+
+    def server_close(self):
+        super().server_close()
+        if self.socket_path.is_socket():
+            self.socket_path.unlink()
+
+
+def create_server(
+        service: PlotService,
+        socket_path: Optional[Union[str, Path]] = None,
+        host: str = "127.0.0.1",
+        port: int = DEFAULT_PORT,
+) -> socketserver.BaseServer:
+    """
+    Create the daemon server, on ``socket_path`` if set, else on ``host:port``.
+
+    Returns
+    -------
+    PlotUnixServer or PlotHTTPServer
+        call ``serve_forever()`` to accept requests.
+    """
+    if socket_path is not None:
+        return PlotUnixServer(service, socket_path)
+    return PlotHTTPServer(service, host=host, port=port)
+
+
+def serve(
+        service: PlotService,
+        socket_path: Optional[Union[str, Path]] = None,
+        host: str = "127.0.0.1",
+        port: int = DEFAULT_PORT,
+):
+    """
+    Start the worker pool and serve requests until interrupted.
+
+    Parameters
+    ----------
+    service
+    socket_path
+        Unix socket path. Serve HTTP on ``host:port`` if None.
+    host
+    port
+    """
+    service.start()
+    server = create_server(service, socket_path=socket_path, host=host, port=port)
+    address = socket_path if socket_path is not None else f"http://{host}:{server.server_address[1]}"
+    logger.info(f"cedar-graph serve: listening on {address}, {service.max_workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
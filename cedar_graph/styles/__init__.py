@@ -3,132 +3,251 @@
 ``STYLE_PATHS`` points at the YAML style files (one per element) loaded by
 ``cedarkit.plots.style.StyleRegistry.default()`` through the
 ``cedarkit.plots.styles`` entry point. Named RGB tables shared by several
-styles are registered here at import time; complex composed tables (NCL
-subsets concatenated with extra colors) are built with cedarkit-plots
-colormap helpers so the YAML files stay declarative.
+styles are registered here as factories and built on first use (through
+:func:`get_rgb_table`, installed in place of cedarkit's); complex
+composed tables (NCL subsets concatenated with extra colors) are built with
+cedarkit-plots colormap helpers so the YAML files stay declarative.
+
+:class:`~cedar_graph.styles.registry.LazyStyleRegistry` parses a style
+YAML file only when its style id is first used, see
+:func:`~cedar_graph.styles.registry.get_style_registry`.
 """
+import threading
 from pathlib import Path
+from typing import Any, Callable, Dict, List, Set
 
+import matplotlib.colors as mcolors
 import numpy as np
 
+import cedarkit.plots.style as _cedarkit_style
 from cedarkit.plots.colormap import generate_colormap_using_ncl_colors, get_ncl_colormap
 from cedarkit.plots.style import register_rgb_table
+from cedarkit.plots.style import registry as _style_registry
 
 
 STYLE_PATHS = [Path(__file__).parent / "cn"]
 
 
+#: table name -> factory of the table colors, for tables not built yet
+_rgb_table_factories: Dict[str, Callable[[], Any]] = dict()
+#: names of all tables registered with a factory
+_rgb_table_names: Set[str] = set()
+_rgb_table_lock = threading.RLock()
+
+
+def get_rgb_table(name: str) -> mcolors.ListedColormap:
+    """
+    Named RGB table, as ``cedarkit.plots.style.get_rgb_table``, running its factory first
+    if it is registered with :func:`register_rgb_table_factory` and not built yet.
+
+    Installed in place of cedarkit's ``get_rgb_table``, which builds styles with
+    ``colormap.rgb_table``.
+
+    Raises
+    ------
+    KeyError
+        unknown table name, listing built tables and tables not built yet.
+    """
+    with _rgb_table_lock:
+        factory = _rgb_table_factories.get(name)
+        if factory is not None:
+            register_rgb_table(name, factory())
+            del _rgb_table_factories[name]
+    try:
+        return _cedarkit_get_rgb_table(name)
+    except KeyError as e:
+        pending = ", ".join(pending_rgb_tables()) or "<none>"
+        raise KeyError(f"{e.args[0]}; tables built on first use: {pending}") from None
+
+
+_cedarkit_get_rgb_table = getattr(_style_registry.get_rgb_table, "__wrapped__", _style_registry.get_rgb_table)
+get_rgb_table.__wrapped__ = _cedarkit_get_rgb_table
+_style_registry.get_rgb_table = get_rgb_table
+_cedarkit_style.get_rgb_table = get_rgb_table
+
+
+def register_rgb_table_factory(name: str, factory: Callable[[], Any]):
+    """
+    Register a named RGB table built by ``factory()`` when a style first uses it.
+
+    Parameters
+    ----------
+    name
+        table name referenced by ``colormap.rgb_table`` in style files.
+    factory
+        returns the table colors (sequence of colors or ``ListedColormap``),
+        see ``cedarkit.plots.style.register_rgb_table``. Replaces a table of the same
+        name built before when it runs.
+    """
+    with _rgb_table_lock:
+        _rgb_table_factories[name] = factory
+        _rgb_table_names.add(name)
+
+
+def pending_rgb_tables() -> List[str]:
+    """Names of registered RGB tables whose factory has not run yet."""
+    with _rgb_table_lock:
+        return sorted(_rgb_table_factories)
+
+
+def build_rgb_tables() -> Dict[str, mcolors.ListedColormap]:
+    """
+    Run all pending RGB table factories.
+
+    Returns
+    -------
+    dict[str, ListedColormap]
+        all tables registered with a factory, e.g. to be saved in a registry snapshot.
+    """
+    return {name: get_rgb_table(name) for name in sorted(_rgb_table_names)}
+
+
+def restore_rgb_tables(tables: Dict[str, mcolors.ListedColormap]):
+    """
+    Register tables returned by :func:`build_rgb_tables` in another process, skipping their factories.
+
+    Parameters
+    ----------
+    tables
+    """
+    with _rgb_table_lock:
+        for name, table in tables.items():
+            if _rgb_table_factories.pop(name, None) is not None:
+                register_rgb_table(name, table)
+
+
 # 500 hPa height / MSLP shared table (h_500, psl)
-register_rgb_table("cn_hgt20", np.array([
-    (255, 255, 255),
-    (0, 0, 0),
-    (20, 100, 210),
-    (40, 130, 240),
-    (80, 165, 245),
-    (150, 210, 250),
-    (180, 240, 250),
-    (203, 248, 253),
-    (255, 255, 255),
-    (180, 250, 170),
-    (120, 245, 115),
-    (55, 210, 60),
-    (30, 180, 30),
-    (15, 160, 15),
-    (0, 0, 255),
-    (255, 0, 0),
-    (255, 140, 0),
-    (238, 18, 137),
-    (255, 121, 121),
-    (211, 211, 211),
-], dtype=float) / 255)
+def _hgt20_table():
+    return np.array([
+        (255, 255, 255),
+        (0, 0, 0),
+        (20, 100, 210),
+        (40, 130, 240),
+        (80, 165, 245),
+        (150, 210, 250),
+        (180, 240, 250),
+        (203, 248, 253),
+        (255, 255, 255),
+        (180, 250, 170),
+        (120, 245, 115),
+        (55, 210, 60),
+        (30, 180, 30),
+        (15, 160, 15),
+        (0, 0, 255),
+        (255, 0, 0),
+        (255, 140, 0),
+        (238, 18, 137),
+        (255, 121, 121),
+        (211, 211, 211),
+    ], dtype=float) / 255
+
+
+register_rgb_table_factory("cn_hgt20", _hgt20_table)
 
 
 # 10m wind speed / 850 hPa wind speed shared table (ws_10m, ws_850)
-register_rgb_table("cn_ws15", np.array([
-    (255, 255, 255),
-    (0, 0, 0),
-    (255, 255, 255),
-    (0, 200, 200),
-    (0, 210, 140),
-    (0, 220, 0),
-    (160, 230, 50),
-    (230, 220, 50),
-    (230, 175, 45),
-    (240, 130, 40),
-    (250, 60, 60),
-    (240, 0, 130),
-    (0, 0, 255),
-    (255, 140, 0),
-    (238, 18, 137)
-], dtype=float) / 255)
+def _ws15_table():
+    return np.array([
+        (255, 255, 255),
+        (0, 0, 0),
+        (255, 255, 255),
+        (0, 200, 200),
+        (0, 210, 140),
+        (0, 220, 0),
+        (160, 230, 50),
+        (230, 220, 50),
+        (230, 175, 45),
+        (240, 130, 40),
+        (250, 60, 60),
+        (240, 0, 130),
+        (0, 0, 255),
+        (255, 140, 0),
+        (238, 18, 137)
+    ], dtype=float) / 255
+
+
+register_rgb_table_factory("cn_ws15", _ws15_table)
 
 
 # composite radar reflectivity table (cdbz)
-register_rgb_table("cn_cr19", np.array([
-    (255, 255, 255),
-    (0, 0, 0),
-    (216, 216, 216),
-    (1, 160, 246),
-    (0, 236, 236),
-    (0, 216, 0),
-    (1, 144, 0),
-    (255, 255, 0),
-    (231, 192, 0),
-    (255, 144, 0),
-    (255, 0, 0),
-    (214, 0, 0),
-    (192, 0, 0),
-    (255, 0, 240),
-    (150, 0, 180),
-    (173, 144, 240),
-    (255, 140, 0),
-    (238, 18, 137),
-    (0, 0, 128)
-], dtype=float) / 255)
+def _cr19_table():
+    return np.array([
+        (255, 255, 255),
+        (0, 0, 0),
+        (216, 216, 216),
+        (1, 160, 246),
+        (0, 236, 236),
+        (0, 216, 0),
+        (1, 144, 0),
+        (255, 255, 0),
+        (231, 192, 0),
+        (255, 144, 0),
+        (255, 0, 0),
+        (214, 0, 0),
+        (192, 0, 0),
+        (255, 0, 240),
+        (150, 0, 180),
+        (173, 144, 240),
+        (255, 140, 0),
+        (238, 18, 137),
+        (0, 0, 128)
+    ], dtype=float) / 255
+
+
+register_rgb_table_factory("cn_cr19", _cr19_table)
 
 
 # pseudo-equivalent potential temperature (pte): NCL subset + appended white
-_pte_colormap = get_ncl_colormap(
-    "BkBlAqGrYeOrReViWh200",
-    index=np.array([175, 160, 156, 140, 125, 110, 100, 90, 80, 60]) - 2,
-)
-register_rgb_table("cn_pte", list(_pte_colormap.colors) + [[1, 1, 1, 1]])
+def _pte_table():
+    colormap = get_ncl_colormap(
+        "BkBlAqGrYeOrReViWh200",
+        index=np.array([175, 160, 156, 140, 125, 110, 100, 90, 80, 60]) - 2,
+    )
+    return list(colormap.colors) + [[1, 1, 1, 1]]
+
+
+register_rgb_table_factory("cn_pte", _pte_table)
 
 
 # dew point depression (t_dew_t): NCL testcmap + two extra colors
-_tdew_colormap = get_ncl_colormap("testcmap")
-register_rgb_table("cn_tdew", list(_tdew_colormap.colors) + [
-    (255 / 255, 0, 255 / 255),
-    (77 / 255, 77 / 255, 77 / 255),
-])
+def _tdew_table():
+    colormap = get_ncl_colormap("testcmap")
+    return list(colormap.colors) + [
+        (255 / 255, 0, 255 / 255),
+        (77 / 255, 77 / 255, 77 / 255),
+    ]
+
+
+register_rgb_table_factory("cn_tdew", _tdew_table)
 
 
 # vertical wind shear (shr): NCL table + user named colors
-_shr_ncl_colormap = get_ncl_colormap("WhViBlGrYeOrRe")
-_shr_user_colormap = generate_colormap_using_ncl_colors(
-    [
-        "aquamarine",
-        "RoyalBlue",
-        "LightSkyBlue",
-        "blue",
-        "PowderBlue",
-        "lightseagreen",
-        "PaleGreen",
-        "Wheat",
-        "Brown",
-        "DarkOliveGreen3",
-        "red",
-        "Green",
-        "forestgreen",
-        "deepSkyBlue",
-        "Blue",
-        "mediumpurple1",
-        "Magenta",
-        "darkorange3",
-    ],
-    "user",
-)
-register_rgb_table(
-    "cn_shr",
-    np.concatenate((_shr_ncl_colormap.colors, _shr_user_colormap.colors), axis=0),
-)
+def _shr_table():
+    ncl_colormap = get_ncl_colormap("WhViBlGrYeOrRe")
+    user_colormap = generate_colormap_using_ncl_colors(
+        [
+            "aquamarine",
+            "RoyalBlue",
+            "LightSkyBlue",
+            "blue",
+            "PowderBlue",
+            "lightseagreen",
+            "PaleGreen",
+            "Wheat",
+            "Brown",
+            "DarkOliveGreen3",
+            "red",
+            "Green",
+            "forestgreen",
+            "deepSkyBlue",
+            "Blue",
+            "mediumpurple1",
+            "Magenta",
+            "darkorange3",
+        ],
+        "user",
+    )
+    return np.concatenate((ncl_colormap.colors, user_colormap.colors), axis=0)
+
+
+register_rgb_table_factory("cn_shr", _shr_table)
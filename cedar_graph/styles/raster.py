@@ -0,0 +1,263 @@
+"""Raster fast path for filled contours of dense fields.
+
+``contourf`` traces the boundary of every level band as paths, so on
+dense grids (``cdbz``, 1 km ``t2m``) path generation takes most of the
+render time and memory. A fill style with ``render: raster`` classifies
+values into the style's ``levels`` with ``np.digitize`` instead, and draws
+the class of each grid cell with ``imshow`` (``pcolormesh`` when the grid
+or projection needs it). Class colors are taken through the same
+``BoundaryNorm`` as the colorbar, so the colorbar matches the image.
+
+``render`` is set on a style variant in the style YAML files, or on a
+recipe layer, which takes precedence over the style:
+
+.. code-block:: yaml
+
+    styles:
+      cn:
+        type: contour
+        colormap: {rgb_table: cn_cdbz}
+        levels: [5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70]
+        fill: true
+        render: raster
+
+Style files and recipes using ``render`` load with
+:class:`~cedar_graph.styles.registry.LazyStyleRegistry` and the cedar-graph
+recipe engine, cedarkit-plots' own loaders do not know the key.
+"""
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Any, Dict, Literal, Optional, Union
+
+import cartopy.crs as ccrs
+import matplotlib.axes
+import matplotlib.colors as mcolors
+import numpy as np
+import xarray as xr
+import yaml
+from pydantic import Field, model_validator
+
+from cedarkit.plots.chart.renderer import PlotRenderer, register_renderer
+from cedarkit.plots.style import ContourStyle
+from cedarkit.plots.style.schema import StyleFile, StyleFileError, StyleVariant
+
+
+#: ``render`` values of style variants and recipe layers.
+CONTOUR_RENDER = "contour"
+RASTER_RENDER = "raster"
+
+Render = Literal["contour", "raster"]
+
+
+@dataclass
+class RasterContourStyle(ContourStyle):
+    """Fill ``ContourStyle`` drawn as a classified raster by :class:`RasterRenderer`."""
+    def validate(self):
+        super().validate()
+        if not self.fill:
+            raise ValueError("raster render needs a fill style")
+        if self.levels is None:
+            raise ValueError("raster render needs style levels")
+
+
+class RasterRenderer(PlotRenderer):
+    """Renderer of :class:`RasterContourStyle`, see :func:`add_raster_fill`."""
+    def render(self, layer, data: xr.DataArray, style: RasterContourStyle, **kwargs) -> Any:
+        return add_raster_fill(layer.ax, field=data, style=style, projection=layer.projection, **kwargs)
+
+
+register_renderer(RasterContourStyle, RasterRenderer())
+
+
+def with_render(style, render: Optional[str]):
+    """
+    Return ``style`` drawn with ``render``: a :class:`RasterContourStyle` for ``"raster"``,
+    a plain ``ContourStyle`` for ``"contour"``, ``style`` itself if None or already drawn so.
+
+    Parameters
+    ----------
+    style
+        some ``Style`` object, only ``ContourStyle`` can be converted.
+    render
+        "contour", "raster" or None.
+
+    Returns
+    -------
+    Style
+    """
+    if render is None or not isinstance(style, ContourStyle):
+        return style
+    style_class = RasterContourStyle if render == RASTER_RENDER else ContourStyle
+    if type(style) is style_class:
+        return style
+    return style_class(**{f.name: getattr(style, f.name) for f in fields(ContourStyle)})
+
+
+def classify(values: np.ndarray, levels) -> np.ma.MaskedArray:
+    """
+    Index of the level band of each value, as ``contourf`` fills them.
+
+    Bands are closed at the top (``levels[i - 1] < value <= levels[i]`` is band ``i``),
+    except the first level band which also holds ``levels[0]``. Band 0 and ``len(levels)``
+    are values below and above all levels (``extend="both"``).
+
+    Parameters
+    ----------
+    values
+    levels
+        increasing levels.
+
+    Returns
+    -------
+    np.ma.MaskedArray
+        uint8 band indices, NaN values masked.
+    """
+    levels = np.asarray(levels)
+    if len(levels) > 254:
+        raise ValueError(f"too many levels for raster render: {len(levels)}")
+    values = np.asarray(values)
+    classes = np.digitize(values, levels, right=True).astype(np.uint8)
+    classes[values == levels[0]] = 1
+    return np.ma.masked_array(classes, mask=np.isnan(values))
+
+
+def band_colors(colors, levels) -> np.ndarray:
+    """
+    RGBA color of each level band (:func:`classify`), looked up through the
+    ``BoundaryNorm`` used by the colorbar of the style.
+
+    Parameters
+    ----------
+    colors
+        colormap or color list of a fill style.
+    levels
+
+    Returns
+    -------
+    np.ndarray
+        (len(levels) + 1, 4) RGBA colors.
+    """
+    levels = np.asarray(levels, dtype=float)
+    cmap = colors if isinstance(colors, mcolors.Colormap) else mcolors.ListedColormap(colors)
+    norm = mcolors.BoundaryNorm(levels, cmap.N, extend="both")
+    values = np.concatenate([[levels[0] - 1], (levels[:-1] + levels[1:]) / 2, [levels[-1] + 1]])
+    return cmap(norm(values))
+
+
+def add_raster_fill(
+        ax: matplotlib.axes.Axes,
+        field: xr.DataArray,
+        style: ContourStyle,
+        projection: Optional[ccrs.Projection] = None,
+        **kwargs,
+):
+    """
+    Draw a fill style as classified grid cells.
+
+    ``imshow`` is used for a regular grid drawn in the projection of the axes,
+    ``pcolormesh`` otherwise. Cells are centered on grid points.
+
+    Parameters
+    ----------
+    ax
+    field
+        2-D field with latitude and longitude as last two dimensions.
+    style
+        fill style with ``levels`` and ``colors``.
+    projection
+        projection of the field coordinates.
+    **kwargs
+        passed to ``imshow`` or ``pcolormesh``.
+
+    Returns
+    -------
+    matplotlib.image.AxesImage or matplotlib.collections.QuadMesh
+    """
+    classes = classify(field.values, style.levels)
+    colors = band_colors(style.colors, style.levels)
+    cmap = mcolors.ListedColormap(colors)
+    norm = mcolors.BoundaryNorm(np.arange(len(colors) + 1) - 0.5, len(colors))
+
+    x = field[field.dims[-1]].values
+    y = field[field.dims[-2]].values
+    transform: Dict[str, Any] = dict()
+    if projection is not None:
+        transform["transform"] = projection
+
+    same_projection = projection is None or getattr(ax, "projection", projection) == projection
+    if same_projection and _is_regular(x) and _is_regular(y):
+        dx = x[1] - x[0]
+        dy = y[1] - y[0]
+        return ax.imshow(
+            classes,
+            cmap=cmap,
+            norm=norm,
+            extent=(x[0] - dx / 2, x[-1] + dx / 2, y[0] - dy / 2, y[-1] + dy / 2),
+            origin="lower",
+            interpolation="nearest",
+            aspect=ax.get_aspect(),
+            **transform,
+            **kwargs,
+        )
+    return ax.pcolormesh(x, y, classes, cmap=cmap, norm=norm, shading="nearest", **transform, **kwargs)
+
+
+def _is_regular(coordinate: np.ndarray) -> bool:
+    if len(coordinate) < 2:
+        return False
+    steps = np.diff(coordinate)
+    return bool(np.allclose(steps, steps[0], rtol=1e-4, atol=0))
+
+
+class RenderStyleVariant(StyleVariant):
+    """``StyleVariant`` with ``render``: "contour" (default) or "raster" for fill styles."""
+    render: Render = CONTOUR_RENDER
+
+    @model_validator(mode="after")
+    def check_render(self) -> "RenderStyleVariant":
+        if self.render == RASTER_RENDER and (self.type != "contour" or not self.fill):
+            raise ValueError("render: raster needs a contour variant with fill: true")
+        return self
+
+
+class RenderStyleFile(StyleFile):
+    """``StyleFile`` whose variants accept ``render``."""
+    styles: Dict[str, RenderStyleVariant] = Field(min_length=1)
+
+
+def load_style_file(path: Union[str, Path]) -> RenderStyleFile:
+    """
+    Load and validate a style YAML file as ``cedarkit.plots.style.schema.load_style_file``,
+    accepting ``render`` on variants.
+
+    Raises
+    ------
+    StyleFileError
+        on YAML syntax errors (with line/column) or schema violations.
+    """
+    path = Path(path)
+    try:
+        text = path.read_text(encoding="utf-8")
+    except OSError as e:
+        raise StyleFileError(path, f"cannot read file: {e}") from e
+
+    try:
+        raw = yaml.safe_load(text)
+    except yaml.MarkedYAMLError as e:
+        mark = e.problem_mark
+        location = f"line {mark.line + 1}, column {mark.column + 1}" if mark else "unknown position"
+        raise StyleFileError(path, f"invalid YAML at {location}: {e.problem}") from e
+    except yaml.YAMLError as e:
+        raise StyleFileError(path, f"invalid YAML: {e}") from e
+
+    if not isinstance(raw, dict):
+        raise StyleFileError(path, "style file must be a YAML mapping")
+
+    try:
+        style_file = RenderStyleFile.model_validate(raw)
+    except ValueError as e:
+        raise StyleFileError(path, f"schema validation failed:\n{e}") from e
+
+    if style_file.id != path.stem:
+        raise StyleFileError(path, f"style id {style_file.id!r} does not match file name {path.stem!r}")
+    return style_file
@@ -0,0 +1,205 @@
+"""Style registry parsing style YAML files on first use, with a snapshot for worker processes.
+
+``StyleRegistry.default()`` parses every style file of every search path
+(built-in, entry points, ``CEDARKIT_STYLE_PATH``) when it is created,
+although a short-lived process plotting ``t2m`` needs one of them. A
+:class:`LazyStyleRegistry` only lists the files when it is created and
+parses a file the first time its style id is used (style files are named
+after their style id, ``t2m.yml`` for ``t2m``).
+
+A snapshot (:meth:`LazyStyleRegistry.save_snapshot`) pickles parsed
+style files and built RGB tables, so new worker processes load every
+style from one file instead of parsing YAML and reading NCL colormaps.
+Snapshot entries are keyed by style file path and modification time, an
+edited style file is parsed again.
+
+Style variants may set ``render: raster`` (see :mod:`cedar_graph.styles.raster`),
+:meth:`LazyStyleRegistry.get_style` then returns a ``RasterContourStyle``.
+
+Examples
+--------
+Once, e.g. at deployment:
+
+>>> get_style_registry().save_snapshot("/tmp/cedar-graph-styles.pickle")
+
+When a worker process starts:
+
+>>> get_style_registry().load_snapshot("/tmp/cedar-graph-styles.pickle")
+True
+"""
+
+import os
+import pickle
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import xarray as xr
+
+from cedarkit.plots.style import Style, StyleRegistry
+from cedarkit.plots.style.schema import StyleFile
+
+from cedar_graph.styles import build_rgb_tables, restore_rgb_tables
+from cedar_graph.styles.raster import load_style_file, with_render
+
+
+#: snapshot format version
+STYLE_SNAPSHOT_VERSION = 2
+
+
+class LazyStyleRegistry(StyleRegistry):
+    """
+    Style registry parsing each style file when its style id is first used.
+
+    Search path order and overrides are the same as ``StyleRegistry``.
+    :meth:`match` needs the criteria of all styles and parses every file.
+    """
+    def __init__(self, search_paths: Sequence[Union[str, Path]]):
+        # style id -> style file, in order of first occurrence like ``StyleRegistry._styles``
+        self._files: Dict[str, Path] = dict()
+        self._snapshot: Dict[str, Tuple[int, StyleFile]] = dict()
+        self._lock = threading.RLock()
+        super().__init__(search_paths)
+
+    def load_path(self, search_path: Union[str, Path]) -> None:
+        """List the style YAML files in a directory, parsed on first use (override on duplicate ids)."""
+        search_path = Path(search_path)
+        if not search_path.is_dir():
+            return
+        files = sorted(search_path.glob("*.yml")) + sorted(search_path.glob("*.yaml"))
+        with self._lock:
+            for file_path in files:
+                self._files[file_path.stem] = file_path
+                self._styles.pop(file_path.stem, None)
+
+    @property
+    def style_ids(self) -> List[str]:
+        return sorted(self._files)
+
+    @property
+    def pending_count(self) -> int:
+        """Number of style files not parsed yet."""
+        with self._lock:
+            return len(self._files) - len(self._styles)
+
+    def match(self, metadata: Mapping[str, Any]) -> Optional[str]:
+        self.load_all()
+        return super().match(metadata)
+
+    def get_style(
+            self,
+            field_id: str,
+            variant: Optional[str] = None,
+            data: Optional[xr.DataArray] = None,
+    ) -> Style:
+        self._ensure(field_id)
+        style = super().get_style(field_id, variant=variant, data=data)
+        style_file = self._styles[field_id]
+        variant_spec = style_file.styles[variant if variant is not None else style_file.optimal]
+        return with_render(style, getattr(variant_spec, "render", None))
+
+    def get_transform(self, field_id: str, variant: Optional[str] = None):
+        self._ensure(field_id)
+        return super().get_transform(field_id, variant=variant)
+
+    def load_all(self):
+        """Parse all style files not parsed yet."""
+        with self._lock:
+            if len(self._styles) == len(self._files):
+                return
+            for style_id in self._files:
+                self._ensure(style_id)
+            # match() checks styles in search order
+            self._styles = {style_id: self._styles[style_id] for style_id in self._files}
+
+    def save_snapshot(self, path: Union[str, Path]):
+        """
+        Save all parsed style files and RGB tables to ``path``.
+
+        Every style file is parsed and every RGB table built first.
+
+        Parameters
+        ----------
+        path
+            snapshot file, written atomically.
+        """
+        self.load_all()
+        tables = build_rgb_tables()
+        with self._lock:
+            styles = {
+                str(file_path): (file_path.stat().st_mtime_ns, self._styles[style_id])
+                for style_id, file_path in self._files.items()
+            }
+        content = dict(version=STYLE_SNAPSHOT_VERSION, styles=styles, rgb_tables=tables)
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(content, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def load_snapshot(self, path: Union[str, Path]) -> bool:
+        """
+        Use a snapshot saved by :meth:`save_snapshot`.
+
+        Style files are still parsed on first use, from the snapshot if the file is unchanged.
+        RGB tables not built yet are taken from the snapshot.
+
+        Parameters
+        ----------
+        path
+
+        Returns
+        -------
+        bool
+            False if the snapshot is missing, unreadable or of another format version.
+        """
+        try:
+            with open(path, "rb") as f:
+                content = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return False
+        if not isinstance(content, dict) or content.get("version") != STYLE_SNAPSHOT_VERSION:
+            return False
+        restore_rgb_tables(content["rgb_tables"])
+        with self._lock:
+            self._snapshot.update(content["styles"])
+        return True
+
+    def _ensure(self, style_id: str):
+        if style_id in self._styles:
+            return
+        with self._lock:
+            file_path = self._files.get(style_id)
+            if file_path is None or style_id in self._styles:
+                return
+            self._styles[style_id] = self._read(file_path)
+            self._paths[style_id] = file_path
+
+    def _read(self, file_path: Path) -> StyleFile:
+        entry = self._snapshot.get(str(file_path))
+        if entry is not None:
+            try:
+                mtime_ns = file_path.stat().st_mtime_ns
+            except OSError:
+                mtime_ns = None
+            if entry[0] == mtime_ns:
+                return entry[1]
+        return load_style_file(file_path)
+
+
+_registry: Optional[LazyStyleRegistry] = None
+
+
+def get_style_registry() -> LazyStyleRegistry:
+    """Process-wide lazy style registry, created by ``LazyStyleRegistry.default()``."""
+    global _registry
+    if _registry is None:
+        _registry = LazyStyleRegistry.default()
+    return _registry
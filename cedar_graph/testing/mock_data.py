@@ -35,6 +35,7 @@ import xarray as xr
 
 from cedar_graph.data import DataLoader
 from cedar_graph.data.field_info import FieldInfo
+from cedar_graph.data.operator import crop_field
 from cedar_graph.data.source import DataSource
 
 
@@ -92,6 +93,9 @@ class MockDataSource(DataSource):
             Forecast lead time. Used by accumulated fields (e.g. APCP,
             ASNOW) so that ``F(t) - F(t - dt)`` is non-zero and the
             rain plots show meaningful coverage.
+        kwargs
+            ``area`` and ``area_padding`` crop the generated field
+            to an area of interest, as ``LocalDataSource`` does.
 
         Returns
         -------
@@ -99,11 +103,15 @@ class MockDataSource(DataSource):
             Two-dimensional array with ``latitude`` and ``longitude``
             coordinates.
         """
-        return self._generate_field(
+        field = self._generate_field(
             field_info,
             start_time=start_time,
             forecast_time=forecast_time,
         )
+        area = kwargs.get("area")
+        if area is not None:
+            field = crop_field(field, area, padding=kwargs.get("area_padding", 1))
+        return field
 
     def _generate_field(
             self,
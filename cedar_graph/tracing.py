@@ -0,0 +1,476 @@
+"""Stage-level tracing spans with Chrome trace export and per-plot summaries.
+
+Spans are recorded around the stages of a plot while tracing is enabled:
+
+* data: ``retrieve`` / ``retrieve_many`` (``DataSource`` calls of ``DataLoader``),
+  ``resolve_path``, ``grib_index_scan`` and ``decode`` of GRIB messages, ``prepare_data``;
+* recipes: every transform (``transform:<op>``) and compute op (``compute:<op>``);
+* drawing: each ``panel.plot`` layer (``plot_layer``), ``title``, ``colorbar``
+  and ``panel.save`` (``save``), hooked into cedarkit while tracing is enabled.
+
+A plot span (:func:`plot_span`, opened by ``quickplot.create_panel``,
+``render.render_areas`` and the batch runners) groups the spans of one
+plot for :meth:`Tracer.summary`. Spans of threads started by a plot
+belong to it when the thread runs a :func:`propagate` callable, as the
+recipe scheduler does.
+
+Worker processes record their own spans: a task run with :func:`call_traced`
+returns the events of its spans with its result, and the tracing process adds
+them with :meth:`Tracer.merge`, keeping their ``pid``. Span ids include the
+process id, so merged spans do not collide. ``perf_counter`` times are
+comparable across processes of one host.
+
+When tracing is disabled, :func:`span` returns a shared no-op context
+manager and no hooks are installed.
+
+Examples
+--------
+>>> with trace("t2m.json") as tracer:
+...     panel = create_panel("cn.t2m", plot_settings, data_source_config={})
+...     panel.save("t2m.png")
+>>> print(tracer.format_summary())
+
+Open ``t2m.json`` in https://ui.perfetto.dev or ``chrome://tracing``.
+"""
+
+import contextvars
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+
+#: category of plot spans.
+PLOT_CATEGORY = "plot"
+
+_tracer: Optional["Tracer"] = None
+_NULL_SPAN = nullcontext()
+_span_ids = itertools.count(1)
+_current_span: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("cedar_graph_span", default=None)
+_current_plot: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("cedar_graph_plot", default=None)
+
+
+@dataclass
+class SpanEvent:
+    """
+    A finished span.
+
+    Attributes
+    ----------
+    name : str
+    category : str
+    start_ns : int
+        ``time.perf_counter_ns()`` at the start.
+    duration_ns : int
+    pid : int
+    tid : int
+    span_id : int
+    parent_id : int or None
+        span open in the same context when this one started.
+    plot_id : int or None
+        span id of the plot span this span belongs to.
+    args : dict
+    """
+    name: str
+    category: str
+    start_ns: int
+    duration_ns: int
+    pid: int
+    tid: int
+    span_id: int
+    parent_id: Optional[int] = None
+    plot_id: Optional[int] = None
+    args: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class StageStats:
+    """
+    Spans of one name in a plot.
+
+    Attributes
+    ----------
+    name : str
+    count : int
+    total_seconds : float
+    self_seconds : float
+        total minus child spans in the same thread.
+    """
+    name: str
+    count: int = 0
+    total_seconds: float = 0.0
+    self_seconds: float = 0.0
+
+
+@dataclass
+class PlotSummary:
+    """
+    Stage times of one plot span.
+
+    Attributes
+    ----------
+    name : str
+    args : dict
+    seconds : float
+    self_seconds : float
+        time of the plot span outside its child spans in the same thread, e.g. map
+        and figure creation.
+    stages : list[StageStats]
+        by total time, largest first.
+    """
+    name: str
+    args: Dict[str, Any]
+    seconds: float
+    self_seconds: float
+    stages: List[StageStats]
+
+
+class Tracer:
+    """
+    Collects span events of this process, and of worker processes with :meth:`merge`.
+
+    Attributes
+    ----------
+    events : list[SpanEvent]
+    start_ns : int
+        ``time.perf_counter_ns()`` when the tracer was created.
+    pid : int
+        process the tracer was created in.
+    """
+    def __init__(self):
+        self.events: List[SpanEvent] = []
+        self.start_ns = time.perf_counter_ns()
+        self.pid = os.getpid()
+        self._thread_names: Dict[Tuple[int, int], str] = dict()
+        self._lock = threading.Lock()
+
+    def record(self, event: SpanEvent):
+        with self._lock:
+            self.events.append(event)
+            if (event.pid, event.tid) not in self._thread_names:
+                self._thread_names[(event.pid, event.tid)] = threading.current_thread().name
+
+    def merge(self, events: List[SpanEvent]):
+        """
+        Add events recorded in another process, see :func:`call_traced`.
+
+        Parameters
+        ----------
+        events
+            events keep their ``pid`` and ``tid``, and are shown as their own process in the trace.
+        """
+        with self._lock:
+            self.events.extend(events)
+            for event in events:
+                self._thread_names.setdefault((event.pid, event.tid), f"worker {event.pid}")
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """
+        Events in the Chrome trace event format (complete ``"X"`` events, microseconds),
+        read by Perfetto and ``chrome://tracing``.
+        """
+        with self._lock:
+            events = list(self.events)
+            thread_names = dict(self._thread_names)
+        pids = sorted({self.pid, *(event.pid for event in events)})
+        trace_events: List[Dict[str, Any]] = [
+            dict(name="process_name", ph="M", pid=pid, tid=0, args=dict(name=f"cedar-graph {pid}"))
+            for pid in pids
+        ]
+        trace_events.extend(
+            dict(name="thread_name", ph="M", pid=pid, tid=tid, args=dict(name=name))
+            for (pid, tid), name in thread_names.items()
+        )
+        for event in events:
+            trace_events.append(dict(
+                name=event.name,
+                cat=event.category,
+                ph="X",
+                ts=(event.start_ns - self.start_ns) / 1000,
+                dur=event.duration_ns / 1000,
+                pid=event.pid,
+                tid=event.tid,
+                args={key: _json_value(value) for key, value in event.args.items()},
+            ))
+        return dict(traceEvents=trace_events, displayTimeUnit="ms")
+
+    def write_chrome_trace(self, path: Union[str, Path]) -> Path:
+        """Write :meth:`chrome_trace` as JSON."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.chrome_trace()), encoding="utf-8")
+        return path
+
+    def summary(self) -> List[PlotSummary]:
+        """Stage times of each plot span, in order of start."""
+        with self._lock:
+            events = list(self.events)
+
+        children_ns: Dict[Tuple[int, int], int] = dict()
+        for event in events:
+            if event.parent_id is not None:
+                key = (event.parent_id, event.tid)
+                children_ns[key] = children_ns.get(key, 0) + event.duration_ns
+
+        plots = sorted((event for event in events if event.category == PLOT_CATEGORY), key=lambda e: e.start_ns)
+        summaries = []
+        for plot in plots:
+            stages: Dict[str, StageStats] = dict()
+            for event in events:
+                if event.plot_id != plot.span_id or event is plot:
+                    continue
+                stats = stages.setdefault(event.name, StageStats(name=event.name))
+                self_ns = max(event.duration_ns - children_ns.get((event.span_id, event.tid), 0), 0)
+                stats.count += 1
+                stats.total_seconds += event.duration_ns / 1e9
+                stats.self_seconds += self_ns / 1e9
+            summaries.append(PlotSummary(
+                name=plot.name,
+                args=dict(plot.args),
+                seconds=plot.duration_ns / 1e9,
+                self_seconds=max(plot.duration_ns - children_ns.get((plot.span_id, plot.tid), 0), 0) / 1e9,
+                stages=sorted(stages.values(), key=lambda stats: stats.total_seconds, reverse=True),
+            ))
+        return summaries
+
+    def format_summary(self) -> str:
+        """:meth:`summary` as text tables, one per plot."""
+        lines = []
+        for plot in self.summary():
+            title = " ".join([plot.name, *(f"{key}={value}" for key, value in plot.args.items())])
+            lines.append(f"{title}: {plot.seconds:.3f}s")
+            lines.append(f"  {'stage':<28}{'count':>7}{'total ms':>12}{'self ms':>12}{'share':>8}")
+            other = StageStats(name="(other)", count=1, total_seconds=plot.self_seconds, self_seconds=plot.self_seconds)
+            for stats in [*plot.stages, other]:
+                share = stats.total_seconds / plot.seconds if plot.seconds > 0 else 0.0
+                lines.append(
+                    f"  {stats.name:<28}{stats.count:>7}{stats.total_seconds * 1000:>12.1f}"
+                    f"{stats.self_seconds * 1000:>12.1f}{share:>8.1%}"
+                )
+        return "\n".join(lines)
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "category", "args", "plot", "span_id", "start_ns", "tokens")
+
+    def __init__(self, tracer: Tracer, name: str, category: str, args: Dict[str, Any], plot: bool = False):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.plot = plot
+
+    def __enter__(self):
+        # unique across processes, for spans merged from worker processes
+        self.span_id = os.getpid() << 32 | next(_span_ids)
+        self.tokens = (
+            _current_span.set(self.span_id),
+            _current_plot.set(self.span_id) if self.plot else None,
+        )
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end_ns = time.perf_counter_ns()
+        span_token, plot_token = self.tokens
+        _current_span.reset(span_token)
+        if plot_token is not None:
+            _current_plot.reset(plot_token)
+        self.tracer.record(SpanEvent(
+            name=self.name,
+            category=self.category,
+            start_ns=self.start_ns,
+            duration_ns=end_ns - self.start_ns,
+            pid=os.getpid(),
+            tid=threading.get_ident(),
+            span_id=self.span_id,
+            parent_id=span_token.old_value if span_token.old_value is not contextvars.Token.MISSING else None,
+            plot_id=self.span_id if self.plot else _current_plot.get(),
+            args=self.args,
+        ))
+        return False
+
+
+def span(name: str, category: str = "stage", **args):
+    """
+    Context manager recording a span while tracing is enabled, a shared no-op otherwise.
+
+    Parameters
+    ----------
+    name
+    category
+    **args
+        shown with the span in the trace viewer.
+    """
+    tracer = _tracer
+    if tracer is None:
+        return _NULL_SPAN
+    return _Span(tracer, name, category, args)
+
+
+def plot_span(name: str, **args):
+    """A span grouping the spans of one plot for :meth:`Tracer.summary`."""
+    tracer = _tracer
+    if tracer is None:
+        return _NULL_SPAN
+    return _Span(tracer, name, PLOT_CATEGORY, args, plot=True)
+
+
+def traced(name: Optional[str] = None, category: str = "stage") -> Callable:
+    """Decorator recording a span around each call, see :func:`span`."""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return func(*args, **kwargs)
+            with _Span(tracer, span_name, category, dict()):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def propagate(func: Callable) -> Callable:
+    """``func`` running in the current plot and span, for threads started by it. ``func`` if disabled."""
+    if _tracer is None:
+        return func
+    return functools.partial(contextvars.copy_context().run, func)
+
+
+def call_traced(func: Callable, *args, **kwargs) -> Tuple[Any, List[SpanEvent]]:
+    """
+    Call ``func`` recording its spans, as a task of a worker process of a traced run.
+
+    The tracing process adds the returned events to its tracer with :meth:`Tracer.merge`.
+    Tracing is enabled for the call only. A tracer inherited by a forked process is
+    replaced during the call, because its events never reach the parent. In the
+    process of an enabled tracer (e.g. a thread pool), spans are recorded there and
+    no events are returned.
+
+    Returns
+    -------
+    tuple[Any, list[SpanEvent]]
+        result of ``func`` and the span events of the call.
+    """
+    if _tracer is not None and _tracer.pid == os.getpid():
+        return func(*args, **kwargs), []
+    tracer = enable_tracing(Tracer())
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        disable_tracing()
+    return result, tracer.events
+
+
+def is_tracing() -> bool:
+    return _tracer is not None
+
+
+def get_tracer() -> Optional[Tracer]:
+    """Tracer of this process, None if tracing is disabled."""
+    return _tracer
+
+
+def _hooked_methods() -> List[Tuple[type, str, str, str]]:
+    """
+    Methods recorded as spans: on ``Panel``, and on ``MapTemplate`` and every subclass
+    overriding them (e.g. ``set_title`` of ``GlobalMapTemplate`` and ``EnsCNMapTemplate``).
+    """
+    from cedarkit.plots.chart.panel import Panel
+    from cedarkit.plots.domains import MapTemplate
+
+    methods = [
+        (Panel, "plot", "plot_layer", "draw"),
+        (Panel, "save", "save", "output"),
+    ]
+    templates = [MapTemplate]
+    for template in templates:
+        templates.extend(subclass for subclass in template.__subclasses__() if subclass not in templates)
+        for method_name, span_name in (("set_title", "title"), ("add_colorbar", "colorbar")):
+            if method_name in template.__dict__:
+                methods.append((template, method_name, span_name, "draw"))
+    return methods
+
+
+_original_methods: Dict[Tuple[type, str], Callable] = dict()
+_active_hook: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("cedar_graph_hook", default=None)
+
+
+def _hook(cls: type, method_name: str, span_name: str, category: str):
+    method = cls.__dict__[method_name]
+    _original_methods[(cls, method_name)] = method
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        # an override calling ``super()`` is recorded once
+        if _active_hook.get() == span_name:
+            return method(*args, **kwargs)
+        token = _active_hook.set(span_name)
+        try:
+            with span(span_name, category):
+                return method(*args, **kwargs)
+        finally:
+            _active_hook.reset(token)
+    setattr(cls, method_name, wrapper)
+
+
+def enable_tracing(tracer: Optional[Tracer] = None) -> Tracer:
+    """
+    Record spans in ``tracer`` (a new one if None) and hook cedarkit drawing methods.
+
+    Returns
+    -------
+    Tracer
+    """
+    global _tracer
+    if tracer is None:
+        tracer = Tracer()
+    if not _original_methods:
+        for cls, method_name, span_name, category in _hooked_methods():
+            _hook(cls, method_name, span_name, category)
+    _tracer = tracer
+    return tracer
+
+
+def disable_tracing() -> Optional[Tracer]:
+    """Stop recording and remove the hooks. Returns the tracer that was enabled."""
+    global _tracer
+    tracer = _tracer
+    _tracer = None
+    for (cls, method_name), method in _original_methods.items():
+        setattr(cls, method_name, method)
+    _original_methods.clear()
+    return tracer
+
+
+@contextmanager
+def trace(path: Union[str, Path, None] = None, summary_path: Union[str, Path, None] = None) -> Iterator[Tracer]:
+    """
+    Enable tracing in the block, then write the Chrome trace to ``path`` and the summary to
+    ``summary_path`` if set.
+    """
+    tracer = enable_tracing()
+    try:
+        yield tracer
+    finally:
+        disable_tracing()
+        if path is not None:
+            tracer.write_chrome_trace(path)
+        if summary_path is not None:
+            summary_path = Path(summary_path)
+            summary_path.parent.mkdir(parents=True, exist_ok=True)
+            summary_path.write_text(tracer.format_summary() + "\n", encoding="utf-8")
+
+
+def _json_value(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
@@ -0,0 +1,25 @@
+"""Data source wrapper counting retrieved fields, shared by data loading tests."""
+from collections import Counter
+from typing import Optional
+
+import pandas as pd
+
+from cedar_graph.data import DataSource
+
+
+class CountingDataSource(DataSource):
+    """Wrap a data source and count retrieved (field name, forecast time)."""
+    def __init__(self, data_source: DataSource, system_name: Optional[str] = None):
+        super().__init__()
+        self.data_source = data_source
+        self.system_name = system_name
+        self.counts = Counter()
+
+    @property
+    def count(self) -> int:
+        """Number of retrieved fields."""
+        return sum(self.counts.values())
+
+    def retrieve(self, field_info, start_time, forecast_time, **kwargs):
+        self.counts[(field_info.name, pd.Timedelta(forecast_time))] += 1
+        return self.data_source.retrieve(field_info, start_time, forecast_time, **kwargs)
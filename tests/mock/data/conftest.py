@@ -0,0 +1,47 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from cedar_graph.data.grib_index import clear_message_indexes
+
+eccodes = pytest.importorskip("eccodes")
+
+
+#: (shortName, isobaricInhPa level) of messages written to the test GRIB file, in file order.
+GRIB_MESSAGES = [
+    ("t", 850),
+    ("t", 500),
+    ("u", 850),
+    ("v", 850),
+    ("u", 500),
+    ("v", 500),
+]
+
+
+def write_grib_file(file_path: Path, messages=GRIB_MESSAGES) -> Path:
+    """Write a small pressure-level GRIB2 file from the ecCodes sample, values offset by level."""
+    with open(file_path, "wb") as f:
+        for short_name, level in messages:
+            message = eccodes.codes_grib_new_from_samples("regular_ll_pl_grib2")
+            eccodes.codes_set(message, "shortName", short_name)
+            eccodes.codes_set(message, "level", level)
+            size = eccodes.codes_get(message, "Ni") * eccodes.codes_get(message, "Nj")
+            eccodes.codes_set_values(message, np.arange(size, dtype=float) + level + ord(short_name))
+            eccodes.codes_write(message, f)
+            eccodes.codes_release(message)
+    return file_path
+
+
+@pytest.fixture
+def grib_file(tmp_path) -> Path:
+    """A small GRIB2 file with t/u/v at 850 and 500 hPa."""
+    return write_grib_file(Path(tmp_path, "test.grb2"))
+
+
+@pytest.fixture
+def clean_message_indexes():
+    """Drop GRIB message indexes built by other tests, and by the test itself after it."""
+    clear_message_indexes()
+    yield
+    clear_message_indexes()
@@ -0,0 +1,62 @@
+"""Test the accumulation cache with time_diff recipes over a series of lead times."""
+from pathlib import Path
+
+import pandas as pd
+import xarray as xr
+
+from cedarkit.plots.engine.recipe import load_recipe_file
+
+from cedar_graph.data import AccumulationCache, DataLoader
+from cedar_graph.data.field_info import apcp_info, t_2m_info
+from cedar_graph.recipes.engine import FIELD_INFOS, RecipePlotEngine, create_op_registry
+
+from ..counting_source import CountingDataSource
+
+
+RECIPE_DIR = Path(__file__).parents[3] / "cedar_graph" / "recipes" / "cn"
+
+
+def rain_24h():
+    engine = RecipePlotEngine(op_registry=create_op_registry(), field_registry=FIELD_INFOS)
+    return engine.build_module(load_recipe_file(RECIPE_DIR / "rain_24h.yaml"))
+
+
+def test_series_reads_each_accumulation_once(mock_data_source, start_time):
+    module = rain_24h()
+    data_source = CountingDataSource(mock_data_source)
+    cache = AccumulationCache(window=pd.Timedelta(hours=24))
+    data_loader = DataLoader(data_source=data_source, accumulation_cache=cache)
+    forecast_times = pd.timedelta_range("24h", "48h", freq="3h")
+
+    for forecast_time in cache.walk(reversed(forecast_times)):
+        plot_data = module.load_data(data_loader, start_time, forecast_time)
+        expected = module.load_data(DataLoader(data_source=mock_data_source), start_time, forecast_time)
+        xr.testing.assert_identical(plot_data.rain, expected.rain)
+        assert min(step[2] for step in cache.steps()) >= forecast_time - cache.window
+
+    # 0-48h at 3h steps, each read once
+    assert set(data_source.counts.values()) == {1}
+    assert len(data_source.counts) == 17
+
+
+def test_intervals_share_accumulations(mock_data_source, start_time, forecast_time):
+    module = rain_24h()
+    data_source = CountingDataSource(mock_data_source)
+    data_loader = DataLoader(data_source=data_source, accumulation_cache=AccumulationCache())
+    for interval in ["1h", "3h", "6h", "12h", "24h"]:
+        module.load_data(data_loader, start_time, forecast_time, interval=interval)
+    assert data_source.counts[("apcp", forecast_time)] == 1
+    assert sum(data_source.counts.values()) == 6
+
+
+def test_only_accumulated_fields(mock_data_source, start_time, forecast_time):
+    cache = AccumulationCache()
+    assert cache.is_accumulated(apcp_info)
+    assert not cache.is_accumulated(t_2m_info)
+
+    data_loader = DataLoader(data_source=mock_data_source, accumulation_cache=cache)
+    data_loader.load_many([apcp_info, t_2m_info], start_time, forecast_time)
+    assert len(cache) == 1
+    found, field = cache.get(apcp_info, None, start_time, forecast_time)
+    assert found
+    assert data_loader.load(apcp_info, start_time, forecast_time) is field
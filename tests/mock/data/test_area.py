@@ -0,0 +1,81 @@
+"""Test area-of-interest pushdown into data loading."""
+import copy
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from cedarkit.plots.types import AreaRange
+
+from cedar_graph.data import DataLoader, FieldCache
+from cedar_graph.data.field_info import t_info
+from cedar_graph.data.operator import crop_field, extract_area, is_within_area, prepare_data
+from cedar_graph.quickplot import load_plot
+from cedar_graph.testing import MockDataSource
+
+
+NORTH_CHINA = AreaRange.from_tuple((108, 123, 34, 44))
+
+
+def test_load_with_area(mock_data_source, start_time, forecast_time):
+    field_info = t_info.with_level("pl", 850)
+    full_field = DataLoader(data_source=mock_data_source).load(
+        field_info=field_info,
+        start_time=start_time,
+        forecast_time=forecast_time,
+    )
+    field = DataLoader(data_source=mock_data_source, area=NORTH_CHINA, area_padding=2).load(
+        field_info=field_info,
+        start_time=start_time,
+        forecast_time=forecast_time,
+    )
+
+    assert field.size < full_field.size
+    assert is_within_area(field, NORTH_CHINA, padding=2)
+    assert not is_within_area(field, NORTH_CHINA, padding=1)
+    xr.testing.assert_identical(extract_area(field, NORTH_CHINA), extract_area(full_field, NORTH_CHINA))
+
+
+def test_extract_area_skips_cropped_field(mock_data_source, start_time, forecast_time):
+    full_field = mock_data_source.retrieve(t_info.with_level("pl", 850), start_time, forecast_time)
+    field = crop_field(full_field, NORTH_CHINA, padding=1)
+    extracted = extract_area(field, NORTH_CHINA)
+    assert extracted.shape == field.shape
+    assert np.shares_memory(extracted.values, field.values)
+    xr.testing.assert_identical(extracted, extract_area(full_field, NORTH_CHINA))
+
+
+def test_area_in_cache_key(mock_data_source, start_time, forecast_time):
+    cache = FieldCache()
+    data_loader = DataLoader(data_source=mock_data_source, cache=cache)
+    field_info = t_info.with_level("pl", 850)
+    data_loader.load(field_info, start_time, forecast_time)
+    field = data_loader.load(field_info, start_time, forecast_time, area=NORTH_CHINA)
+    assert len(cache) == 2
+    assert is_within_area(field, NORTH_CHINA)
+
+
+@pytest.mark.parametrize("sample_step", [0.25, 0.45])
+def test_load_plot_pushdown_sampled(start_time, forecast_time, system_name, sample_step):
+    """Sampling steps wider than the padding of the loaded window (4 grid steps) keep the outer sampled rows."""
+    data_source = MockDataSource(resolution=0.05)
+    plot_settings = dict(
+        system_name=system_name,
+        start_time=start_time,
+        forecast_time=str(forecast_time),
+        area_range=NORTH_CHINA,
+        sample_step=sample_step,
+        level=850,
+    )
+    prepared = []
+    for area_pushdown in (False, True):
+        plot_module, plot_metadata, plot_data = load_plot(
+            "cn.t_dew_t.default", plot_settings, data_source_config={}, data_source=data_source,
+            area_pushdown=area_pushdown,
+        )
+        prepared.append(prepare_data(copy.copy(plot_data), plot_metadata, total_area=NORTH_CHINA))
+
+    expected, result = prepared
+    assert result.field_t.size == expected.field_t.size
+    for name in ("field_t", "field_t_dew_t_diff"):
+        xr.testing.assert_identical(getattr(result, name), getattr(expected, name))
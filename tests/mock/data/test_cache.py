@@ -0,0 +1,53 @@
+"""Test the LRU field cache in DataLoader."""
+import numpy as np
+import xarray as xr
+
+from cedar_graph.data import DataLoader, FieldCache
+from cedar_graph.data.field_info import u_info, v_info, t_2m_info
+
+from ..counting_source import CountingDataSource
+
+
+def test_cache_hit(mock_data_source, start_time, forecast_time):
+    data_source = CountingDataSource(mock_data_source, system_name="CMA-GFS")
+    cache = FieldCache()
+    first = DataLoader(data_source=data_source, cache=cache)
+    second = DataLoader(data_source=data_source, cache=cache)
+
+    field = first.load(field_info=u_info.with_level("pl", 850), start_time=start_time, forecast_time=forecast_time)
+    fields = second.load_many(
+        field_infos=[u_info.with_level("pl", 850), v_info.with_level("pl", 850)],
+        start_time=start_time,
+        forecast_time=forecast_time,
+    )
+
+    assert fields[0] is field
+    assert data_source.count == 2
+    stats = cache.stats
+    assert (stats.hits, stats.misses, stats.count) == (1, 2, 2)
+    assert stats.current_bytes == field.nbytes + fields[1].nbytes
+
+
+def test_cache_key_includes_time(mock_data_source, start_time, forecast_time):
+    data_source = CountingDataSource(mock_data_source, system_name="CMA-GFS")
+    data_loader = DataLoader(data_source=data_source, cache=FieldCache())
+    data_loader.load(field_info=t_2m_info, start_time=start_time, forecast_time=forecast_time)
+    data_loader.load(field_info=t_2m_info, start_time=start_time, forecast_time=forecast_time * 2)
+    assert data_source.count == 2
+
+
+def test_lru_eviction():
+    field = xr.DataArray(np.zeros((10, 10)))
+    cache = FieldCache(max_bytes=field.nbytes * 2)
+    cache.put("a", field)
+    cache.put("b", field.copy())
+    assert cache.get("a") is field
+    cache.put("c", field.copy())
+
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert cache.stats.evictions == 1
+    assert cache.stats.current_bytes == field.nbytes * 2
+
+    cache.put("large", xr.DataArray(np.zeros((100, 100))))
+    assert "large" not in cache
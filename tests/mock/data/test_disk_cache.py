@@ -0,0 +1,123 @@
+"""Test the on-disk decoded-field cache."""
+import os
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from cedar_graph.data import LocalDataSource, disk_cache
+from cedar_graph.data.disk_cache import DiskCachedDataSource, DiskFieldCache
+from cedar_graph.data.field_info import t_info, u_info, v_info
+from cedar_graph.data.source import FilePathCache
+
+
+class CountingLocalDataSource(LocalDataSource):
+    def __init__(self, grib_file):
+        super().__init__(
+            system_name="CMA-GFS",
+            file_path_func=lambda **kwargs: grib_file,
+            path_cache=FilePathCache(),
+        )
+        self.count = 0
+
+    def retrieve_many(self, field_infos, start_time, forecast_time):
+        self.count += len(field_infos)
+        return super().retrieve_many(field_infos, start_time=start_time, forecast_time=forecast_time)
+
+
+@pytest.fixture
+def local_data_source(grib_file):
+    return CountingLocalDataSource(grib_file)
+
+
+def test_cached_field_equals_decoded(local_data_source, grib_file, tmp_path, start_time, forecast_time):
+    data_source = DiskCachedDataSource(local_data_source, cache_dir=tmp_path / "cache")
+    field_infos = [t_info.with_level("pl", 850), u_info.with_level("pl", 500)]
+
+    decoded = data_source.retrieve_many(field_infos, start_time=start_time, forecast_time=forecast_time)
+    # a second source (another process) reads the same cache directory
+    other = DiskCachedDataSource(CountingLocalDataSource(grib_file), cache_dir=tmp_path / "cache")
+    cached = other.retrieve_many(field_infos, start_time=start_time, forecast_time=forecast_time)
+
+    assert local_data_source.count == 2
+    assert other.data_source.count == 0
+    for expected, field in zip(decoded, cached):
+        assert isinstance(field.data, np.memmap)
+        xr.testing.assert_identical(field, expected)
+
+
+def test_file_change_invalidates(local_data_source, grib_file, tmp_path, start_time, forecast_time):
+    data_source = DiskCachedDataSource(local_data_source, cache_dir=tmp_path / "cache")
+    info = v_info.with_level("pl", 850)
+    data_source.retrieve(info, start_time=start_time, forecast_time=forecast_time)
+    os.utime(grib_file, ns=(0, 0))
+    data_source.retrieve(info, start_time=start_time, forecast_time=forecast_time)
+    assert local_data_source.count == 2
+
+
+def test_missing_field_not_cached(local_data_source, tmp_path, start_time, forecast_time):
+    data_source = DiskCachedDataSource(local_data_source, cache_dir=tmp_path / "cache")
+    info = t_info.with_level("pl", 300)
+    assert data_source.retrieve(info, start_time=start_time, forecast_time=forecast_time) is None
+    assert data_source.cache.entries() == []
+
+
+def test_lru_eviction(tmp_path):
+    cache = DiskFieldCache(tmp_path / "cache")
+    field = xr.DataArray(np.zeros((10, 10)), dims=["latitude", "longitude"], name="t")
+    cache.put("a" * 40, field)
+    entry_size = cache.total_bytes()
+    cache.max_bytes = entry_size * 2
+    cache.put("b" * 40, field)
+    os.utime(cache._entry_path("a" * 40, ".json"), (0, 0))
+    cache.put("c" * 40, field)
+
+    assert cache.get("a" * 40) is None
+    assert cache.get("b" * 40) is not None
+    assert cache.get("c" * 40) is not None
+    assert cache.total_bytes() <= cache.max_bytes
+
+
+def test_eviction_tracks_size(tmp_path, monkeypatch):
+    """The directory is scanned at the first put and when the tracked size exceeds the cap."""
+    cache = DiskFieldCache(tmp_path / "cache")
+    field = xr.DataArray(np.zeros((10, 10)), dims=["latitude", "longitude"], name="t")
+    scans = []
+    entries = cache.entries
+    monkeypatch.setattr(cache, "entries", lambda: scans.append(1) or entries())
+
+    cache.put("a" * 40, field)
+    entry_size = cache.total_bytes()
+    scans.clear()
+    cache.max_bytes = entry_size * 3
+    cache.put("b" * 40, field)
+    cache.put("c" * 40, field)
+    assert scans == []
+    cache.put("d" * 40, field)
+    assert len(scans) == 1
+    assert cache.total_bytes() <= cache.max_bytes
+
+    # entries added by another process are counted at the next scan
+    monkeypatch.setattr(disk_cache, "DISK_CACHE_SCAN_INTERVAL", 2)
+    other = DiskFieldCache(tmp_path / "cache", max_bytes=cache.max_bytes * 2)
+    other.put("e" * 40, field)
+    other.put("f" * 40, field)
+    cache.put("g" * 40, field)
+    cache.put("h" * 40, field)
+    assert cache.total_bytes() <= cache.max_bytes
+
+
+@pytest.mark.parametrize("field", [
+    xr.DataArray(np.zeros(3), dims=["x"], name="t1", attrs=dict(levels=(850, 500))),
+    xr.DataArray(np.zeros(3), dims=["x"], name="t2", attrs=dict(level=np.int64(850))),
+    xr.DataArray(np.zeros(3), dims=["x"], coords=dict(x=np.array(["a", 1, None], dtype=object)), name="t3"),
+])
+def test_uncacheable_field(tmp_path, field, monkeypatch):
+    """A field whose hit would differ from the field is not cached, and logged once."""
+    warnings = []
+    monkeypatch.setattr(disk_cache.logger, "warning", warnings.append)
+    cache = DiskFieldCache(tmp_path / "cache")
+    cache.put("a" * 40, field)
+    cache.put("b" * 40, field)
+    assert cache.entries() == []
+    assert len(warnings) == 1 and field.name in warnings[0]
@@ -0,0 +1,54 @@
+"""Test immutable and hashable FieldInfo."""
+import copy
+import dataclasses
+import pickle
+
+import pytest
+
+from cedar_graph.data.field_info import FieldInfo, Parameter, t_info, vwsh_info
+
+
+def test_with_level():
+    info = t_info.with_level("pl", 850)
+    assert info.level_type == "pl"
+    assert info.level == 850
+    assert t_info.level_type is None and t_info.level is None
+    assert info == t_info.with_level("pl", 850)
+    assert hash(info) == hash(t_info.with_level("pl", 850))
+    assert info != t_info.with_level("pl", 500)
+
+
+def test_with_level_keys():
+    info = t_info.with_level("pl", 850, stepType="instant")
+    assert info.additional_keys == {"stepType": "instant"}
+    assert t_info.additional_keys is None
+
+
+def test_dict_level():
+    info = vwsh_info.with_level("heightAboveGroundLayer", {"first_level": 6000, "second_level": 0})
+    same = vwsh_info.with_level("heightAboveGroundLayer", {"second_level": 0, "first_level": 6000})
+    assert isinstance(info.level, dict)
+    assert info.level["first_level"] == 6000
+    assert info == same
+    assert len({info, same}) == 1
+
+
+def test_dict_parameter():
+    info = FieldInfo(name="x", parameter=Parameter(eccodes_keys={"discipline": 0, "parameterNumber": 1}))
+    assert isinstance(info.parameter.get_parameter(), dict)
+    assert hash(info) == hash(copy.deepcopy(info))
+
+
+def test_immutable():
+    info = t_info.with_level("pl", 850, stepType="instant")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        info.level = 500
+    with pytest.raises(TypeError):
+        info.additional_keys["stepType"] = "accum"
+
+
+def test_pickle():
+    info = vwsh_info.with_level("heightAboveGroundLayer", {"first_level": 6000, "second_level": 0})
+    loaded = pickle.loads(pickle.dumps(info))
+    assert loaded == info
+    assert hash(loaded) == hash(info)
@@ -0,0 +1,73 @@
+"""Test GRIB message index against the sequential reki scan."""
+import os
+
+import pytest
+import reki
+import xarray as xr
+
+from cedar_graph.data.field_info import t_info, u_info, v_info, FieldInfo, Parameter
+from cedar_graph.data.grib_index import (
+    GribMessageIndex,
+    get_message_index,
+)
+from cedar_graph.data.source import get_field_from_file
+
+
+pytestmark = pytest.mark.usefixtures("clean_message_indexes")
+
+
+def without_count(field: xr.DataArray) -> xr.DataArray:
+    """GRIB_count is the ecCodes message counter of the reading handle, not a message property."""
+    return field.drop_attrs(deep=False).assign_attrs(
+        {k: v for k, v in field.attrs.items() if k != "GRIB_count"}
+    )
+
+
+@pytest.mark.parametrize("field_info", [t_info, u_info, v_info])
+@pytest.mark.parametrize("level", [850, 500])
+def test_indexed_field_equals_scan(grib_file, field_info, level):
+    info = field_info.with_level("pl", level)
+    expected = reki.from_source("file", grib_file).sel(
+        parameter=info.parameter.get_parameter(),
+        level_type=info.level_type,
+        level=info.level,
+    ).first().to_xarray()
+
+    field = get_field_from_file(field_info=info, file_path=grib_file)
+
+    xr.testing.assert_identical(without_count(field), without_count(expected))
+
+
+def test_lookup_is_cached(grib_file):
+    message_index = get_message_index(grib_file)
+    offset = message_index.lookup(u_info.with_level("pl", 850))
+    assert offset is not None and offset > 0
+    assert get_message_index(grib_file) is message_index
+    assert len(message_index.offsets) == 1
+    assert message_index.lookup(u_info.with_level("pl", 850)) == offset
+
+
+def test_missing_field(grib_file):
+    info = FieldInfo(name="x", parameter=Parameter(eccodes_short_name="gh"), level_type="pl", level=850)
+    assert get_field_from_file(field_info=info, file_path=grib_file) is None
+    assert list(get_message_index(grib_file).offsets.values()) == [None]
+
+
+def test_sidecar(grib_file, tmp_path):
+    index_dir = tmp_path / "index"
+    info = v_info.with_level("pl", 500)
+    offset = GribMessageIndex(grib_file, index_dir=index_dir).lookup(info)
+
+    reloaded = GribMessageIndex(grib_file, index_dir=index_dir)
+    assert reloaded.sidecar_path.exists()
+    assert list(reloaded.offsets.values()) == [offset]
+
+
+def test_stale_index(grib_file):
+    message_index = get_message_index(grib_file)
+    message_index.lookup(t_info.with_level("pl", 850))
+    with open(grib_file, "ab") as f:
+        f.write(b"7777")
+    os.utime(grib_file, ns=(0, 0))
+    assert message_index.is_stale()
+    assert get_message_index(grib_file) is not message_index
@@ -0,0 +1,39 @@
+"""Test DataLoader batch loading with the mock data source."""
+import xarray as xr
+
+from cedar_graph.data import DataLoader
+from cedar_graph.data.field_info import u_info, v_info, t_2m_info
+from cedar_graph.data.loader import PrefetchedDataLoader
+
+
+def test_load_many(mock_data_source, start_time, forecast_time):
+    data_loader = DataLoader(data_source=mock_data_source)
+    field_infos = [u_info.with_level("pl", 850), v_info.with_level("pl", 850), t_2m_info]
+    fields = data_loader.load_many(field_infos=field_infos, start_time=start_time, forecast_time=forecast_time)
+    for field_info, field in zip(field_infos, fields):
+        expected = data_loader.load(field_info=field_info, start_time=start_time, forecast_time=forecast_time)
+        xr.testing.assert_identical(field, expected)
+
+
+def test_prefetched_data_loader(mock_data_source, start_time, forecast_time):
+    data_loader = DataLoader(data_source=mock_data_source)
+    u_850_info = u_info.with_level("pl", 850)
+    prefetched_field = data_loader.load(field_info=u_850_info, start_time=start_time, forecast_time=forecast_time)
+    prefetched_loader = PrefetchedDataLoader(
+        data_loader=data_loader,
+        start_time=start_time,
+        forecast_time=forecast_time,
+        fields=[(u_850_info, prefetched_field)],
+    )
+
+    assert prefetched_loader.load(
+        field_info=u_info.with_level("pl", 850), start_time=start_time, forecast_time=forecast_time,
+    ) is prefetched_field
+    assert prefetched_loader.load(
+        field_info=u_850_info, start_time=start_time, forecast_time=forecast_time * 2,
+    ) is not prefetched_field
+    fields = prefetched_loader.load_many(
+        field_infos=[u_850_info, v_info.with_level("pl", 850)], start_time=start_time, forecast_time=forecast_time,
+    )
+    assert fields[0] is prefetched_field
+    assert fields[1].name == "v"
@@ -0,0 +1,108 @@
+"""Test cached grid indices of sample_nearest and extract_area, and automatic sample steps."""
+from dataclasses import dataclass
+
+import pytest
+import xarray as xr
+from reki.operator import sample_nearest
+
+from cedarkit.plots.domains import EastAsiaMapTemplate
+from cedarkit.plots.domains.layout import LayoutConfig
+from cedarkit.plots.types import AreaRange
+
+from cedar_graph.data.field_info import t_info, u_info
+from cedar_graph.data.operator import (
+    AUTO_SAMPLE_STEP,
+    BARB_SPACING,
+    FILL_PIXELS_PER_POINT,
+    GridIndexCache,
+    _extract_area,
+    auto_sample_step,
+    crop_field,
+    get_grid_index_cache,
+    map_degrees_per_pixel,
+    prepare_data,
+    resolve_sample_step,
+    select_plot_grid,
+)
+from cedar_graph.metadata import BasePlotMetadata
+
+
+NORTH_CHINA = AreaRange.from_tuple((108, 123, 34, 44))
+
+
+@pytest.fixture
+def field_t(mock_data_source, start_time, forecast_time):
+    return mock_data_source.retrieve(t_info.with_level("pl", 850), start_time, forecast_time)
+
+
+@pytest.fixture
+def field_u(mock_data_source, start_time, forecast_time):
+    return mock_data_source.retrieve(u_info.with_level("pl", 850), start_time, forecast_time)
+
+
+@pytest.mark.parametrize("sample_step", [None, 0.25, 0.5, 0.75])
+@pytest.mark.parametrize("area", [None, NORTH_CHINA])
+def test_select_plot_grid_equals_operators(field_t, sample_step, area):
+    expected = field_t
+    if sample_step is not None:
+        expected = sample_nearest(expected, longitude_step=sample_step, latitude_step=sample_step)
+    if area is not None:
+        expected = _extract_area(expected, area)
+    xr.testing.assert_identical(select_plot_grid(field_t, sample_step=sample_step, area=area), expected)
+
+
+def test_indices_shared_by_grid(field_t, field_u):
+    cache = GridIndexCache()
+    grid_index = cache.get(field_t, sample_step=0.5, area=NORTH_CHINA)
+    assert cache.get(field_u, sample_step=0.5, area=NORTH_CHINA) is grid_index
+    assert isinstance(grid_index.latitude, slice)
+    assert isinstance(grid_index.longitude, slice)
+
+    cropped = crop_field(field_t, NORTH_CHINA, padding=3)
+    assert cache.get(cropped, sample_step=0.5, area=NORTH_CHINA) is not grid_index
+    assert len(cache) == 2
+
+
+def test_process_wide_cache(field_t):
+    get_grid_index_cache().clear()
+    select_plot_grid(field_t, sample_step=0.5, area=NORTH_CHINA)
+    select_plot_grid(field_t, sample_step=0.5, area=NORTH_CHINA)
+    assert len(get_grid_index_cache()) == 1
+
+
+def test_auto_sample_step():
+    east_asia = AreaRange.from_tuple((70, 140, 15, 55))
+    assert map_degrees_per_pixel(east_asia, layout=LayoutConfig.east_asia()) == pytest.approx((70 / 2400, 40 / 1920))
+    # CnArea layout: 0.8 x 0.6 of the figure, shrunk to aspect 1.25
+    assert map_degrees_per_pixel(NORTH_CHINA, layout=LayoutConfig.cn_area()) == pytest.approx((15 / 2400, 10 / 1920))
+
+    fill_step = auto_sample_step(east_asia, layout=LayoutConfig.east_asia())
+    assert fill_step == pytest.approx(40 / 1920 * FILL_PIXELS_PER_POINT)
+    barb_step = auto_sample_step(east_asia, kind="barb", layout=LayoutConfig.east_asia(), barb_length=4)
+    assert barb_step == pytest.approx(70 / 2400 * 4 / 72 * 400 * BARB_SPACING)
+    assert auto_sample_step(NORTH_CHINA, layout=LayoutConfig.cn_area()) < fill_step
+    with pytest.raises(ValueError, match="kind"):
+        auto_sample_step(east_asia, kind="quiver")
+
+
+@dataclass
+class PlotData:
+    field_t: xr.DataArray
+    field_u: xr.DataArray
+
+
+def test_prepare_data_auto(field_t, field_u):
+    domain = EastAsiaMapTemplate()
+    metadata = BasePlotMetadata(sample_step=AUTO_SAMPLE_STEP, auto_extract_area=False)
+    plot_data = prepare_data(PlotData(field_t, field_u), metadata, domain.total_area(), domain=domain, barb_fields=["field_u"])
+
+    fill_step = auto_sample_step(domain.area, layout=domain.layout_config)
+    barb_step = auto_sample_step(domain.area, kind="barb", layout=domain.layout_config)
+    xr.testing.assert_identical(plot_data.field_t, select_plot_grid(field_t, sample_step=fill_step))
+    xr.testing.assert_identical(plot_data.field_u, select_plot_grid(field_u, sample_step=barb_step))
+    assert plot_data.field_u.size < plot_data.field_t.size
+
+    assert resolve_sample_step(BasePlotMetadata(auto_sample_nearest=False, sample_step=AUTO_SAMPLE_STEP)) is None
+    assert resolve_sample_step(BasePlotMetadata()) == 0.09
+    with pytest.raises(ValueError, match="domain"):
+        resolve_sample_step(metadata)
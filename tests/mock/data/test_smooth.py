@@ -0,0 +1,134 @@
+"""Test fused multi-pass smth9 against repeated cedarkit smth9, and smoothing after crop."""
+from pathlib import Path
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from cedarkit.comp.smooth import smth9
+from cedarkit.comp.util import apply_to_xarray_values
+from cedarkit.plots.engine.recipe import load_recipe_file
+from cedarkit.plots.types import AreaRange
+
+from cedar_graph.data import DataLoader
+from cedar_graph.data.field_info import t_info
+from cedar_graph.data.loader import PrefetchedDataLoader
+from cedar_graph.data.operator import expand_area, select_plot_grid
+from cedar_graph.data.smooth import smooth_field, smoothing_halo, smth9_repeat
+from cedar_graph.recipes.engine import FIELD_INFOS, RecipePlotEngine, create_op_registry
+from cedar_graph.recipes.planner import SuiteLoadPlan
+
+from ..counting_source import CountingDataSource
+
+
+RECIPE_DIR = Path(__file__).parents[3] / "cedar_graph" / "recipes" / "cn"
+
+AREA = AreaRange.from_tuple((108.3, 122.9, 34.1, 43.7))
+
+
+@pytest.fixture
+def field(mock_data_source, start_time, forecast_time):
+    return mock_data_source.retrieve(t_info.with_level("pl", 850), start_time, forecast_time)
+
+
+def smth9_chain(field, p, q, wrap, repeat):
+    for _ in range(repeat):
+        field = apply_to_xarray_values(field, lambda x: smth9(x, p, q, wrap))
+    return field
+
+
+@pytest.mark.parametrize("p,q,wrap", [(0.5, -0.25, False), (0.5, 0.25, True)])
+@pytest.mark.parametrize("repeat", [1, 2, 4])
+def test_smooth_field_equals_chain(field, p, q, wrap, repeat):
+    expected = smth9_chain(field, p, q, wrap, repeat)
+    result = smooth_field(field, p, q, wrap, repeat=repeat)
+    xr.testing.assert_allclose(result, expected, rtol=1e-12, atol=0)
+    assert result.attrs == field.attrs
+    assert result.name == field.name
+
+
+def test_input_not_modified(field):
+    values = field.values.copy()
+    smooth_field(field, repeat=3)
+    np.testing.assert_array_equal(field.values, values)
+
+
+def test_float32():
+    x = np.random.default_rng(0).random((50, 60))
+    result = smth9_repeat(x, 0.5, -0.25, repeat=3, dtype=np.float32)
+    assert result.dtype == np.float32
+    expected = x
+    for _ in range(3):
+        expected = smth9(expected, 0.5, -0.25, False)
+    np.testing.assert_allclose(result, expected, rtol=1e-5)
+
+
+def test_recipe_transform_fused(field):
+    registry = create_op_registry()
+    calls = []
+    smth9_op = registry.get("smth9")
+    registry.register(
+        "smth9",
+        lambda *args, **kwargs: calls.append(kwargs["repeat"]) or smth9_op(*args, **kwargs),
+        fused_repeat=True,
+    )
+    result = registry.apply_transform("smth9", field, [0.5, 0.25, False], {}, 4, context=None)
+    assert calls == [4]
+    xr.testing.assert_allclose(result, smth9_chain(field, 0.5, 0.25, False, 4), rtol=1e-12, atol=0)
+
+
+@pytest.mark.parametrize("sample_step", [None, 0.25, 0.5, 0.75])
+@pytest.mark.parametrize("repeat", [1, 3, 4])
+def test_smooth_after_crop(mock_data_source, start_time, forecast_time, sample_step, repeat):
+    area = AREA
+    field_info = t_info.with_level("pl", 850)
+
+    full_field = DataLoader(data_source=mock_data_source).load(field_info, start_time, forecast_time)
+    expected = select_plot_grid(smooth_field(full_field, repeat=repeat), sample_step=sample_step, area=area)
+
+    data_loader = DataLoader(
+        data_source=mock_data_source,
+        area=expand_area(area, sample_step or 0),
+        area_padding=smoothing_halo(repeat),
+    )
+    field = data_loader.load(field_info, start_time, forecast_time)
+    assert field.size < full_field.size
+    result = select_plot_grid(smooth_field(field, repeat=repeat), sample_step=sample_step, area=area)
+
+    xr.testing.assert_identical(result, expected)
+
+
+def test_planned_smoothing_loads_once(mock_data_source, start_time, forecast_time):
+    engine = RecipePlotEngine(op_registry=create_op_registry(), field_registry=FIELD_INFOS)
+    module = engine.build_module(load_recipe_file(RECIPE_DIR / "h_500_wind_850.yaml"))
+    assert module.smoothing_halo() > 1
+    plan = SuiteLoadPlan([(module, dict())], start_time, forecast_time)
+    data_source = CountingDataSource(mock_data_source)
+
+    [plot_data] = plan.run(DataLoader(data_source=data_source, area=AREA, area_padding=1))
+    assert data_source.count == plan.load_count
+
+    expected = module.load_data(DataLoader(data_source=mock_data_source), start_time, forecast_time)
+    for name, field in vars(expected).items():
+        if isinstance(field, xr.DataArray):
+            xr.testing.assert_identical(select_plot_grid(getattr(plot_data, name), area=AREA), select_plot_grid(field, area=AREA))
+
+
+def test_prefetched_with_area_padding(mock_data_source, start_time, forecast_time):
+    field_info = t_info.with_level("pl", 850)
+    data_source = CountingDataSource(mock_data_source)
+    data_loader = DataLoader(data_source=data_source, area=AREA, area_padding=4)
+    field = data_loader.load(field_info, start_time, forecast_time)
+    prefetched = PrefetchedDataLoader(data_loader, start_time, forecast_time, fields=[(field_info, field)])
+
+    # prefetched fields have a wide enough window
+    narrower = prefetched.with_area_padding(2)
+    assert isinstance(narrower, PrefetchedDataLoader) and narrower.area_padding == 2
+    assert narrower.load(field_info, start_time, forecast_time) is field
+    assert data_source.count == 1
+
+    # a wider window loads the field again
+    wider = prefetched.with_area_padding(6)
+    assert wider.data_loader.area_padding == 6
+    assert wider.load(field_info, start_time, forecast_time).size > field.size
+    assert data_source.count == 2
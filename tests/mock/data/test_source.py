@@ -0,0 +1,100 @@
+"""Test LocalDataSource with a local GRIB file."""
+import pandas as pd
+import pytest
+import xarray as xr
+
+from cedar_graph.data import LocalDataSource, DataLoader, FilePathCache
+from cedar_graph.data.field_info import FieldInfo, Parameter, t_info, u_info, v_info
+from cedar_graph.data.grib_index import get_message_index
+
+
+pytestmark = pytest.mark.usefixtures("clean_message_indexes")
+
+
+@pytest.fixture
+def local_data_source(grib_file):
+    def find_path(**kwargs):
+        return grib_file
+    return LocalDataSource(system_name="CMA-GFS", file_path_func=find_path)
+
+
+def test_retrieve_many(local_data_source, grib_file, start_time, forecast_time):
+    field_infos = [
+        v_info.with_level("pl", 500),
+        t_info.with_level("pl", 850),
+        FieldInfo(name="h", parameter=Parameter(eccodes_short_name="gh"), level_type="pl", level=500),
+        u_info.with_level("pl", 850),
+    ]
+    fields = DataLoader(data_source=local_data_source).load_many(
+        field_infos=field_infos,
+        start_time=start_time,
+        forecast_time=forecast_time,
+    )
+
+    assert fields[2] is None
+    for field_info, field in zip(field_infos, fields):
+        if field is None:
+            continue
+        expected = local_data_source.retrieve(
+            field_info=field_info,
+            start_time=start_time,
+            forecast_time=forecast_time,
+        )
+        xr.testing.assert_equal(field, expected)
+    # one scan resolved every selection
+    assert len(get_message_index(grib_file).offsets) == len(field_infos)
+
+
+def test_retrieve_many_without_index(grib_file, start_time, forecast_time):
+    data_source = LocalDataSource(
+        system_name="CMA-GFS",
+        file_path_func=lambda **kwargs: grib_file,
+        use_message_index=False,
+    )
+    fields = data_source.retrieve_many(
+        field_infos=[u_info.with_level("pl", 850), v_info.with_level("pl", 850)],
+        start_time=start_time,
+        forecast_time=forecast_time,
+    )
+    assert [field.name for field in fields] == ["u", "v"]
+    assert get_message_index(grib_file).offsets == {}
+
+
+class CountingPathFunc:
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.calls = 0
+
+    def __call__(self, **kwargs):
+        self.calls += 1
+        return self.file_path
+
+
+def test_file_path_memoized(grib_file, start_time, forecast_time):
+    find_path = CountingPathFunc(grib_file)
+    data_source = LocalDataSource(system_name="CMA-GFS", file_path_func=find_path, path_cache=FilePathCache())
+    for field_info in [t_info.with_level("pl", 850), u_info.with_level("pl", 850)]:
+        data_source.retrieve(field_info=field_info, start_time=start_time, forecast_time=forecast_time)
+    assert find_path.calls == 1
+
+    data_source.get_file_path(start_time=start_time, forecast_time=forecast_time + pd.Timedelta(hours=3))
+    assert find_path.calls == 2
+
+    data_source.invalidate(forecast_time=forecast_time)
+    data_source.get_file_path(start_time=start_time, forecast_time=forecast_time)
+    assert find_path.calls == 3
+
+
+def test_missing_file_path_expires(start_time, forecast_time):
+    find_path = CountingPathFunc(None)
+    path_cache = FilePathCache(negative_ttl=60)
+    data_source = LocalDataSource(system_name="CMA-GFS", file_path_func=find_path, path_cache=path_cache)
+    assert data_source.retrieve(field_info=t_info.with_level("pl", 850), start_time=start_time, forecast_time=forecast_time) is None
+    data_source.get_file_path(start_time=start_time, forecast_time=forecast_time)
+    assert find_path.calls == 1
+
+    path_cache.negative_ttl = 0
+    data_source.invalidate()
+    data_source.get_file_path(start_time=start_time, forecast_time=forecast_time)
+    data_source.get_file_path(start_time=start_time, forecast_time=forecast_time)
+    assert find_path.calls == 3
@@ -0,0 +1,32 @@
+"""Private cedarkit-plots names used by ``cedar_graph.recipes.engine``.
+
+``RecipePlotModule`` and ``RecipePlotEngine`` override or call these
+hooks, which are not part of the public API of cedarkit-plots. These
+tests fail when an upgrade renames or changes them, before the recipes
+break in less obvious ways. Update the version range of cedarkit-plots
+in ``pyproject.toml`` with them.
+"""
+import inspect
+
+from cedarkit.plots.engine import PlotEngine, PlotModuleAdapter
+from cedarkit.plots.engine import engine as cedarkit_engine
+
+from cedar_graph.recipes.engine import RecipePlotEngine, RecipePlotModule
+
+
+def parameters(func) -> list:
+    return list(inspect.signature(func).parameters)
+
+
+def test_plot_module_hooks():
+    assert issubclass(RecipePlotModule, PlotModuleAdapter)
+    assert parameters(PlotModuleAdapter.__dict__["_build_load_data"]) == ["self"]
+    assert parameters(PlotModuleAdapter.__dict__["_plot_data_keys"]) == ["self"]
+    assert isinstance(PlotModuleAdapter.__dict__["_coerce_param"], staticmethod)
+    assert parameters(PlotModuleAdapter._coerce_param) == ["param", "value"]
+
+
+def test_plot_engine_hooks():
+    assert issubclass(RecipePlotEngine, PlotEngine)
+    assert parameters(PlotEngine.__dict__["_resolve_field_info"]) == ["self", "spec", "metadata"]
+    assert cedarkit_engine._LEVEL_TYPE_ALIASES["isobaricInhPa"] == "pl"
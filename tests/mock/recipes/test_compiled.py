@@ -0,0 +1,86 @@
+"""Test the compiled recipe cache: one parse per file modification, disk form, precompile_all."""
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from cedarkit.plots.engine import PlotEngine
+
+from cedar_graph.recipes import RECIPE_PATHS
+from cedar_graph.recipes.compiled import CompiledRecipeCache, precompile_all
+from cedar_graph.recipes import engine as engine_module
+from cedar_graph.recipes.engine import FIELD_INFOS, RecipePlotEngine, create_op_registry, get_recipe_engine
+from cedar_graph.server import warm_up
+
+
+RECIPE_DIR = Path(__file__).parents[3] / "cedar_graph" / "recipes" / "cn"
+
+
+def create_engine(recipe_cache=None) -> RecipePlotEngine:
+    return RecipePlotEngine(op_registry=create_op_registry(), field_registry=FIELD_INFOS, recipe_cache=recipe_cache)
+
+
+@pytest.fixture
+def recipe_file(tmp_path) -> Path:
+    return Path(shutil.copy(RECIPE_DIR / "t2m.yaml", tmp_path / "t2m.yaml"))
+
+
+def test_same_module(recipe_file):
+    engine = create_engine()
+    recipe = engine.load_recipe(recipe_file)
+    module = engine.build_module(recipe)
+    assert engine.load_recipe(str(recipe_file)) is recipe
+    assert engine.build_module(engine.load_recipe(recipe_file)) is module
+
+
+def test_reload_on_change(recipe_file):
+    engine = create_engine()
+    recipe = engine.load_recipe(recipe_file)
+    module = engine.build_module(recipe)
+
+    stat = recipe_file.stat()
+    os.utime(recipe_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    changed = engine.load_recipe(recipe_file)
+    assert changed is not recipe
+    assert changed == recipe
+    assert engine.build_module(changed) is not module
+
+
+def test_disk_cache(recipe_file, tmp_path, monkeypatch):
+    cache_dir = tmp_path / "compiled"
+    recipe = create_engine(CompiledRecipeCache(cache_dir)).load_recipe(recipe_file)
+    assert len(list(cache_dir.glob("*.pickle"))) == 1
+
+    def fail(self, path):
+        raise AssertionError("recipe parsed again")
+
+    monkeypatch.setattr(PlotEngine, "load_recipe", fail)
+    assert create_engine(CompiledRecipeCache(cache_dir)).load_recipe(recipe_file) == recipe
+
+    # registries changed: checked again
+    engine = create_engine(CompiledRecipeCache(cache_dir))
+    engine.op_registry.register("extra", lambda field, context: field)
+    with pytest.raises(AssertionError, match="parsed again"):
+        engine.load_recipe(recipe_file)
+
+
+def test_precompile_all():
+    engine = create_engine()
+    files = precompile_all(engine)
+    assert len(files) == len(list(RECIPE_PATHS[0].glob("*.yaml")))
+    assert len(engine.recipe_cache) == len(files)
+
+
+def test_recipe_engine_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(engine_module, "_engine", None)
+    engine = get_recipe_engine()
+    assert engine.recipe_cache.cache_dir is None
+    assert get_recipe_engine(cache_dir=tmp_path / "compiled") is engine
+    assert engine.recipe_cache.cache_dir == tmp_path / "compiled"
+
+    # workers of serve and batch
+    monkeypatch.setattr(engine_module, "_engine", None)
+    monkeypatch.setattr("cedar_graph.map_cache.install_map_cache", lambda map_cache_dir: None)
+    warm_up(precompile=True, recipe_cache_dir=tmp_path / "workers")
+    assert len(list((tmp_path / "workers").glob("*.pickle"))) == len(list(RECIPE_PATHS[0].glob("*.yaml")))
@@ -0,0 +1,142 @@
+"""Test memoized transform chains and compute results across recipes."""
+import threading
+from pathlib import Path
+
+import pytest
+import xarray as xr
+
+from cedarkit.plots.engine.recipe import Recipe, load_recipe_file
+
+from cedar_graph.recipes.engine import FIELD_INFOS, RecipePlotEngine, create_op_registry
+from cedar_graph.recipes.memo import apply_chain, canonical
+from cedar_graph.data import FieldCache
+
+
+RECIPE_DIR = Path(__file__).parents[3] / "cedar_graph" / "recipes" / "cn"
+
+#: values of required recipe params
+PARAM_VALUES = dict(wind_level=850, interval="24h")
+
+
+@pytest.fixture
+def op_calls():
+    """Op name -> list of ``repeat`` (transforms) or None (compute) of each call."""
+    return dict()
+
+
+@pytest.fixture
+def engine(op_calls):
+    op_registry = create_op_registry()
+
+    def counted(name, func):
+        def op(*args, **kwargs):
+            op_calls.setdefault(name, []).append(kwargs.get("repeat"))
+            return func(*args, **kwargs)
+        return op
+
+    op_registry.register("smth9", counted("smth9", op_registry.get("smth9")), fused_repeat=True)
+    op_registry.register("wind_speed", counted("wind_speed", op_registry.get("wind_speed")), kind="compute")
+    return RecipePlotEngine(op_registry=op_registry, field_registry=FIELD_INFOS)
+
+
+def load(module, data_loader, start_time, forecast_time):
+    params = {name: value for name, value in PARAM_VALUES.items() if name in module.recipe.params}
+    return module.load_data(data_loader, start_time, forecast_time, **params)
+
+
+def assert_plot_data_identical(result, expected):
+    for name, field in vars(expected).items():
+        xr.testing.assert_identical(getattr(result, name), field)
+
+
+def test_canonical():
+    assert canonical([0.5, {"b": 1, "a": [2]}]) == canonical((0.5, {"a": (2,), "b": 1}))
+    hash(canonical({"interval": [1, 2]}))
+
+
+def test_same_results(engine, mock_data_loader, start_time, forecast_time):
+    modules = [engine.build_module(load_recipe_file(path)) for path in sorted(RECIPE_DIR.glob("*.yaml"))]
+    expected = [load(module, mock_data_loader, start_time, forecast_time) for module in modules]
+    with engine.memoize() as memo:
+        for _ in range(2):
+            for module, plot_data in zip(modules, expected):
+                assert_plot_data_identical(load(module, mock_data_loader, start_time, forecast_time), plot_data)
+        assert len(memo) > 0
+    assert engine.transform_memo is None
+
+
+def test_repeat_continues_from_prefix(engine, op_calls, mock_data_loader, start_time, forecast_time):
+    """h_500_psl smooths 500hPa height 4 times, h_500_wind_850 twice, after the same style_units."""
+    h_500_wind_850 = engine.build_module(load_recipe_file(RECIPE_DIR / "h_500_wind_850.yaml"))
+    h_500_psl = engine.build_module(load_recipe_file(RECIPE_DIR / "h_500_psl.yaml"))
+    expected = load(h_500_psl, mock_data_loader, start_time, forecast_time)
+    op_calls.clear()
+
+    with engine.memoize():
+        load(h_500_wind_850, mock_data_loader, start_time, forecast_time)
+        assert op_calls["smth9"] == [2]
+        result = load(h_500_psl, mock_data_loader, start_time, forecast_time)
+    # h: 2 more passes on the memoized 2-pass result, psl: 2 passes
+    assert sorted(op_calls["smth9"]) == [2, 2, 2]
+    assert_plot_data_identical(result, expected)
+
+
+def test_compute_shared(engine, op_calls, mock_data_loader, start_time, forecast_time):
+    """wind_speed from the same u/v is computed once, whatever the data keys are called."""
+    recipe = load_recipe_file(RECIPE_DIR / "h_500_wind_850.yaml")
+    content = recipe.model_dump(exclude_none=True)
+    content["data"]["ws"] = content["data"].pop("ws_850")
+    content["layers"][0]["field"] = "ws"
+    renamed = Recipe.model_validate(content)
+
+    with engine.memoize():
+        first = load(engine.build_module(recipe), mock_data_loader, start_time, forecast_time)
+        second = load(engine.build_module(renamed), mock_data_loader, start_time, forecast_time)
+    assert op_calls["wind_speed"] == [None]
+    xr.testing.assert_identical(second.ws, first.ws_850)
+
+
+def test_apply_chain_prefix():
+    field = xr.DataArray([1.0, 2.0])
+    applied = []
+
+    def add_one(field, repeat):
+        applied.append(repeat)
+        return field + repeat
+
+    step = ("add_one", (), (), None)
+    memo = FieldCache()
+    assert apply_chain(memo, "base", lambda: field, [(step, 2, add_one)]).values.tolist() == [3.0, 4.0]
+    assert apply_chain(memo, "base", lambda: None, [(step, 5, add_one)]).values.tolist() == [6.0, 7.0]
+    assert applied == [2, 3]
+    # one miss per value, prefixes probed without counting
+    stats = memo.stats
+    assert (stats.hits, stats.misses) == (1, 2)
+
+
+def test_memoize_per_thread(engine):
+    """Batches overlapping in threads keep their own memo, whichever exits first."""
+    entered = threading.Barrier(2)
+    first_done = threading.Event()
+    seen = dict()
+
+    def batch(name, exit_first):
+        with engine.memoize() as memo:
+            entered.wait()
+            if not exit_first:
+                first_done.wait()
+            seen[name] = engine.transform_memo is memo
+        if exit_first:
+            first_done.set()
+        seen[f"{name}_after"] = engine.transform_memo
+
+    threads = [
+        threading.Thread(target=batch, args=("first", True)),
+        threading.Thread(target=batch, args=("second", False)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert seen == dict(first=True, second=True, first_after=None, second_after=None)
+    assert engine.transform_memo is None
@@ -0,0 +1,59 @@
+"""Test the suite load planner: deduplicated loads, same plot data as loading each recipe on its own."""
+from pathlib import Path
+
+import pytest
+import xarray as xr
+
+from cedarkit.plots.engine.recipe import load_recipe_file
+
+from cedar_graph.data import DataLoader
+from cedar_graph.recipes.engine import FIELD_INFOS, RecipePlotEngine, create_op_registry
+from cedar_graph.recipes.planner import SuiteLoadPlan
+
+from ..counting_source import CountingDataSource
+
+
+RECIPE_DIR = Path(__file__).parents[3] / "cedar_graph" / "recipes" / "cn"
+
+#: values of required recipe params
+PARAM_VALUES = dict(wind_level=850, interval="24h")
+
+
+@pytest.fixture(scope="module")
+def suite():
+    engine = RecipePlotEngine(op_registry=create_op_registry(), field_registry=FIELD_INFOS)
+    items = []
+    for recipe_path in sorted(RECIPE_DIR.glob("*.yaml")):
+        module = engine.build_module(load_recipe_file(recipe_path))
+        params = {name: value for name, value in PARAM_VALUES.items() if name in module.recipe.params}
+        items.append((module, params))
+    return items
+
+
+def test_loads_deduplicated(suite, start_time, forecast_time):
+    plan = SuiteLoadPlan(suite, start_time, forecast_time)
+    assert len(set(plan.loads)) == plan.load_count
+    assert set(plan.loads) == set(plan.requests)
+    # 850hPa u/v of the four *_wind recipes and h_500_wind_850, 500hPa height, 24h precipitation totals
+    assert plan.loads_saved == 15
+
+
+def test_wind_recipes(suite, start_time, forecast_time):
+    items = [item for item in suite if item[0].recipe.data.keys() >= {"u", "v"} and "wind_level" in item[1]]
+    plan = SuiteLoadPlan(items, start_time, forecast_time)
+    assert len(items) == 4
+    assert plan.requested_count == 12
+    assert plan.load_count == 6
+    assert plan.loads_saved == 6
+
+
+def test_run_loads_once(suite, mock_data_source, start_time, forecast_time):
+    plan = SuiteLoadPlan(suite, start_time, forecast_time)
+    data_source = CountingDataSource(mock_data_source)
+    plot_data_list = plan.run(DataLoader(data_source=data_source))
+    assert data_source.count == plan.load_count
+
+    for (module, params), plot_data in zip(suite, plot_data_list):
+        expected = module.load_data(DataLoader(data_source=mock_data_source), start_time, forecast_time, **params)
+        for name, field in vars(expected).items():
+            xr.testing.assert_identical(getattr(plot_data, name), field)
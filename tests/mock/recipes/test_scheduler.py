@@ -0,0 +1,112 @@
+"""Test the recipe data-entry graph and its threaded execution against the sequential load_data."""
+import threading
+import time
+from pathlib import Path
+
+import pytest
+import xarray as xr
+
+from cedarkit.plots.engine import PlotModuleAdapter
+from cedarkit.plots.engine.recipe import Recipe, RecipeError, load_recipe_file
+
+from cedar_graph.data import DataLoader, DataSource
+from cedar_graph.recipes.engine import FIELD_INFOS, RecipePlotEngine, create_op_registry
+from cedar_graph.recipes.scheduler import RecipeGraph
+
+
+RECIPE_DIR = Path(__file__).parents[3] / "cedar_graph" / "recipes" / "cn"
+
+
+def create_engine(max_workers=4) -> RecipePlotEngine:
+    return RecipePlotEngine(
+        op_registry=create_op_registry(),
+        field_registry=FIELD_INFOS,
+        max_workers=max_workers,
+    )
+
+
+#: values of required recipe params
+PARAM_VALUES = dict(wind_level=850, interval="24h")
+
+
+def create_recipe(data: dict) -> Recipe:
+    """t2m recipe with its data entries replaced."""
+    recipe = load_recipe_file(RECIPE_DIR / "t2m.yaml").model_dump(exclude_none=True)
+    recipe["data"] = dict(t2m=dict(field="t2m"), **data)
+    return Recipe.model_validate(recipe)
+
+
+def test_graph_dependencies():
+    recipe = load_recipe_file(RECIPE_DIR / "prep_24h.yaml")
+    graph = RecipeGraph(recipe)
+    assert graph.dependencies["rain_total"] == set()
+    assert graph.dependencies["snow_total"] == set()
+    assert graph.dependencies["classified"] == {"rain_total", "snow_total"}
+    assert graph.producers["snow"] == "classified"
+
+
+def test_graph_cycle():
+    recipe = create_recipe(dict(
+        a=dict(compute=dict(op="wind_speed", inputs=["b", "b"])),
+        b=dict(compute=dict(op="wind_speed", inputs=["a", "a"])),
+    ))
+    with pytest.raises(RecipeError, match="depends on itself"):
+        RecipeGraph(recipe)
+
+
+@pytest.mark.parametrize("recipe_path", sorted(RECIPE_DIR.glob("*.yaml")), ids=lambda p: p.stem)
+def test_same_as_sequential(recipe_path, mock_data_loader, start_time, forecast_time):
+    recipe = load_recipe_file(recipe_path)
+    module = create_engine().build_module(recipe)
+    sequential_load_data = PlotModuleAdapter._build_load_data(module)
+    param_values = {name: value for name, value in PARAM_VALUES.items() if name in recipe.params}
+
+    expected = sequential_load_data(mock_data_loader, start_time, forecast_time, **param_values)
+    result = module.load_data(mock_data_loader, start_time, forecast_time, **param_values)
+    for name, field in vars(expected).items():
+        xr.testing.assert_identical(getattr(result, name), field)
+
+
+class SlowDataSource(DataSource):
+    """Wrap a data source, every retrieve takes ``delay`` seconds and is counted while running."""
+    def __init__(self, data_source, delay: float):
+        super().__init__()
+        self.data_source = data_source
+        self.delay = delay
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def retrieve(self, field_info, start_time, forecast_time, **kwargs):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            time.sleep(self.delay)
+            return self.data_source.retrieve(field_info, start_time, forecast_time, **kwargs)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+def test_time_diff_loads_run_concurrently(mock_data_source, start_time, forecast_time):
+    """prep_24h loads apcp and asnow at the previous forecast time in two independent entries."""
+    recipe = load_recipe_file(RECIPE_DIR / "prep_24h.yaml")
+    data_source = SlowDataSource(mock_data_source, delay=0.2)
+    data_loader = DataLoader(data_source=data_source)
+
+    create_engine(max_workers=4).build_module(recipe).load_data(data_loader, start_time, forecast_time)
+    assert data_source.max_running == 2
+
+    data_source.max_running = 0
+    create_engine(max_workers=1).build_module(recipe).load_data(data_loader, start_time, forecast_time)
+    assert data_source.max_running == 1
+
+
+def test_node_error_raised(mock_data_loader, start_time, forecast_time):
+    recipe = load_recipe_file(RECIPE_DIR / "t2m.yaml")
+    engine = create_engine()
+    engine.op_registry.register("broken", lambda field, context: 1 / 0)
+    recipe.data["t2m"].transforms.append(recipe.data["t2m"].transforms[0].model_copy(update=dict(op="broken", args=[])))
+    with pytest.raises(ZeroDivisionError):
+        engine.build_module(recipe).load_data(mock_data_loader, start_time, forecast_time)
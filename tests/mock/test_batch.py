@@ -0,0 +1,267 @@
+"""Batch manifest: job expansion, grouping per lead time, and group rendering with shared loads.
+
+Plot loading is mostly replaced by a fake ``load_plot`` that loads a field
+through the shared field cache. Real plots draw mock data on maps of the
+China border shapefiles bundled with cedarkit only (the offline map loader
+of ``test_composite``).
+"""
+import dataclasses
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import matplotlib.pyplot as plt
+import pandas as pd
+import pytest
+
+from cedarkit.plots import map as cedarkit_map
+from cedarkit.plots.types import AreaRange
+
+import cedar_graph.quickplot
+from cedar_graph.batch import (
+    CN_AREAS,
+    ManifestError,
+    PlotArea,
+    expand_jobs,
+    group_jobs,
+    load_manifest,
+    parse_manifest,
+    run_batch,
+    run_group,
+    run_pipeline,
+)
+from cedar_graph.cli import main
+from cedar_graph.data import DataLoader
+from cedar_graph.data.field_info import t_2m_info
+from cedar_graph.quickplot import load_plot
+from cedar_graph.render import render_areas
+
+from .image_baseline import assert_image_match
+
+
+MANIFEST = """\
+output_dir: {output_dir}
+systems: [CMA-GFS, CMA-MESO]
+start_times: ["2024070100"]
+forecast_hours: {{start: 0, stop: 6, step: 3}}
+areas:
+  - name: China
+  - NorthEast
+  - name: Beijing
+    range: [115, 118, 39, 42]
+    params: {{wind_level: 925}}
+products:
+  - plot_type: cn.t2m
+  - plot_type: cn.kidx_wind
+    params: {{wind_level: 850}}
+    areas: [XiZang, Beijing]
+"""
+
+
+@pytest.fixture
+def manifest_path(tmp_path) -> Path:
+    path = tmp_path / "manifest.yaml"
+    path.write_text(MANIFEST.format(output_dir=tmp_path / "output"))
+    return path
+
+
+class FakePanel:
+    def __init__(self):
+        self.fig = plt.figure(figsize=(1, 1), dpi=20)
+        self.fig.add_subplot()
+
+    def save(self, path):
+        Path(path).write_bytes(b"png")
+
+
+@dataclass
+class FakePlotMetadata:
+    area_range: Optional[AreaRange] = None
+    area_name: Optional[str] = None
+
+
+class FakePlotModule:
+    def __init__(self):
+        self.plotted = []
+
+    def plot(self, plot_data, plot_metadata):
+        if plot_metadata.area_name == "Broken":
+            raise RuntimeError("broken area")
+        self.plotted.append(plot_metadata.area_name)
+        return FakePanel()
+
+
+@pytest.fixture
+def fake_load_plot(monkeypatch, mock_data_source):
+    calls = []
+
+    def load_plot(plot_type, plot_settings, data_source_config, field_cache=None, data_source=None, **kwargs):
+        if plot_type == "cn.broken":
+            raise RuntimeError("broken plot")
+        plot_data = DataLoader(data_source=mock_data_source, cache=field_cache).load(
+            field_info=t_2m_info,
+            start_time=plot_settings["start_time"],
+            forecast_time=pd.to_timedelta(plot_settings["forecast_time"]),
+        )
+        plot_module = FakePlotModule()
+        calls.append((plot_type, plot_settings, data_source, field_cache, plot_module))
+        return plot_module, FakePlotMetadata(), plot_data
+
+    monkeypatch.setattr(cedar_graph.quickplot, "load_plot", load_plot)
+    monkeypatch.setattr(cedar_graph.quickplot, "resolve_plot", lambda plot_type: plot_type)
+    monkeypatch.setattr(
+        cedar_graph.quickplot, "load_params",
+        lambda plot_type: {"cn.kidx_wind": {"wind_level"}}.get(plot_type, set()),
+    )
+    monkeypatch.setattr(cedar_graph.quickplot, "create_data_source", lambda system_name, config: object())
+    return calls
+
+
+def test_expand_jobs(manifest_path):
+    manifest = load_manifest(manifest_path)
+    assert manifest.forecast_times == [pd.Timedelta(hours=hour) for hour in (0, 3, 6)]
+
+    jobs = expand_jobs(manifest)
+    # t2m: 3 areas, kidx_wind: 2 areas; 2 systems, 3 lead times
+    assert len(jobs) == (3 + 2) * 2 * 3
+
+    kidx_jobs = {job.area.name: job for job in jobs if job.plot_type == "cn.kidx_wind"}
+    assert kidx_jobs["XiZang"].params == dict(wind_level=500)
+    assert kidx_jobs["Beijing"].params == dict(wind_level=925)
+    assert kidx_jobs["Beijing"].plot_settings()["area_range"].end_latitude == 42
+
+    job = jobs[0]
+    assert "area_range" not in job.plot_settings()
+    assert job.output_path == manifest.output_dir / "CMA-GFS/2024070100/cn_t2m/cn_t2m_China_000.png"
+
+
+def test_group_jobs(manifest_path):
+    groups = group_jobs(expand_jobs(load_manifest(manifest_path)))
+    assert len(groups) == 2 * 3
+    for (system_name, start_time, forecast_time), group in groups.items():
+        assert len(group) == 5
+        assert all(job.system_name == system_name and job.forecast_time == forecast_time for job in group)
+
+
+def test_manifest_errors(tmp_path):
+    content = dict(
+        output_dir=str(tmp_path),
+        systems=["CMA-GFS"],
+        start_times="2024070100",
+        forecast_hours=[24],
+        products=["cn.t2m"],
+    )
+    manifest = parse_manifest(content)
+    assert manifest.areas[0].name == "China"
+    assert manifest.start_times == [pd.Timestamp("2024-07-01 00:00")]
+
+    with pytest.raises(ManifestError, match="missing key"):
+        parse_manifest({k: v for k, v in content.items() if k != "systems"})
+    with pytest.raises(ManifestError, match="unknown area"):
+        parse_manifest(dict(content, areas=["Atlantis"]))
+    with pytest.raises(ManifestError, match="unknown areas"):
+        parse_manifest(dict(content, products=[dict(plot_type="cn.t2m", areas=["Atlantis"])]))
+    with pytest.raises(ManifestError, match="step"):
+        parse_manifest(dict(content, forecast_hours=dict(start=0, stop=24, step=0)))
+
+    assert len(parse_manifest(dict(content, areas=["cn_areas"])).areas) == len(CN_AREAS)
+    assert not manifest.composite
+    assert parse_manifest(dict(content, composite=True)).composite
+
+
+def test_run_group(manifest_path, fake_load_plot):
+    groups = group_jobs(expand_jobs(load_manifest(manifest_path)))
+    group = next(iter(groups.values()))
+    group.append(dataclasses.replace(group[0], plot_type="cn.broken"))
+    group.append(dataclasses.replace(group[0], area=PlotArea(name="Broken")))
+
+    results = run_group(group)
+    assert [result.ok for result in results] == [True] * 5 + [False, False]
+    assert "broken plot" in results[-2].error
+    assert "broken area" in results[-1].error
+    assert all(result.job.output_path.exists() for result in results[:5])
+
+    # t2m: loaded once, drawn for 3 areas (+ the broken one), wind_level is not a t2m param;
+    # kidx_wind: loaded per wind level of its 2 areas
+    loads = [(call[0], call[1].get("wind_level")) for call in fake_load_plot]
+    assert loads == [("cn.t2m", None), ("cn.kidx_wind", 500), ("cn.kidx_wind", 925)]
+    assert fake_load_plot[0][4].plotted == ["China", "NorthEast", "Beijing"]
+
+    # one data source and one field cache for the group
+    assert len({id(call[2]) for call in fake_load_plot}) == 1
+    assert len({id(call[3]) for call in fake_load_plot}) == 1
+    field_cache = fake_load_plot[0][3]
+    assert field_cache.stats.misses == 1
+    assert field_cache.stats.hits == 2
+
+
+def test_run_group_real_plot(monkeypatch, mock_data_source, system_name, tmp_path):
+    """Areas of a load group equal areas drawn from their own load."""
+    monkeypatch.setattr(cedarkit_map, "DEFAULT_MAP_LOADER_PACKAGE", "tests.mock.test_composite")
+    monkeypatch.setattr(cedar_graph.quickplot, "create_data_source", lambda system_name, config: mock_data_source)
+    manifest = parse_manifest(dict(
+        output_dir=str(tmp_path / "output"),
+        systems=[system_name],
+        start_times="2024070100",
+        forecast_hours=[24],
+        areas=["NorthEast", "XiZang"],
+        products=["cn.t2m"],
+    ))
+    jobs = expand_jobs(manifest)
+    results = run_group(jobs)
+    assert all(result.ok for result in results)
+
+    for job in jobs:
+        plot_module, plot_metadata, plot_data = load_plot(
+            job.plot_type, job.plot_settings(), data_source_config={}, data_source=mock_data_source,
+        )
+        [path] = render_areas(
+            plot_module, plot_data, plot_metadata, [job.area], output=str(tmp_path / "single_{area_name}.png"),
+        )
+        assert_image_match(job.output_path, path)
+
+
+def test_run_group_trace(manifest_path, fake_load_plot, tmp_path):
+    group = next(iter(group_jobs(expand_jobs(load_manifest(manifest_path))).values()))
+    run_group(group, trace_dir=tmp_path / "traces")
+
+    trace_path = tmp_path / "traces" / "CMA-GFS_2024070100_000.json"
+    events = json.loads(trace_path.read_text())["traceEvents"]
+    plots = [(event["name"], event["args"]["stage"]) for event in events if event.get("cat") == "plot"]
+    # t2m: 1 load, 3 areas; kidx_wind: 1 load per wind level, 2 areas
+    assert sorted(plots) == sorted(
+        [("cn.t2m", "load")] + [("cn.t2m", "render")] * 3
+        + [("cn.kidx_wind", "load")] * 2 + [("cn.kidx_wind", "render")] * 2
+    )
+    # first load of the field only, others from the field cache
+    assert [event["name"] for event in events if event.get("cat") == "data"] == ["retrieve"]
+    assert "cn.t2m stage=load" in trace_path.with_suffix(".txt").read_text()
+
+
+def test_run_batch(manifest_path, fake_load_plot):
+    manifest = load_manifest(manifest_path)
+    results = run_batch(manifest, executor_factory=lambda: ThreadPoolExecutor(max_workers=2))
+    assert [result.job.output_path for result in results] == [job.output_path for job in expand_jobs(manifest)]
+    assert all(result.ok for result in results)
+    assert len({id(call[3]) for call in fake_load_plot}) == 6
+
+
+def test_run_pipeline(manifest_path, fake_load_plot):
+    manifest = load_manifest(manifest_path)
+    results = run_pipeline(manifest)
+    assert [result.job.output_path for result in results] == [job.output_path for job in expand_jobs(manifest)]
+    assert all(result.ok for result in results)
+    assert all(result.job.output_path.read_bytes().startswith(b"\x89PNG") for result in results)
+
+    # loads shared as in run_group, one field cache for all lead times
+    assert len(fake_load_plot) == 3 * 6
+    assert len({id(call[3]) for call in fake_load_plot}) == 1
+
+
+def test_batch_dry_run(manifest_path, capsys):
+    assert main(["batch", str(manifest_path), "--dry-run"]) == 0
+    output = capsys.readouterr().out
+    assert "CMA-MESO 2024070100 0 days 03:00:00: 5 jobs" in output
+    assert "cn.kidx_wind XiZang" in output
@@ -0,0 +1,132 @@
+"""Static chrome compositing: paint-order runs, cache reuse and match with the full render.
+
+The pte_wind frames use the China border shapefiles bundled with cedarkit
+only (this module is the map loader package), Natural Earth features need
+a download not available in CI.
+"""
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pytest
+
+from cedarkit.plots import map as cedarkit_map
+from cedarkit.plots.map.default import DefaultMapLoader, get_china_map, get_china_nine_map  # noqa: F401
+
+from cedar_graph.composite import ChromeCache, chrome_runs
+from cedar_graph.data import DataLoader
+from cedar_graph.plots.cn.pte_wind import default as pte_wind
+from cedar_graph.render import render_series
+
+from .image_baseline import assert_image_match
+
+
+class OfflineMapLoader(DefaultMapLoader):
+    def coastline(self, scale=None, style=None):
+        return []
+
+    def lakes(self, scale=None, style=None):
+        return []
+
+
+map_class = OfflineMapLoader
+
+
+class FakeLayer:
+    def __init__(self, ax):
+        self.ax = ax
+
+
+class FakeChart:
+    def __init__(self, ax):
+        self.layers = [FakeLayer(ax)]
+
+
+class FakePanel:
+    """Panel-like figure: filled contours under a static border line, static frame and colorbar, dynamic title."""
+    def __init__(self, hour: int):
+        self.fig = plt.figure(figsize=(4, 3), dpi=50)
+        ax = self.fig.add_axes((0.1, 0.1, 0.7, 0.8))
+        x, y = np.meshgrid(np.linspace(0, 10, 50), np.linspace(0, 10, 40))
+        contour = ax.contourf(x, y, np.sin(x + hour) * np.cos(y), levels=8)
+        ax.plot([0, 10], [2, 8], color="k", linewidth=3, zorder=1.5)
+        ax.contour(x, y, np.cos(x - hour), levels=4, colors="w")
+        ax.grid(True)
+        ax.set_title(f"forecast hour {hour}")
+        self.fig.colorbar(contour, cax=self.fig.add_axes((0.85, 0.1, 0.03, 0.8)))
+        self.charts = [FakeChart(ax)]
+
+
+def test_chrome_runs():
+    panel = FakePanel(hour=0)
+    runs = chrome_runs(panel.fig, [panel.charts[0].layers[0].ax])
+    assert [run.dynamic for run in runs] == [False, True, False, True, False, True, False]
+    # border line and grid between filled contours and contour lines
+    assert [type(artist).__name__ for artist in runs[2].artists] == ["Line2D", "XAxis", "YAxis"]
+    # colorbar axes is static
+    assert runs[-1].artists[-1] is panel.fig.axes[1]
+
+    # empty title slots are dynamic: setting one keeps the runs
+    other = FakePanel(hour=3)
+    other.fig.axes[0].set_title("left", loc="left")
+    other.fig.axes[0].title.set_visible(False)
+    other_runs = chrome_runs(other.fig, [other.charts[0].layers[0].ax])
+    assert [run.signature() for run in other_runs] == [run.signature() for run in runs]
+    plt.close(panel.fig)
+    plt.close(other.fig)
+
+
+def test_chrome_cache(tmp_path):
+    chrome_cache = ChromeCache(max_entries=1)
+    for hour in (0, 3):
+        panel = FakePanel(hour)
+        panel.fig.savefig(tmp_path / f"full_{hour}.png", bbox_inches="tight")
+        chrome_cache.save(panel, tmp_path / f"composite_{hour}.png", key="fake")
+        plt.close(panel.fig)
+        assert_image_match(tmp_path / f"composite_{hour}.png", tmp_path / f"full_{hour}.png")
+    assert chrome_cache.stats().hits == 1
+    assert chrome_cache.stats().misses == 1
+
+    # other key evicts, other chrome renders again
+    panel = FakePanel(hour=6)
+    chrome_cache.save(panel, tmp_path / "other.png", key="other")
+    panel.fig.axes[0].plot([0, 10], [8, 2])
+    chrome_cache.save(panel, tmp_path / "other.png", key="other")
+    plt.close(panel.fig)
+    assert len(chrome_cache) == 1
+    assert chrome_cache.stats().misses == 3
+
+
+@pytest.fixture
+def offline_map(monkeypatch):
+    monkeypatch.setattr(cedarkit_map, "DEFAULT_MAP_LOADER_PACKAGE", __name__)
+
+
+def test_render_series(offline_map, mock_data_source, start_time, system_name, tmp_path):
+    data_loader = DataLoader(data_source=mock_data_source)
+
+    def frames():
+        for hour in (24, 48):
+            forecast_time = pd.Timedelta(hours=hour)
+            plot_data = pte_wind.load_data(
+                data_loader=data_loader, start_time=start_time, forecast_time=forecast_time,
+                wind_level=850.0, pte_levels=(500, 850),
+            )
+            plot_metadata = pte_wind.PlotMetadata(
+                start_time=start_time, forecast_time=forecast_time, system_name=system_name,
+                wind_level=850.0, pte_levels=(500, 850),
+            )
+            yield plot_data, plot_metadata
+
+    chrome_cache = ChromeCache()
+    paths = render_series(
+        pte_wind, frames(), output=str(tmp_path / "pte_wind_{area_name}_{forecast_hour:03d}.png"),
+        chrome_cache=chrome_cache,
+    )
+    assert paths == [tmp_path / "pte_wind_area0_024.png", tmp_path / "pte_wind_area0_048.png"]
+    assert chrome_cache.stats().hits == 1
+
+    plot_data, plot_metadata = list(frames())[-1]
+    panel = pte_wind.plot(plot_data=plot_data, plot_metadata=plot_metadata)
+    panel.save(tmp_path / "full.png")
+    plt.close(panel.fig)
+    assert_image_match(paths[-1], tmp_path / "full.png")
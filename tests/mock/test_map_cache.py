@@ -0,0 +1,108 @@
+"""Base-map geometry cache: clipping, in-memory and on-disk reuse of map loader features.
+
+Uses the China border shapefiles bundled with cedarkit, Natural Earth
+features need a download not available in CI.
+"""
+import pytest
+import shapely
+from shapely.geometry import LineString, box
+
+from cedarkit.plots import map as cedarkit_map
+from cedarkit.plots.map import get_map_loader_class
+
+from cedar_graph.map_cache import (
+    CACHED_MAP_LOADER_PACKAGE,
+    CachedFeature,
+    CachedMapLoader,
+    MapGeometryCache,
+    clip_geometries,
+    install_map_cache,
+    uninstall_map_cache,
+)
+
+
+BEIJING_EXTENT = (115.0, 118.0, 39.0, 42.0)
+
+
+@pytest.fixture
+def map_cache():
+    def install(cache_dir=None):
+        return install_map_cache(cache_dir)
+    yield install
+    uninstall_map_cache()
+
+
+def test_clip_geometries():
+    line = LineString([(0, 0), (5, 5), (10, 10)])
+    polygon = box(20, 20, 30, 30)
+    clipped = clip_geometries([line, polygon], (0, 4, 0, 4), margin=0.25)
+    assert len(clipped) == 1
+    assert clipped[0].bounds == (0, 0, 5, 5)
+
+    clipped = clip_geometries([line], (0, 10, 0, 10), margin=0)
+    assert len(shapely.get_coordinates(clipped[0])) == 2
+    clipped = clip_geometries([line], (0, 10, 0, 10), margin=0, simplify=None)
+    assert len(shapely.get_coordinates(clipped[0])) == 3
+
+
+def test_cached_map_loader(map_cache):
+    default_package = cedarkit_map.DEFAULT_MAP_LOADER_PACKAGE
+    cache = map_cache()
+    assert cedarkit_map.DEFAULT_MAP_LOADER_PACKAGE == CACHED_MAP_LOADER_PACKAGE
+    assert get_map_loader_class() is CachedMapLoader
+
+    loader = get_map_loader_class()()
+    source = loader.base_loader.china_borders()
+    features = loader.china_borders()
+    assert all(isinstance(feature, CachedFeature) for feature in features)
+    assert [feature.kwargs for feature in features] == [feature.kwargs for feature in source]
+    assert get_map_loader_class()().china_borders() == features
+
+    geometries = list(features[0].intersecting_geometries(BEIJING_EXTENT))
+    assert geometries
+    x0, y0, x1, y1 = shapely.total_bounds(geometries)
+    assert 114.9 <= x0 and x1 <= 118.1 and 38.9 <= y0 and y1 <= 42.1
+    assert list(features[0].intersecting_geometries(BEIJING_EXTENT)) == geometries
+    assert cache.stats().misses == 1
+    assert cache.stats().memory_hits == 1
+
+    # installing again keeps the wrapped package
+    map_cache()
+    uninstall_map_cache()
+    assert cedarkit_map.DEFAULT_MAP_LOADER_PACKAGE == default_package
+
+
+def test_disk_cache(map_cache, tmp_path, monkeypatch):
+    map_cache(tmp_path)
+    features = get_map_loader_class()().china_borders()
+    expected = list(features[0].intersecting_geometries(BEIJING_EXTENT))
+
+    # a new process: reads features and geometries from disk, never the shapefiles
+    cache = map_cache(tmp_path)
+    loader = get_map_loader_class()()
+    monkeypatch.setattr(
+        type(loader.base_loader), "get_feature",
+        lambda self, name, **kwargs: pytest.fail(f"map loaded: {name}"),
+    )
+    features = loader.china_borders()
+    geometries = list(features[0].intersecting_geometries(BEIJING_EXTENT))
+    assert [geometry.equals(other) for geometry, other in zip(geometries, expected)] == [True] * len(expected)
+    assert cache.stats().disk_hits == 1
+    assert cache.stats().misses == 0
+
+    cache.clear()
+    assert not list(tmp_path.glob("*/*.pickle"))
+
+
+def test_memory_only():
+    cache = MapGeometryCache()
+    loads = []
+
+    def load():
+        loads.append(1)
+        return get_map_loader_class("cedarkit.plots.map.default")().china_nine_lines()
+
+    features = cache.get_features("nine_lines", load)
+    assert cache.get_features("nine_lines", load) is features
+    list(features[0].intersecting_geometries((105.0, 125.0, 0.0, 25.0)))
+    assert len(loads) == 1
@@ -0,0 +1,182 @@
+"""Pipelined execution: memory-bounded queue, overlapping stages and images equal to ``panel.save``.
+
+Maps use the China border shapefiles bundled with cedarkit only (the
+offline map loader of ``test_composite``), Natural Earth features need a
+download not available in CI.
+"""
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from cedarkit.plots import map as cedarkit_map
+
+from cedar_graph.data import DataLoader
+from cedar_graph.pipeline import (
+    MemoryBoundedQueue,
+    PipelineJob,
+    PlotPipeline,
+    plot_data_nbytes,
+    rasterize,
+    write_png,
+)
+from cedar_graph.quickplot import resolve_plot
+from cedar_graph.render import CN_AREAS, PlotArea, area_metadata
+
+from .image_baseline import assert_image_match
+
+
+OFFLINE_MAP_LOADER_PACKAGE = "tests.mock.test_composite"
+
+
+@pytest.fixture
+def offline_map(monkeypatch):
+    monkeypatch.setattr(cedarkit_map, "DEFAULT_MAP_LOADER_PACKAGE", OFFLINE_MAP_LOADER_PACKAGE)
+
+
+def test_memory_bounded_queue():
+    queue = MemoryBoundedQueue(max_bytes=100)
+    assert queue.put("a", 60)
+    # larger than the budget: waits until the budget is empty
+    put = threading.Thread(target=queue.put, args=("b", 150), daemon=True)
+    put.start()
+    time.sleep(0.1)
+    assert len(queue) == 1
+
+    # taken but not released
+    assert queue.get() == "a"
+    time.sleep(0.1)
+    assert len(queue) == 0
+    queue.release(60)
+    put.join(timeout=5)
+    assert len(queue) == 1
+    assert queue.get() == "b"
+    assert queue.current_bytes == 150
+
+    queue.charge(10)
+    assert queue.peak_bytes == 160
+    queue.close()
+    assert queue.get() is None
+    assert not queue.put("c", 1)
+
+
+def test_plot_data_nbytes():
+    field = xr.DataArray(np.zeros((10, 20)))
+    assert plot_data_nbytes(dict(a=field, b=[field.values, None], c="text")) == 2 * field.nbytes
+
+
+def test_rasterize(offline_map, mock_data_source, start_time, forecast_time, system_name, tmp_path):
+    plot_module = resolve_plot("cn.t2m")
+    plot_metadata = plot_module.PlotMetadata(start_time=start_time, forecast_time=forecast_time, system_name=system_name)
+    plot_data = plot_module.load_data(
+        data_loader=DataLoader(data_source=mock_data_source), start_time=start_time, forecast_time=forecast_time,
+    )
+    panel = plot_module.plot(plot_data=plot_data, plot_metadata=plot_metadata)
+    panel.save(tmp_path / "saved.png")
+    write_png(rasterize(panel.fig), tmp_path / "written.png")
+    plt.close(panel.fig)
+    assert (tmp_path / "written.png").read_bytes() == (tmp_path / "saved.png").read_bytes()
+
+
+def pipeline_jobs(data_source, start_time, system_name, tmp_path):
+    def load(plot_type, forecast_hour):
+        def load_plot():
+            forecast_time = pd.Timedelta(hours=forecast_hour)
+            plot_module = resolve_plot(plot_type)
+            plot_data = plot_module.load_data(
+                data_loader=DataLoader(data_source=data_source), start_time=start_time, forecast_time=forecast_time,
+            )
+            plot_metadata = plot_module.PlotMetadata(
+                start_time=start_time, forecast_time=forecast_time, system_name=system_name,
+            )
+            return plot_module, plot_metadata, plot_data
+        return load_plot
+
+    def broken():
+        raise RuntimeError("broken load")
+
+    china = PlotArea("China")
+    return [
+        PipelineJob(
+            plot_type="cn.t2m",
+            load=load("cn.t2m", 24),
+            outputs=[(area, tmp_path / f"t2m_{area.name}_024.png") for area in (china, CN_AREAS[1])],
+        ),
+        PipelineJob(plot_type="cn.t2m", load=broken, outputs=[(china, tmp_path / "broken.png")]),
+        PipelineJob(plot_type="cn.t2m", load=load("cn.t2m", 48), outputs=[(china, tmp_path / "t2m_China_048.png")]),
+    ]
+
+
+def check_results(results, jobs):
+    assert [result.path for result in results] == [path for job in jobs for _, path in job.outputs]
+    assert [result.ok for result in results] == [True, True, False, True]
+    assert "broken load" in results[2].error
+    assert all(result.path.exists() for result in results if result.ok)
+
+
+def test_pipeline(offline_map, mock_data_source, start_time, system_name, tmp_path):
+    jobs = pipeline_jobs(mock_data_source, start_time, system_name, tmp_path)
+    # budget of one plot data: loaders wait for each render
+    pipeline = PlotPipeline(max_bytes=1)
+    results = pipeline.run(jobs)
+    check_results(results, jobs)
+    stats = pipeline.stats()
+    assert stats.load_seconds > 0 and stats.render_seconds > 0 and stats.write_seconds > 0
+    assert stats.peak_bytes > 0
+
+
+def test_pipeline_shared_plot_data(offline_map, mock_data_source, start_time, system_name, tmp_path):
+    """Areas of one job drawn in this process equal areas drawn from their own load."""
+    [job, _, _] = pipeline_jobs(mock_data_source, start_time, system_name, tmp_path)
+    # overlapping areas: the second one was drawn from data cropped to the first
+    job.outputs = [(area, tmp_path / f"{area.name}.png") for area in (CN_AREAS[0], CN_AREAS[1])]
+    results = PlotPipeline().run([job])
+    assert all(result.ok for result in results)
+
+    for area, path in job.outputs:
+        plot_module, plot_metadata, plot_data = job.load()
+        panel = plot_module.plot(plot_data=plot_data, plot_metadata=area_metadata(plot_metadata, area))
+        panel.save(tmp_path / f"single_{area.name}.png")
+        plt.close(panel.fig)
+        assert_image_match(path, tmp_path / f"single_{area.name}.png")
+
+
+def use_offline_map():
+    cedarkit_map.DEFAULT_MAP_LOADER_PACKAGE = OFFLINE_MAP_LOADER_PACKAGE
+
+
+class CountingExecutor(ProcessPoolExecutor):
+    """Process pool counting submitted tasks."""
+    submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+def test_pipeline_processes(offline_map, mock_data_source, start_time, system_name, tmp_path):
+    jobs = pipeline_jobs(mock_data_source, start_time, system_name, tmp_path)
+    executor = CountingExecutor(
+        max_workers=2, mp_context=multiprocessing.get_context("fork"), initializer=use_offline_map,
+    )
+    with executor:
+        # start the workers before the loader threads
+        list(executor.map(abs, range(2)))
+        executor.submitted = 0
+        results = PlotPipeline(executor=executor, max_pending_renders=2).run(jobs)
+    check_results(results, jobs)
+    # one render task per loaded plot, whatever its number of areas
+    assert executor.submitted == 2
+
+    # recipe plot data and metadata classes are rebuilt in the workers
+    plot_module, plot_metadata, plot_data = jobs[-1].load()
+    panel = plot_module.plot(plot_data=plot_data, plot_metadata=plot_metadata)
+    panel.save(tmp_path / "full.png")
+    plt.close(panel.fig)
+    assert_image_match(tmp_path / "t2m_China_048.png", tmp_path / "full.png")
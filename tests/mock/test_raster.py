@@ -0,0 +1,128 @@
+"""Raster render of fill styles: band classification, colors, style/recipe ``render`` and drawing."""
+from pathlib import Path
+from types import SimpleNamespace
+
+import matplotlib.colors as mcolors
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+import xarray as xr
+from matplotlib.collections import QuadMesh
+from matplotlib.image import AxesImage
+
+from cedarkit.plots.engine.recipe import Recipe
+from cedarkit.plots.style import ContourStyle
+from cedarkit.plots.style.schema import StyleFileError
+
+from cedar_graph.recipes.engine import FIELD_INFOS, RecipePlotEngine, RenderRecipe, create_op_registry
+from cedar_graph.styles.raster import RasterContourStyle, add_raster_fill, band_colors, classify, with_render
+from cedar_graph.styles.registry import LazyStyleRegistry
+
+
+RECIPE_DIR = Path(__file__).parents[2] / "cedar_graph" / "recipes" / "cn"
+
+STYLE_TEMPLATE = """\
+id: demo
+criteria:
+  - cemc_name: demo
+optimal: cn
+styles:
+  cn:
+    type: contour
+    colormap:
+      colors: [white, red, green, blue]
+    levels: [0, 10, 20]
+    fill: {fill}
+    render: raster
+  cn_contour:
+    type: contour
+    colormap:
+      colors: [white, red, green, blue]
+    levels: [0, 10, 20]
+    fill: true
+"""
+
+
+def test_classify():
+    values = np.array([[-5, 0, 5, 10], [15, 20, 25, np.nan]])
+    classes = classify(values, [0, 10, 20])
+    assert classes.dtype == np.uint8
+    assert classes[0].tolist() == [0, 1, 1, 1]
+    assert classes[1, :3].tolist() == [2, 2, 3]
+    assert classes.mask.tolist() == [[False] * 4, [False] * 3 + [True]]
+
+    with pytest.raises(ValueError):
+        classify(values, np.arange(300))
+
+
+def test_band_colors():
+    colors = ["white", "red", "green", "blue"]
+    np.testing.assert_array_equal(band_colors(colors, [0, 10, 20]), mcolors.to_rgba_array(colors))
+    # colormap with more colors than bands: sampled as the colorbar does
+    cmap = plt.get_cmap("viridis")
+    norm = mcolors.BoundaryNorm([0, 10, 20], cmap.N, extend="both")
+    np.testing.assert_array_equal(band_colors(cmap, [0, 10, 20]), cmap(norm([-1, 5, 15, 21])))
+
+
+def test_with_render():
+    style = ContourStyle(colors=["white", "red", "green", "blue"], levels=[0, 10, 20], fill=True)
+    raster_style = with_render(style, "raster")
+    assert type(raster_style) is RasterContourStyle
+    assert raster_style.levels == style.levels
+    assert with_render(raster_style, "raster") is raster_style
+    assert type(with_render(raster_style, "contour")) is ContourStyle
+    assert with_render(style, None) is style
+
+    with pytest.raises(ValueError):
+        with_render(ContourStyle(levels=[0, 10, 20], colors="k"), "raster")
+
+
+def test_style_render(tmp_path):
+    (tmp_path / "demo.yml").write_text(STYLE_TEMPLATE.format(fill="true"))
+    registry = LazyStyleRegistry([tmp_path])
+    assert type(registry.get_style("demo")) is RasterContourStyle
+    assert type(registry.get_style("demo", "cn_contour")) is ContourStyle
+
+    (tmp_path / "demo.yml").write_text(STYLE_TEMPLATE.format(fill="false"))
+    with pytest.raises(StyleFileError, match="render: raster"):
+        LazyStyleRegistry([tmp_path]).get_style("demo")
+
+
+def test_recipe_render(tmp_path, start_time):
+    engine = RecipePlotEngine(op_registry=create_op_registry(), field_registry=FIELD_INFOS)
+    assert type(engine.load_recipe(RECIPE_DIR / "t2m.yaml")) is Recipe
+
+    recipe_path = tmp_path / "t2m.yaml"
+    text = (RECIPE_DIR / "t2m.yaml").read_text(encoding="utf-8")
+    recipe_path.write_text(text.replace("  - field: t2m\n", "  - field: t2m\n    render: raster\n"), encoding="utf-8")
+    recipe = engine.load_recipe(recipe_path)
+    assert isinstance(recipe, RenderRecipe)
+    assert recipe.layers[0].render == "raster"
+
+    style = engine.build_layer_style(recipe.layers[0], SimpleNamespace(start_time=start_time))
+    assert type(style) is RasterContourStyle
+
+
+def field(x, y) -> xr.DataArray:
+    lon, lat = np.meshgrid(x, y)
+    return xr.DataArray(
+        np.sin(lon / 3) * np.cos(lat / 4) * 20 + 10,
+        coords={"latitude": y, "longitude": x},
+        dims=["latitude", "longitude"],
+    )
+
+
+def test_add_raster_fill():
+    style = ContourStyle(colors=["white", "red", "green", "blue"], levels=[0, 10, 20], fill=True)
+    fig, ax = plt.subplots()
+    ax.set_xlim(2, 8)
+    ax.set_ylim(1, 9)
+    image = add_raster_fill(ax, field(np.linspace(0, 10, 41), np.linspace(0, 10, 21)), style)
+    assert isinstance(image, AxesImage)
+    assert image.get_extent() == [-0.125, 10.125, -0.25, 10.25]
+    assert (ax.get_xlim(), ax.get_ylim()) == ((2, 8), (1, 9))
+
+    # irregular grid
+    mesh = add_raster_fill(ax, field(np.geomspace(1, 10, 41), np.linspace(0, 10, 21)), style)
+    assert isinstance(mesh, QuadMesh)
+    plt.close(fig)
@@ -0,0 +1,118 @@
+"""Load-once fan-out: per-area metadata and drawing areas in turn or in forked processes.
+
+Most plots are drawn by a fake plot module with blank figures. Real plot
+modules draw mock data on maps of the China border shapefiles bundled with
+cedarkit only (the offline map loader of ``test_composite``).
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+import matplotlib.pyplot as plt
+import pytest
+
+from cedarkit.plots import map as cedarkit_map
+from cedarkit.plots.types import AreaRange
+
+from cedar_graph.quickplot import load_plot
+from cedar_graph.render import CN_AREAS, PlotArea, area_metadata, render_areas
+
+from .image_baseline import assert_image_match
+
+
+@dataclass
+class FakePlotMetadata:
+    start_time: Optional[str] = None
+    area_range: Optional[AreaRange] = None
+    area_name: Optional[str] = None
+
+
+class FakePanel:
+    def __init__(self, area_name):
+        self.fig = plt.figure()
+        self.area_name = area_name
+
+    def save(self, path):
+        with open(path, "w") as f:
+            f.write(self.area_name)
+
+
+class FakePlotModule:
+    PlotMetadata = FakePlotMetadata
+
+    @staticmethod
+    def plot(plot_data, plot_metadata):
+        plot_data["drawn"].append(plot_metadata.area_name)
+        return FakePanel(f"{plot_metadata.area_name}:{plot_data['field']}")
+
+
+def test_area_metadata():
+    plot_metadata = FakePlotMetadata(start_time="2024070100")
+    metadata = area_metadata(plot_metadata, CN_AREAS[0])
+    assert metadata.area_name == "NorthEast"
+    assert metadata.area_range == CN_AREAS[0].area
+    assert metadata.start_time == "2024070100"
+    assert plot_metadata.area_name is None
+
+
+def test_render_areas():
+    plot_data = dict(field="t2m", drawn=[])
+    areas = [CN_AREAS[0], AreaRange.from_tuple((100, 120, 20, 40)), None]
+    panels = render_areas(FakePlotModule, plot_data, FakePlotMetadata(), areas)
+    assert [panel.area_name for panel in panels] == ["NorthEast:t2m", "area1:t2m", "area2:t2m"]
+    assert plot_data["drawn"] == ["NorthEast", "area1", "area2"]
+    for panel in panels:
+        plt.close(panel.fig)
+
+    figures = plt.get_fignums()
+    results = render_areas(
+        FakePlotModule, dict(field="t2m", drawn=[]), FakePlotMetadata(), CN_AREAS[:2],
+        output=lambda area, panel: (area.name, panel.area_name),
+    )
+    assert results == [("NorthEast", "NorthEast:t2m"), ("NorthChina", "NorthChina:t2m")]
+    assert plt.get_fignums() == figures
+
+
+def test_render_areas_template(tmp_path):
+    paths = render_areas(
+        FakePlotModule, dict(field="t2m", drawn=[]), FakePlotMetadata(), [PlotArea(name="China")],
+        output=str(tmp_path / "t2m/{area_name}.png"),
+    )
+    assert paths == [tmp_path / "t2m/China.png"]
+    assert paths[0].read_text() == "China:t2m"
+
+
+def test_render_areas_processes(tmp_path):
+    plot_data = dict(field="t2m", drawn=[])
+    paths = render_areas(
+        FakePlotModule, plot_data, FakePlotMetadata(), CN_AREAS,
+        output=str(tmp_path / "{area_name}.png"), processes=3,
+    )
+    assert [path.read_text() for path in paths] == [f"{area.name}:t2m" for area in CN_AREAS]
+    # drawn in child processes
+    assert plot_data["drawn"] == []
+
+    with pytest.raises(ValueError, match="output"):
+        render_areas(FakePlotModule, plot_data, FakePlotMetadata(), CN_AREAS, processes=3)
+
+
+@pytest.mark.parametrize("plot_type,params", [("cn.t2m", {}), ("cn.t_dew_t.default", dict(level=850))])
+def test_render_areas_shared_data(
+        monkeypatch, mock_data_source, start_time, forecast_time, system_name, tmp_path, plot_type, params,
+):
+    """Areas drawn from one load equal areas drawn from their own load: ``plot()`` crops a copy."""
+    monkeypatch.setattr(cedarkit_map, "DEFAULT_MAP_LOADER_PACKAGE", "tests.mock.test_composite")
+    plot_settings = dict(system_name=system_name, start_time=start_time, forecast_time=str(forecast_time), **params)
+
+    def load():
+        return load_plot(plot_type, plot_settings, data_source_config={}, data_source=mock_data_source)
+
+    # disjoint areas: the second area was cropped out of the first one's data
+    areas = [CN_AREAS[0], CN_AREAS[7]]
+    plot_module, plot_metadata, plot_data = load()
+    paths = render_areas(plot_module, plot_data, plot_metadata, areas, output=str(tmp_path / "{area_name}.png"))
+    for area, path in zip(areas, paths):
+        plot_module, plot_metadata, plot_data = load()
+        [single_path] = render_areas(
+            plot_module, plot_data, plot_metadata, [area], output=str(tmp_path / "single_{area_name}.png"),
+        )
+        assert_image_match(path, single_path)
@@ -0,0 +1,245 @@
+"""Render daemon: request parsing, worker pool recycling and the HTTP API on TCP and Unix sockets.
+
+Workers run in a thread pool with a fake render function: rendering real
+plots needs map data not available in CI.
+"""
+import http.client
+import json
+import multiprocessing
+import os
+import socket
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from cedar_graph.cli import create_parser
+from cedar_graph.server import PlotRequest, PlotResult, PlotService, create_server
+
+
+REQUEST = dict(
+    plot_type="cn.t2m",
+    system_name="CMA-GFS",
+    start_time="2024070100",
+    forecast_time="24h",
+)
+
+
+def fake_render(request: PlotRequest, data_source_config) -> PlotResult:
+    if request.plot_type == "cn.broken":
+        raise RuntimeError("broken plot")
+    if request.plot_type == "cn.crash":
+        os._exit(1)
+    if request.output_path is not None:
+        return PlotResult(path=request.output_path, elapsed=0.5)
+    content = json.dumps(dict(plot_settings=request.plot_settings(), data_source_config=data_source_config))
+    return PlotResult(content=content.encode("utf-8"), elapsed=0.5)
+
+
+def create_service(**kwargs) -> PlotService:
+    return PlotService(
+        data_source_config=dict(data_class="od"),
+        executor_factory=lambda: ThreadPoolExecutor(max_workers=2),
+        render=fake_render,
+        **kwargs,
+    )
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path):
+        super().__init__("localhost")
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(str(self.socket_path))
+
+
+@pytest.fixture(params=["tcp", "unix"])
+def connect(request, tmp_path):
+    service = create_service()
+    if request.param == "tcp":
+        server = create_server(service, port=0)
+        port = server.server_address[1]
+        connection_factory = lambda: http.client.HTTPConnection("127.0.0.1", port)
+    else:
+        socket_path = tmp_path / "cedar-graph.sock"
+        server = create_server(service, socket_path=socket_path)
+        connection_factory = lambda: UnixHTTPConnection(socket_path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield connection_factory
+    server.shutdown()
+    server.server_close()
+    service.shutdown()
+
+
+def post(connection, path, content):
+    body = content if isinstance(content, bytes) else json.dumps(content).encode("utf-8")
+    connection.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+    return connection.getresponse()
+
+
+def test_plot_request():
+    request = PlotRequest.from_dict(dict(
+        REQUEST,
+        area=dict(start_longitude=100, end_longitude=120, start_latitude=20, end_latitude=40),
+        params=dict(interval="24h"),
+    ))
+    plot_settings = request.plot_settings()
+    assert plot_settings["start_time"] == "2024070100"
+    assert plot_settings["interval"] == "24h"
+    assert plot_settings["area_range"]["end_latitude"] == 40
+
+    with pytest.raises(ValueError, match="missing"):
+        PlotRequest.from_dict(dict(plot_type="cn.t2m"))
+    with pytest.raises(ValueError, match="unknown"):
+        PlotRequest.from_dict(dict(REQUEST, level=850))
+    with pytest.raises(ValueError):
+        PlotRequest.from_dict([REQUEST])
+    with pytest.raises(ValueError, match="area"):
+        PlotRequest.from_dict(dict(REQUEST, area=[100, 120, 20, 40]))
+    with pytest.raises(ValueError, match="area"):
+        PlotRequest.from_dict(dict(REQUEST, area=dict(start_longitude=100, end_longitude=120)))
+    with pytest.raises(ValueError, match="area"):
+        PlotRequest.from_dict(dict(
+            REQUEST, area=dict(start_longitude="100", end_longitude=120, start_latitude=20, end_latitude=40),
+        ))
+    with pytest.raises(ValueError, match="forecast_time"):
+        PlotRequest.from_dict(dict(REQUEST, forecast_time=None))
+    with pytest.raises(ValueError, match="dpi"):
+        PlotRequest.from_dict(dict(REQUEST, dpi="high"))
+
+
+def test_recycle_workers():
+    executors = []
+
+    def executor_factory():
+        executors.append(ThreadPoolExecutor(max_workers=1))
+        return executors[-1]
+
+    service = PlotService(recycle_after=2, executor_factory=executor_factory, render=fake_render)
+    for _ in range(5):
+        service.render(PlotRequest(**REQUEST))
+    assert len(executors) == 3
+    assert service.stats()["recycled"] == 2
+    assert service.stats()["completed"] == 5
+
+    with pytest.raises(RuntimeError):
+        service.render(PlotRequest(**dict(REQUEST, plot_type="cn.broken")))
+    assert service.stats()["failed"] == 1
+    service.shutdown()
+
+
+class BrokenExecutor(ThreadPoolExecutor):
+    def submit(self, *args, **kwargs):
+        raise BrokenProcessPool("a worker crashed")
+
+
+def test_broken_workers():
+    # broken before the request: replaced on submit
+    executors = [BrokenExecutor(max_workers=1)]
+
+    def executor_factory():
+        if not executors:
+            executors.append(ThreadPoolExecutor(max_workers=1))
+        return executors.pop()
+
+    service = PlotService(recycle_after=None, executor_factory=executor_factory, render=fake_render)
+    service.render(PlotRequest(**REQUEST))
+    assert service.stats()["recycled"] == 1
+    assert service.stats()["completed"] == 1
+    service.shutdown()
+
+    # broken by the request: the request fails, the next one runs in a new pool
+    service = PlotService(
+        recycle_after=None,
+        executor_factory=lambda: ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("fork")),
+        render=fake_render,
+    )
+    with pytest.raises(BrokenProcessPool):
+        service.render(PlotRequest(**dict(REQUEST, plot_type="cn.crash")))
+    assert service.render(PlotRequest(**REQUEST)).content is not None
+    assert service.stats() == dict(workers=service.max_workers, recycle_after=None, completed=1, failed=1, recycled=1)
+    service.shutdown()
+
+
+def test_plot(connect):
+    connection = connect()
+    response = post(connection, "/plot", dict(REQUEST, params=dict(wind_level=850)))
+    assert response.status == 200
+    assert response.getheader("Content-Type") == "image/png"
+    assert response.getheader("X-Render-Time") == "0.500"
+    content = json.loads(response.read())
+    assert content["plot_settings"]["wind_level"] == 850
+    assert content["data_source_config"] == dict(data_class="od")
+
+    # keep-alive connection
+    response = post(connection, "/plot", dict(REQUEST, output_path="/tmp/t2m.png"))
+    assert response.status == 200
+    assert json.loads(response.read()) == dict(path="/tmp/t2m.png", elapsed=0.5)
+
+
+def test_plot_errors(connect):
+    connection = connect()
+    response = post(connection, "/plot", b"not json")
+    assert response.status == 400
+    response.read()
+
+    response = post(connection, "/plot", dict(plot_type="cn.t2m"))
+    assert response.status == 400
+    assert "missing" in json.loads(response.read())["error"]
+
+    response = post(connection, "/plot", b"\xff")
+    assert response.status == 400
+    response.read()
+
+    response = post(connection, "/plot", dict(REQUEST, area=dict(start_longitude=100)))
+    assert response.status == 400
+    assert "area" in json.loads(response.read())["error"]
+
+    response = post(connection, "/plot", dict(REQUEST, plot_type="cn.broken"))
+    assert response.status == 500
+    assert "broken plot" in json.loads(response.read())["error"]
+
+    response = post(connection, "/unknown", REQUEST)
+    assert response.status == 404
+    response.read()
+
+
+def test_content_length(connect):
+    for length in ("abc", "-1"):
+        connection = connect()
+        connection.putrequest("POST", "/plot")
+        connection.putheader("Content-Length", length)
+        connection.endheaders()
+        response = connection.getresponse()
+        assert response.status == 400
+        assert response.getheader("Connection") == "close"
+        assert "Content-Length" in json.loads(response.read())["error"]
+        connection.close()
+
+
+def test_health(connect):
+    connection = connect()
+    post(connection, "/plot", REQUEST).read()
+    connection.request("GET", "/health")
+    response = connection.getresponse()
+    assert response.status == 200
+    content = json.loads(response.read())
+    assert content["status"] == "ok"
+    assert content["completed"] == 1
+
+
+def test_serve_arguments():
+    args = create_parser().parse_args([
+        "serve", "--socket", "/tmp/cedar-graph.sock", "--workers", "2", "--recycle-after", "0",
+        "--map-cache", "/tmp/cedar-graph-maps", "--recipe-cache", "/tmp/cedar-graph-recipes",
+    ])
+    assert args.command == "serve"
+    assert args.socket == "/tmp/cedar-graph.sock"
+    assert args.workers == 2
+    assert args.recycle_after == 0
+    assert args.map_cache == "/tmp/cedar-graph-maps"
+    assert args.recipe_cache == "/tmp/cedar-graph-recipes"
@@ -0,0 +1,145 @@
+"""Lazy style registry: per-id parsing, search order, snapshots and lazy RGB tables."""
+import os
+
+import numpy as np
+import pytest
+
+from cedarkit.plots.style import StyleRegistry
+from cedarkit.plots.style import registry as cedarkit_style_registry
+
+import cedar_graph.styles.registry as style_registry_module
+from cedar_graph.styles import STYLE_PATHS, get_rgb_table, pending_rgb_tables, register_rgb_table_factory
+from cedar_graph.styles.registry import LazyStyleRegistry
+
+
+STYLE_TEMPLATE = """\
+id: {style_id}
+criteria:
+  - cemc_name: {name}
+optimal: cn
+styles:
+  cn:
+    type: contour
+    colormap:
+      colors: [red, green, blue]
+    levels: {levels}
+"""
+
+
+def write_style(path, style_id, levels, name=None):
+    path.write_text(STYLE_TEMPLATE.format(style_id=style_id, name=name or style_id, levels=levels))
+
+
+def test_parse_on_first_use():
+    registry = LazyStyleRegistry(STYLE_PATHS)
+    file_count = len(list(STYLE_PATHS[0].glob("*.yml")))
+    assert registry.pending_count == file_count
+    assert "t2m" in registry.style_ids
+
+    registry.get_style("t2m")
+    assert registry.pending_count == file_count - 1
+
+
+def test_same_styles_as_default_registry():
+    lazy_registry = LazyStyleRegistry.default()
+    registry = StyleRegistry.default()
+    assert lazy_registry.style_ids == registry.style_ids
+
+    for style_id, variant in [("t2m", "cn_winter"), ("h_500", None), ("shr", "cn_fill")]:
+        actual = lazy_registry.get_style(style_id, variant)
+        expected = registry.get_style(style_id, variant)
+        np.testing.assert_allclose(np.asarray(actual.levels, dtype=float), np.asarray(expected.levels, dtype=float))
+    assert lazy_registry.match({"cemc_name": "t2m"}) == registry.match({"cemc_name": "t2m"}) == "t2m"
+
+
+def test_override(tmp_path):
+    base_dir = tmp_path / "base"
+    user_dir = tmp_path / "user"
+    base_dir.mkdir()
+    user_dir.mkdir()
+    write_style(base_dir / "demo.yml", "demo", [0, 1])
+    write_style(user_dir / "demo.yml", "demo", [0, 2])
+
+    registry = LazyStyleRegistry([base_dir, user_dir])
+    assert registry.style_ids == ["demo"]
+    assert registry.get_style("demo").levels[-1] == 2
+    assert registry.pending_count == 0
+
+    with pytest.raises(KeyError):
+        registry.get_style("unknown")
+
+
+def test_match_uses_search_order(tmp_path):
+    base_dir = tmp_path / "base"
+    user_dir = tmp_path / "user"
+    base_dir.mkdir()
+    user_dir.mkdir()
+    write_style(base_dir / "a_generic.yml", "a_generic", [0, 1], name="demo")
+    write_style(user_dir / "b_business.yml", "b_business", [0, 1], name="demo")
+
+    registry = LazyStyleRegistry([base_dir, user_dir])
+    registry.get_style("b_business")
+    assert registry.match({"cemc_name": "demo"}) == "b_business"
+
+
+def test_snapshot(tmp_path, monkeypatch):
+    style_dir = tmp_path / "styles"
+    style_dir.mkdir()
+    write_style(style_dir / "demo.yml", "demo", [0, 1])
+    write_style(style_dir / "edited.yml", "edited", [0, 1])
+    snapshot_path = tmp_path / "snapshot" / "styles.pickle"
+    LazyStyleRegistry([style_dir]).save_snapshot(snapshot_path)
+    assert pending_rgb_tables() == []
+
+    write_style(style_dir / "edited.yml", "edited", [0, 5])
+    stat = (style_dir / "edited.yml").stat()
+    os.utime(style_dir / "edited.yml", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    parsed = []
+    load_style_file = style_registry_module.load_style_file
+
+    def counting_load_style_file(path):
+        parsed.append(path.name)
+        return load_style_file(path)
+
+    monkeypatch.setattr(style_registry_module, "load_style_file", counting_load_style_file)
+    registry = LazyStyleRegistry([style_dir])
+    assert registry.load_snapshot(snapshot_path)
+    assert registry.get_style("demo").levels[-1] == 1
+    assert registry.get_style("edited").levels[-1] == 5
+    assert parsed == ["edited.yml"]
+
+
+def test_load_snapshot_missing(tmp_path):
+    registry = LazyStyleRegistry(STYLE_PATHS)
+    assert not registry.load_snapshot(tmp_path / "missing.pickle")
+    (tmp_path / "broken.pickle").write_bytes(b"not a pickle")
+    assert not registry.load_snapshot(tmp_path / "broken.pickle")
+
+
+def test_rgb_table_factory():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return [(1, 0, 0), (0, 0, 1)]
+
+    register_rgb_table_factory("test_lazy_table", factory)
+    assert calls == []
+    assert "test_lazy_table" in pending_rgb_tables()
+
+    # cedarkit looks tables up through the wrapper when building styles
+    assert cedarkit_style_registry.get_rgb_table is get_rgb_table
+    assert get_rgb_table("test_lazy_table").N == 2
+    get_rgb_table("test_lazy_table")
+    assert calls == [1]
+    assert "test_lazy_table" not in pending_rgb_tables()
+
+    # tables not built yet are listed as known
+    register_rgb_table_factory("test_pending_table", factory)
+    with pytest.raises(KeyError, match="test_pending_table"):
+        get_rgb_table("test_unknown_table")
+
+    # registered again: replaces the built table when used
+    register_rgb_table_factory("test_lazy_table", lambda: [(0, 1, 0)] * 3)
+    assert get_rgb_table("test_lazy_table").N == 3
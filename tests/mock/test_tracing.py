@@ -0,0 +1,209 @@
+"""Tracing spans: no-op when disabled, nesting, Chrome trace export, summaries and spans of a plot."""
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import matplotlib.pyplot as plt
+import pytest
+
+from cedarkit.plots import map as cedarkit_map
+from cedarkit.plots.chart.panel import Panel
+
+from cedar_graph import tracing
+from cedar_graph.pipeline import PipelineJob, PlotPipeline
+from cedar_graph.quickplot import load_plot
+from cedar_graph.render import PlotArea, plot_name, render_areas
+from cedar_graph.tracing import (
+    call_traced,
+    disable_tracing,
+    enable_tracing,
+    get_tracer,
+    plot_span,
+    propagate,
+    span,
+    trace,
+    traced,
+)
+
+
+@pytest.fixture
+def offline_map(monkeypatch):
+    monkeypatch.setattr(cedarkit_map, "DEFAULT_MAP_LOADER_PACKAGE", "tests.mock.test_composite")
+
+
+def test_disabled():
+    assert get_tracer() is None
+    assert span("a") is span("b", "data", field="t2m")
+    assert plot_span("a") is span("a")
+    save = Panel.__dict__["save"]
+
+    tracer = enable_tracing()
+    assert Panel.__dict__["save"] is not save
+    assert disable_tracing() is tracer
+    assert Panel.__dict__["save"] is save
+    with span("a"):
+        pass
+    assert tracer.events == []
+
+
+@traced("work", "test")
+def work():
+    with span("inner", "test"):
+        pass
+    return 1
+
+
+def test_nested_spans(tmp_path):
+    with trace(tmp_path / "trace.json", summary_path=tmp_path / "summary.txt") as tracer:
+        with plot_span("demo", forecast_time="24h"):
+            assert work() == 1
+            assert work() == 1
+            # spans of threads running a propagated function belong to the plot
+            with ThreadPoolExecutor(1) as executor:
+                executor.submit(propagate(work)).result()
+        with span("outside"):
+            pass
+    assert get_tracer() is None
+
+    events = {event.name: event for event in tracer.events}
+    plot = events["demo"]
+    assert events["work"].parent_id == plot.span_id
+    assert events["inner"].parent_id == events["work"].span_id
+    assert events["outside"].plot_id is None
+    work_threads = {event.tid for event in tracer.events if event.name == "work"}
+    assert threading.get_ident() in work_threads and len(work_threads) == 2
+
+    [summary] = tracer.summary()
+    assert summary.name == "demo" and summary.args == dict(forecast_time="24h")
+    stages = {stats.name: stats for stats in summary.stages}
+    assert set(stages) == {"work", "inner"}
+    assert stages["work"].count == 3 and stages["inner"].count == 3
+    assert stages["work"].self_seconds == pytest.approx(stages["work"].total_seconds - stages["inner"].total_seconds)
+    assert 0 < summary.self_seconds < summary.seconds
+
+    content = json.loads((tmp_path / "trace.json").read_text())
+    complete = [event for event in content["traceEvents"] if event["ph"] == "X"]
+    assert len(complete) == len(tracer.events)
+    assert all(event["ts"] >= 0 and event["dur"] >= 0 for event in complete)
+    assert any(event["name"] == "thread_name" for event in content["traceEvents"] if event["ph"] == "M")
+
+    text = (tmp_path / "summary.txt").read_text()
+    assert text.startswith("demo forecast_time=24h: ")
+    assert "work" in text and "inner" in text and "(other)" in text
+
+
+def test_plot_spans(offline_map, mock_data_source, start_time, forecast_time, system_name, tmp_path):
+    plot_settings = dict(system_name=system_name, start_time=start_time, forecast_time=str(forecast_time))
+    with trace() as tracer:
+        with plot_span("cn.t2m", stage="load"):
+            plot_module, plot_metadata, plot_data = load_plot(
+                "cn.t2m", plot_settings, data_source_config={}, data_source=mock_data_source,
+            )
+        render_areas(
+            plot_module, plot_data, plot_metadata, [PlotArea("China")], output=str(tmp_path / "{area_name}.png"),
+            plot_type="cn.t2m",
+        )
+    plt.close("all")
+    assert tracing._original_methods == dict()
+
+    load, render = tracer.summary()
+    load_stages = {stats.name for stats in load.stages}
+    assert "retrieve" in load_stages or "retrieve_many" in load_stages
+    assert any(name.startswith("transform:") for name in load_stages)
+    assert render.name == "cn.t2m" and render.args["stage"] == "render" and render.args["area"] == "China"
+    assert {"prepare_data", "plot_layer", "title", "colorbar", "save"} <= {stats.name for stats in render.stages}
+
+
+def test_call_traced():
+    # in the process of the tracer, spans are recorded there
+    with trace() as tracer:
+        assert call_traced(work) == (1, [])
+    assert [event.name for event in tracer.events] == ["inner", "work"]
+
+    # elsewhere, e.g. in a worker process, spans of the call are returned
+    result, events = call_traced(work)
+    assert result == 1 and [event.name for event in events] == ["inner", "work"]
+    assert get_tracer() is None and tracing._original_methods == dict()
+
+
+def render_stages(tracer):
+    """Span names of the render plot spans by process."""
+    stages = dict()
+    for plot in tracer.summary():
+        if plot.args.get("stage") == "render":
+            pid = next(event.pid for event in tracer.events if event.name == plot.name and event.args == plot.args)
+            stages.setdefault(pid, set()).update(stats.name for stats in plot.stages)
+    return stages
+
+
+def test_worker_spans(offline_map, mock_data_source, start_time, forecast_time, system_name, tmp_path):
+    """Spans of forked render processes and pipeline workers are merged with their pid."""
+    plot_settings = dict(system_name=system_name, start_time=start_time, forecast_time=str(forecast_time))
+    plot_module, plot_metadata, plot_data = load_plot(
+        "cn.t2m", plot_settings, data_source_config={}, data_source=mock_data_source,
+    )
+    areas = [PlotArea("China"), PlotArea("NorthChina", (110, 120, 35, 45))]
+    with trace(tmp_path / "areas.json") as tracer:
+        paths = render_areas(
+            plot_module, plot_data, plot_metadata, areas, output=str(tmp_path / "{area_name}.png"),
+            processes=2, plot_type="cn.t2m",
+        )
+    assert all(path.exists() for path in paths)
+    stages = render_stages(tracer)
+    assert os.getpid() not in stages and len(stages) >= 1
+    for names in stages.values():
+        assert {"prepare_data", "plot_layer", "title", "colorbar", "save"} <= names
+    content = json.loads((tmp_path / "areas.json").read_text())
+    process_names = {event["pid"] for event in content["traceEvents"] if event["name"] == "process_name"}
+    assert process_names == {os.getpid(), *stages}
+    span_ids = [event.span_id for event in tracer.events]
+    assert len(set(span_ids)) == len(span_ids)
+
+    job = PipelineJob(
+        plot_type="cn.t2m",
+        load=lambda: (plot_module, plot_metadata, plot_data),
+        outputs=[(area, tmp_path / f"pipeline_{area.name}.png") for area in areas],
+    )
+    executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("fork"))
+    with executor, trace() as tracer:
+        results = PlotPipeline(executor=executor).run([job])
+    assert all(result.ok for result in results)
+    stages = render_stages(tracer)
+    [worker] = stages
+    assert worker != os.getpid()
+    assert {"prepare_data", "plot_layer", "title", "colorbar", "rasterize"} <= stages[worker]
+    assert "write_png" in {event.name for event in tracer.events if event.pid == os.getpid()}
+    plt.close("all")
+
+
+def test_template_overrides():
+    """Overrides of ``set_title`` / ``add_colorbar`` are recorded, once when they call ``super()``."""
+    from cedarkit.plots.domains import MapTemplate
+    from cedarkit.plots.domains.ens_cn import EnsCNMapTemplate
+    from cedarkit.plots.domains.global_template import GlobalMapTemplate
+
+    class Template(MapTemplate):
+        def set_title(self, *args, **kwargs):
+            pass
+
+    class SubTemplate(Template):
+        def set_title(self, *args, **kwargs):
+            super().set_title(*args, **kwargs)
+
+    originals = [GlobalMapTemplate.__dict__["set_title"], EnsCNMapTemplate.__dict__["add_colorbar"]]
+    with trace() as tracer:
+        assert GlobalMapTemplate.__dict__["set_title"] is not originals[0]
+        assert EnsCNMapTemplate.__dict__["add_colorbar"] is not originals[1]
+        with plot_span("demo"):
+            SubTemplate.__new__(SubTemplate).set_title()
+    assert [GlobalMapTemplate.__dict__["set_title"], EnsCNMapTemplate.__dict__["add_colorbar"]] == originals
+    assert [event.name for event in tracer.events] == ["title", "demo"]
+
+
+def test_plot_name():
+    from cedar_graph.quickplot import resolve_plot
+
+    assert plot_name(resolve_plot("cn.t_dew_t.default")) == "cn.t_dew_t.default"
+    assert plot_name(resolve_plot("cn.t2m")) == resolve_plot("cn.t2m").recipe.name